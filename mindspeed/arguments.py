@@ -113,6 +113,12 @@ def _add_coc_args(parser):
                        help='coc parallel num')
     group.add_argument('--coc-fused-kernel', action='store_true',
                        help='use coc fused kernel')
+    group.add_argument('--coc-autotune', action='store_true',
+                       help='time the coc parallel nums 1/2/4/8 for every matmul shape at its first run '
+                            'and use the fastest one')
+    group.add_argument('--coc-autotune-cache', type=str, default=None,
+                       help='json file of the coc autotune results, loaded at startup and updated with '
+                            'the newly tuned shapes')
     return parser
 
 
@@ -139,6 +145,15 @@ def _add_moe_args(parser):
                        help="Reducing AllReduce communication under the no drop policy through the sliding window mechanism.")
     group.add_argument("--moe-use-sinkhorn", action='store_true',
                        help="Use sinkhorn load balancing in the gate.")
+    group.add_argument("--moe-capacity-bucket-size", type=int, default=0,
+                       help="Round the capacity of `--moe-dynamic-padding` up to multiples of this size, "
+                            "so that the shapes of the experts change rarely.")
+    group.add_argument("--moe-capacity-shrink-patience", type=int, default=16,
+                       help="Number of consecutive steps the bucketed capacity must be larger than required "
+                            "before it shrinks, 16 by default.")
+    group.add_argument("--moe-sparse-dispatch", action='store_true',
+                       help="Dispatch and combine tokens through per-expert token indices "
+                            "instead of dense [S, E, C] combine weights and dispatch mask.")
 
     # megatron mcore moe arguments
     group.add_argument("--moe-tp-extend-ep", action='store_true',
@@ -197,6 +212,12 @@ def _add_cp_args(parser):
                        help='not apply remapping but only rescheduling process in adaptive-cp feature')
     group.add_argument('--adaptive-cp-manually-set-mask-list', action='store_true',
                        help='manually set pre-cooked attention mask list')
+    group.add_argument('--adaptive-cp-cache-size', type=int, default=0,
+                       help='number of attention mask patterns whose adaptive cp remap and scheduling are cached '
+                            'with --adaptive-cp-dynamic-attn-mask, 0 (default) disables the cache')
+    group.add_argument('--adaptive-cp-async-remap', action='store_true',
+                       help='remap attention masks missing from the adaptive cp cache in a background thread, '
+                            'the step uses the plan without remapping until the remap is done')
     group.add_argument('--context-parallel-kv-cache-policy', type=str, default=None,
                        choices=['full', 'half'],
                        help='Selectivity cache K, V in process of cp.'
@@ -320,6 +341,9 @@ def _add_training_args(parser):
                        help='Swap modules for model. Can be used together with "--swap-attention."')
     group.add_argument('--adaptive-memory-optimization', action='store_true', default=False,
                        help='Switch to open adaptive memory optimization feature, default is False.')
+    group.add_argument('--swap-pinned-pool-max-cached-gb', type=float, default=None,
+                       help='Cap in GB of the free pinned host buffers kept for reuse by the activation swaps of '
+                            '"--swap-attention" and "--adaptive-memory-optimization". The default keeps them all.')
     group.add_argument('--use-fusion-attn-v2', action='store_true', default=False,
                        help='use fusion_attention ops version 2')
     group.add_argument('--pipe-experts-multi-data', type=int, default=1,
@@ -331,6 +355,10 @@ def _add_training_args(parser):
     group.add_argument("--additional-config", help="additional model config file path")
     group.add_argument('--use-ema', action='store_true', default=False,
                        help='use ema when training')
+    group.add_argument('--ema-update-interval', type=int, default=1,
+                       help='update the ema every this many steps with the decay raised to this power when --use-ema.')
+    group.add_argument('--ema-warmup-steps', type=int, default=0,
+                       help='ramp up the ema decay linearly from 0 during this many steps when --use-ema.')
     group.add_argument('--use-multiparameter-pipeline-model-parallel', action='store_true', default=False,
                        help='can transfer multi parameters from stage to stage in pipeline model parallel')
     group.add_argument('--ampipe-degree', type=int, default=1,
@@ -647,6 +675,17 @@ def validate_args_wrapper(validate_args):
             raise AssertionError('`--moe-zero-memory` do not support `--moe-allgather-overlap-comm` for now.')
         if args.moe_dynamic_padding and not args.moe_no_drop:
             raise AssertionError('`--moe-dynamic-padding` only support for `--moe-no-drop`.')
+        if args.moe_capacity_bucket_size < 0 or args.moe_capacity_shrink_patience < 0:
+            raise AssertionError('`--moe-capacity-bucket-size` and `--moe-capacity-shrink-patience` must be >= 0.')
+        if args.moe_capacity_bucket_size and not args.moe_dynamic_padding:
+            raise AssertionError('`--moe-capacity-bucket-size` only support for `--moe-dynamic-padding`.')
+        if args.moe_sparse_dispatch:
+            if args.moe_model_type != 'deepspeed_moe':
+                raise AssertionError('`--moe-sparse-dispatch` only support for deepspeed moe.')
+            if args.enable_token_rearrange_opt:
+                raise AssertionError('`--moe-sparse-dispatch` is not compatible with `--enable-token-rearrange-opt`.')
+            if args.ampipe_degree > 1:
+                raise AssertionError('`--moe-sparse-dispatch` is not compatible with ampipe.')
         if args.moe_permutation_async_comm and args.moe_model_type != 'megatron_moe':
             raise AssertionError('`--moe-permutation-async-comm` only support for megatron core moe.')
         if args.moe_bmm_mc2:
@@ -690,6 +729,11 @@ def validate_args_wrapper(validate_args):
             assert n_window >= 1 and remainder == 0, f'ring_degree should be divisible by cp_window_size when using double ring with hybrid context parallelism.'
             args.use_flash_attn = True
 
+        assert args.adaptive_cp_cache_size >= 0, "--adaptive-cp-cache-size must be non-negative"
+        if args.adaptive_cp_async_remap:
+            assert args.adaptive_cp_dynamic_attn_mask and args.adaptive_cp_cache_size > 0, \
+                "--adaptive-cp-async-remap requires --adaptive-cp-dynamic-attn-mask and a positive --adaptive-cp-cache-size"
+
         if args.context_parallel_size > 1 and args.context_parallel_algo == 'adaptive_cp_algo':
             assert args.seq_length % args.context_parallel_size == 0, f"sequence length must be divisible by context_parallel_size"
             args.use_flash_attn = True
@@ -1051,6 +1095,19 @@ def _add_auto_settings_args(parser):
         default="info",
         help="The world size (# of ranks) for auto settings to search in."
     )
+    group.add_argument(
+        "--auto-settings-cache-dir",
+        type=str,
+        default=None,
+        help="Directory of the persistent cache of parsed profiling results, reused across auto settings runs "
+             "with the same config, model, hardware and software versions. Disabled by default."
+    )
+    group.add_argument(
+        "--auto-settings-search-workers",
+        type=int,
+        default=1,
+        help="Number of processes evaluating the memory and time cost of the configs of the white box search."
+    )
     group.add_argument(
         "--target-nnodes",
         type=int,
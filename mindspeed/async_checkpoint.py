@@ -0,0 +1,216 @@
+# Copyright (c) 2025, Huawei Technologies Co., Ltd.  All rights reserved.
+"""
+Asynchronous save of the checkpoints of the legacy torch format.
+
+The state dicts are first copied to host buffers on the training thread, then a forked process serializes them
+with ``torch.save``. Every storage is copied once with its bytes and the tensors are views of the copy with the
+offsets and strides of the originals, so a snapshot is saved exactly like the state dict it was taken from. The
+host buffers are kept for the next save, they are pinned when the tensors are on the device.
+
+A checkpoint file is written to a temporary file which is renamed, then its completion marker is written. At most
+one save is in flight, it is joined by the next save and at exit. It is finalized with the megatron async saves
+whenever they are finalized blocking, i.e. at the end of training and before the exits of ``train``.
+"""
+import atexit
+import copy
+import multiprocessing
+import os
+import traceback
+from functools import wraps
+from typing import Callable, List, Sequence, Tuple
+
+import torch
+
+CHECKPOINT_DONE_SUFFIX = ".done"
+
+
+def get_done_marker(checkpoint_name: str) -> str:
+    return checkpoint_name + CHECKPOINT_DONE_SUFFIX
+
+
+def is_checkpoint_done(checkpoint_name: str) -> bool:
+    return os.path.isfile(get_done_marker(checkpoint_name))
+
+
+def _get_storage_bytes(storage, device):
+    return torch.empty(0, dtype=torch.uint8, device=device).set_(storage)
+
+
+def write_checkpoint(state_dict, checkpoint_name: str):
+    """Saves ``state_dict`` to a temporary file renamed to ``checkpoint_name``, then writes the completion marker."""
+    # torch.save names the archive after the file, the temporary file has the same name in a temporary directory
+    directory, file_name = os.path.split(checkpoint_name)
+    tmp_dir = os.path.join(directory, f".{file_name}.tmp{os.getpid()}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_name = os.path.join(tmp_dir, file_name)
+    torch.save(state_dict, tmp_name)
+    with open(tmp_name, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_name, checkpoint_name)
+    os.rmdir(tmp_dir)
+    with open(get_done_marker(checkpoint_name), "w") as f:
+        f.write("done")
+
+
+def _write_checkpoints(checkpoints):
+    try:
+        for state_dict, checkpoint_name in checkpoints:
+            write_checkpoint(state_dict, checkpoint_name)
+    except BaseException:
+        traceback.print_exc()
+        os._exit(1)
+    os._exit(0)
+
+
+class AsyncCheckpointWriter:
+    """
+    Writes the checkpoints in a background process.
+
+    Args:
+        mp_context: start method of the writer process, the snapshots are inherited by a forked process.
+    """
+
+    def __init__(self, mp_context: str = "fork"):
+        self.mp_context = multiprocessing.get_context(mp_context)
+        self.process = None
+        self.checkpoint_names: List[str] = []
+        self._finalize_fns: List[Callable] = []
+        self._host_buffers: List[torch.Tensor] = []
+
+    @property
+    def in_flight(self):
+        return self.process is not None
+
+    def save(self, checkpoints: Sequence[Tuple[dict, str]]):
+        """
+        Snapshots the state dicts of ``checkpoints``, a list of (state dict, checkpoint name), and starts writing
+        them. The previous save is joined first.
+        """
+        self.wait()
+        snapshots = self.snapshot([state_dict for state_dict, _ in checkpoints])
+        checkpoint_names = [checkpoint_name for _, checkpoint_name in checkpoints]
+        for checkpoint_name in checkpoint_names:
+            if is_checkpoint_done(checkpoint_name):
+                os.remove(get_done_marker(checkpoint_name))
+        self.process = self.mp_context.Process(target=_write_checkpoints,
+                                               args=(list(zip(snapshots, checkpoint_names)),))
+        self.process.start()
+        self.checkpoint_names = checkpoint_names
+
+    def add_finalize_fn(self, finalize_fn: Callable):
+        """Runs ``finalize_fn`` at the next ``finalize``, after the save in flight."""
+        self._finalize_fns.append(finalize_fn)
+
+    def wait(self):
+        """Joins the save in flight."""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        process.join()
+        if process.exitcode != 0:
+            self._finalize_fns.clear()
+            raise RuntimeError(f"async save of the checkpoints {self.checkpoint_names} failed "
+                               f"with exit code {process.exitcode}")
+
+    def finalize(self):
+        """Joins the save in flight and runs the finalize functions of the saves."""
+        self.wait()
+        finalize_fns, self._finalize_fns = self._finalize_fns, []
+        for finalize_fn in finalize_fns:
+            finalize_fn()
+
+    def snapshot(self, obj):
+        """
+        Copies ``obj`` to host memory: the tensors are copied to the host buffers, the containers are rebuilt and
+        the other objects are deep copied.
+        """
+        storage_copies, tensor_copies = {}, {}
+        snapshot = self._snapshot(obj, storage_copies, tensor_copies)
+        if any(device.type != "cpu" for device, _ in storage_copies):
+            torch.cuda.synchronize()
+        return snapshot
+
+    def _snapshot(self, obj, storage_copies, tensor_copies):
+        if isinstance(obj, torch.Tensor):
+            # a tensor found twice, e.g. tied weights, is pickled once like in the state dict
+            if id(obj) not in tensor_copies:
+                tensor_copies[id(obj)] = self._snapshot_tensor(obj, storage_copies)
+            return tensor_copies[id(obj)]
+        if isinstance(obj, dict):
+            snapshot = copy.copy(obj)
+            for key, value in obj.items():
+                snapshot[key] = self._snapshot(value, storage_copies, tensor_copies)
+            return snapshot
+        if isinstance(obj, list):
+            return [self._snapshot(value, storage_copies, tensor_copies) for value in obj]
+        if isinstance(obj, tuple):
+            values = [self._snapshot(value, storage_copies, tensor_copies) for value in obj]
+            return type(obj)(*values) if hasattr(obj, "_fields") else type(obj)(values)
+        return copy.deepcopy(obj)
+
+    def _snapshot_tensor(self, tensor, storage_copies):
+        storage = tensor.untyped_storage()
+        key = (tensor.device, storage.data_ptr())
+        host_storage = storage_copies.get(key)
+        if host_storage is None:
+            host_buffer = self._get_host_buffer(len(storage_copies), storage.nbytes(), tensor.device.type != "cpu")
+            host_buffer.copy_(_get_storage_bytes(storage, tensor.device), non_blocking=True)
+            host_storage = host_buffer.untyped_storage()
+            storage_copies[key] = host_storage
+        snapshot = torch.empty(0, dtype=tensor.dtype).set_(host_storage, tensor.storage_offset(), tensor.size(),
+                                                          tensor.stride())
+        if isinstance(tensor, torch.nn.Parameter):
+            return torch.nn.Parameter(snapshot, requires_grad=tensor.requires_grad)
+        return snapshot.requires_grad_(tensor.requires_grad)
+
+    def _get_host_buffer(self, index, nbytes, pin_memory):
+        if index < len(self._host_buffers):
+            host_buffer = self._host_buffers[index]
+            if host_buffer.numel() == nbytes and host_buffer.is_pinned() == pin_memory:
+                return host_buffer
+        host_buffer = torch.empty(nbytes, dtype=torch.uint8, pin_memory=pin_memory)
+        if index < len(self._host_buffers):
+            self._host_buffers[index] = host_buffer
+        else:
+            self._host_buffers.append(host_buffer)
+        return host_buffer
+
+
+_ASYNC_CHECKPOINT_WRITER = None
+
+
+def _wait_at_exit():
+    # the other ranks may not be done, the latest iteration is only updated by a single process
+    _ASYNC_CHECKPOINT_WRITER.wait()
+    if not torch.distributed.is_initialized():
+        _ASYNC_CHECKPOINT_WRITER.finalize()
+
+
+def finalize_async_checkpoint_save():
+    """Joins the save in flight on every rank, then runs its finalize functions, e.g. updates the latest iteration."""
+    if _ASYNC_CHECKPOINT_WRITER is None:
+        return
+    _ASYNC_CHECKPOINT_WRITER.wait()
+    if torch.distributed.is_initialized():
+        torch.distributed.barrier()
+    _ASYNC_CHECKPOINT_WRITER.finalize()
+
+
+def maybe_finalize_async_save_wrapper(maybe_finalize_async_save):
+    @wraps(maybe_finalize_async_save)
+    def wrapper(*args, **kwargs):
+        result = maybe_finalize_async_save(*args, **kwargs)
+        blocking = kwargs['blocking'] if 'blocking' in kwargs else bool(args and args[0])
+        if blocking:
+            finalize_async_checkpoint_save()
+        return result
+
+    return wrapper
+
+
+def get_async_checkpoint_writer() -> AsyncCheckpointWriter:
+    global _ASYNC_CHECKPOINT_WRITER
+    if _ASYNC_CHECKPOINT_WRITER is None:
+        _ASYNC_CHECKPOINT_WRITER = AsyncCheckpointWriter()
+        atexit.register(_wait_at_exit)
+    return _ASYNC_CHECKPOINT_WRITER
@@ -49,6 +49,8 @@ class SystemConfig:
     driver_version: str = ""
     cann_version: str = ""
     search_world_size: int = field(init=0)
+    profile_cache_dir: str = None
+    search_workers: int = 1
 
     def __post_init__(self):
         self.world_size = self.nnodes * self.nproc_per_node
@@ -103,8 +105,9 @@ def set_system_config(args):
         work_dir=args.auto_settings_work_dir,
         log_level=log_level,
         search_dimensions=8,
-        waas_enabled=False
-
+        waas_enabled=False,
+        profile_cache_dir=getattr(args, 'auto_settings_cache_dir', None),
+        search_workers=int(getattr(args, 'auto_settings_search_workers', 1))
     )
     _SYSTEM_CONFIG = sys_config
 
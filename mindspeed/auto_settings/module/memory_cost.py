@@ -1,6 +1,8 @@
 """
 算子预估
 """
+import numpy as np
+
 from mindspeed.auto_settings.config.model_config import get_model_config
 from mindspeed.auto_settings.config.system_config import get_system_config
 from mindspeed.auto_settings.module.memory.memory_modeling import MemoryModeling
@@ -18,54 +20,50 @@ class MemoryCost(object):
         MemoryModeling.set_model_cfg(get_model_config())
         MemoryModeling.modeling(work_dir)
 
-    def get_memory_cost(self, config):
+    def get_memory_costs(self, configs):
         """
-        算子执行耗时
+        批量预估峰值内存，返回与configs顺序一致的结果
+        各配置的峰值内存逐个建模，重计算层数在整批配置上向量化求解
         """
-        if config.layers_per_vpp:
-            layers_per_vpp = config.layers_per_vpp
-        else:
-            layers_per_vpp = get_model_config().num_layers // config.pp
-        num_layers = get_model_config().num_layers // config.pp
+        if not configs:
+            return []
+        model_cfg = get_model_config()
         device_mem_cap = get_system_config().memory_cap
-        recompute_mem, peak_stage_mem, optimizer_peak = MemoryModeling.estimate(config)
-        peak_mem = max(peak_stage_mem, optimizer_peak)
+        rows = []
+        for config in configs:
+            recompute_mem, peak_stage_mem, optimizer_peak = MemoryModeling.estimate(config)
+            self.logger.debug(f"before recompute, memory = {peak_stage_mem}")
+            warmup_micro_batchs, _ = get_num_warmup_micro_batches(config, model_cfg)
+            layers_per_vpp = config.layers_per_vpp if config.layers_per_vpp else model_cfg.num_layers // config.pp
+            rows.append((config.pp, layers_per_vpp, recompute_mem, peak_stage_mem, optimizer_peak, warmup_micro_batchs))
+        pp, layers_per_vpp, memory_per_layer, peak_stage_mem, optimizer_peak, warmup_micro_batchs = \
+            np.array(rows, dtype=np.float64).T
 
-        self.logger.debug(f"before recompute, memory = {peak_stage_mem}")
-        memory_per_layer = recompute_mem
-        warmup_micro_batchs, total_num_micro_batches = get_num_warmup_micro_batches(config, get_model_config())
-        release_mem = 0
+        num_layers = model_cfg.num_layers // pp
+        peak_mem = np.maximum(peak_stage_mem, optimizer_peak)
         max_release_mem = warmup_micro_batchs * layers_per_vpp * memory_per_layer - memory_per_layer
         oom_cap = device_mem_cap - peak_stage_mem
-        if max_release_mem <= oom_cap:
-            return {
-                "layer_calculate": 0,
-                "peak_memory": peak_mem,
-                "need_recompute": False,
-                "new_memory": max_release_mem + peak_stage_mem,
-                "recompute_layer": 0
-            }
-        if config.layers_per_vpp:
-            layer_calculate = (oom_cap // (memory_per_layer * config.pp))
-            release_mem += layer_calculate * memory_per_layer * config.pp
-            if 0 < layer_calculate < num_layers:
-                release_mem -= memory_per_layer
-            return {
-                "layer_calculate": layer_calculate,
-                "peak_memory": peak_mem,
-                "need_recompute": True,
-                "new_memory": release_mem + peak_stage_mem,
-                "recompute_layer": num_layers - layer_calculate
-            }
+        need_recompute = max_release_mem > oom_cap
+        # 不需要重计算的配置不使用layer_calculate，其除零结果被丢弃
+        with np.errstate(divide="ignore", invalid="ignore"):
+            layer_calculate = oom_cap // (memory_per_layer * pp)
+        release_mem = layer_calculate * memory_per_layer * pp
+        release_mem -= np.where((0 < layer_calculate) & (layer_calculate < num_layers), memory_per_layer, 0.)
+        new_memory = np.where(need_recompute, release_mem, max_release_mem) + peak_stage_mem
+
+        results = []
+        for i, need in enumerate(need_recompute.tolist()):
+            results.append({
+                "layer_calculate": layer_calculate[i].item() if need else 0,
+                "peak_memory": peak_mem[i].item(),
+                "need_recompute": need,
+                "new_memory": new_memory[i].item(),
+                "recompute_layer": (num_layers[i] - layer_calculate[i]).item() if need else 0
+            })
+        return results
 
-        layer_calculate = (oom_cap // (memory_per_layer * config.pp))
-        release_mem += layer_calculate * memory_per_layer * config.pp
-        if 0 < layer_calculate < num_layers:
-            release_mem -= memory_per_layer
-        return {
-            "layer_calculate": layer_calculate,
-            "peak_memory": peak_mem,
-            "need_recompute": True,
-            "new_memory": release_mem + peak_stage_mem,
-            "recompute_layer": num_layers - layer_calculate
-        }
+    def get_memory_cost(self, config):
+        """
+        预估单个配置的峰值内存
+        """
+        return self.get_memory_costs([config])[0]
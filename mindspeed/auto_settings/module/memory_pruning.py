@@ -0,0 +1,100 @@
+"""
+黑盒搜索的内存剪枝
+"""
+import json
+import math
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from mindspeed.auto_settings.utils.logger import get_logger
+
+
+class MemoryDominancePruner(object):
+    """
+    Prunes the configs of the black box search with their white box memory estimates.
+
+    The estimates of the whole search space are computed once and sorted, so all the later configs
+    whose estimate is above a threshold are pruned in one step:
+        1. a config measured OOM prunes the later configs that need more memory by the white box model.
+        2. the measured peak memories recalibrate the white box model, the later configs whose
+           calibrated estimate exceeds the memory limit by more than ``margin`` are pruned.
+
+    Args:
+        estimates: white box peak memory estimate of every config, in MB.
+        memory_limit: available device memory, in the unit of the measurements (GB).
+        log_path: json lines file of the pruning decisions.
+        margin: relative tolerance of the calibrated estimates.
+        min_samples: number of measurements before the calibrated pruning starts.
+        names: name of every config in the log.
+    """
+
+    def __init__(self, estimates: Sequence[float], memory_limit: float, log_path: Optional[str] = None,
+                 margin: float = 0.1, min_samples: int = 2, names: Optional[Sequence[str]] = None):
+        self.estimates = np.asarray(estimates, dtype=np.float64)
+        self.memory_limit = memory_limit
+        self.log_path = log_path
+        self.margin = margin
+        self.min_samples = min_samples
+        self.names = names
+        self.order = np.argsort(self.estimates, kind="stable")
+        self.sorted_estimates = self.estimates[self.order]
+        self.alive = np.ones(len(self.estimates), dtype=bool)
+        self.ratios: List[float] = []
+        self.scale: Optional[float] = None
+        self.logger = get_logger("MemoryPruner")
+        if self.log_path is not None and os.path.exists(self.log_path):
+            os.remove(self.log_path)
+
+    def is_alive(self, index: int) -> bool:
+        return bool(self.alive[index])
+
+    @property
+    def num_pruned(self) -> int:
+        return int(len(self.alive) - np.count_nonzero(self.alive))
+
+    def prune_dominated(self, index: int, threshold: float) -> List[int]:
+        """Config ``index`` is OOM, prunes the later configs whose estimate is above ``threshold``."""
+        pruned = self._prune_above(index, threshold)
+        self._log({"event": "oom", "index": index, "threshold": float(threshold), "pruned": pruned})
+        return pruned
+
+    def record_measurement(self, index: int, estimate: float, peak_memory: float) -> List[int]:
+        """
+        Recalibrates the white box model with the measured peak memory of config ``index`` and its
+        estimate, the same one as in ``estimates`` so that all the ratios have the same basis, and prunes
+        the later configs whose calibrated estimate exceeds the memory limit.
+        """
+        estimate, peak_memory = float(estimate), float(peak_memory)
+        if estimate > 0 and math.isfinite(estimate) and math.isfinite(peak_memory):
+            self.ratios.append(peak_memory / estimate)
+            self.scale = float(np.median(self.ratios))
+        record = {"event": "measurement", "index": index, "estimate": estimate, "peak_memory": peak_memory,
+                  "scale": self.scale, "pruned": []}
+        if self.scale is not None and self.scale > 0 and len(self.ratios) >= self.min_samples:
+            record["threshold"] = self.memory_limit * (1 + self.margin) / self.scale
+            record["pruned"] = self._prune_above(index, record["threshold"])
+        self._log(record)
+        return record["pruned"]
+
+    def _prune_above(self, index, threshold):
+        start = np.searchsorted(self.sorted_estimates, threshold, side="right")
+        candidates = self.order[start:]
+        # nan estimates are sorted last and never above a threshold
+        candidates = candidates[(candidates > index) & self.alive[candidates] &
+                                ~np.isnan(self.estimates[candidates])]
+        candidates.sort()
+        self.alive[candidates] = False
+        return candidates.tolist()
+
+    def _log(self, record):
+        if record["pruned"]:
+            self.logger.info(f"==> {record['event']} of config #{record['index']} prunes "
+                             f"{len(record['pruned'])} configs, {self.num_pruned} pruned in total")
+        if self.log_path is None:
+            return
+        if self.names is not None:
+            record["config"] = self.names[record["index"]]
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
@@ -1,4 +1,8 @@
 import os
+import weakref
+from collections import defaultdict
+
+import numpy as np
 from sqlalchemy import Column, Integer, String, UniqueConstraint, text, desc
 from sqlalchemy import create_engine, Float
 from sqlalchemy.orm import sessionmaker, declarative_base
@@ -6,6 +10,19 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 Base = declarative_base()
 BaseHistory = declarative_base()
 
+HISTORY_COLUMNS = ('types', 'accelerator_core', 'input_shape', 'output_shape', 'duration', 'device', 'jit', 'cann',
+                   'driver', 'dtype')
+# columns of the unique constraint, SQLite returns the rows of a lookup in the order of its index
+UNIQUE_COLUMNS = ('types', 'accelerator_core', 'input_shape', 'output_shape', 'device', 'jit', 'cann', 'driver',
+                  'dtype')
+UPSERT_HISTORY_QUERY = text('''
+    INSERT OR REPLACE INTO operator_history
+    (types, accelerator_core, input_shape, output_shape, duration, device, jit, cann, driver, dtype, reverse1)
+    VALUES (:types, :accelerator_core, :input_shape, :output_shape, :duration, :device, :jit, :cann, :driver, :dtype, :reverse1)
+    ON CONFLICT(types, accelerator_core, input_shape, output_shape, device, jit, cann, driver, dtype)
+    DO UPDATE SET duration = (operator_history.duration + EXCLUDED.duration) / 2
+''')
+
 
 class DataBase:
     def __init__(self, working_dir: str):
@@ -90,25 +107,103 @@ class OperatorHistory(BaseHistory):
         }
 
 
+class OperatorHistoryIndex(object):
+    """
+    In-memory index of the operator history, built from one scan of the table.
+
+    The lookups return the same rows in the same order as the queries of OperatorHistoryDAO.
+    The OperatorHistory objects of a key are built on its first lookup.
+    """
+
+    def __init__(self, rows):
+        self._types_and_input_shape = defaultdict(list)
+        self._accelerator_core_and_types = defaultdict(list)
+        for row in rows:
+            self._types_and_input_shape[(row[0], row[2])].append(row)
+            self._accelerator_core_and_types[(row[1], row[0])].append(row)
+        self._types_and_input_shape_objects = {}
+        self._accelerator_core_and_types_objects = {}
+        self.num_rows = len(rows)
+
+    def get_by_types_and_input_shape(self, types, input_shape):
+        return self._get(self._types_and_input_shape, self._types_and_input_shape_objects, (types, input_shape))
+
+    def get_by_types_and_accelerator_core(self, accelerator_core, types):
+        return self._get(self._accelerator_core_and_types, self._accelerator_core_and_types_objects,
+                         (accelerator_core, types))
+
+    @staticmethod
+    def _get(buckets, objects_cache, key):
+        objects = objects_cache.get(key)
+        if objects is None:
+            objects = [OperatorHistory(*row) for row in buckets.get(key, [])]
+            objects_cache[key] = objects
+        return list(objects)
+
+
 class OperatorHistoryDAO(object):
     def __init__(self, db_connection):
         self.db_connection = db_connection
+        self._index = None
+        self._index_stale = False
 
     def insert_history(self, data_list):
+        if not data_list:
+            return
+
         def insert_data(session, dict_list):
-            for data in dict_list:
-                query = text('''
-                            INSERT OR REPLACE INTO operator_history 
-                            (types, accelerator_core, input_shape, output_shape, duration, device, jit, cann, driver, dtype, reverse1)
-                            VALUES (:types, :accelerator_core, :input_shape, :output_shape, :duration, :device, :jit, :cann, :driver, :dtype, :reverse1)
-                            ON CONFLICT(types, accelerator_core, input_shape, output_shape, device, jit, cann, driver, dtype)
-                            DO UPDATE SET duration = (operator_history.duration + EXCLUDED.duration) / 2
-                        ''')
-                session.execute(query, data)
-
-        self.db_connection.execute(insert_data, data_list)
+            # one executemany for all the rows, the rows are upserted in order as with one execute per row
+            session.execute(UPSERT_HISTORY_QUERY, dict_list)
+
+        self.db_connection.execute(insert_data, list(data_list))
+        self._index_stale = True
+
+    def load_index(self):
+        """Loads the whole history into memory, the lookups are served from it until clear_index."""
+        self._index = OperatorHistoryIndex(self.db_connection.execute(self._get_rows))
+        self._index_stale = False
+        return self._index
+
+    def clear_index(self):
+        self._index = None
+        self._index_stale = False
+
+    def _get_valid_index(self):
+        if self._index is not None and self._index_stale:
+            # reload after an insert, the upsert may have changed durations of known rows
+            self.load_index()
+        return self._index
+
+    @staticmethod
+    def _get_rows(session):
+        columns = [getattr(OperatorHistory, name) for name in HISTORY_COLUMNS]
+        order = [getattr(OperatorHistory, name) for name in UNIQUE_COLUMNS] + [OperatorHistory.id]
+        return [tuple(row) for row in session.query(*columns).order_by(*order).all()]
+
+    def export_columns(self, path=None):
+        """
+        Returns the history as a dict of numpy columns, the durations and jit as numbers, the other
+        columns as strings, and saves it to ``path`` as a compressed npz file for model fitting.
+        """
+        rows = self.db_connection.execute(self._get_rows)
+        columns = {}
+        for i, name in enumerate(HISTORY_COLUMNS):
+            values = [row[i] for row in rows]
+            if name == 'duration':
+                columns[name] = np.array(values, dtype=np.float64)
+            elif name == 'jit':
+                columns[name] = np.array(values, dtype=np.int64)
+            else:
+                columns[name] = np.array(['' if value is None else str(value) for value in values], dtype=np.str_)
+        if path is not None:
+            np.savez_compressed(path, **columns)
+        return columns
 
     def get_by_types_and_input_shape(self, types, input_shape):
+        index = self._get_valid_index()
+        if index is not None:
+            return index.get_by_types_and_input_shape(types, input_shape)
+
         def get(session, key1, key2):
             results = session.query(OperatorHistory).filter_by(types=key1, input_shape=key2).all()
             objects = [OperatorHistory(types=result.types,
@@ -126,6 +221,10 @@ class OperatorHistoryDAO(object):
         return self.db_connection.execute(get, types, input_shape)
 
     def get_by_types_and_accelerator_core(self, accelerator_core, types):
+        index = self._get_valid_index()
+        if index is not None:
+            return index.get_by_types_and_accelerator_core(accelerator_core, types)
+
         def get(session, key1, key2):
             results = session.query(OperatorHistory).filter_by(accelerator_core=key1, types=key2).all()
             objects = [OperatorHistory(types=result.types,
@@ -162,10 +261,23 @@ class Operator(object):
         ))
 
 
+_DB_CONNECTIONS = weakref.WeakSet()
+
+
+def dispose_connections_after_fork():
+    """
+    Called in a forked process, drops the SQLite connections inherited from the parent
+    without closing them, the process opens its own connections.
+    """
+    for db_connection in list(_DB_CONNECTIONS):
+        db_connection.engine.dispose(close=False)
+
+
 class DBConnection:
     def __init__(self, db_url):
         self.engine = create_engine(db_url)
         self.Session = sessionmaker(bind=self.engine)
+        _DB_CONNECTIONS.add(self)
 
     def execute(self, func, *args, **kwargs):
         session = self.Session()
@@ -62,6 +62,9 @@ class OperatorPerformance(object):
         operator_note_list.get_operator_note(self)
 
         self.get_history_db(operator_note_list.operator_note_list)
+        # the lookups of the search are served from memory, inserts into the history reload it
+        history_index = self.db.operator_history_dao.load_index()
+        self._logger.info(f'load {history_index.num_rows} operators of the history db into memory')
         self._logger.info(f'-----------------------------------')
         # 第 4 轮，基于operator_note_model建shape计算operator_model_dao
         self.get_operator_model(operator_note_list.operator_note_dict)
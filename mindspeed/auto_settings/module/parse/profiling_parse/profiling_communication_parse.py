@@ -7,8 +7,12 @@ from mindspeed.auto_settings.module.parse.profiling_parse.profiling_config impor
     ProfilingConfig
 )
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_constant import NumberConstant, SpecialKeyName
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_meta_parse import ColumnarDetails, accumulate
+import heapq
 import os
 
+import numpy as np
+
 # WAIT_TIME_RATIO : 等待时间占总时间比例
 if not os.environ.get('WAIT_TIME_RATIO'):
     os.environ['WAIT_TIME_RATIO'] = "0.2"
@@ -46,7 +50,7 @@ class AnalyseCommunicationMsg(ProfilingConfig):
         super(AnalyseCommunicationMsg, self).__init__(search_cfg)
         self.collective_hcom = communication_details.get('collective', {})
         self.p2p_hcom = communication_details.get('p2p', {})
-        self.kernel_details = kernel_details
+        self.kernel_details = ColumnarDetails.from_rows(kernel_details)
         self.tensor_parallel_comm = TensorParallelCommunication()
         self.pipeline_parallel_comm = PipelineParallelCommunication()
         self.data_parallel_comm = DataParallelCommunication()
@@ -55,71 +59,60 @@ class AnalyseCommunicationMsg(ProfilingConfig):
         self.pp_stream_id = None
         self.tp_stream_id = None
         self.overlap_record = {}
-        self.overlap_list = []
+        self.overlap_set = set()
+        self._cp_vector_time = None
 
     @classmethod
     def is_send_or_recv_op(cls, op_name: str) -> bool:
         return 'send' in op_name or 'receive' in op_name
 
-    def get_hcom_and_hcom_overlap(self, index, info):
-        current_name = self.kernel_details[index][SpecialKeyName.NAME]
-        next_name = self.kernel_details[index + 1][SpecialKeyName.NAME]
-        if current_name in self.overlap_list or next_name in self.overlap_list:
-            return
-
-        if index + 1 >= len(self.kernel_details):
-            return
-
-        hcom_time1 = float(info[SpecialKeyName.DURATION_US])
-        hcom_time2 = float(self.kernel_details[index + 1][SpecialKeyName.DURATION_US])
-        shorter_hcom = current_name if hcom_time1 <= hcom_time2 else next_name
-        self.overlap_list.append(shorter_hcom)
-
-    def get_compute_and_hcom_overlap(self, index, info):
-        overlap_record = {}
-        overlap_list = []
-        overlap_time = float(info[SpecialKeyName.DURATION_US])
-        op1 = self.kernel_details[index + 1]
-        op2 = self.kernel_details[index + 2] if index + 2 < len(self.kernel_details) else None
-        op1_name = op1[SpecialKeyName.NAME]
-        hcom1_duration = float(op1[SpecialKeyName.DURATION_US])
-
-        if op2 and op2[SpecialKeyName.ACCELERATOR_CORE] == 'HCCL':
-            op2_name = op2[SpecialKeyName.NAME]
-            hcom2_duration = float(op2[SpecialKeyName.DURATION_US])
-
-            if hcom2_duration <= hcom1_duration:
-                overlap_list.append(op2_name)
-                overlap_record[op1_name] = min(overlap_time, hcom1_duration)
-            else:
-                overlap_list.append(op1_name)
-                overlap_record[op1_name] = min(overlap_time, hcom2_duration)
-        else:
-            overlap_record[op1_name] = min(overlap_time, hcom1_duration)
-
-        return overlap_record, overlap_list
-
-    def is_compute_and_hcom_overlap(self, index, row):
-        if index + 1 >= len(self.kernel_details):
-            return False
-        op1 = self.kernel_details[index + 1]
-        if op1[SpecialKeyName.ACCELERATOR_CORE] != 'HCCL' or row[SpecialKeyName.ACCELERATOR_CORE] == 'HCCL':
-            return False
-        start_time = float(row[SpecialKeyName.START_TIME_US])
-        duration = float(row[SpecialKeyName.DURATION_US])
-        op1_start_time = float(op1[SpecialKeyName.START_TIME_US])
-        return op1_start_time < start_time + duration
-
-    def is_hcom_hcom_overlap(self, index, row):
-        if index + 1 >= len(self.kernel_details):
-            return False
-        op1 = self.kernel_details[index + 1]
-        if row[SpecialKeyName.ACCELERATOR_CORE] != 'HCCL' or op1[SpecialKeyName.ACCELERATOR_CORE] != 'HCCL':
-            return False
-        start_time = float(row[SpecialKeyName.START_TIME_US])
-        duration = float(row[SpecialKeyName.DURATION_US])
-        op1_start_time = float(op1[SpecialKeyName.START_TIME_US])
-        return op1_start_time < start_time + duration
+    def get_compute_and_hcom_overlap(self, compute_index):
+        """
+        Overlaps of the compute ops that the next HCCL op starts during. The overlap time of the HCCL op
+        is recorded, and if the HCCL op after it runs at the same time, the shorter one of the two is
+        overlapped.
+        Returns:
+            overlap_record: Dict[hcom name] = overlap time(us)
+            overlap_names: the overlapped hcom name of every compute op, None if it has none
+        """
+        names = self.kernel_details.column(SpecialKeyName.NAME)
+        num_rows = len(self.kernel_details)
+        is_hccl = self.kernel_details.str_column(SpecialKeyName.ACCELERATOR_CORE) == 'HCCL'
+        duration = self.kernel_details.float_column(SpecialKeyName.DURATION_US)
+
+        op1_index = compute_index + 1
+        op2_index = np.minimum(compute_index + 2, num_rows - 1)
+        op2_is_hccl = (compute_index + 2 < num_rows) & is_hccl[op2_index]
+        hcom1_duration = duration[op1_index]
+        hcom2_duration = duration[op2_index]
+        op2_is_shorter = op2_is_hccl & (hcom2_duration <= hcom1_duration)
+        overlap_time = np.minimum(duration[compute_index],
+                                  np.where(op2_is_hccl & ~op2_is_shorter, hcom2_duration, hcom1_duration))
+
+        overlap_record = dict(zip([names[i] for i in op1_index.tolist()], overlap_time.tolist()))
+        overlap_names = [
+            (names[index + 2] if shorter else names[index + 1]) if has_op2 else None
+            for index, has_op2, shorter in zip(compute_index.tolist(), op2_is_hccl.tolist(), op2_is_shorter.tolist())
+        ]
+        return overlap_record, overlap_names
+
+    def get_overlap_index(self):
+        """
+        Indexes of the ops that the next op starts during, for a compute op followed by an HCCL op and
+        for two HCCL ops.
+        """
+        num_rows = len(self.kernel_details)
+        if num_rows < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        is_hccl = self.kernel_details.str_column(SpecialKeyName.ACCELERATOR_CORE) == 'HCCL'
+        start_time = self.kernel_details.float_column(SpecialKeyName.START_TIME_US)
+        duration = self.kernel_details.float_column(SpecialKeyName.DURATION_US)
+        next_starts_before_end = start_time[1:] < start_time[:-1] + duration[:-1]
+        next_is_hccl = is_hccl[1:] & next_starts_before_end
+        compute_index = np.flatnonzero(~is_hccl[:-1] & next_is_hccl)
+        hcom_index = np.flatnonzero(is_hccl[:-1] & next_is_hccl)
+        return compute_index, hcom_index
 
     def get_parallel_comm_group(self, collective_group, index):
         if index >= len(collective_group):
@@ -338,7 +331,7 @@ class AnalyseCommunicationMsg(ProfilingConfig):
 
     def _analyse_tp_comm(self, name, info):
         hcom_name = name.split('@')[0]
-        if hcom_name in self.overlap_list:
+        if hcom_name in self.overlap_set:
             return
         if ('reduceScatter' in hcom_name or 'allGather' in hcom_name):
             self._accumulate_communication_stats(self.tensor_parallel_comm, name, info)
@@ -363,8 +356,9 @@ class AnalyseCommunicationMsg(ProfilingConfig):
     def _analyse_cp_comm(self, name, info):
         self._accumulate_communication_stats(self.context_parallel_comm, name, info)
 
-        cp_vector_time = self._analyse_cp_vector_time()
-        self.context_parallel_comm.vector_time_ms = cp_vector_time
+        if self._cp_vector_time is None:
+            self._cp_vector_time = self._analyse_cp_vector_time()
+        self.context_parallel_comm.vector_time_ms = self._cp_vector_time
 
     def _megatron_ep_adaptation(self, stream_list):
         for index, stream_info in enumerate(stream_list):
@@ -384,39 +378,54 @@ class AnalyseCommunicationMsg(ProfilingConfig):
         return min_expert_time
 
     def _analyse_communication_overlap(self):
-        for index, row in enumerate(self.kernel_details):
-            if "Name" not in row or "Type" not in row:
-                continue
-            if self.is_compute_and_hcom_overlap(index, row):
-                per_overlap_record, per_overlap_list = self.get_compute_and_hcom_overlap(index, row)
-                self.overlap_record = {**self.overlap_record, **per_overlap_record}
-                self.overlap_list.extend(per_overlap_list)
-            elif self.is_hcom_hcom_overlap(index, row):
-                self.get_hcom_and_hcom_overlap(index, row)
-
-    def _cp_vector_operator_overlap(self, index, row):
-        if index >= len(self.kernel_details) - 1:
-            return False
-        is_hccl = row[SpecialKeyName.ACCELERATOR_CORE] == 'HCCL'
-        is_ai_vector_core = self.kernel_details[index + 1][SpecialKeyName.ACCELERATOR_CORE] == 'AI_VECTOR_CORE'
-        is_time_overlap = float(self.kernel_details[index + 1][SpecialKeyName.START_TIME_US]) < float(
-            row[SpecialKeyName.START_TIME_US]) + float(row[SpecialKeyName.DURATION_US])
-        is_overlap = is_hccl and is_ai_vector_core and is_time_overlap
-        if is_overlap and self.is_send_or_recv_op(row[SpecialKeyName.NAME]):
-            return True
-        return False
+        if not self.kernel_details.has_columns("Name", "Type"):
+            return
+        compute_index, hcom_index = self.get_overlap_index()
+        self.overlap_record, compute_overlap_names = self.get_compute_and_hcom_overlap(compute_index)
+        if not hcom_index.size:
+            self.overlap_set.update(name for name in compute_overlap_names if name is not None)
+            return
+
+        # two overlapping HCCL ops are skipped if one of them is overlapped already by an earlier op,
+        # so the ops are walked in order, only the ones with an overlap
+        names = self.kernel_details.column(SpecialKeyName.NAME)
+        duration = self.kernel_details.float_column(SpecialKeyName.DURATION_US)
+        compute_events = ((index, name) for index, name in zip(compute_index.tolist(), compute_overlap_names)
+                          if name is not None)
+        hcom_events = ((index, None) for index in hcom_index.tolist())
+        for index, overlap_name in heapq.merge(compute_events, hcom_events, key=lambda event: event[0]):
+            if overlap_name is not None:
+                self.overlap_set.add(overlap_name)
+            else:
+                current_name, next_name = names[index], names[index + 1]
+                if current_name in self.overlap_set or next_name in self.overlap_set:
+                    continue
+                shorter_hcom = current_name if duration[index] <= duration[index + 1] else next_name
+                self.overlap_set.add(shorter_hcom)
 
     def _analyse_cp_vector_time(self):
-        is_cp_vector = False
-        total_cp_vector = 0
-        for index, row in enumerate(self.kernel_details):
-            if "Name" not in row or "Type" not in row:
-                continue
-            is_ai_vector_core = row[SpecialKeyName.ACCELERATOR_CORE] == 'AI_VECTOR_CORE'
-            if is_cp_vector and is_ai_vector_core and 'Grad' not in row[SpecialKeyName.NAME]:
-                total_cp_vector += float(row[SpecialKeyName.DURATION_US]) / NumberConstant.CONVERSION_TIME
-            elif is_cp_vector and row[SpecialKeyName.ACCELERATOR_CORE] != 'AI_VECTOR_CORE':
-                is_cp_vector = False
-            if self._cp_vector_operator_overlap(index, row):
-                is_cp_vector = True
-        return total_cp_vector
+        """
+        Time of the vector ops that run during the send or receive of context parallel, a vector op that
+        starts during an HCCL send or receive and the vector ops right after it are counted.
+        """
+        if not self.kernel_details.has_columns("Name", "Type") or len(self.kernel_details) < 2:
+            return 0
+        names = self.kernel_details.column(SpecialKeyName.NAME)
+        core = self.kernel_details.str_column(SpecialKeyName.ACCELERATOR_CORE)
+        start_time = self.kernel_details.float_column(SpecialKeyName.START_TIME_US)
+        duration = self.kernel_details.float_column(SpecialKeyName.DURATION_US)
+        is_ai_vector_core = core == 'AI_VECTOR_CORE'
+
+        overlap_start = np.zeros(len(names), dtype=bool)
+        overlap_start[:-1] = (core[:-1] == 'HCCL') & is_ai_vector_core[1:] & \
+                             (start_time[1:] < start_time[:-1] + duration[:-1])
+        for index in np.flatnonzero(overlap_start).tolist():
+            overlap_start[index] = self.is_send_or_recv_op(names[index])
+
+        # the vector ops are counted until the next op of another core, which starts a new overlap or not
+        row_index = np.arange(len(names))
+        last_other_core_index = np.maximum.accumulate(np.where(is_ai_vector_core, -1, row_index))
+        after_overlap_start = (last_other_core_index >= 0) & overlap_start[np.maximum(last_other_core_index, 0)]
+        counted_index = np.flatnonzero(is_ai_vector_core & after_overlap_start)
+        counted_index = [index for index in counted_index.tolist() if 'Grad' not in names[index]]
+        return accumulate(duration[counted_index] / NumberConstant.CONVERSION_TIME)
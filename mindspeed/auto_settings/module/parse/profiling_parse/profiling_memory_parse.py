@@ -1,6 +1,9 @@
 from typing import List
 
-from mindspeed.auto_settings.module.parse.profiling_parse.profiling_meta_parse import StructureAnalyseTool
+import numpy as np
+
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_meta_parse import ColumnarDetails, \
+    StructureAnalyseTool
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_constant import SpecialOperatorName
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_config import ProfilingConfig
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_constant import SpecialKeyName
@@ -12,7 +15,7 @@ class AnalyseMemoryMsg(ProfilingConfig):
     def __init__(self, rank_file_path, search_cfg, memory_details, stage_id=0):
         super(AnalyseMemoryMsg, self).__init__(search_cfg)
         self._rank_file_path = rank_file_path
-        self._memory_details = memory_details
+        self._memory_details = ColumnarDetails.from_rows(memory_details)
         self._update_norm_op()
         self.fw_memory_indices: List[List[int]]
         self.bw_memory_indices: List[List[int]]
@@ -29,6 +32,17 @@ class AnalyseMemoryMsg(ProfilingConfig):
         peak_memory = max(peak_memory, float(row[SpecialKeyName.ALLOCATED_MEMORY]))
         return start_memory, peak_memory
 
+    def compare_memory_range(self, start_idx, end_idx, start_memory, peak_memory):
+        """compare_memory over the rows from start_idx to end_idx"""
+        allocated = self._memory_details.float_column(SpecialKeyName.ALLOCATED_MEMORY)[start_idx:end_idx]
+        if not allocated.size:
+            return start_memory, peak_memory
+        if start_memory == 0:
+            nonzero = np.flatnonzero(allocated != 0)
+            start_memory = float(allocated[nonzero[0]] if nonzero.size else allocated[-1])
+        peak_memory = max(peak_memory, float(allocated.max()))
+        return start_memory, peak_memory
+
     @staticmethod
     def analyse_cann_and_driver(memory_record_details):
         app_mem = 0
@@ -64,8 +78,9 @@ class AnalyseMemoryMsg(ProfilingConfig):
         if self.stage_id != 0:
             return [em_start_memory], [em_peak_memory]
         embedding_start_idx = 0
-        for idx, msg in enumerate(self._memory_details[1:], start=1):
-            op_name = msg[SpecialKeyName.NAME]
+        names = self._memory_details.column(SpecialKeyName.NAME)
+        for idx in range(1, len(names)):
+            op_name = names[idx]
             if self.norm_op in op_name:
                 break
             if SpecialOperatorName.EMBEDDING in op_name:
@@ -73,7 +88,8 @@ class AnalyseMemoryMsg(ProfilingConfig):
                 em_start_memory, em_peak_memory = self.compare_memory(self._memory_details[idx - 1],
                                                                       em_start_memory, em_peak_memory)
             if idx > embedding_start_idx != 0:
-                em_start_memory, em_peak_memory = self.compare_memory(msg, em_start_memory, em_peak_memory)
+                em_start_memory, em_peak_memory = self.compare_memory(self._memory_details[idx],
+                                                                      em_start_memory, em_peak_memory)
 
         return [em_start_memory], [em_peak_memory]
 
@@ -85,9 +101,9 @@ class AnalyseMemoryMsg(ProfilingConfig):
                 self.fw_memory_indices[micro][-1] + self.fw_memory_per_micro_opt_num - 1)
             fw_start_memory[micro] = float(
                 self._memory_details[self.fw_memory_indices[micro][0]][SpecialKeyName.ALLOCATED_MEMORY])
-            for msg in self._memory_details[self.fw_memory_indices[micro][0]: self.fw_memory_indices[micro][-1]]:
-                fw_start_memory[micro], fw_peak_memory[micro] = \
-                    self.compare_memory(msg, fw_start_memory[micro], fw_peak_memory[micro])
+            fw_start_memory[micro], fw_peak_memory[micro] = self.compare_memory_range(
+                self.fw_memory_indices[micro][0], self.fw_memory_indices[micro][-1],
+                fw_start_memory[micro], fw_peak_memory[micro])
 
         return fw_start_memory, fw_peak_memory
 
@@ -110,16 +126,14 @@ class AnalyseMemoryMsg(ProfilingConfig):
                                                  self.bw_memory_indices[micro][-1] - self.bw_memory_per_micro_opt_num)
             bw_start_memory[micro] = float(
                 self._memory_details[self.bw_memory_indices[micro][0]][SpecialKeyName.ALLOCATED_MEMORY])
-            for msg in self._memory_details[self.bw_memory_indices[micro][0]: self.bw_memory_indices[micro][-1]]:
-                bw_start_memory[micro], bw_peak_memory[micro] = \
-                    self.compare_memory(msg, bw_start_memory[micro], bw_peak_memory[micro])
+            bw_start_memory[micro], bw_peak_memory[micro] = self.compare_memory_range(
+                self.bw_memory_indices[micro][0], self.bw_memory_indices[micro][-1],
+                bw_start_memory[micro], bw_peak_memory[micro])
 
         return bw_start_memory, bw_peak_memory
 
     def analyse_optimizer(self):
-        op_start_memory, op_peak_memory = 0, 0
-        for msg in self._memory_details[self.bw_memory_indices[-1][-1] + 1:]:
-            op_start_memory, op_peak_memory = self.compare_memory(msg, op_start_memory, op_peak_memory)
+        op_start_memory, op_peak_memory = self.compare_memory_range(self.bw_memory_indices[-1][-1] + 1, None, 0, 0)
         return [op_start_memory], [op_peak_memory]
 
     def analyse_recompute(self):
@@ -131,15 +145,14 @@ class AnalyseMemoryMsg(ProfilingConfig):
 
     def _analyse_norm_op(self):
         fw_memory_indices, bw_memory_indices = [], []
-        for index, row in enumerate(self._memory_details[1:], start=1):
-            if self.norm_op in self._memory_details[index - 1][SpecialKeyName.NAME]:
-                continue
-            if self.norm_op in row[SpecialKeyName.NAME] \
-                    and SpecialOperatorName.BACKWARD not in row[SpecialKeyName.NAME]:
-                fw_memory_indices.append(index)
-            elif self.norm_op in row[SpecialKeyName.NAME] \
-                    and SpecialOperatorName.BACKWARD in row[SpecialKeyName.NAME]:
+        names = self._memory_details.column(SpecialKeyName.NAME)
+        is_norm = np.array([self.norm_op in name for name in names], dtype=bool)
+        # the first row of consecutive norm rows
+        for index in (np.flatnonzero(is_norm[1:] & ~is_norm[:-1]) + 1).tolist():
+            if SpecialOperatorName.BACKWARD in names[index]:
                 bw_memory_indices.append(index)
+            else:
+                fw_memory_indices.append(index)
 
         return fw_memory_indices, bw_memory_indices
 
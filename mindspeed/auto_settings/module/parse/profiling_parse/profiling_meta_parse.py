@@ -1,16 +1,109 @@
 import csv
 import json
 import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_constant import SpecialOperatorName
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_constant import NumberConstant
 from mindspeed.auto_settings.utils.file_utils import check_file_size
 
 
+def accumulate(values: np.ndarray):
+    """Sums the values one after another from 0, like the += loops of the row parsers."""
+    if values.size == 0:
+        return 0
+    return float(np.cumsum(values)[-1])
+
+
+class ColumnarDetails:
+    """
+        Rows of a profiling csv stored by column. The columns keep the strings as read, the typed numpy
+        columns are parsed once when they are first used. Indexing gives the rows as dicts like csv.DictReader.
+    """
+
+    def __init__(self, columns: Dict[str, List[Optional[str]]], num_rows: int):
+        self._columns = columns
+        self._num_rows = num_rows
+        self._float_columns: Dict[str, np.ndarray] = {}
+        self._str_columns: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_reader(cls, reader):
+        """Builds the columns from a csv.reader whose first row is the header."""
+        header = next(reader, [])
+        num_fields = len(header)
+        rows = [row if len(row) == num_fields else (row + [None] * num_fields)[:num_fields] for row in reader]
+        columns = {key: list(values) for key, values in zip(header, zip(*rows))} if rows else \
+            {key: [] for key in header}
+        return cls(columns, len(rows))
+
+    @classmethod
+    def from_rows(cls, rows):
+        if isinstance(rows, ColumnarDetails):
+            return rows
+        keys = list(rows[0].keys()) if rows else []
+        return cls({key: [row.get(key) for row in rows] for key in keys}, len(rows))
+
+    def __len__(self):
+        return self._num_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._num_rows))]
+        if index < 0:
+            index += self._num_rows
+        if not 0 <= index < self._num_rows:
+            raise IndexError('row index out of range')
+        return {key: values[index] for key, values in self._columns.items()}
+
+    def __iter__(self):
+        for index in range(self._num_rows):
+            yield self[index]
+
+    def has_columns(self, *keys):
+        return all(key in self._columns for key in keys)
+
+    def column(self, key) -> List[Optional[str]]:
+        return self._columns[key]
+
+    def str_column(self, key) -> np.ndarray:
+        if key not in self._str_columns:
+            self._str_columns[key] = np.array(self._columns[key], dtype=object)
+        return self._str_columns[key]
+
+    def float_column(self, key) -> np.ndarray:
+        """The column parsed as float64, the values that are no numbers are nan."""
+        if key not in self._float_columns:
+            values = self._columns[key]
+            try:
+                column = np.array(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                column = np.array([_to_float(value) for value in values], dtype=np.float64)
+            self._float_columns[key] = column
+        return self._float_columns[key]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
 class FileAnalyseTool:
     """
         support csv and json parse
     """
 
+    @classmethod
+    def analyse_csv_columns(cls, file_path: str, csv_name: str) -> ColumnarDetails:
+        csv_path = os.path.join(file_path, csv_name)
+        with open(csv_path, newline='') as csvfile:
+            check_file_size(csvfile)
+            return ColumnarDetails.from_reader(csv.reader(csvfile))
+
     @classmethod
     def analyse_csv_info(cls, file_path: str, csv_name: str):
         csv_path = os.path.join(file_path, csv_name)
@@ -56,30 +149,23 @@ class StructureAnalyseTool:
 
     def __init__(self, rank_file_path, memory_details):
         self._rank_file_path = rank_file_path
-        self._memory_details = memory_details
+        self._memory_details = ColumnarDetails.from_rows(memory_details)
         self.fw_norm_op = SpecialOperatorName.FW_RMS_NORM_TYPE
         self.bw_norm_op = SpecialOperatorName.BW_RMS_NORM_TYPE
         self._search_special_norm_op()
 
     def analyse_norm_op(self):
         """ Analyse the norm op details in kernel_details.csv. """
-        fw_norm_op_idx_list = []
-        bw_norm_op_idx_list = []
-        matmul_total_time = 0
-        mc2_total_time = 0
-        for idx, row in enumerate(self._memory_details):
-            if "Name" not in row or "Type" not in row:
-                continue
-            if row["Type"] == "MatMulCommon":
-                time = float(row["Duration(us)"]) / NumberConstant.CONVERSION_TIME
-                matmul_total_time += time
-                mc2_total_time += time
-            if row["Type"] == "AllGatherMatmul" or row["Type"] == "MatmulReduceScatter":
-                mc2_total_time += float(row["Duration(us)"]) / NumberConstant.CONVERSION_TIME
-            if row["Type"] == self.fw_norm_op:
-                fw_norm_op_idx_list.append(idx)
-            elif row["Type"] == self.bw_norm_op:
-                bw_norm_op_idx_list.append(idx)
+        if not self._memory_details.has_columns("Name", "Type"):
+            return [], [], 0, 0
+        types = self._memory_details.str_column("Type")
+        durations = self._memory_details.float_column("Duration(us)")
+        is_matmul = types == "MatMulCommon"
+        is_mc2 = is_matmul | (types == "AllGatherMatmul") | (types == "MatmulReduceScatter")
+        matmul_total_time = accumulate(durations[is_matmul] / NumberConstant.CONVERSION_TIME)
+        mc2_total_time = accumulate(durations[is_mc2] / NumberConstant.CONVERSION_TIME)
+        fw_norm_op_idx_list = np.flatnonzero(types == self.fw_norm_op).tolist()
+        bw_norm_op_idx_list = np.flatnonzero(types == self.bw_norm_op).tolist()
         return fw_norm_op_idx_list, bw_norm_op_idx_list, matmul_total_time, mc2_total_time
 
     def get_fw_norm_op(self):
@@ -1,11 +1,12 @@
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_constant import OperatorDetails
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_meta_parse import ColumnarDetails
 
 
 class AnalyseOperatorMsg:
     """ Analyse operator message. """
 
     def __init__(self, operator_details):
-        self._operator_details = operator_details
+        self._operator_details = ColumnarDetails.from_rows(operator_details)
 
     def analyse_embedding(self, start_idx, end_idx):
         return self._analyse_operators(start_idx, end_idx)
@@ -23,17 +24,20 @@ class AnalyseOperatorMsg:
         return self._analyse_operators(start_idx, end_idx)
 
     def _analyse_operators(self, start_idx, end_idx):
+        columns = [self._operator_details.column(key) for key in (
+            'Name', 'Type', 'Input Shapes', 'Output Shapes', 'Duration(us)', 'Wait Time(us)', 'Accelerator Core')]
         details_list = []
         for i in range(start_idx, end_idx):
-            detail = self._operator_details[i]
+            name, type_, input_shapes, output_shapes, duration_us, wait_time_us, accelerator_core = \
+                (column[i] for column in columns)
             op_detail = OperatorDetails(
-                name=detail['Name'],
-                type_=detail['Type'],
-                input_shapes=detail['Input Shapes'],
-                output_shapes=detail['Output Shapes'],
-                duration_us=detail['Duration(us)'],
-                wait_time_us=detail['Wait Time(us)'],
-                accelerator_core=detail['Accelerator Core']
+                name=name,
+                type_=type_,
+                input_shapes=input_shapes,
+                output_shapes=output_shapes,
+                duration_us=duration_us,
+                wait_time_us=wait_time_us,
+                accelerator_core=accelerator_core
             )
             details_list.append(op_detail)
         return details_list
@@ -1,4 +1,6 @@
+from concurrent.futures import ProcessPoolExecutor
 import math
+import multiprocessing
 import os
 import re
 from mindspeed.auto_settings.utils.logger import get_logger
@@ -12,10 +14,26 @@ from mindspeed.auto_settings.module.parse.profiling_parse.profiling_memory_parse
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_meta_parse import FileAnalyseTool
 
 
+def _parse_stage(root_path, search_cfg, hardware, rank_file_path, stage_id):
+    """Parses the rank of one stage in a worker process, returns its ProfilingModelInfo."""
+    parser = ProfilingParser(root_path, search_cfg=search_cfg)
+    parser.nodes, parser.devices_per_node, parser.node_rank = hardware
+    parser.rank_file_path = rank_file_path
+    parser.stage_id = stage_id
+    parser.model.stage_id = stage_id
+    parser.parse_model_structure()
+    return parser.model
+
+
 class ProfilingParser(ProfilingConfig):
-    def __init__(self, root_path, search_cfg=None, args=None):
+    # the results of a stage that replace the ones of the previous stage instead of being appended
+    STAGE_REPLACED_ATTRS = ('matmul_total_time', 'mc2_total_time', 'cann_and_driver_memory', 'recompute_memory')
+
+    def __init__(self, root_path, search_cfg=None, args=None, num_workers=None):
         super(ProfilingParser, self).__init__(search_cfg, args)
         self._root_path = root_path
+        # number of processes that parse the ranks of the stages, by default one per stage up to the cpu count
+        self.num_workers = num_workers
         self._ascend_operator_details = None
         self.stage_id = 0
         self.rank_file_path = None
@@ -39,9 +57,9 @@ class ProfilingParser(ProfilingConfig):
 
     def parse_model_structure(self):
         self._update_profiling_file_path()
-        kernel_details = FileAnalyseTool.analyse_csv_info(self.rank_file_path, 'kernel_details.csv')
+        kernel_details = FileAnalyseTool.analyse_csv_columns(self.rank_file_path, 'kernel_details.csv')
         communication_details = FileAnalyseTool.analyse_json_info(self.rank_file_path, 'communication.json')
-        memory_details = FileAnalyseTool.analyse_csv_info(self.rank_file_path, 'operator_memory.csv')
+        memory_details = FileAnalyseTool.analyse_csv_columns(self.rank_file_path, 'operator_memory.csv')
         memory_record_details = FileAnalyseTool.analyse_csv_info(self.rank_file_path, 'memory_record.csv')
         structure_cls = StructureAnalyseTool(self.rank_file_path, kernel_details)
         fw_norm_op_idx_list, bw_norm_op_idx_list, matmul_total_time, mc2_total_time = structure_cls.analyse_norm_op()
@@ -142,6 +160,10 @@ class ProfilingParser(ProfilingConfig):
         paths_and_ids = self._get_first_rank_and_stage_id_of_each_stage(node_first_rank_id, devices_each_stage,
                                                                         rank_file_path)
         if isinstance(paths_and_ids, list):
+            num_workers = self.num_workers or min(len(paths_and_ids), os.cpu_count() or 1)
+            if num_workers > 1 and len(paths_and_ids) > 1:
+                self._parse_stages_in_pool(paths_and_ids, num_workers)
+                return
             for path, stage_id in paths_and_ids:
                 self.rank_file_path = path
                 self.stage_id = stage_id
@@ -152,6 +174,25 @@ class ProfilingParser(ProfilingConfig):
             self.model.stage_id = self.stage_id
             self.parse_model_structure()
 
+    def _parse_stages_in_pool(self, paths_and_ids, num_workers):
+        """Parses the ranks of the stages in processes, the results are merged in stage order."""
+        hardware = (self.nodes, self.devices_per_node, self.node_rank)
+        # the parser runs in the training process after the device runtime is initialized, it is not forked
+        with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_parse_stage, self._root_path, self.search_cfg, hardware, path, stage_id)
+                       for path, stage_id in paths_and_ids]
+            stage_models = [future.result() for future in futures]
+        for (path, stage_id), stage_model in zip(paths_and_ids, stage_models):
+            self.rank_file_path = path
+            self.stage_id = stage_id
+            self._merge_stage_model(stage_model)
+
+    def _merge_stage_model(self, stage_model):
+        self.model.extend_stage_info(stage_model)
+        for attr_name in self.STAGE_REPLACED_ATTRS:
+            setattr(self.model, attr_name, getattr(stage_model, attr_name))
+        self.model.stage_id = stage_model.stage_id
+
     def _parse_each_node(self):
         rank_file_path = self._extract_rank_file_path()
         self._parse_first_rank_of_each_stage(rank_file_path)
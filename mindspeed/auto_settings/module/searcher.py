@@ -1,11 +1,12 @@
+import heapq
 import math
+import multiprocessing
 import os
 import time
 
 from mindspeed.auto_settings.module.memory_cost import MemoryCost
-from collections import deque
 from copy import deepcopy
-from typing import Deque, Tuple, Optional, List
+from typing import Tuple, Optional, List
 import traceback
 import numpy as np
 import pandas as pd
@@ -13,6 +14,8 @@ import pandas as pd
 from mindspeed.auto_settings.config.search_config import SearchConfig, ExecutorFlag
 from mindspeed.auto_settings.config.system_config import get_system_config
 from mindspeed.auto_settings.module.memory_cost_black import MemoryCostBlack
+from mindspeed.auto_settings.module.memory_pruning import MemoryDominancePruner
+from mindspeed.auto_settings.module.operator.operator_database import dispose_connections_after_fork
 from mindspeed.auto_settings.module.time_cost import TimeCost
 from mindspeed.auto_settings.module.time_cost_black import TimeCostBlack
 from mindspeed.auto_settings.profile.profiler import Profiler
@@ -24,6 +27,23 @@ from mindspeed.auto_settings.utils.utils import get_prof_dir, get_black_prof_fil
 Searcher Strategy
 """
 
+# (searcher, configs) of the running white box search, inherited by the forked search workers
+_WHITE_SEARCH_STATE = None
+
+# 每批预估的配置数上限
+MAX_SEARCH_CHUNK_SIZE = 64
+PROGRESS_LOG_INTERVAL = 5.0
+
+
+def _init_search_worker():
+    dispose_connections_after_fork()
+
+
+def _evaluate_chunk(chunk):
+    searcher, configs = _WHITE_SEARCH_STATE
+    start, end = chunk
+    return start, searcher.evaluate_configs(configs[start:end])
+
 
 class Searcher(object):
     def __init__(self):
@@ -95,6 +115,74 @@ class WhiteSearcher(BaseSearcher):
                 f"Stage [1] pruned config: TP=[{cfg.tp}] PP=[{cfg.pp}] LAYERS_PER_VPP=[{cfg.layers_per_vpp}] "
                 f"DP=[{cfg.dp}] CP=[{cfg.cp}] EP=[{cfg.ep}] ZeRO=[{cfg.zero1}]")
 
+    def evaluate_configs(self, configs):
+        """
+        批量预估configs的内存和耗时
+        返回与configs顺序一致的(total_time, new_memory, recompute_layer, use_mc2)，OOM或预估失败的配置为None
+        """
+        device_mem_cap = get_system_config().memory_cap
+        memory_infos = self.memory_cost.get_memory_costs(configs)
+        fit_indices = []
+        for i, (cfg, memory_info) in enumerate(zip(configs, memory_infos)):
+            self.logger.info("====================")
+            self.logger.info(f"Looking at:\n\n{cfg}")
+            if memory_info["peak_memory"] > device_mem_cap:
+                self.logger.info(f"OOM found, next!")
+            else:
+                fit_indices.append(i)
+
+        fit_configs = [configs[i] for i in fit_indices]
+        fit_memory_infos = [memory_infos[i] for i in fit_indices]
+        try:
+            time_infos = self.time_cost.get_time_costs(fit_configs, fit_memory_infos)
+        except Exception:
+            # 逐个预估，跳过出错的配置
+            time_infos = [self._get_time_cost_or_none(cfg, memory_info)
+                          for cfg, memory_info in zip(fit_configs, fit_memory_infos)]
+
+        results: List[Optional[Tuple]] = [None] * len(configs)
+        for i, memory_info, time_info in zip(fit_indices, fit_memory_infos, time_infos):
+            if time_info is None:
+                continue
+            self.logger.debug(
+                f"after recompute, perf = {time_info['total_time']} and "
+                f"need_recompute = {memory_info['need_recompute']}")
+            self.logger.debug(f"cur mem_estimated = {memory_info['new_memory']}, "
+                              f"recompute_layer = {time_info['num_layers']}")
+            results[i] = (time_info["total_time"], memory_info["new_memory"], time_info["num_layers"],
+                          time_info["use_mc2"])
+        return results
+
+    def _get_time_cost_or_none(self, cfg, memory_info):
+        try:
+            return self.get_time_cost(cfg, memory_info)
+        except Exception as err:
+            self.logger.warning(f"Search: ERROR during perf_modeling_calculation: {type(err).__name__}")
+            traceback.print_exc()
+            return None
+
+    def iter_evaluations(self, configs, num_workers):
+        """
+        分批预估configs，num_workers大于1时在fork的进程池中并行预估，批次完成的顺序不固定
+        yield (批次起始下标, 批次结果)
+        """
+        global _WHITE_SEARCH_STATE
+        chunk_size = max(1, min(MAX_SEARCH_CHUNK_SIZE, math.ceil(len(configs) / (num_workers * 4))))
+        chunks = [(start, min(start + chunk_size, len(configs))) for start in range(0, len(configs), chunk_size)]
+        if num_workers <= 1 or len(chunks) <= 1:
+            for start, end in chunks:
+                yield start, self.evaluate_configs(configs[start:end])
+            return
+
+        # the cost models are trained in this process, the forked workers inherit them
+        _WHITE_SEARCH_STATE = (self, configs)
+        try:
+            with multiprocessing.get_context("fork").Pool(num_workers, initializer=_init_search_worker) as pool:
+                for start, results in pool.imap_unordered(_evaluate_chunk, chunks):
+                    yield start, results
+        finally:
+            _WHITE_SEARCH_STATE = None
+
     def search(self, configs, topk):
         """
         线上搜索方法
@@ -105,50 +193,50 @@ class WhiteSearcher(BaseSearcher):
 
         system_config = get_system_config()
         device_mem_cap = system_config.memory_cap
+        num_workers = max(1, min(system_config.search_workers, len(configs)))
         self.logger.info(f"Search: total_device_num: {system_config.search_world_size}")
         self.logger.info(f"Search: device_mem_cap: {device_mem_cap}")
-        best_perf_cfg_map: Deque[Tuple[float, Optional[SearchConfig]]] = deque([(float("inf"), None)] * topk, topk)
+        self.logger.info(f"Search: number of search workers: {num_workers}")
+        # 性能最差的配置位于堆顶，性能相同时保留下标小的配置，结果与批次完成顺序无关
+        best_perf_heap: List[Tuple[float, int, Tuple]] = []
 
         self.logger.info(f"Stage [1] pruned result: number of valid PTD configurations [{len(configs)}]")
         self.log_configs(configs)
 
         search_config_begin_time = time.time()
-        for cfg in configs:
-            self.logger.info("====================")
-            self.logger.info(f"Looking at:\n\n{cfg}")
-            memory_info = self.get_memory_cost(cfg)
-            if memory_info["peak_memory"] > device_mem_cap:
-                self.logger.info(f"OOM found, next!")
-                continue
-            try:
-                time_info = self.get_time_cost(cfg, memory_info)
-                new_perf = time_info["total_time"]
-                recompute_layer = time_info["num_layers"]
-                use_mc2 = time_info["use_mc2"]
-                new_memory = memory_info["new_memory"]
-                self.logger.debug(
-                    f"after recompute, perf = {new_perf} and need_recompute = {memory_info['need_recompute']}")
-                self.logger.debug(f"cur mem_estimated = {new_memory}, recompute_layer = {recompute_layer}")
-
-                better_found = False
-                for i, perf_cfg in enumerate(best_perf_cfg_map):
-                    if new_perf < perf_cfg[0]:
-                        better_found = True
-                        cfg.performance = new_perf
-                        cfg.memory = new_memory
-                        cfg.recompute_num_layers = recompute_layer
-                        cfg.use_ascend_mc2 = use_mc2 if cfg.tensor_model_parallel_size > 1 else False
-                        self.logger.info(f"Search: SUCCESSFUL Better #{i} Config Found.")
-                        self.logger.debug(f"Performance Estimation: {new_perf}.")
-                        best_perf_cfg_map.pop()
-                        best_perf_cfg_map.insert(i, (new_perf, deepcopy(cfg)))
-                        break
-                if not better_found:
+        last_log_time = search_config_begin_time
+        num_evaluated = 0
+        for start, results in self.iter_evaluations(configs, num_workers):
+            for index, result in enumerate(results, start):
+                if result is None:
+                    continue
+                entry = (-result[0], -index, result)
+                if not result[0] < float("inf"):
+                    self.logger.info(f"Sub-optimal performance, next!")
+                elif len(best_perf_heap) < topk:
+                    heapq.heappush(best_perf_heap, entry)
+                elif topk > 0 and entry[:2] > best_perf_heap[0][:2]:
+                    heapq.heapreplace(best_perf_heap, entry)
+                else:
                     self.logger.info(f"Sub-optimal performance, next!")
-            except Exception as err:
-                self.logger.warning(f"Search: ERROR during perf_modeling_calculation: {type(err).__name__}")
-                traceback.print_exc()
-        final_cfgs = [cfg for _, cfg in best_perf_cfg_map]
+            num_evaluated += len(results)
+            now = time.time()
+            if now - last_log_time >= PROGRESS_LOG_INTERVAL or num_evaluated == len(configs):
+                last_log_time = now
+                self.logger.info(f"Search: evaluated {num_evaluated}/{len(configs)} configs, "
+                                 f"{num_evaluated / max(now - search_config_begin_time, 1e-9):.1f} configs/s")
+
+        final_cfgs = []
+        for i, (_, neg_index, result) in enumerate(sorted(best_perf_heap, reverse=True)):
+            new_perf, new_memory, recompute_layer, use_mc2 = result
+            cfg = deepcopy(configs[-neg_index])
+            cfg.performance = new_perf
+            cfg.memory = new_memory
+            cfg.recompute_num_layers = recompute_layer
+            cfg.use_ascend_mc2 = use_mc2 if cfg.tensor_model_parallel_size > 1 else False
+            self.logger.info(f"Search: Top #{i} Config is config #{-neg_index}, performance estimation: {new_perf}.")
+            final_cfgs.append(cfg)
+        final_cfgs.extend([None] * (topk - len(final_cfgs)))
         self.logger.info(">>>>>> Search configuration cost time: %sms",
                          str((time.time() - search_config_begin_time) * 1000))
         self.logger.info(">>>>>> Total execution cost time: %sms",
@@ -170,6 +258,7 @@ class BlackSearcher(BaseSearcher):
         ])
 
         self.output_path = os.path.join(get_system_config().work_dir, 'model_results.csv')
+        self.pruning_log_path = os.path.join(get_system_config().work_dir, 'black_search_pruning.jsonl')
 
     def get_logger(self):
         return self.logger
@@ -179,9 +268,16 @@ class BlackSearcher(BaseSearcher):
         黑盒搜索方案
         """
         self.pre_search()
-        idx = 0
-        while idx < len(configs):
-            config = configs[idx]
+        configs = [config for config in configs if config is not None]
+        # 白盒内存预估只计算一次，实测OOM或标定后的预估超出内存的后续配置一次性剪枝
+        memory_infos = self.memory_cost.get_memory_costs(configs)
+        pruner = MemoryDominancePruner([memory_info["peak_memory"] for memory_info in memory_infos],
+                                       get_system_config().max_available_memory,
+                                       log_path=self.pruning_log_path,
+                                       names=[get_prof_dir(config) for config in configs])
+        for idx, config in enumerate(configs):
+            if not pruner.is_alive(idx):
+                continue
             self.logger.info(f">>> current config: {config}")
 
             work_dir = os.path.join(get_system_config().work_dir, get_prof_dir(config))
@@ -199,17 +295,10 @@ class BlackSearcher(BaseSearcher):
             peak_memory = self.memory_black.get_peak_memory(config)
             self.logger.info(f"the peak_mem of croped_mbs_config({config}) is {peak_memory}")
             if peak_memory > get_system_config().max_available_memory:
-                tmp_search_space = deepcopy(configs)
-                mem1 = self.memory_cost.get_memory_cost(cropped_config)
-                mem1 = mem1["peak_memory"]
-                for i in range(idx + 1, len(tmp_search_space)):
-                    # 解决预估不准的问题
-                    mem2 = self.memory_cost.get_memory_cost(tmp_search_space[i])
-                    mem2 = mem2["peak_memory"]
-                    if mem2 > mem1:
-                        self.logger.info(f"==> remove config({tmp_search_space[i]}), mem1: {mem1} mem2: {mem2}")
-                        configs.remove(tmp_search_space[i])
-                idx += 1
+                # 解决预估不准的问题
+                mem1 = self.memory_cost.get_memory_cost(cropped_config)["peak_memory"]
+                pruner.prune_dominated(idx, mem1)
+                pruner.record_measurement(idx, memory_infos[idx]["peak_memory"], peak_memory)
                 continue
 
             self.logger.info(f"profiler cropped config: {cropped_config}")
@@ -219,8 +308,9 @@ class BlackSearcher(BaseSearcher):
             self.profiler.run(get_prof_dir(config), config, ExecutorFlag.PROFILE_BLACK)
             step_time = np.mean(self.time_black.get_iteration_time(config)) / 1e3  # ms
             peak_mem = self.memory_black.get_peak_memory(config)
+            pruner.record_measurement(idx, memory_infos[idx]["peak_memory"], peak_mem)
             self.add_model_result(config, peak_mem, step_time)
-            idx += 1
+        self.logger.info(f"Black search: {pruner.num_pruned} of {len(configs)} configs pruned by memory")
 
         self.model_results.to_csv(self.output_path, index=False)
         topk_config = self.get_top_k(topk=topk)
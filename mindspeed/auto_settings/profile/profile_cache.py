@@ -0,0 +1,96 @@
+"""
+profiling解析结果的持久化缓存
+"""
+from dataclasses import asdict
+from importlib import metadata
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+
+import torch
+
+from mindspeed.auto_settings.config.model_config import get_model_config
+from mindspeed.auto_settings.config.search_config import SearchConfig, ExecutorFlag
+from mindspeed.auto_settings.config.system_config import get_system_config
+from mindspeed.auto_settings.utils.file_utils import restricted_read, restricted_write
+from mindspeed.auto_settings.utils.logger import get_logger
+
+CACHEABLE_FLAGS = (ExecutorFlag.PARSE_MODEL, ExecutorFlag.PROFILE)
+
+
+def get_software_versions() -> Dict[str, Optional[str]]:
+    system_config = get_system_config()
+    versions = {
+        "torch": torch.__version__,
+        "cann": system_config.cann_version,
+        "driver": system_config.driver_version,
+    }
+    for package in ("torch_npu", "mindspeed", "megatron_core"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+class ProfileCache(object):
+    """
+    以SearchConfig、模型配置、硬件与软件版本的内容哈希为键, 缓存解析后的profiling结果
+    """
+    VERSION = 1
+    SUFFIX = ".pkl"
+    # 由搜索结果回填的字段, 不影响profiling结果
+    IGNORED_FIELDS = ("memory", "performance")
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._logger = get_logger("ProfileCache")
+
+    @staticmethod
+    def normalize(cfg) -> Dict[str, Any]:
+        normalized = asdict(cfg)
+        for field_name in ProfileCache.IGNORED_FIELDS:
+            normalized.pop(field_name, None)
+        if isinstance(cfg, SearchConfig):
+            normalized["prof_file"] = cfg.prof_file
+            normalized["auto_settings_ranks"] = cfg.auto_settings_ranks
+        return normalized
+
+    def key(self, cfg: SearchConfig) -> str:
+        system_config = get_system_config()
+        content = {
+            "version": self.VERSION,
+            "search_config": self.normalize(cfg),
+            "model_config": self.normalize(get_model_config()),
+            "hardware": {
+                "device_type": system_config.device_type,
+                "nnodes": system_config.nnodes,
+                "nproc_per_node": system_config.nproc_per_node,
+            },
+            "software": get_software_versions(),
+        }
+        content = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, cfg: SearchConfig) -> Optional[Any]:
+        path = os.path.join(self.cache_dir, self.key(cfg) + self.SUFFIX)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._logger.debug(f"Profiling cache hit: {path}")
+        return restricted_read(path)
+
+    def put(self, cfg: SearchConfig, result: Any):
+        path = os.path.join(self.cache_dir, self.key(cfg) + self.SUFFIX)
+        # 先写临时文件再替换, 中断的写入不会留下损坏的缓存
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        restricted_write(tmp_path, result)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
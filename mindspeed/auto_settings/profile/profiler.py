@@ -8,8 +8,9 @@ from mindspeed.auto_settings.config.search_config import SearchConfig, ExecutorF
 from mindspeed.auto_settings.config.system_config import get_system_config
 from mindspeed.auto_settings.module.parse.profiling_parse.profiling_node_parse import GatherNodeProfiling
 from mindspeed.auto_settings.profile.argv import BaseArgv, FilterArgv, SearchConfigArgv
+from mindspeed.auto_settings.profile.profile_cache import ProfileCache, CACHEABLE_FLAGS
 from mindspeed.auto_settings.profile.runner import Runner
-from mindspeed.auto_settings.utils.file_utils import restricted_write
+from mindspeed.auto_settings.utils.file_utils import restricted_read, restricted_write
 from mindspeed.auto_settings.utils.logger import get_logger
 from mindspeed.auto_settings.utils.singleton import Singleton
 from mindspeed.auto_settings.utils.utils import check_file_exists, get_prof_dir
@@ -24,9 +25,12 @@ class Profiler(metaclass=Singleton):
 
     def __init__(self):
         self._logger = get_logger("Profiler")
+        self.runner = None
+        self.cache = None
 
     def init(self):
-        self.runner = Runner()
+        if self.runner is None:
+            self.runner = Runner()
 
     def run(self, output_filename: str,
                       cfg: Optional[SearchConfig] = None,
@@ -57,7 +61,9 @@ class Profiler(metaclass=Singleton):
                 bcast_list: List[Any] = [None] * 3
                 dist.broadcast_object_list(bcast_list)
                 output_filename, cfg, flag = bcast_list
-                self._prepare(output_filename, cfg=cfg, flag=flag)
+                return_code = self._prepare(output_filename, cfg=cfg, flag=flag)
+                if return_code != 0:
+                    self._logger.error("Profiling job %s failed with return code %d.", output_filename, return_code)
                 dist.barrier()
             except RuntimeError as e:
                 if "successfully reached monitoredBarrier" in str(e):
@@ -77,6 +83,20 @@ class Profiler(metaclass=Singleton):
             cfg: Optional[SearchConfig] = None,
             flag: ExecutorFlag = ExecutorFlag.PROFILE
     ) -> int:
+        modified_argv, modified_env = self._build_job(output_filename, cfg, flag)
+        return_code = self.runner.run(modified_argv, modified_env)
+
+        return return_code
+
+    def _build_job(
+            self,
+            output_filename: str,
+            cfg: Optional[SearchConfig] = None,
+            flag: ExecutorFlag = ExecutorFlag.PROFILE
+    ):
+        """
+        生成任务的运行参数与环境变量
+        """
         system_config = get_system_config()
         work_dir = system_config.work_dir
         save_path = os.path.join(work_dir, output_filename)
@@ -86,9 +106,7 @@ class Profiler(metaclass=Singleton):
             os.mkdir(work_dir)
         if cfg:
             restricted_write(os.path.join(system_config.work_dir, f"at_{system_config.node_rank}.pkl"), cfg)
-        return_code = self.runner.run(modified_argv, modified_env)
-
-        return return_code
+        return modified_argv, modified_env
 
     def _update_env(self, flag: ExecutorFlag) -> Dict[str, str]:
         """
@@ -128,17 +146,45 @@ class Profiler(metaclass=Singleton):
         """
         对相关数据并行进行数据采集
         """
-        profile_results = []
-        self._logger.info("<==========Begin to profile==========>")
+        self.init()
+        system_config = get_system_config()
+        self.cache = ProfileCache(system_config.profile_cache_dir) if system_config.profile_cache_dir else None
+        os.makedirs(system_config.work_dir, exist_ok=True)
+        results = [None] * len(configs)
+        jobs = []
         for idx, (config, file_name) in enumerate(configs):
+            if self.cache and config.profile_type in CACHEABLE_FLAGS:
+                results[idx] = self.cache.get(config)
+                if results[idx] is not None:
+                    if config.profile_type == ExecutorFlag.PARSE_MODEL:
+                        restricted_write(os.path.join(system_config.work_dir, file_name), results[idx])
+                    continue
             if not check_file_exists(file_name):
-                self._logger.info('<==========the %s/%s loop==========>', str(idx), str(len(configs)))
-                self._logger.info("profile_db_configs (tp, pp, dp, cp, ep, #layers, seq_len):")
-                self.run(file_name, config, flag=config.profile_type)
-            if config.profile_type == ExecutorFlag.PROFILE:
-                file_path = os.path.join(get_system_config().work_dir, get_prof_dir(config))
+                jobs.append((config, file_name))
+
+        self._logger.info("<==========Begin to profile==========>")
+        for idx, (config, file_name) in enumerate(jobs):
+            self._logger.info('<==========the %s/%s loop==========>', str(idx), str(len(jobs)))
+            self._logger.info("profile_db_configs (tp, pp, dp, cp, ep, #layers, seq_len):")
+            return_code = self.run(file_name, config, flag=config.profile_type)
+            if return_code != 0:
+                # the results of a failed job are neither parsed nor cached
+                raise RuntimeError(f"Profiling job {file_name} failed with return code {return_code}.")
+
+        profile_results = []
+        for idx, (config, file_name) in enumerate(configs):
+            if results[idx] is None and config.profile_type == ExecutorFlag.PROFILE:
+                file_path = os.path.join(system_config.work_dir, get_prof_dir(config))
                 profiling_node_parse = GatherNodeProfiling(file_path)
-                profiling_res = profiling_node_parse.fuse_node_pkl()
-                profile_results.append([config, profiling_res])
+                results[idx] = profiling_node_parse.fuse_node_pkl()
+                if self.cache:
+                    self.cache.put(config, results[idx])
+            elif results[idx] is None and self.cache and config.profile_type in CACHEABLE_FLAGS \
+                    and check_file_exists(file_name):
+                self.cache.put(config, restricted_read(os.path.join(system_config.work_dir, file_name)))
+            if config.profile_type == ExecutorFlag.PROFILE:
+                profile_results.append([config, results[idx]])
+        if self.cache:
+            self._logger.info("Profiling cache: %s", str(self.cache.stats()))
         self._logger.info("<==========Finished profiling==========>")
         return profile_results
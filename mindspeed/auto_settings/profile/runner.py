@@ -1,8 +1,9 @@
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 from argparse import Namespace
 import os
 import subprocess
 import sys
+import threading
 
 from mindspeed.auto_settings.config.system_config import get_system_config
 from mindspeed.auto_settings.utils.logger import get_logger
@@ -25,11 +26,14 @@ class Runner:
     def get_base_env(self) -> Dict[str, str]:
         return os.environ.copy()
 
-    def run(
+    def launch(
             self,
             modified_argv: List[str],
             modified_env: Dict[str, str]
-    ) -> int:
+    ):
+        """
+        启动任务但不等待, 返回进程句柄
+        """
         cmd = [
                   "torchrun",
                   "--nnodes", str(self.nnodes),
@@ -40,13 +44,61 @@ class Runner:
               ] + modified_argv
         self._logger.debug(f"Next job command: {cmd} with env {modified_env}")
 
-        process = subprocess.Popen(
+        return subprocess.Popen(
             cmd,
             preexec_fn=os.setpgrp,
             env=modified_env
         )
+
+    def run(
+            self,
+            modified_argv: List[str],
+            modified_env: Dict[str, str]
+    ) -> int:
+        process = self.launch(modified_argv, modified_env)
         process.wait()
         return_code = process.returncode
         self._logger.info("Last job returns %d.", return_code)
 
         return return_code
+
+
+class _FakeProcess:
+
+    def __init__(self, target: Callable[[], int]):
+        self.returncode = None
+        self._thread = threading.Thread(target=self._run, args=(target,), daemon=True)
+        self._thread.start()
+
+    def _run(self, target):
+        try:
+            self.returncode = target()
+        except Exception:
+            self.returncode = 1
+            raise
+
+    def poll(self) -> Optional[int]:
+        return None if self._thread.is_alive() else self.returncode
+
+    def wait(self) -> int:
+        self._thread.join()
+        return self.returncode
+
+
+class FakeRunner(Runner):
+    """
+    不依赖设备的本地runner, 在线程中以job_fn(argv, env)代替torchrun任务, 用于测试profiling流程
+    """
+
+    def __init__(self, job_fn: Callable[[List[str], Dict[str, str]], Optional[int]]):
+        super(FakeRunner, self).__init__()
+        self.job_fn = job_fn
+        self.launched = []
+
+    def launch(
+            self,
+            modified_argv: List[str],
+            modified_env: Dict[str, str]
+    ):
+        self.launched.append({"argv": modified_argv, "env": modified_env})
+        return _FakeProcess(lambda: self.job_fn(modified_argv, modified_env) or 0)
@@ -35,6 +35,8 @@ from megatron.training.checkpointing import (
     find_checkpoint_rank_0
 )
 
+from mindspeed.async_checkpoint import finalize_async_checkpoint_save, get_async_checkpoint_writer
+
 
 def save_checkpoint(iteration, model, optimizer, opt_param_scheduler,
                     num_floating_point_operations_so_far, checkpointing_context=None):
@@ -61,10 +63,13 @@ def save_checkpoint(iteration, model, optimizer, opt_param_scheduler,
         optimizer.save_parameter_state(optim_checkpoint_name)
 
     async_save_request = None
-    if args.async_save:
-        if not args.use_dist_ckpt:
-            raise NotImplementedError('Async checkpoint save not implemented for legacy checkpoints')
-        elif args.dist_ckpt_format != 'torch_dist':
+    legacy_async_save = args.async_save and not args.use_dist_ckpt
+    if legacy_async_save:
+        # Every rank has a writer, the save in flight is joined by all of them before the latest iteration is updated.
+        get_async_checkpoint_writer()
+        finalize_async_checkpoint_save()
+    if args.async_save and not legacy_async_save:
+        if args.dist_ckpt_format != 'torch_dist':
             raise NotImplementedError(f'Async checkpoint save not implemented for {args.dist_ckpt_format} distributed checkpoint format')
 
     # Collect args, model, RNG.
@@ -107,11 +112,17 @@ def save_checkpoint(iteration, model, optimizer, opt_param_scheduler,
                 state_dict = {k: v for k, v in state_dict.items() if not k.startswith('ema')}
 
             ensure_directory_exists(checkpoint_name)
-            torch.save(state_dict, checkpoint_name)
-
+            checkpoints = [(state_dict, checkpoint_name)]
             if args.use_ema:
                 ema_state_dict = {k.replace('ema', 'model'): v for k, v in ema_state_dict.items()}
-                torch.save(ema_state_dict, checkpoint_name + ".ema")
+                checkpoints.append((ema_state_dict, checkpoint_name + ".ema"))
+
+            if legacy_async_save:
+                # Snapshot the state dicts to host memory and write them in the background.
+                get_async_checkpoint_writer().save(checkpoints)
+            else:
+                for checkpoint_state_dict, name in checkpoints:
+                    torch.save(checkpoint_state_dict, name)
 
     if not args.async_save:
         assert async_save_request is None
@@ -133,13 +144,15 @@ def save_checkpoint(iteration, model, optimizer, opt_param_scheduler,
                 append_to_progress_log(f'Saved async checkpoint\tIteration: {iteration}',
                                        barrier=False)
 
-        if args.async_save:
+        if legacy_async_save:
+            get_async_checkpoint_writer().add_finalize_fn(iter_finalize_fn)
+        elif args.async_save:
             assert async_save_request is not None
             async_save_request.add_finalize_fn(iter_finalize_fn)
         else:
             iter_finalize_fn()
 
-    if args.async_save:
+    if args.async_save and not legacy_async_save:
         schedule_async_save(async_save_request)
         print_rank_0('  scheduled an async checkpoint save at iteration {:7d} to {}' \
                      .format(iteration, args.save))
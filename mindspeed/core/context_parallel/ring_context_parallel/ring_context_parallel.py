@@ -737,38 +737,52 @@ class AttentionStrategyFactory:
 
 
 class KVCacheManager:
-    """KV Cache Manager"""
+    """KV Cache Manager, the cached blocks are written into a buffer preallocated for the cp size"""
 
-    def __init__(self, cache_policy):
+    def __init__(self, cache_policy, cp_size):
         self.cache_policy = cache_policy
-        self.k_cache_list = []
-        self.v_cache_list = []
+        # every ring step is cached except the step cp_size - 2, its block is communicated again in backward
+        self.num_slots = max(cp_size - 1, 1)
+        self.num_cached = 0
+        self.k_cache = None
+        self.v_cache = None
+
+    def _allocate_cache(self, cur_kv):
+        block = cur_kv[0]
+        if self.cache_policy == "full":
+            cache = torch.empty((2, self.num_slots, *block.shape), dtype=block.dtype, device=block.device)
+            self.k_cache, self.v_cache = cache[0], cache[1]
+        else:
+            # half policy keeps the v of the last block in the slot after the cached k
+            cache = torch.empty((self.num_slots + 1, *block.shape), dtype=block.dtype, device=block.device)
+            self.k_cache, self.v_cache = cache[:self.num_slots], cache[self.num_slots:]
 
     def update_cache(self, cur_kv):
-        # update the cache by kv cache policy
+        # update the cache by kv cache policy, the ring buffers are reused so the block is written into its slot
+        if self.cache_policy not in ("full", "half"):
+            return
+        if self.k_cache is None:
+            self._allocate_cache(cur_kv)
+        self.k_cache[self.num_cached].copy_(cur_kv[0])
         if self.cache_policy == "full":
-            self.k_cache_list.append(cur_kv[0].clone())
-            self.v_cache_list.append(cur_kv[1].clone())
-        elif self.cache_policy == "half":
-            self.k_cache_list.append(cur_kv[0].clone())
+            self.v_cache[self.num_cached].copy_(cur_kv[1])
+        self.num_cached += 1
 
     def get_cache(self, cur_kv):
-        # get kv cache when config is not causal or eod
-        self.k_cache_list = self.k_cache_list if self.k_cache_list else [cur_kv[0].clone()]
-        self.v_cache_list = self.v_cache_list if self.v_cache_list else [cur_kv[1].clone()]
-        k_stack = torch.stack(self.k_cache_list)
-        v_stack = torch.stack(self.v_cache_list)
-        return k_stack, v_stack
+        # get kv cache when config is not causal or eod, as views of the cache
+        if self.k_cache is None:
+            return cur_kv[0].unsqueeze(0), cur_kv[1].unsqueeze(0)
+        if self.cache_policy == "half":
+            self.v_cache[0].copy_(cur_kv[1])
+            return self.k_cache[:self.num_cached], self.v_cache
+        return self.k_cache[:self.num_cached], self.v_cache[:self.num_cached]
 
     def get_cache_causal_regular(self, cur_kv, q):
         # get kv cache when config is causal and is not eod, as causal regular condition
-        self.k_cache_list = self.k_cache_list if self.k_cache_list else [cur_kv[0].clone()]
-        self.v_cache_list = self.v_cache_list if self.v_cache_list else [cur_kv[1].clone()]
+        k_stack, v_stack = self.get_cache(cur_kv)
         q = q.view(-1, *q.shape[2:])
-        self.k_cache_list = [x.view(-1, *x.shape[2:]) for x in self.k_cache_list]
-        self.v_cache_list = [x.view(-1, *x.shape[2:]) for x in self.v_cache_list]
-        k_stack = torch.stack(self.k_cache_list)
-        v_stack = torch.stack(self.v_cache_list)
+        # [num_blocks, 2, s, b, h] -> [num_blocks, 2s, b, h]
+        k_stack, v_stack = [x.view(x.shape[0], -1, *x.shape[3:]) for x in [k_stack, v_stack]]
         return k_stack, v_stack, q
 
 
@@ -956,7 +970,7 @@ class AttentionWithCp(torch.autograd.Function):
         cp_config.global_attn_outs = [attn_out, softmax_max, softmax_sum, cp_config.rng_states]
         cp_config.q_block_id, cp_config.kv_block_id, kv_block_id_outer = cp_config.rank, cp_config.rank, cp_config.rank
 
-        cache_manager = KVCacheManager(cp_config.cache_policy)
+        cache_manager = KVCacheManager(cp_config.cache_policy, cp_config.cp_size)
         attention_strategy = AttentionStrategyFactory.get_strategy(cp_config.causal, cp_config.is_eod_reset)
 
         for j in range(cp_config.outer_size):
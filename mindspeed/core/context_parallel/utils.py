@@ -1,5 +1,9 @@
 # Copyright (c) 2022-2024, NVIDIA CORPORATION & AFFILIATES. All rights reserved.
 # Copyright (c) 2024, Huawei Technologies Co., Ltd.  All rights reserved.
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
 import torch
 import torch_npu
 import torch.distributed as dist
@@ -23,6 +27,7 @@ COMM_THRESHOLD = 6
 ADAPTIVE_CP_DEFAULT_SHAPE = 1024
 ADAPTIVE_CP_MASK_LIST_SET_BY_USER = None
 ADAPTIVE_CP_GRID_MASK_SET_BY_USER = None
+ADAPTIVE_CP_REMAP_CACHE = None
 
 
 # SBH -> TND
@@ -530,13 +535,81 @@ def find_qo_task(grid_mask, cp_size, cur_comm, next_comm, device_id, is_send_q):
 
 def clear_global_info():
     global CACHED_SEQ, CACHED_GRID_MASK, CACHED_MASK_LIST, CACHED_SCHEDULING, ADAPTIVE_CP_SCHEDULING_INFO
+    global ADAPTIVE_CP_REMAP_CACHE
     CACHED_SEQ, CACHED_GRID_MASK, CACHED_MASK_LIST, CACHED_SCHEDULING, ADAPTIVE_CP_SCHEDULING_INFO = (None, None, [],
                                                                                                       None, None)
+    ADAPTIVE_CP_REMAP_CACHE = None
+
+
+class AdaptiveCpPlan:
+    def __init__(self, opt_seq, opt_scheduling, covers_mask=False):
+        self.opt_seq = opt_seq
+        self.opt_scheduling = opt_scheduling
+        # the cache key hashes the whole attention mask, so the mask lists of the plan can be reused
+        self.covers_mask = covers_mask
+        self.mask_lists = {}
+
+
+class AdaptiveCpRemapCache:
+    """
+    LRU cache of the adaptive cp plans of dynamic attention masks, keyed by a hash of the coarsened mask.
+
+    With async_remap, a missed mask is served by the plan without remapping while the remap runs in a background
+    thread, the remapped plan is used from the next time the same mask comes back. Hits and misses only depend on
+    the sequence of masks, so all the cp ranks pick the same plans.
+    """
+
+    def __init__(self, max_size, async_remap=False):
+        self.max_size = max_size
+        self.async_remap = async_remap
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.executor = None
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        if isinstance(entry, Future):
+            entry = entry.result()
+            self.entries[key] = entry
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def submit(self, key, fn, *args):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='adaptive_cp_remap')
+        self.put(key, self.executor.submit(fn, *args))
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
+def get_adaptive_cp_remap_cache():
+    global ADAPTIVE_CP_REMAP_CACHE
+    if ADAPTIVE_CP_REMAP_CACHE is None:
+        args = get_args()
+        ADAPTIVE_CP_REMAP_CACHE = AdaptiveCpRemapCache(args.adaptive_cp_cache_size, args.adaptive_cp_async_remap)
+    return ADAPTIVE_CP_REMAP_CACHE
+
+
+def adaptive_cp_mask_digest(coarse_mask):
+    return hashlib.blake2b(coarse_mask.cpu().contiguous().numpy().tobytes(), digest_size=16).digest()
 
 
 class AdaptiveCpOps:
     def __init__(self):
         self.ops = AdaptiveCpOpBuilder().load()
+        self.plan = None
 
     def coarsen_attn_mask_cpu(self, attn_mask, sampling_ratio):
         if not attn_mask.is_contiguous():
@@ -569,6 +642,10 @@ class AdaptiveCpOps:
         return optimal_sorted_indices, optimal_grid_mask, optimal_attn_mask, optimal_num_cluster
 
     def adaptive_remap(self, attn_mask, cp_size, truncated_dim=10):
+        coarse_mask, sampling_ratio = self.coarsen_attn_mask_for_remap(attn_mask)
+        return self.remap_coarse_mask(coarse_mask, sampling_ratio, cp_size, truncated_dim)
+
+    def coarsen_attn_mask_for_remap(self, attn_mask):
         args = get_args()
         if attn_mask.dim() != 2 or attn_mask.shape[0] != attn_mask.shape[1]:
             raise RuntimeError("Only 2-dimensional self-attention mask supported in adaptive cp")
@@ -589,7 +666,10 @@ class AdaptiveCpOps:
             else:
                 sampling_ratio = attn_mask.shape[0] // ADAPTIVE_CP_DEFAULT_SHAPE
                 coarse_mask = coarsen_attn_mask_npu(attn_mask, sampling_ratio).cpu()
+        return coarse_mask, sampling_ratio
 
+    def remap_coarse_mask(self, coarse_mask, sampling_ratio, cp_size, truncated_dim=10):
+        args = get_args()
         coarse_mask_np = coarse_mask.to(torch.float16).numpy()
         mean_matrix = np.mean(coarse_mask_np, axis=0)
         centered_matrix = (coarse_mask_np - mean_matrix).astype(float)
@@ -616,6 +696,10 @@ class AdaptiveCpOps:
         if args.attention_mask_on_cpu != (attn_mask.device.type == 'cpu'):
             raise RuntimeError("args.attention_mask_on_cpu does not match the device of set attention mask")
 
+        if args.adaptive_cp_dynamic_attn_mask and args.adaptive_cp_cache_size > 0:
+            self.plan = self.get_cached_adaptive_cp_plan(attn_mask, cp_size)
+            return self.plan.opt_seq, self.plan.opt_scheduling
+
         # 生成重映射后的序列和重排后的gird mask，输出tensor(npu/cpu) opt_grid_mask和list opt_seq
         if not args.adaptive_cp_only_reschedule:
             if args.adaptive_cp_dynamic_attn_mask or CACHED_GRID_MASK is None:
@@ -637,11 +721,43 @@ class AdaptiveCpOps:
 
         return opt_seq, opt_scheduling
 
+    def get_cached_adaptive_cp_plan(self, attn_mask, cp_size):
+        args = get_args()
+        cache = get_adaptive_cp_remap_cache()
+        if args.adaptive_cp_only_reschedule:
+            coarse_mask, sampling_ratio = self.get_grid_mask(attn_mask, cp_size).cpu(), None
+        else:
+            coarse_mask, sampling_ratio = self.coarsen_attn_mask_for_remap(attn_mask)
+        key = (adaptive_cp_mask_digest(coarse_mask), tuple(attn_mask.shape), cp_size)
+        plan = cache.get(key)
+        if plan is not None:
+            return plan
+
+        if args.adaptive_cp_only_reschedule:
+            plan = AdaptiveCpPlan(list(range(attn_mask.shape[0])), adaptive_reschedule_task(coarse_mask, cp_size))
+        elif cache.async_remap:
+            cache.submit(key, self.build_remapped_plan, coarse_mask, sampling_ratio, cp_size)
+            grid_mask = self.get_grid_mask(attn_mask, cp_size).cpu()
+            return AdaptiveCpPlan(list(range(attn_mask.shape[0])), adaptive_reschedule_task(grid_mask, cp_size))
+        else:
+            plan = self.build_remapped_plan(coarse_mask, sampling_ratio, cp_size)
+        cache.put(key, plan)
+        return plan
+
+    def build_remapped_plan(self, coarse_mask, sampling_ratio, cp_size):
+        opt_grid_mask, opt_seq = self.remap_coarse_mask(coarse_mask, sampling_ratio, cp_size)
+        # without coarsening, the key is a hash of the whole attention mask
+        covers_mask = get_args().adaptive_cp_without_coarse
+        return AdaptiveCpPlan(opt_seq, adaptive_reschedule_task(opt_grid_mask, cp_size), covers_mask)
+
     def get_mask_list(self, attn_mask, opt_scheduling, opt_seq, cp_rank, cp_size):
         args = get_args()
         global CACHED_MASK_LIST
         if not args.adaptive_cp_dynamic_attn_mask and len(CACHED_MASK_LIST) > 0:
             return CACHED_MASK_LIST
+        plan = self.plan if self.plan is not None and self.plan.opt_scheduling is opt_scheduling else None
+        if plan is not None and plan.covers_mask and cp_rank in plan.mask_lists:
+            return plan.mask_lists[cp_rank]
         round_num = len(opt_scheduling)
         grid_size = attn_mask.shape[0] // cp_size
         mask_list = []
@@ -673,5 +789,7 @@ class AdaptiveCpOps:
                     mask_list[rnd_idx] = mask_list[rnd_idx].npu(non_blocking=True)
 
         CACHED_MASK_LIST = mask_list
+        if plan is not None and plan.covers_mask:
+            plan.mask_lists[cp_rank] = mask_list
         return mask_list
         
\ No newline at end of file
@@ -34,16 +34,12 @@ def _get_ltor_masks_and_position_ids(
         torch.Tensor: The mask used for loss value during training
 
         torch.Tensor: The position ID's of the token
+
+    The document resets are computed with a cumsum over document starts instead of a
+    Python loop over the EOD indices, so the cost is O(S) without the dense mask.
     """
     seq_length = data.numel()
 
-    if create_attention_mask:
-        attention_mask = torch.tril(
-            torch.ones((seq_length, seq_length), device=data.device)
-        ).unsqueeze(0)
-    else:
-        attention_mask = None
-
     # Loss mask.
     loss_mask = torch.ones(seq_length, dtype=torch.float, device=data.device)
     if eod_mask_loss:
@@ -51,34 +47,31 @@ def _get_ltor_masks_and_position_ids(
 
     # Position ids.
     position_ids = torch.arange(seq_length, dtype=torch.long, device=data.device)
-    # We need to clone as the ids will be modifed based on batch index.
-    if reset_position_ids:
-        position_ids = position_ids.clone()
 
+    # Find indices where EOD token is.
+    eod_index = torch.nonzero(data.view(-1) == eod_token, as_tuple=False).view(-1)
+
+    # Segment id of every token: a new document starts right after each EOD token.
+    segment_ids = None
     if reset_attention_mask:
-        # Find indices where EOD token is.
-        eod_index = position_ids[data == eod_token]
-        # Detach indices from positions if going to modify positions.
+        doc_start = torch.zeros(seq_length, dtype=torch.long, device=data.device)
+        doc_start[eod_index[eod_index < seq_length - 1] + 1] = 1
+        segment_ids = torch.cumsum(doc_start, dim=0)
+        # Reset positions relative to the start of each document.
         if reset_position_ids:
-            eod_index = eod_index.clone()
-
-        # Loop through EOD indices:
-        prev_index = 0
-        for j in range(eod_index.numel()):
-            i = eod_index[j]
-            # Mask attention loss.
-            if reset_attention_mask and attention_mask is not None:
-                attention_mask[0, (i + 1) :, : (i + 1)] = 0
-            # Reset positions.
-            if reset_position_ids:
-                position_ids[(i + 1) :] -= i + 1 - prev_index
-                prev_index = i + 1
-
-    if attention_mask is not None:
-        # Convert attention mask to binary:
-        attention_mask = attention_mask < 0.5
-    
-    seq_length_tensor = torch.tensor([seq_length])
+            segment_start = torch.cat([eod_index.new_zeros(1), eod_index + 1])
+            position_ids = position_ids - segment_start[segment_ids]
+
+    if create_attention_mask:
+        # The dense mask is only materialized when requested, True means masked out.
+        attention_mask = torch.ones((seq_length, seq_length), dtype=torch.bool, device=data.device).tril_()
+        if segment_ids is not None:
+            attention_mask &= segment_ids.unsqueeze(1) == segment_ids.unsqueeze(0)
+        attention_mask = attention_mask.logical_not_().unsqueeze(0)
+    else:
+        attention_mask = None
+
+    seq_length_tensor = torch.tensor([seq_length], device=eod_index.device)
     actual_seq_len = torch.cat([eod_index + 1, seq_length_tensor])
 
     return attention_mask, loss_mask, (position_ids, actual_seq_len)
@@ -60,6 +60,8 @@ class LayerzeroConfig:
     param_init_fn: Optional[str] = None,
     forward_prefetch: bool = True
     limit_all_gathers: bool = True
+    # Budget of the unsharded bytes of in-flight all-gathers, None limits the number of them instead
+    inflight_all_gather_bytes: Optional[int] = None
     offload_grads: bool = False
     ckpt_load_path: str = None
     autocast_input: bool = True
@@ -68,6 +70,9 @@ class LayerzeroConfig:
     def __post_init__(self):
         if self.zero3_size <= 0 or not isinstance(self.zero3_size, int):
             raise ValueError("zero3_size must be a non-negative int value")
+        if self.inflight_all_gather_bytes is not None and (
+                not isinstance(self.inflight_all_gather_bytes, int) or self.inflight_all_gather_bytes <= 0):
+            raise ValueError("inflight_all_gather_bytes must be a positive int value")
 
     @classmethod
     def load_from_yaml(cls, yml_file: str):
@@ -95,6 +100,8 @@ class LayerzeroConfig:
             "backward_prefetch": backward_prefetch,
             "backward_reduce_scatter": backward_rs,
             "forward_prefetch": self.forward_prefetch,
+            "limit_all_gathers": self.limit_all_gathers,
+            "inflight_all_gather_bytes": self.inflight_all_gather_bytes,
             "offload_grads": self.offload_grads
         }
         return kwargs
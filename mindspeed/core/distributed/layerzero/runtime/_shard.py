@@ -4,12 +4,13 @@
 import logging
 
 from enum import auto, Enum
-from typing import Any, no_type_check, Optional, Set, Tuple, TYPE_CHECKING
+from typing import Any, List, no_type_check, Optional, Set, Tuple, TYPE_CHECKING
 
 import torch
 from torch.distributed.utils import _p_assert
 import torch.distributed as dist
 from mindspeed.core.distributed.layerzero.zero3.api import BackwardPrefetch
+from mindspeed.core.distributed.layerzero.zero3._exec_order_utils import _get_unsharded_bytes
 from mindspeed.core.distributed.layerzero.zero3.flat_param import HandleTrainingState
 if TYPE_CHECKING:
     from mindspeed.core.distributed.layerzero.zero3._common_utils import _ZeRO3State
@@ -47,7 +48,7 @@ def _unshard(
 
     unshard_stream.wait_stream(pre_unshard_stream)
     if state.limit_all_gathers:
-        event = state._free_event_queue.dequeue_if_needed()
+        event = state._free_event_queue.dequeue_if_needed(_get_unsharded_bytes(handle))
         if event:
             with torch.profiler.record_function(
                 "LayerZeRO3.rate_limiter"
@@ -72,7 +73,7 @@ def _reshard(
     if state.limit_all_gathers and free_unsharded_flat_param:
         free_event = state._device_handle.Event()
         free_event.record()
-        state._free_event_queue.enqueue(free_event)
+        state._free_event_queue.enqueue(free_event, _get_unsharded_bytes(handle))
     # Since we prefetch entire handles keys at a time, conservatively mark
     # the entire key as no longer prefetched once we free at least one
     if free_unsharded_flat_param:
@@ -175,39 +176,38 @@ def _prefetch_handle(
     """
     if not current_handle:
         return
-    handle = _get_handle_to_prefetch(state, current_handle)
-    if not handle:
-        return
-    # Temporarily emulate the training state while calling `_unshard` to
-    # ensure the correct `as_params` for `_use_unsharded_views()`
-    prev_training_state = handle._training_state
-    if prefetch_mode == _PrefetchMode.BACKWARD:
-        handle._training_state = HandleTrainingState.BACKWARD_PRE
-    elif prefetch_mode == _PrefetchMode.FORWARD:
-        if handle.enter_backward:
-            return
-        handle._training_state = HandleTrainingState.FORWARD
-    else:
-        raise ValueError(f"Invalid prefetch mode on rank {state.zero3_rank}: {prefetch_mode}")
-    # Prefetch the next set of handles without synchronizing to allow
-    # the sync to happen as late as possible to maximize overlap
-    _unshard(state, handle, state._unshard_stream, state._pre_unshard_stream)
-    handle._training_state = prev_training_state
-    handle._prefetched = True
+    for handle in _get_handles_to_prefetch(state, current_handle):
+        # Temporarily emulate the training state while calling `_unshard` to
+        # ensure the correct `as_params` for `_use_unsharded_views()`
+        prev_training_state = handle._training_state
+        if prefetch_mode == _PrefetchMode.BACKWARD:
+            handle._training_state = HandleTrainingState.BACKWARD_PRE
+        elif prefetch_mode == _PrefetchMode.FORWARD:
+            if handle.enter_backward:
+                return
+            handle._training_state = HandleTrainingState.FORWARD
+        else:
+            raise ValueError(f"Invalid prefetch mode on rank {state.zero3_rank}: {prefetch_mode}")
+        # Prefetch the next set of handles without synchronizing to allow
+        # the sync to happen as late as possible to maximize overlap
+        _unshard(state, handle, state._unshard_stream, state._pre_unshard_stream)
+        handle._training_state = prev_training_state
+        handle._prefetched = True
 
 
 @no_type_check
-def _get_handle_to_prefetch(
+def _get_handles_to_prefetch(
     state: "_ZeRO3State",
     current_handle: "FlatParamHandle",
-) -> "FlatParamHandle":
+) -> List["FlatParamHandle"]:
     """
-    Returns a :class:`list` of the handles keys to prefetch for the next
+    Returns a :class:`list` of the handles to prefetch for the next
     module(s), where ``current_handle`` represents the current module.
 
     "Prefetching" refers to running the unshard logic early (without
     synchronization), and the "next" modules depend on the recorded execution
-    order and the current training state.
+    order and the current training state. Without a prefetch bytes budget this
+    is at most one handle, otherwise the depth adapts to the budget.
     """
     training_state = _get_training_state(current_handle)
     valid_training_states = (
@@ -221,7 +221,7 @@ def _get_handle_to_prefetch(
         f"currently in {training_state}",
     )
     eod = state._exec_order_data
-    target_handle: Optional["FlatParamHandle"] = None
+    target_handle_candidates: List["FlatParamHandle"] = []
     if (
         training_state == HandleTrainingState.BACKWARD_PRE
         and state.backward_prefetch == BackwardPrefetch.BACKWARD_PRE
@@ -229,29 +229,17 @@ def _get_handle_to_prefetch(
         training_state == HandleTrainingState.BACKWARD_POST
         and state.backward_prefetch == BackwardPrefetch.BACKWARD_POST
     ):
-        target_handle_candidate = eod.get_handle_to_backward_prefetch(
+        target_handle_candidates = eod.get_handles_to_backward_prefetch(
             current_handle)
-        if (
-            target_handle_candidate
-            # and target_handle_candidate._needs_pre_backward_unshard
-            and not target_handle_candidate._prefetched
-        ):
-            target_handle = target_handle_candidate
-        else:
-            target_handle = None
     elif training_state == HandleTrainingState.FORWARD and state.forward_prefetch:
-        target_handle_candidate = eod.get_handle_to_forward_prefetch(
+        target_handle_candidates = eod.get_handles_to_forward_prefetch(
             current_handle)
-        if (
-            target_handle_candidate
-            # and target_handle_candidate._needs_pre_forward_unshard
-            and not target_handle_candidate._prefetched
-        ):
-            target_handle = target_handle_candidate
-        else:
-            target_handle = None
 
-    return target_handle
+    return [
+        target_handle_candidate
+        for target_handle_candidate in target_handle_candidates
+        if not target_handle_candidate._prefetched
+    ]
 
 
 def _get_training_state(
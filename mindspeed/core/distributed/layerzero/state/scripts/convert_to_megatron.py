@@ -3,12 +3,16 @@
 
 import argparse
 import os
+import tempfile
 from collections import OrderedDict
 
 import torch
 import mindspeed.megatron_adaptor
 from mindspeed.core.distributed.layerzero.state.scripts import layerzero_checkpointer
-from mindspeed.core.distributed.layerzero.state.scripts.layerzero_checkpointer import LayerzeroCheckpoint
+from mindspeed.core.distributed.layerzero.state.scripts.layerzero_checkpointer import (
+    LayerzeroCheckpoint,
+    StreamingLayerzeroCheckpoint,
+)
 ARGS_KEY = 'args'
 
 FINAL_LAYER_NORM_KEY = 'final_layernorm'
@@ -33,6 +37,16 @@ def parse_arguments():
                         help='Convert for release purpose, reset some (progress) counters.')
     parser.add_argument('--ema_model', action='store_true',
                         help='Convert Ema models')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Build full parameters one at a time from memory mapped shards and spill them to '
+                             'disk, so host memory stays bounded by --max_memory_gb')
+    parser.add_argument('--max_memory_gb', default=8.0, type=float,
+                        help='Host memory for pending full parameters in streaming mode, shared by the workers')
+    parser.add_argument('--workers', default=1, type=int,
+                        help='Number of worker processes converting pp stages in parallel in streaming mode')
+    parser.add_argument('--spill_folder', default=None, type=str,
+                        help='Folder for the spilled full parameters in streaming mode, '
+                             'defaults to a temporary folder in the output folder')
     args = parser.parse_args()
     print(f'args = {args}')
     return args
@@ -82,6 +96,19 @@ def _create_latest_file(base_folder, iteration):
         f.write(str(iteration))
 
 
+def _convert(lz_checkpoint, args):
+    iteration = lz_checkpoint.get_iteration()
+    _create_latest_file(args.output_folder, iteration)
+    checkpoint_paths = _create_checkpoint_paths(
+        args.output_folder, iteration, args.target_tp, args.target_pp)
+    for i in range(0, args.target_tp):
+        for j in range(0, args.target_pp):
+            sd = _create_rank_checkpoint(
+                lz_checkpoint, i, j, args.target_tp, args.target_pp, args.for_release)
+            _save_checkpoint(checkpoint_paths[i][j], sd)
+            del sd
+
+
 def main():
     print(f'Convert Layerzero dist Checkpoint to a SINGLE Megatron Checkpoint')
 
@@ -94,16 +121,19 @@ def main():
         from mindspeed.core.distributed.layerzero.state.scripts.layerzero_checkpointer import remove_model_prefix
         remove_model_prefix(args.prefix)
 
-    lz_checkpoint = LayerzeroCheckpoint(args.input_folder)
-    iteration = lz_checkpoint.get_iteration()
-    _create_latest_file(args.output_folder, iteration)
-    checkpoint_paths = _create_checkpoint_paths(
-        args.output_folder, iteration, args.target_tp, args.target_pp)
-    for i in range(0, args.target_tp):
-        for j in range(0, args.target_pp):
-            sd = _create_rank_checkpoint(
-                lz_checkpoint, i, j, args.target_tp, args.target_pp, args.for_release)
-            _save_checkpoint(checkpoint_paths[i][j], sd)
+    if not args.streaming:
+        lz_checkpoint = LayerzeroCheckpoint(args.input_folder)
+        _convert(lz_checkpoint, args)
+        return
+
+    spill_root = args.spill_folder or args.output_folder
+    os.makedirs(spill_root, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=spill_root) as spill_dir:
+        lz_checkpoint = StreamingLayerzeroCheckpoint(
+            args.input_folder, spill_dir, int(args.max_memory_gb * 2 ** 30), args.workers)
+        _convert(lz_checkpoint, args)
+        # drop the memory mapped spill files before they are removed
+        del lz_checkpoint
 
 
 if __name__ == "__main__":
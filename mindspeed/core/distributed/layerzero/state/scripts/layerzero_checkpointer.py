@@ -2,6 +2,7 @@
 
 import os
 import re
+import multiprocessing
 from typing import Dict, List, Tuple, Any
 from dataclasses import dataclass
 from collections import OrderedDict, defaultdict
@@ -24,6 +25,7 @@ PP_LAYERS_KEY = "layers_per_pp"
 
 EMA_MODEL_SD_KEY = "ema_model"
 MODEL_PREFIX = None
+SPILL_FILE_PATTERN = "pp_{:03d}_{:05d}.pt"
 
 
 def remove_model_prefix(prefix):
@@ -52,8 +54,11 @@ class ShardStateDict:
         self._init_metadata()
 
     def _init_metadata(self):
-        state_dict = torch.load(self.filename, map_location='cpu')
+        # tensors stay memory mapped on disk, only the metadata is read into host memory
+        state_dict = torch.load(self.filename, map_location='cpu', mmap=True)
 
+        self.iteration = state_dict.get(ITERATION_KEY, 0)
+        self.args = state_dict.get(ARGS_KEY, None)
         self.parallel_info = state_dict[PARALLE_STATE_KAY]
         self._param_key_to_shard_info = state_dict[LOCAL_NAME_TO_FQN_KEY]
         self.model_state_dict = state_dict[MODEL_SD_KEY]
@@ -92,8 +97,8 @@ class LayerzeroCheckpoint(object):
         self.ckpt_dir = ckpt_dir
         self.file_list = self._get_files_by_key(ckpt_dir, MODEL_FILE_KEY)
         self.global_state = {}
-        self._build_global_state()
         self.state_dicts = [ShardStateDict(f) for f in self.file_list]
+        self._build_global_state()
         self.pp_degree = self.state_dicts[0].pp_degree
         self.tp_degree = self.state_dicts[0].tp_degree
         self.layer_state_dicts = [{} for _ in range(self.num_layers)]
@@ -107,9 +112,8 @@ class LayerzeroCheckpoint(object):
         pass
 
     def _build_global_state(self):
-        sd = torch.load(self.file_list[0], map_location=torch.device('cpu'))
-        self.global_state[ITERATION_KEY] = sd.get(ITERATION_KEY, 0)
-        self.global_state[ARGS_KEY] = sd.get(ARGS_KEY, None)
+        self.global_state[ITERATION_KEY] = self.state_dicts[0].iteration
+        self.global_state[ARGS_KEY] = self.state_dicts[0].args
         args = self.get_args()
         self.global_state[NUM_LAYERS_KEY] = args.num_layers
         self.global_state[PP_LAYERS_KEY] = args.num_layers // args.pipeline_model_parallel_size
@@ -161,40 +165,28 @@ class LayerzeroCheckpoint(object):
 
         output: A single full_state_dict for this pp stage. (TP=1)
         '''
-        tp_zero_index = get_TP_unshard_idx_same_pp(state_dicts)
         non_zero_keys = set()
-        for key, param in state_dicts[0].model_state_dict.items():
-            fqn = clean_tensor_name(key)
-            shard_info = state_dicts[0]._get_shard_info_by_fqn(fqn)
+        for key, fqn, shard_info, full_tensor in _iter_full_tensors(state_dicts, self.tp_degree):
             if shard_info is None:
-                full_tensor = param
                 non_zero_keys.add(fqn)
-            else:
-                shape = shard_info.shape
-                tensor_model_parallel = shard_info.tensor_model_parallel
-                partition_dim = shard_info.partition_dim
-
-                shard_lists = _get_shard_list_by_param_key(state_dicts, key)
-                if self.tp_degree > 1 and tensor_model_parallel:
-                    full_tensor = zero_tp_to_full_tensor(
-                        shard_lists, tp_zero_index, shape, partition_dim, self.tp_degree)
-                else:
-                    full_tensor = zero_to_full_tensor(shard_lists, shape)
-            layer_num = _get_layer_num(fqn)
-            if layer_num is not None:
-                global_layer_num = self.local_to_global_layer_num(
-                    layer_num, pp_rank)
-                self.layer_state_dicts[global_layer_num][key] = full_tensor
-            else:
-                if pp_rank == 0:
-                    self.pre_process_sd[fqn] = full_tensor
-                if pp_rank == self.pp_degree - 1:
-                    self.post_process_sd[fqn] = full_tensor
-                if not (pp_rank == 0) or (pp_rank == self.pp_degree - 1):
-                    self.other_sd[fqn] = full_tensor
+            self._add_full_tensor(pp_rank, key, fqn, full_tensor)
         print(f"{non_zero_keys=}")
         return
 
+    def _add_full_tensor(self, pp_rank: int, key: str, fqn: str, full_tensor: torch.Tensor) -> None:
+        layer_num = _get_layer_num(fqn)
+        if layer_num is not None:
+            global_layer_num = self.local_to_global_layer_num(
+                layer_num, pp_rank)
+            self.layer_state_dicts[global_layer_num][key] = full_tensor
+        else:
+            if pp_rank == 0:
+                self.pre_process_sd[fqn] = full_tensor
+            if pp_rank == self.pp_degree - 1:
+                self.post_process_sd[fqn] = full_tensor
+            if not (pp_rank == 0) or (pp_rank == self.pp_degree - 1):
+                self.other_sd[fqn] = full_tensor
+
     def local_to_global_layer_num(self, layer_num: int, pp_rank: int):
         return layer_num + pp_rank * self.pp_layers_per_rank
 
@@ -267,6 +259,50 @@ class LayerzeroCheckpoint(object):
         return state_dict
 
 
+
+class StreamingLayerzeroCheckpoint(LayerzeroCheckpoint):
+    '''
+    A LayerzeroCheckpoint that never holds the whole model in host memory.
+
+    Shards are memory mapped and full parameters are built one at a time by one worker process per pp stage.
+    Each worker keeps at most max_memory_bytes / num_workers of full parameters in memory before writing them
+    to spill files in spill_dir, the full state dicts then hold memory mapped tensors of the spill files, so
+    saving the rank checkpoints streams them from disk. The rank checkpoints are byte-identical to the ones of
+    LayerzeroCheckpoint.
+    '''
+
+    def __init__(self, ckpt_dir, spill_dir, max_memory_bytes, num_workers=1):
+        self.spill_dir = spill_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.num_workers = num_workers
+        super().__init__(ckpt_dir)
+
+    def convert_to_full_state_dict(self) -> Dict[str, Any]:
+        same_pp_groups = _get_same_pp_ranks(self.state_dicts)
+        num_workers = max(min(self.num_workers, len(same_pp_groups)), 1)
+        memory_budget = self.max_memory_bytes // num_workers
+        tasks = [(pp_rank, [sd.filename for sd in pp_groups], self.tp_degree, self.spill_dir, memory_budget,
+                  MODEL_SD_KEY) for pp_rank, pp_groups in same_pp_groups.items()]
+        os.makedirs(self.spill_dir, exist_ok=True)
+        if num_workers > 1:
+            with multiprocessing.get_context('spawn').Pool(num_workers) as pool:
+                stage_entries = pool.starmap(_spill_pp_stage, tasks)
+        else:
+            stage_entries = [_spill_pp_stage(*task) for task in tasks]
+
+        # the stages are added in the same order as LayerzeroCheckpoint, shared non layer keys resolve the same way
+        for (pp_rank, pp_groups), entries in zip(same_pp_groups.items(), stage_entries):
+            spill_files = {}
+            for key, fqn, spill_file in entries:
+                if spill_file is None:
+                    full_tensor = pp_groups[0]._get_param_by_param_key(key)
+                else:
+                    if spill_file not in spill_files:
+                        spill_files[spill_file] = torch.load(spill_file, map_location='cpu', mmap=True)
+                    full_tensor = spill_files[spill_file][key]
+                self._add_full_tensor(pp_rank, key, fqn, full_tensor)
+        return
+
 def _get_layer_num(key: str) -> int:
     match = PP_LAYER_PATTERN.match(key)
 
@@ -403,3 +439,66 @@ def get_TP_unshard_idx_same_pp(state_dicts: List[ShardStateDict]) -> List[int]:
     sorted_list = sorted(tp_global_index, key=lambda x: (x[1], x[2]))
     sorted_index = [x[0] for x in sorted_list]
     return sorted_index
+
+
+def _iter_full_tensors(state_dicts: List[ShardStateDict], tp_degree: int):
+    '''
+    Yield (key, fqn, shard_info, full_tensor) of every parameter of a pp stage, one parameter at a time.
+
+    Input: sorted state_dict based on global rank and belongs to same pp stage
+    '''
+    tp_zero_index = get_TP_unshard_idx_same_pp(state_dicts)
+    for key, param in state_dicts[0].model_state_dict.items():
+        fqn = clean_tensor_name(key)
+        shard_info = state_dicts[0]._get_shard_info_by_fqn(fqn)
+        if shard_info is None:
+            full_tensor = param
+        else:
+            shape = shard_info.shape
+            tensor_model_parallel = shard_info.tensor_model_parallel
+            partition_dim = shard_info.partition_dim
+
+            shard_lists = _get_shard_list_by_param_key(state_dicts, key)
+            if tp_degree > 1 and tensor_model_parallel:
+                full_tensor = zero_tp_to_full_tensor(
+                    shard_lists, tp_zero_index, shape, partition_dim, tp_degree)
+            else:
+                full_tensor = zero_to_full_tensor(shard_lists, shape)
+        yield key, fqn, shard_info, full_tensor
+
+
+def _spill_pp_stage(pp_rank: int, filenames: List[str], tp_degree: int, spill_dir: str, memory_budget: int,
+                    model_sd_key: str) -> List[Tuple[str, str, str]]:
+    '''
+    Build the full parameters of a pp stage and write them to spill files once memory_budget bytes are pending.
+
+    Returns (key, fqn, spill_file) of every parameter in state dict order, spill_file is None for the parameters
+    not managed by Layerzero, which are read from the shard of the lowest global rank.
+    '''
+    global MODEL_SD_KEY
+    MODEL_SD_KEY = model_sd_key
+    state_dicts = [ShardStateDict(f) for f in filenames]
+    sort_shard_dict_by_global_rank(state_dicts)
+
+    entries = []
+    non_zero_keys = set()
+    pending, pending_bytes = {}, 0
+    num_spill_files = 0
+    spill_file = os.path.join(spill_dir, SPILL_FILE_PATTERN.format(pp_rank, num_spill_files))
+    for key, fqn, shard_info, full_tensor in _iter_full_tensors(state_dicts, tp_degree):
+        if shard_info is None:
+            non_zero_keys.add(fqn)
+            entries.append((key, fqn, None))
+            continue
+        pending[key] = full_tensor
+        pending_bytes += full_tensor.numel() * full_tensor.element_size()
+        entries.append((key, fqn, spill_file))
+        if pending_bytes >= memory_budget:
+            torch.save(pending, spill_file)
+            pending, pending_bytes = {}, 0
+            num_spill_files += 1
+            spill_file = os.path.join(spill_dir, SPILL_FILE_PATTERN.format(pp_rank, num_spill_files))
+    if pending:
+        torch.save(pending, spill_file)
+    print(f"{pp_rank=} {non_zero_keys=}")
+    return entries
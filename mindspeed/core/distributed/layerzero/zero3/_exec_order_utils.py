@@ -5,6 +5,7 @@ import logging
 from enum import auto, Enum
 from typing import Dict, List, Optional, Tuple, Union
 
+import torch
 import torch.distributed as dist
 import torch.nn as nn
 from mindspeed.core.distributed.layerzero.zero3.flat_param import FlatParamHandle
@@ -22,12 +23,22 @@ class _ExecOrderWarnStatus(Enum):
     WARNED = auto()  # deviated in a previous iteration
 
 
+def _get_unsharded_bytes(handle: FlatParamHandle) -> int:
+    """Returns the bytes of the padded unsharded flat param of ``handle``, cached on the handle."""
+    if handle._unsharded_bytes is None:
+        flat_param = handle.flat_param
+        element_size = torch.empty((), dtype=handle._fwd_bwd_param_dtype).element_size()
+        handle._unsharded_bytes = flat_param._padded_unsharded_size.numel() * element_size
+    return handle._unsharded_bytes
+
+
 class _ExecOrderData:
 
     def __init__(
         self,
         backward_prefetch_limit: int,
         forward_prefetch_limit: int,
+        prefetch_bytes_budget: Optional[int] = None,
     ) -> None:
         # Tracks the (static) pre-forward order for execution order validation
         # and forward prefetching
@@ -40,6 +51,9 @@ class _ExecOrderData:
         # single module
         self._backward_prefetch_limit = backward_prefetch_limit
         self._forward_prefetch_limit = forward_prefetch_limit
+        # If set, the prefetch depth adapts to the unsharded bytes of the next
+        # handles instead of the fixed limits
+        self._prefetch_bytes_budget = prefetch_bytes_budget
 
         self.process_group: Optional[dist.ProcessGroup] = None
         self.world_size: Optional[int] = None
@@ -111,21 +125,66 @@ class _ExecOrderData:
             target_index += 1
         return target_handle
 
-    def get_handle_to_post_backward(
+    def get_handles_to_backward_prefetch(
+        self,
+        current_handle: FlatParamHandle,
+    ) -> List[FlatParamHandle]:
+        """
+        Returns the handles to backward prefetch given the current handle. With
+        a bytes budget, the depth is the number of previous handles in the
+        post-forward order whose unsharded bytes fit in the budget together
+        with the current handle (at least one), otherwise it is the handle
+        given by the backward prefetch limit.
+        """
+        if self._prefetch_bytes_budget is None:
+            target_handle = self.get_handle_to_backward_prefetch(current_handle)
+            return [target_handle] if target_handle is not None else []
+        current_index = current_handle._post_forward_index
+        if current_index is None:
+            return []
+        return self._get_handles_within_budget(
+            current_handle,
+            self.handles_post_forward_order,
+            range(current_index - 1, -1, -1),
+        )
+
+    def get_handles_to_forward_prefetch(
         self,
         current_handle: FlatParamHandle,
     ) -> List[FlatParamHandle]:
+        """
+        Returns the handles to forward prefetch given the current handle, the
+        depth adapts to the bytes budget like the backward prefetch.
+        """
+        if self._prefetch_bytes_budget is None:
+            target_handle = self.get_handle_to_forward_prefetch(current_handle)
+            return [target_handle] if target_handle is not None else []
         current_index = current_handle._pre_forward_order_index
         if current_index is None:
             return []
-        target_index = current_index + 1
-        target_handle: List[FlatParamHandle] = []
-        for _ in range(len(self.handles_pre_forward_order)):
-            if target_index >= len(self.handles_pre_forward_order):
+        return self._get_handles_within_budget(
+            current_handle,
+            self.handles_pre_forward_order,
+            range(current_index + 1, len(self.handles_pre_forward_order)),
+        )
+
+    def _get_handles_within_budget(
+        self,
+        current_handle: FlatParamHandle,
+        handles: List[Optional[FlatParamHandle]],
+        indices: range,
+    ) -> List[FlatParamHandle]:
+        target_handles: List[FlatParamHandle] = []
+        total_bytes = _get_unsharded_bytes(current_handle)
+        for index in indices:
+            handle = handles[index]
+            if handle is None:
+                continue
+            total_bytes += _get_unsharded_bytes(handle)
+            if target_handles and total_bytes > self._prefetch_bytes_budget:
                 break
-            target_handle.append(self.handles_pre_forward_order[target_index])
-            target_index += 1
-        return target_handle
+            target_handles.append(handle)
+        return target_handles
 
     def record_post_forward(self, handle: Optional[FlatParamHandle]) -> None:
         if not handle or handle._post_forward_index is not None:
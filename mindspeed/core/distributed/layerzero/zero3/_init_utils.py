@@ -216,7 +216,8 @@ def _init_core_state(
     limit_all_gathers: bool,
     backward_prefetch_limit: int,
     forward_prefetch_limit: int,
-    offload_grads: bool = False
+    offload_grads: bool = False,
+    inflight_all_gather_bytes: Optional[int] = None,
 ) -> _ZeRO3State:
     # We clamp the strategy to `NO_SHARD` for world size of 1 since they are
     # currently functionally equivalent. This may change if/when we integrate
@@ -230,7 +231,7 @@ def _init_core_state(
     state.limit_all_gathers = limit_all_gathers
     state.training_state = TrainingState.IDLE
     state._is_root = None
-    state._free_event_queue = _FreeEventQueue()
+    state._free_event_queue = _FreeEventQueue(max_inflight_bytes=inflight_all_gather_bytes)
     state._rs_event_queue = _FreeEventQueue()
     state._offload_event_queue = _FreeEventQueue()
     state._offload_grads = offload_grads
@@ -239,6 +240,7 @@ def _init_core_state(
     state._exec_order_data = exec_order_utils._ExecOrderData(
         backward_prefetch_limit,
         forward_prefetch_limit,
+        inflight_all_gather_bytes,
     )
     #! add support for zero1 events
     # Mapping from fully sharded module to the handles it is responsible to
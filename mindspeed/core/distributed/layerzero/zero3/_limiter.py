@@ -1,27 +1,53 @@
 # Copyright (c) 2024, Huawei Technologies Co., Ltd.  All rights reserved.
 
 import collections
+from typing import Optional
 
 
 class _FreeEventQueue:
+    """
+    Queue of the free events of the unsharded flat params, limits the all-gathers that run ahead of the frees.
+    Without ``max_inflight_bytes`` the number of queued events is limited to ``num_inflights``. Otherwise the
+    unsharded bytes of the all-gathers whose free event has not been waited for, plus the bytes of the next
+    all-gather, are limited to ``max_inflight_bytes``.
+    """
 
-    def __init__(self, num_inflights: int = 3) -> None:
+    def __init__(self, num_inflights: int = 3, max_inflight_bytes: Optional[int] = None) -> None:
         self._queue = collections.deque()
+        self._queue_bytes = collections.deque()
         self._max_num_inflight_all_gathers = num_inflights
+        self._max_inflight_bytes = max_inflight_bytes
+        self._inflight_bytes = 0
 
-    def enqueue(self, free_event) -> None:
-        """Enqueues a free event."""
+    @property
+    def inflight_bytes(self) -> int:
+        return self._inflight_bytes
+
+    def enqueue(self, free_event, nbytes: int = 0) -> None:
+        """Enqueues a free event, ``nbytes`` is the size of the freed unsharded flat param."""
         self._queue.append(free_event)
+        self._queue_bytes.append(nbytes)
 
-    def dequeue_if_needed(self):
-        """Dequeues a single event if the limit is reached."""
-        if len(self._queue) >= self._max_num_inflight_all_gathers:
-            return self._dequeue()
-        return None
+    def dequeue_if_needed(self, nbytes: int = 0):
+        """
+        Dequeues the events to wait for before an all-gather of ``nbytes`` if the limit is reached, and counts
+        the all-gather as in flight. The events are recorded in order on the same stream, so only the last
+        dequeued one is returned.
+        """
+        event = None
+        if self._max_inflight_bytes is None:
+            if len(self._queue) >= self._max_num_inflight_all_gathers:
+                event = self._dequeue()
+        else:
+            while self._queue and self._inflight_bytes + nbytes > self._max_inflight_bytes:
+                event = self._dequeue()
+        self._inflight_bytes += nbytes
+        return event
 
     def _dequeue(self):
         """Dequeues a free event if possible."""
         if self._queue:
             event = self._queue.popleft()
+            self._inflight_bytes -= self._queue_bytes.popleft()
             return event
         return None
@@ -343,6 +343,8 @@ class FlatParamHandle:
         self._handle_index: Optional[int] = None
         # Index in handles_to_pre_forward_order
         self._pre_forward_order_index: Optional[int] = None
+        # Bytes of the padded unsharded flat param, set on first use by the all-gather limiter
+        self._unsharded_bytes: Optional[int] = None
         # Index in `handles_post_forward_order`
         self._post_forward_index: Optional[int] = None
         # Used for guarding against mistargeted forward prefetches
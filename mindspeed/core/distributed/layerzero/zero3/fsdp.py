@@ -89,6 +89,7 @@ class LayerZeRO3(nn.Module, _ZeRO3State):
         device_id: Optional[Union[int, torch.device]] = None,
         forward_prefetch: bool = True,
         limit_all_gathers: bool = True,
+        inflight_all_gather_bytes: Optional[int] = None,
         ignored_states: Union[
             Optional[Iterable[torch.nn.Parameter]
                      ], Optional[Iterable[torch.nn.Module]]
@@ -114,6 +115,7 @@ class LayerZeRO3(nn.Module, _ZeRO3State):
                 "device_id": device_id,
                 "forward_prefetch": forward_prefetch,
                 "limit_all_gathers": limit_all_gathers,
+                "inflight_all_gather_bytes": inflight_all_gather_bytes,
                 "ignored_states": self._ignored_params,
             }
             _auto_wrap(
@@ -134,6 +136,7 @@ class LayerZeRO3(nn.Module, _ZeRO3State):
             backward_prefetch_limit,
             forward_prefetch_limit,
             offload_grads,
+            inflight_all_gather_bytes,
         )
         _init_runtime_state(self)
 
@@ -7,6 +7,7 @@ import torch.nn
 
 from megatron.training import print_rank_0
 from megatron.core.num_microbatches_calculator import get_num_microbatches
+from mindspeed.core.memory.pinned_buffer_pool import get_pinned_buffer_pool
 from .adaptive_memory_profiling import AdaptiveMemoryProfiling, RecomputeHook
 from .adaptive_memory_solver import AdaptMemGraphSolver
 from .adaptive_memory_policy import AdaptMemPolicyManager
@@ -119,6 +120,7 @@ class AdaptiveMemoryOpt(metaclass=SingletonBase):
 
                 return result
             finally:
+                get_pinned_buffer_pool().end_step()
                 AdaptiveStepMgr().incr_step()           # incr step num after step_func and adapting
 
         return custom_adapt_mem_step
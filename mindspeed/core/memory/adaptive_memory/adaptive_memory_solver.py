@@ -269,38 +269,6 @@ class AdaptMemGraphSolver(metaclass=SingletonBase):
             self.best_layer_policy_comb = broadcast_obj(self.best_layer_policy_comb)
         return adapt_mem_policy_list
 
-    def get_max_goods_value(self, idx, ans, device_memory):
-        i, j, k = idx
-        pre_step_ans = ans[i - 1][j - k]
-        if k == 0:
-            return deepcopy(pre_step_ans)
-
-        goods_value = ans[i][j]
-        # calculate memory
-        memory = pre_step_ans.memory
-        pre_layer_num = len(pre_step_ans.polices)
-        for index in range(k):
-            cur_layer_index = pre_layer_num + index
-            cur_layer_chunk_rank = cur_layer_index // self.get_layer_num_per_chunk()
-            cur_layer_bs = self.num_warmup_bs_in_chunks[cur_layer_chunk_rank]
-            cur_layer_memory_cost = cur_layer_bs * AdaptMemPolicyManager().policy_combinations[i].memory
-            memory += cur_layer_memory_cost
-        # calculate cost
-        comb_time = pre_step_ans.time + k * AdaptMemPolicyManager().policy_combinations[i].time
-        # calculate device_memory
-        if pre_step_ans.time == sys.maxsize:
-            comb_time = k * AdaptMemPolicyManager().policy_combinations[i].time
-        max_free_memory = max(device_memory - self.static_memory, 0)
-
-        if max_free_memory >= memory and comb_time <= goods_value.time and (len(pre_step_ans.polices) + k) == j:
-            goods_value.memory = memory
-            goods_value.time = comb_time
-            goods_value.polices.clear()
-            goods_value.polices.extend(pre_step_ans.polices)
-            goods_value.polices.extend(AdaptMemPolicyManager().policy_combinations[i] for _ in range(k))
-
-        return goods_value
-
     def add_func_locations(self, layer_idx, func_name, action):
         self.func_locations.append(FuncLocation(layer_idx, func_name, action))
 
@@ -338,7 +306,7 @@ class AdaptMemGraphSolver(metaclass=SingletonBase):
             raise AssertionError("get_func_action error.")
         return all_same_func_loc[global_layer_idx].action
 
-    def get_mem_layer_policy(self, combination_num, layer_num, ans):
+    def get_mem_layer_policy(self, layer_num, layers_best):
         apm = AdaptMemPolicyManager()
         layer_full_recompute_memory = 0
         for index in range(layer_num):
@@ -351,15 +319,15 @@ class AdaptMemGraphSolver(metaclass=SingletonBase):
 
         self.best_layer_policy_comb = [apm.full_recompute_comb for _ in range(layer_num)]
 
-        size = layer_num - len(ans[combination_num][layer_num].polices)
-        pre_layer_num = len(ans[combination_num][layer_num].polices)
-        memory = ans[combination_num][layer_num].memory
+        size = layer_num - len(layers_best.polices)
+        pre_layer_num = len(layers_best.polices)
+        memory = layers_best.memory
         for index in range(size):
             cur_layer_index = pre_layer_num + index
             cur_layer_chunk_rank = cur_layer_index // self.get_layer_num_per_chunk()
             memory += self.num_warmup_bs_in_chunks[cur_layer_chunk_rank] * apm.full_recompute_comb.memory
-        comb_time = ans[combination_num][layer_num].time + size * apm.full_recompute_comb.time
-        best_policy_comb = deepcopy(ans[combination_num][layer_num].polices)
+        comb_time = layers_best.time + size * apm.full_recompute_comb.time
+        best_policy_comb = deepcopy(layers_best.polices)
         best_policy_comb.extend(size * [apm.full_recompute_comb])
 
         if comb_time < layer_full_recompute_time:
@@ -391,24 +359,77 @@ class AdaptMemGraphSolver(metaclass=SingletonBase):
             AdaptMemPolicyManager().policy_combinations.insert(0, None)
         print_rank_0(f"combination_num:{combination_num}")
 
-        # init ans
-        def default_policy():
-            return AdaptiveModelMemPolicy("normal", [])
-
-        ans = [[default_policy() for _ in range(self.get_pp_layer_num() + 1)] for _ in range(combination_num + 1)]
-
-        # find max goods value
-        for i in range(1, combination_num + 1):
-            for j in range(self.get_pp_layer_num() + 1):
-                if i >= 2:
-                    ans[i - 2][j].polices.clear()
-                for k in range(j + 1):
-                    ans[i][j] = self.get_max_goods_value([i, j, k], ans, device_memory)
-        self.get_mem_layer_policy(combination_num, self.get_pp_layer_num(), ans)
+        layer_num = self.get_pp_layer_num()
+        # warmup micro batches of the chunk each layer belongs to.
+        layers_bs = [self.num_warmup_bs_in_chunks[index // self.get_layer_num_per_chunk()]
+                     for index in range(layer_num)]
+        max_free_memory = max(device_memory - self.static_memory, 0)
+        layers_best = self.solve_knapsack(AdaptMemPolicyManager().policy_combinations, combination_num,
+                                          layers_bs, max_free_memory)
+        self.get_mem_layer_policy(layer_num, layers_best)
         end_time = time.time()
         execution_time = end_time - start_time
         print_rank_0(f"The execution time of the knapsack algorithm is {execution_time} seconds.")
 
+    @staticmethod
+    def solve_knapsack(policy_combinations, combination_num, layers_bs, max_free_memory):
+        """Knapsack of policy combinations over layers, returns the best model policy for all layers.
+
+        Row i only depends on row i - 1, so every (j layers, k layers of combination i) cell of a row is
+        evaluated at once on arrays, and only the chosen k of each cell is kept to rebuild the policies.
+        """
+        layer_num = len(layers_bs)
+        best = AdaptiveModelMemPolicy("normal", [])
+        if layer_num == 0:
+            return best
+        j_idx = np.arange(layer_num + 1)[:, None]
+        k_idx = np.arange(1, layer_num + 1)[None, :]
+        valid = j_idx >= k_idx
+        pre = np.where(valid, j_idx - k_idx, 0)
+        # pad one layer so that pre + s of invalid cells stays in range.
+        layers_bs = np.array(list(layers_bs) + [0])
+
+        memory = np.zeros(layer_num + 1)
+        comb_time = np.full(layer_num + 1, np.inf)
+        layer_count = np.zeros(layer_num + 1, dtype=np.int64)
+        choice = np.zeros((combination_num + 1, layer_num + 1), dtype=np.int64)
+        for i in range(1, combination_num + 1):
+            policy = policy_combinations[i]
+            layers_memory = layers_bs * policy.memory
+            # add the k layers one by one, in the same order as a per-layer loop, to get the same sums.
+            cand_memory = memory[pre]
+            for s in range(layer_num):
+                cand_memory[:, s:] += layers_memory[np.minimum(pre[:, s:] + s, layer_num)]
+            pre_time = comb_time[pre]
+            cand_time = np.where(pre_time == np.inf, 0, pre_time) + k_idx * policy.time
+            feasible = valid & (layer_count[pre] + k_idx == j_idx) & (max_free_memory >= cand_memory)
+            best_time = np.where(feasible, cand_time, np.inf).min(axis=1)
+            is_best = feasible & (cand_time == best_time[:, None])
+            # the largest k wins when times are equal.
+            best_k = layer_num - np.argmax(is_best[:, ::-1], axis=1)
+            rows = np.flatnonzero(is_best.any(axis=1) & (best_time <= comb_time))
+
+            memory = memory.copy()
+            comb_time = comb_time.copy()
+            layer_count = layer_count.copy()
+            memory[rows] = cand_memory[rows, best_k[rows] - 1]
+            comb_time[rows] = best_time[rows]
+            layer_count[rows] = rows
+            choice[i, rows] = best_k[rows]
+
+        segments = []
+        j = layer_num
+        for i in range(combination_num, 0, -1):
+            if choice[i, j] > 0:
+                segments.append((i, choice[i, j]))
+                j -= choice[i, j]
+        for i, k in reversed(segments):
+            best.polices.extend(policy_combinations[i] for _ in range(k))
+        best.memory = memory[layer_num].item()
+        if comb_time[layer_num] != np.inf:
+            best.time = comb_time[layer_num].item()
+        return best
+
     def get_adapt_mem_policy_list(self):
         adapt_mem_policy_list = []
         apm = AdaptMemPolicyManager()
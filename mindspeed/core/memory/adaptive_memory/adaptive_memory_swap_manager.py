@@ -5,7 +5,9 @@ import torch
 import torch_npu
 from numpy import mean
 from torch.cuda import Event
-from megatron.training import print_rank_0
+from megatron.training import print_rank_0, get_args
+
+from mindspeed.core.memory.pinned_buffer_pool import copy_storage_, get_pinned_buffer_pool
 
 from .adaptive_memory_tool import SingletonBase, CpuTensorCache
 from .adaptive_memory_tool import FuncLocationMgr, broadcast_obj
@@ -54,7 +56,7 @@ class SwappableTensor:
                 if self.is_slice_tensor:
                     self.tensor_cpu.copy_(self.tensor, non_blocking=self.is_prefetch)
                 else:
-                    self.tensor_cpu.storage().copy_(self.tensor.storage(), non_blocking=self.is_prefetch)
+                    copy_storage_(self.tensor_cpu, self.tensor, non_blocking=self.is_prefetch)
                 self.stat = SwappableTensorStat.D2H
 
     def change_stat_to_host(self):
@@ -70,7 +72,7 @@ class SwappableTensor:
                 if self.is_slice_tensor:
                     self.tensor.copy_(self.tensor_cpu, non_blocking=self.is_prefetch)
                 else:
-                    self.tensor.storage().copy_(self.tensor_cpu.storage(), non_blocking=self.is_prefetch)
+                    copy_storage_(self.tensor, self.tensor_cpu, non_blocking=self.is_prefetch)
                 if self.h2d_event is not None:
                     self.h2d_event.record()
                 self.stat = SwappableTensorStat.H2D
@@ -103,6 +105,9 @@ class SwapManager(metaclass=SingletonBase):
 
         self.prefetch_stream = torch_npu.npu.Stream(device=torch.npu.current_device())
         self.oom_rescue_stream = torch_npu.npu.current_stream()
+        max_cached_gb = getattr(get_args(), 'swap_pinned_pool_max_cached_gb', None)
+        if max_cached_gb is not None:
+            get_pinned_buffer_pool().set_max_cached_bytes(int(max_cached_gb * 1024 ** 3))
 
     def get_mean_wait_ms(self, event_pairs):
         time_list = []
@@ -278,7 +283,7 @@ class SwapManager(metaclass=SingletonBase):
             return wrapped_tensor.cap_tensor
         storage_tensor = torch.tensor([], dtype=wrapped_tensor.tensor.dtype, device=wrapped_tensor.tensor.device).set_(wrapped_tensor.tensor.storage())
         wrapped_storage_tensor = SwappableTensor(storage_tensor, self.oom_rescue_stream, is_prefetch=False)
-        wrapped_storage_tensor.tensor_cpu = torch.empty(storage_tensor.shape, dtype=storage_tensor.dtype, pin_memory=True, device='cpu')
+        wrapped_storage_tensor.tensor_cpu = get_pinned_buffer_pool().acquire(storage_tensor.shape, storage_tensor.dtype)
         return wrapped_storage_tensor
 
 
@@ -312,8 +317,11 @@ class SwapManager(metaclass=SingletonBase):
         share_storage_tensors = wrapped_tensor.bro_tensors
         wrapped_tensor.cap_tensor.launch_h2d()
         wrapped_tensor.cap_tensor.stat = SwappableTensorStat.DEVICE
+        # the oom rescue copies are synchronous, the host buffer is free again
+        get_pinned_buffer_pool().release(wrapped_tensor.cap_tensor.tensor_cpu)
         for wt in share_storage_tensors:
             wt.stat = SwappableTensorStat.DEVICE
+            wt.cap_tensor = None
             self.oom_rescue_host_tensors.pop(wt)
             self.oom_rescue_device_tensors[wt] = None
 
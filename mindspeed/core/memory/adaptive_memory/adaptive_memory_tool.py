@@ -1,12 +1,13 @@
 # Copyright (c) Huawei Technologies Co., Ltd. 2024. All rights reserved.
 
 from enum import Enum, IntEnum
-from typing import Set, Dict
 import pickle
 import torch
 from megatron.core import parallel_state as ps
 from megatron.training import print_rank_0
 
+from mindspeed.core.memory.pinned_buffer_pool import get_pinned_buffer_pool
+
 BYTES_PER_MB = 1024 * 1024
 
 
@@ -172,20 +173,13 @@ class FuncLocation:
 
 
 class CpuTensorCache(metaclass=SingletonBase):
-    def __init__(self):
-        self.shape_to_tensor_list_map: Dict[(torch.Size, torch.dtype), Set[torch.Tensor]] = {}
+    """Host tensors of the swapped activations, taken from the pinned buffer pool shared with swap attention."""
 
     def get_cpu_tensor(self, shape: torch.Size, dtype: torch.dtype):
-        tensor_set = self.shape_to_tensor_list_map.setdefault((shape, dtype), set())
-        if len(tensor_set) != 0:
-            cpu_tensor = tensor_set.pop()
-        else:
-            cpu_tensor = torch.empty(shape, dtype=dtype, pin_memory=True, device='cpu')
-        return cpu_tensor
+        return get_pinned_buffer_pool().acquire(shape, dtype)
 
     def release_cpu_tensor(self, cpu_tensor):
-        tensor_set = self.shape_to_tensor_list_map.setdefault((cpu_tensor.shape, cpu_tensor.dtype), set())
-        tensor_set.add(cpu_tensor)
+        get_pinned_buffer_pool().release(cpu_tensor)
 
 
 def broadcast_in_mp_dp(tensor, src, mp, dp):
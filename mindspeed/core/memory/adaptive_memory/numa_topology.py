@@ -0,0 +1,199 @@
+# Copyright (c) 2025, Huawei Technologies Co., Ltd.  All rights reserved.
+"""
+NUMA topology of the accelerators of a node, read from sysfs.
+
+The NUMA node of an accelerator is ``/sys/bus/pci/devices/<bus>/numa_node`` and the cores of a NUMA node are
+``/sys/devices/system/node/node<id>/cpulist``. The accelerators are the Huawei PCI functions of the processing
+accelerator class, the device ids follow the order of their bus addresses. The topology is cached in a file of
+the node which is shared by its local ranks, it is named after the host and the boot id so that it is discovered
+again after a reboot.
+"""
+import json
+import os
+import re
+import socket
+import tempfile
+from typing import Dict, List, NamedTuple, Optional
+
+HUAWEI_VENDOR_ID = 0x19e5
+PROCESSING_ACCELERATOR_CLASS = 0x12
+UNKNOWN_NUMA_NODE = -1
+NUMA_TOPOLOGY_CACHE_ENV = "MINDSPEED_NUMA_TOPOLOGY_CACHE"
+
+
+class NumaTopology(NamedTuple):
+    """PCI bus address and NUMA node of every accelerator by device id, cores of every NUMA node."""
+    device_buses: List[str]
+    device_numa_nodes: List[int]
+    numa_cpus: Dict[int, List[int]]
+
+    def to_json(self):
+        return json.dumps({"device_buses": self.device_buses, "device_numa_nodes": self.device_numa_nodes,
+                           "numa_cpus": {str(node): cpus for node, cpus in self.numa_cpus.items()}})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(data["device_buses"], data["device_numa_nodes"],
+                   {int(node): cpus for node, cpus in data["numa_cpus"].items()})
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """Parses a sysfs cpu list such as ``0-3,8-11,16``."""
+    cpus = []
+    for item in text.strip().split(","):
+        if not item:
+            continue
+        bounds = item.split("-")
+        if len(bounds) == 1:
+            cpus.append(int(bounds[0]))
+        elif len(bounds) == 2:
+            cpus.extend(range(int(bounds[0]), int(bounds[1]) + 1))
+        else:
+            raise ValueError(f"invalid cpu list: {text!r}")
+    return cpus
+
+
+def _read_file(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def read_numa_cpus(sysfs_root: str = "/sys") -> Dict[int, List[int]]:
+    """Cores of every NUMA node, the nodes without cores are skipped."""
+    node_dir = os.path.join(sysfs_root, "devices", "system", "node")
+    numa_cpus = {}
+    if not os.path.isdir(node_dir):
+        return numa_cpus
+    for name in os.listdir(node_dir):
+        match = re.fullmatch(r"node(\d+)", name)
+        cpulist_path = os.path.join(node_dir, name, "cpulist")
+        if match is None or not os.path.isfile(cpulist_path):
+            continue
+        cpus = parse_cpu_list(_read_file(cpulist_path))
+        if cpus:
+            numa_cpus[int(match.group(1))] = cpus
+    return dict(sorted(numa_cpus.items()))
+
+
+def normalize_pci_bus(bus: str) -> str:
+    """Bus address as named in sysfs, e.g. ``C1:00.0`` is ``0000:c1:00.0``."""
+    bus = bus.strip().lower()
+    return bus if bus.count(":") == 2 else f"0000:{bus}"
+
+
+def read_pci_numa_node(bus: str, sysfs_root: str = "/sys") -> int:
+    path = os.path.join(sysfs_root, "bus", "pci", "devices", normalize_pci_bus(bus), "numa_node")
+    if not os.path.isfile(path):
+        return UNKNOWN_NUMA_NODE
+    return int(_read_file(path))
+
+
+def read_accelerator_buses(sysfs_root: str = "/sys") -> List[str]:
+    """Bus addresses of the accelerators in the order of their device ids."""
+    pci_dir = os.path.join(sysfs_root, "bus", "pci", "devices")
+    if not os.path.isdir(pci_dir):
+        return []
+    buses = []
+    for bus in os.listdir(pci_dir):
+        vendor_path = os.path.join(pci_dir, bus, "vendor")
+        class_path = os.path.join(pci_dir, bus, "class")
+        if not os.path.isfile(vendor_path) or not os.path.isfile(class_path):
+            continue
+        if int(_read_file(vendor_path), 16) == HUAWEI_VENDOR_ID and \
+                int(_read_file(class_path), 16) >> 16 == PROCESSING_ACCELERATOR_CLASS:
+            buses.append(bus)
+    return sorted(buses)
+
+
+def discover_numa_topology(sysfs_root: str = "/sys", device_buses: Optional[List[str]] = None) -> NumaTopology:
+    """Reads the topology from sysfs, ``device_buses`` overrides the accelerators found on the PCI bus."""
+    if device_buses is None:
+        device_buses = read_accelerator_buses(sysfs_root)
+    device_buses = [normalize_pci_bus(bus) for bus in device_buses]
+    return NumaTopology(device_buses, [read_pci_numa_node(bus, sysfs_root) for bus in device_buses],
+                        read_numa_cpus(sysfs_root))
+
+
+def get_default_cache_path(boot_id_path: str = "/proc/sys/kernel/random/boot_id") -> str:
+    """``$MINDSPEED_NUMA_TOPOLOGY_CACHE`` or a file of the host and boot in the temporary directory."""
+    if os.environ.get(NUMA_TOPOLOGY_CACHE_ENV):
+        return os.environ[NUMA_TOPOLOGY_CACHE_ENV]
+    boot_id = _read_file(boot_id_path) if os.path.isfile(boot_id_path) else "unknown"
+    return os.path.join(tempfile.gettempdir(), f"mindspeed_numa_topology_{socket.gethostname()}_{boot_id}.json")
+
+
+def _read_cached_topology(cache_path, num_devices):
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        topology = NumaTopology.from_json(_read_file(cache_path))
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return topology if len(topology.device_buses) >= num_devices else None
+
+
+def load_numa_topology(cache_path: Optional[str] = None, sysfs_root: str = "/sys", num_devices: int = 0,
+                       discover_fn=None) -> NumaTopology:
+    """
+    Returns the cached topology of the node if it has at least ``num_devices`` accelerators, or discovers it
+    with ``discover_fn`` and caches it. The local ranks which discover it at the same time find the same topology,
+    each of them replaces the cache atomically.
+    """
+    if cache_path is None:
+        cache_path = get_default_cache_path()
+    topology = _read_cached_topology(cache_path, num_devices)
+    if topology is not None:
+        return topology
+    topology = discover_fn() if discover_fn is not None else discover_numa_topology(sysfs_root)
+    if not topology.device_buses:
+        return topology
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    try:
+        with os.fdopen(os.open(tmp_path, flags, 0o644), "w") as fout:
+            fout.write(topology.to_json())
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # the topology is only discovered again by the next run
+        pass
+    return topology
+
+
+def assign_cpus(topology: NumaTopology, devices: List[int], ratio: float = 0.5,
+                cpus_per_device: Optional[int] = None) -> Dict[int, List[int]]:
+    """
+    Non overlapping cores of every device of ``devices``. The devices of a NUMA node share ``ratio`` of its cores
+    evenly, or get ``cpus_per_device`` cores each, in the order of their ids. A device whose NUMA node is unknown
+    or has no cores is placed on the node which leaves the most cores per device.
+    """
+    numa_devices = {node: [] for node in topology.numa_cpus}
+    unplaced = []
+    for device in sorted(devices):
+        node = topology.device_numa_nodes[device] if device < len(topology.device_numa_nodes) else UNKNOWN_NUMA_NODE
+        if node in numa_devices:
+            numa_devices[node].append(device)
+        else:
+            unplaced.append(device)
+    for device in unplaced:
+        if not numa_devices:
+            raise RuntimeError("no NUMA node with cores is found to bind the cpus of the devices")
+        node = max(numa_devices, key=lambda n: (len(topology.numa_cpus[n]) / (len(numa_devices[n]) + 1), -n))
+        numa_devices[node].append(device)
+
+    device_cpus = {}
+    for node, node_devices in numa_devices.items():
+        if not node_devices:
+            continue
+        all_cpus = topology.numa_cpus[node]
+        if cpus_per_device is None:
+            num_cpus = int(len(all_cpus) * ratio // len(node_devices))
+        else:
+            num_cpus = cpus_per_device
+            if len(node_devices) * num_cpus > len(all_cpus):
+                raise RuntimeError(
+                    f"Cpu num in numa {node} to assign {num_cpus} for every device is not enough, "
+                    f"please decrease the value of CPU_BINDING_NUM!")
+        for index, device in enumerate(node_devices):
+            device_cpus[device] = all_cpus[index * num_cpus: (index + 1) * num_cpus]
+    return device_cpus
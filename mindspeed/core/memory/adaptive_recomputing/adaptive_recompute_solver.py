@@ -344,33 +344,6 @@ class GraphSolver:
         g.nodes[idx]['recompute'] = False
         self.layers_combination_init(g, idx + 1)
 
-    def get_max_goods_value(self, idx, ans, device_memory):
-        i, j, k = idx[0], idx[1], idx[2]
-        pre_step_ans = ans[i - 1][j - k]
-        if k == 0:
-            return pre_step_ans
-
-        goods_value = ans[i][j]
-        memory = pre_step_ans.memory + k * self.layers_combination[i].memory
-        cost = pre_step_ans.cost + k * self.layers_combination[i].cost
-        if pre_step_ans.cost == float('inf'):
-            cost = k * self.layers_combination[i].cost
-        try:
-            device_memory = max(device_memory - self.static_memory, 0) / self.pp
-        except ZeroDivisionError:
-            device_memory = max(device_memory - self.static_memory, 0)
-            print_rank_0("[ERROR] pipeline model parallel world size is 0. ")
-
-        if device_memory >= memory and cost <= goods_value.cost:
-            goods_value.memory = memory
-            goods_value.cost = cost
-            goods_value.layer_names.clear()
-            if len(pre_step_ans.layer_names) > 0:
-                goods_value.layer_names.extend(pre_step_ans.layer_names)
-            goods_value.layer_names.extend(self.layers_combination[i].name for _ in range(k))
-
-        return goods_value
-
     def print_recompute_policy(self, memory, cost):
         fmt_str = "With selective recompute:\n"
         for k, v in self.recompute_policy.items():
@@ -393,24 +366,22 @@ class GraphSolver:
             self.static_memory / 1024, memory * self.pp / 1024, performance)
         self.selective_recompute_info = fmt_str
 
-    def get_all_layer_policy(self, combination_num, layer_num, ans):
+    def get_all_layer_policy(self, layer_num, layers_best):
         layer_nodes = [self.layer_full_recompute_combination.name for _ in range(layer_num)]
         memory = layer_num * self.layer_full_recompute_combination.memory
         cost = layer_num * self.layer_full_recompute_combination.cost
         for i in range(layer_num, 0, -1):
-            size = layer_num - len(ans[combination_num][i].layer_names)
+            size = layer_num - layers_best.layer_count[i]
             if size != layer_num:
-                l_nodes = []
-                l_nodes.extend(ans[combination_num][i].layer_names)
-                # if the policies of all layers are not found, the remaining layers ues all recompute policy.
-                l_nodes.extend(self.layer_full_recompute_combination.name for _ in range(size))
-                l_memory = ans[combination_num][i].memory + size * self.layer_full_recompute_combination.memory
-                l_cost = ans[combination_num][i].cost + size * self.layer_full_recompute_combination.cost
+                l_memory = layers_best.memory[i] + size * self.layer_full_recompute_combination.memory
+                l_cost = layers_best.cost[i] + size * self.layer_full_recompute_combination.cost
                 if l_cost < cost:
                     cost = l_cost
                     memory = l_memory
                     layer_nodes.clear()
-                    layer_nodes.extend(l_nodes)
+                    layer_nodes.extend(layers_best.get_layer_names(i, self.layers_combination))
+                    # if the policies of all layers are not found, the remaining layers ues all recompute policy.
+                    layer_nodes.extend(self.layer_full_recompute_combination.name for _ in range(size))
 
         for nodes in layer_nodes:
             if nodes not in self.recompute_policy.keys():
@@ -426,16 +397,17 @@ class GraphSolver:
             combination_num = len(self.layers_combination)
             # make combination index id begin for 1.
             self.layers_combination.insert(0, None)
-        # init ans
-        ans = [[GoodsValue() for _ in range(self.layers_num + 1)] for _ in range(combination_num + 1)]
-        # find max goods value
+        try:
+            device_memory = max(device_memory - self.static_memory, 0) / self.pp
+        except ZeroDivisionError:
+            device_memory = max(device_memory - self.static_memory, 0)
+            print_rank_0("[ERROR] pipeline model parallel world size is 0. ")
+        layers_best = GoodsValueTable(self.layers_num)
+        # find max goods value, the best value of j layers is updated in place by every combination.
         for i in range(1, combination_num + 1):
-            for j in range(self.layers_num + 1):
-                k = 0
-                while k <= self.layers_combination[i].num and k <= j:
-                    ans[i][j] = self.get_max_goods_value([i, j, k], ans, device_memory)
-                    k += 1
-        self.get_all_layer_policy(combination_num, self.layers_num, ans)
+            for j in range(1, self.layers_num + 1):
+                layers_best.update(j, i, self.layers_combination[i], device_memory)
+        self.get_all_layer_policy(self.layers_num, layers_best)
 
     def get_combination_idx(self, nodes_name):
         for i in range(len(self.layers_combination)):
@@ -567,8 +539,50 @@ class LayerCombination:
         self.policy_name = config["policy_name"]
 
 
-class GoodsValue:
-    def __init__(self):
-        self.layer_names = []
-        self.memory = 0
-        self.cost = float('inf')
+class GoodsValueTable:
+    """Array-backed knapsack table, entry j holds the best value found for j layers.
+
+    Instead of copying the layer names into every entry, each update appends a backpointer node
+    (parent node, combination idx, k) and the names are only rebuilt for the chosen entries.
+    """
+
+    def __init__(self, layers_num):
+        self.memory = np.zeros(layers_num + 1)
+        self.cost = np.full(layers_num + 1, np.inf)
+        self.layer_count = np.zeros(layers_num + 1, dtype=np.int64)
+        self.node_idx = np.full(layers_num + 1, -1, dtype=np.int64)
+        self.nodes = []
+
+    def update(self, j, combination_idx, combination, device_memory):
+        """Try to reach j layers from j - k layers with k layers of the combination, for every k at once."""
+        k = np.arange(1, min(combination.num, j) + 1)
+        if k.size == 0:
+            return
+        pre = j - k
+        pre_cost = self.cost[pre]
+        memory = self.memory[pre] + k * combination.memory
+        cost = np.where(pre_cost == np.inf, 0, pre_cost) + k * combination.cost
+        feasible = device_memory >= memory
+        if not feasible.any():
+            return
+        best_cost = cost[feasible].min()
+        if best_cost > self.cost[j]:
+            return
+        # the largest k wins when costs are equal.
+        best = np.flatnonzero(feasible & (cost == best_cost))[-1]
+        self.nodes.append((self.node_idx[pre[best]], combination_idx, k[best]))
+        self.memory[j] = memory[best]
+        self.cost[j] = best_cost
+        self.layer_count[j] = self.layer_count[pre[best]] + k[best]
+        self.node_idx[j] = len(self.nodes) - 1
+
+    def get_layer_names(self, j, layers_combination):
+        segments = []
+        node = self.node_idx[j]
+        while node >= 0:
+            node, combination_idx, k = self.nodes[node]
+            segments.append((combination_idx, k))
+        layer_names = []
+        for combination_idx, k in reversed(segments):
+            layer_names.extend(layers_combination[combination_idx].name for _ in range(k))
+        return layer_names
@@ -5,6 +5,7 @@ import math
 import time
 import multiprocessing
 from functools import wraps
+import numpy as np
 import torch
 import megatron.training.global_vars
 from megatron.training import get_args
@@ -16,6 +17,9 @@ import mindspeed.core.parallel_state as mindspeed_parallel_state
 
 
 class AutoPipelineSolver():
+    # host memory used by the lanes of one batch of 1F1B simulations
+    SIMULATION_MEMORY = 256 * 1024 * 1024
+
     def __init__(self, context):
         self.context = context
         self.MB_SIZE = 1024 * 1024
@@ -54,9 +58,9 @@ class AutoPipelineSolver():
         self.target_memory = self.set_target_memory()
 
         # auto pipeline search result
+        self.stage_recompute_cache = {}
         self.ans = []
         self.backup = []
-        self.backup_min_mem = 0
         # auto pipeline policy
         self.policy = []
         self.optimal_sch = []
@@ -103,40 +107,63 @@ class AutoPipelineSolver():
 
 
     def naive_search(self, module_type, answer_queue):
+        """Enumerate the layer splits in the same order as a plain DFS, but prune the prefixes which can not
+        reach num_layers or contain a stage whose memory can not be satisfied by recomputing."""
+        num_pp_stage = self.pipeline_model_parallel_size
 
-        def dfs_build_layers(prefix_n_layers, cur_layers_sum):
-
-            if len(prefix_n_layers) > self.pipeline_model_parallel_size:
-                return
-            if cur_layers_sum > self.num_layers:
-                return
-            if 2 <= len(prefix_n_layers) < self.pipeline_model_parallel_size:
-                if prefix_n_layers[-1] < prefix_n_layers[-2]:
-                    return
-
-            if len(prefix_n_layers) == self.pipeline_model_parallel_size and cur_layers_sum == self.num_layers:
-                status, prefix_recomp_modules, mem_set = self.get_recompute_modules(prefix_n_layers, self.pipeline_model_parallel_size, module_type)
-                if status:
-                    answer_queue.append((prefix_n_layers, prefix_recomp_modules, mem_set, module_type))
-                if len(answer_queue) == 0 and len(self.ans) == 0:
-                    if len(self.backup) == 0:
-                        self.backup.append((prefix_n_layers, prefix_recomp_modules, mem_set, module_type))
-                    else:
-                        temp_min_mem = min(mem_set[1])
-                        if temp_min_mem < self.backup_min_mem:
-                            self.backup_min_mem = temp_min_mem
-                            self.backup[0] = (prefix_n_layers, prefix_recomp_modules, mem_set, module_type)
+        def dfs_build_layers(prefix_n_layers, prefix_recomp_modules, prefix_mems, cur_layers_sum):
+            stage_num = len(prefix_n_layers)
+            if stage_num == num_pp_stage:
+                answer_queue.append((prefix_n_layers, prefix_recomp_modules,
+                                     (self.target_memory / self.MB_SIZE, prefix_mems), module_type))
                 return
 
+            remaining_stages = num_pp_stage - stage_num - 1
             for cur_n_layer in range(self.max_layer, self.min_layer - 1, -1):
-                dfs_build_layers(prefix_n_layers + [cur_n_layer], cur_layers_sum + cur_n_layer)
-
-        for prefix_n_layer in range(self.max_layer, self.min_layer - 1, -1):
-            dfs_build_layers([prefix_n_layer], prefix_n_layer)
+                # layers of the stages are non-decreasing, except for the last one.
+                if 1 <= stage_num < num_pp_stage - 1 and cur_n_layer < prefix_n_layers[-1]:
+                    continue
+                layers_sum = cur_layers_sum + cur_n_layer
+                if not (layers_sum + remaining_stages * self.min_layer <= self.num_layers
+                        <= layers_sum + remaining_stages * self.max_layer):
+                    continue
+                status, n_recompute_module, stage_mem = self.get_stage_recompute_module(
+                    cur_n_layer, num_pp_stage, stage_num, module_type)
+                if not status:
+                    continue
+                dfs_build_layers(prefix_n_layers + [cur_n_layer], prefix_recomp_modules + [n_recompute_module],
+                                 prefix_mems + [stage_mem], layers_sum)
 
+        dfs_build_layers([], [], [], 0)
         return answer_queue
 
 
+    def get_backup_policy(self):
+        """The first layer split of the search, used as the minimum memory strategy when no split satisfies
+        the target memory."""
+        num_pp_stage = self.pipeline_model_parallel_size
+
+        def dfs_first_layers(prefix_n_layers, cur_layers_sum):
+            stage_num = len(prefix_n_layers)
+            if stage_num == num_pp_stage:
+                return prefix_n_layers if cur_layers_sum == self.num_layers else None
+            for cur_n_layer in range(self.max_layer, self.min_layer - 1, -1):
+                if 1 <= stage_num < num_pp_stage - 1 and cur_n_layer < prefix_n_layers[-1]:
+                    continue
+                if cur_layers_sum + cur_n_layer > self.num_layers:
+                    continue
+                n_layers = dfs_first_layers(prefix_n_layers + [cur_n_layer], cur_layers_sum + cur_n_layer)
+                if n_layers is not None:
+                    return n_layers
+            return None
+
+        n_layers = dfs_first_layers([], 0)
+        if n_layers is None:
+            return []
+        _, recomp_modules, mem_set = self.get_recompute_modules(n_layers, num_pp_stage, 0)
+        return [(n_layers, recomp_modules, mem_set, 0)]
+
+
     def main_search(self):
         mlp_answer_queue, attn_answer_queue, layer_answer_queue = [], [], []
         mlp_answer_queue = self.naive_search(0, mlp_answer_queue)
@@ -145,6 +172,8 @@ class AutoPipelineSolver():
         self.ans += attn_answer_queue
         layer_answer_queue = self.naive_search(2, layer_answer_queue)
         self.ans += layer_answer_queue
+        if len(self.ans) == 0:
+            self.backup = self.get_backup_policy()
 
         return self.ans
 
@@ -203,128 +232,158 @@ class AutoPipelineSolver():
         return target_memory
 
 
-    def get_recompute_modules(self, n_layers, num_pp_stage, module_type):
+    def get_stage_recompute_module(self, n_layer, num_pp_stage, stage_num, module_type):
+        """Number of recompute modules and memory of one stage, memoized since they only depend on the stage."""
+        key = (n_layer, num_pp_stage, stage_num, module_type)
+        if key in self.stage_recompute_cache:
+            return self.stage_recompute_cache[key]
+
         per_layer_activation_param, per_recompute_module_param = self.cal_module_param(module_type)
-        init_recompute_modules = []
-        new_n_layers_mems = []
-        stage_num = 0
         status = True
-
-        while stage_num < len(n_layers):
-            init_layer_mem = self.cal_model_mem(per_layer_activation_param, per_recompute_module_param,\
-                                                n_layers[stage_num], 0,
-                                                num_pp_stage - stage_num, stage_num)
-            if init_layer_mem <= self.target_memory * self.ratio:
+        init_layer_mem = self.cal_model_mem(per_layer_activation_param, per_recompute_module_param,\
+                                            n_layer, 0,
+                                            num_pp_stage - stage_num, stage_num)
+        if init_layer_mem <= self.target_memory * self.ratio:
+            n_recompute_module = 0
+        else:
+            if (per_recompute_module_param * (num_pp_stage - stage_num) / self.MB_SIZE) == 0:
                 n_recompute_module = 0
-                init_recompute_modules.append(n_recompute_module)
             else:
-                if (per_recompute_module_param * (num_pp_stage - stage_num) / self.MB_SIZE) == 0:
-                    n_recompute_module = 0
-                else:
-                    n_recompute_module = math.ceil((init_layer_mem / self.MB_SIZE - self.target_memory * self.ratio / self.MB_SIZE) / (per_recompute_module_param * (num_pp_stage - stage_num) / self.MB_SIZE))
-                if n_recompute_module > n_layers[stage_num]:
-                    status = False
-                    n_recompute_module = n_layers[stage_num]
-                    init_recompute_modules.append(n_recompute_module)
-                else:
-                    init_recompute_modules.append(n_recompute_module)
+                n_recompute_module = math.ceil((init_layer_mem / self.MB_SIZE - self.target_memory * self.ratio / self.MB_SIZE) / (per_recompute_module_param * (num_pp_stage - stage_num) / self.MB_SIZE))
+            if n_recompute_module > n_layer:
+                status = False
+                n_recompute_module = n_layer
+
+        init_layer_mem = self.cal_model_mem(per_layer_activation_param, per_recompute_module_param,
+                                            n_layer, n_recompute_module,
+                                            num_pp_stage - stage_num, stage_num)
+        init_layer_mem -= per_recompute_module_param*n_recompute_module
+        init_layer_mem /= self.MB_SIZE
+        self.stage_recompute_cache[key] = (status, n_recompute_module, init_layer_mem)
+        return self.stage_recompute_cache[key]
+
 
-            init_layer_mem = self.cal_model_mem(per_layer_activation_param, per_recompute_module_param,
-                                                n_layers[stage_num], n_recompute_module,
-                                                num_pp_stage - stage_num, stage_num)
-            init_layer_mem -= per_recompute_module_param*n_recompute_module
-            init_layer_mem /= self.MB_SIZE
+    def get_recompute_modules(self, n_layers, num_pp_stage, module_type):
+        init_recompute_modules = []
+        new_n_layers_mems = []
+        status = True
+
+        for stage_num, n_layer in enumerate(n_layers):
+            stage_status, n_recompute_module, init_layer_mem = self.get_stage_recompute_module(
+                n_layer, num_pp_stage, stage_num, module_type)
+            status = status and stage_status
+            init_recompute_modules.append(n_recompute_module)
             new_n_layers_mems.append(init_layer_mem)
-            stage_num += 1
 
         return status, init_recompute_modules, (self.target_memory/self.MB_SIZE, new_n_layers_mems)
 
 
-    def dp(self, examples):
-        # lookup duration via parallel params
-        (Fwd, Bwd, ComFwd, ComBwd) = self.forward_time, self.forward_time * 1.3, self.comm_time, self.comm_time
-
-        RecompFwd = 0
-        module_type = examples[3]
+    def get_recompute_forward_time(self, module_type):
         if module_type == 0:
-            RecompFwd = self.mlp_forward_time
+            return self.mlp_forward_time
         elif module_type == 1:
-            RecompFwd = self.attention_forward_time
+            return self.attention_forward_time
         elif module_type == 2:
-            RecompFwd = self.layer_forward_time
-
-        # to remember that n_layers can be divided by num_pp_stage
-        n_layers = [0] + examples[0]
-        n_recompute_layers = [0] + examples[1]
-        num_pp_stage = self.pipeline_model_parallel_size
+            return self.layer_forward_time
+        return 0
 
-        # number of micro-batch-size is 256
-        mbs = [self.micro_batch_size for _ in range(self.global_batch_size)]
-        num_microbatch = len(mbs)
-        mbs = [0] + mbs
 
-        SF = [[0 for i in range(num_microbatch + 1)] for _ in range(num_pp_stage + 1)]  # start of forward 图中蓝色的左边
-        EF = [[0 for i in range(num_microbatch + 1)] for _ in range(num_pp_stage + 1)]  # end of forward 图中蓝色的右边
+    def simulate_1f1b(self, examples_list):
+        """Iteration time of the 1F1B schedule of every example.
 
-        SB = [[0 for i in range(num_microbatch + 1)] for _ in range(num_pp_stage + 1)]  # start of backward 图中绿色的左边
-        EB = [[0 for i in range(num_microbatch + 1)] for _ in range(num_pp_stage + 1)]  # end of backward 图中绿色的右边
+        The examples are batched as lanes of numpy arrays, the recurrence runs once per batch and every lane
+        performs the same operations as a simulation of that example alone.
+        """
+        # lookup duration via parallel params
+        (Fwd, Bwd, ComFwd, ComBwd) = self.forward_time, self.forward_time * 1.3, self.comm_time, self.comm_time
+        num_pp_stage = self.pipeline_model_parallel_size
+        # number of micro-batch-size is 256
+        num_microbatch = self.global_batch_size
 
         warmup = [num_pp_stage - p - 1 for p in range(num_pp_stage)]
         remaining = [num_microbatch - warmup[p] for p in range(num_pp_stage)]
-
-        # for dp, p and m start with 1
-        # warmup: only forward processing, add activations
-        for p in range(1, num_pp_stage + 1):
-            for m in range(1, num_pp_stage - p + 1):
-                SF[p][m] = max(EF[p][m - 1], EF[p - 1][m] + ComFwd)
-                EF[p][m] = SF[p][m] + Fwd * n_layers[p]
-
-        # 1f1b
-        for num_1f1b in range(1, num_microbatch + 1):
-
-            # # fwd of 1f1b
+        lane_bytes = 2 * (num_pp_stage + 2) * (num_microbatch + 1) * 8
+        num_lanes = max(1, self.SIMULATION_MEMORY // lane_bytes)
+
+        itertimes = []
+        for start in range(0, len(examples_list), num_lanes):
+            lanes = examples_list[start:start + num_lanes]
+            # to remember that n_layers can be divided by num_pp_stage
+            n_layers = np.array([[0] + examples[0] for examples in lanes], dtype=np.float64).T
+            n_recompute_layers = np.array([[0] + examples[1] for examples in lanes], dtype=np.float64).T
+            recomp_fwd = np.array([self.get_recompute_forward_time(examples[3]) for examples in lanes],
+                                  dtype=np.float64)
+            fwd_time = Fwd * n_layers
+            bwd_time = Bwd * n_layers
+            recomp_time = recomp_fwd * n_recompute_layers
+
+            EF = np.zeros((num_pp_stage + 1, num_microbatch + 1, len(lanes)))  # end of forward
+            EB = np.zeros((num_pp_stage + 2, num_microbatch + 1, len(lanes)))  # end of backward
+            # running max of EF[1], used as the end of forward of the virtual stage 0
+            EF1_max = np.zeros(len(lanes))
+
+            # for dp, p and m start with 1
+            # warmup: only forward processing, add activations
             for p in range(1, num_pp_stage + 1):
-                if remaining[p - 1] < num_1f1b:
-                    # this means it have to work for cool down phase
-                    continue
+                for m in range(1, num_pp_stage - p + 1):
+                    SF = np.maximum(EF[p][m - 1], EF[p - 1][m] + ComFwd)
+                    EF[p][m] = SF + fwd_time[p]
+                    if p == 1:
+                        EF1_max = np.maximum(EF1_max, EF[p][m])
+
+            # 1f1b
+            for num_1f1b in range(1, num_microbatch + 1):
+
+                # # fwd of 1f1b
+                for p in range(1, num_pp_stage + 1):
+                    if remaining[p - 1] < num_1f1b:
+                        # this means it have to work for cool down phase
+                        continue
+
+                    m = warmup[p - 1] + num_1f1b
+                    if p == 1:
+                        EF[0][m] = EF1_max - ComFwd
+
+                    SF = np.maximum(EB[p][m + p - num_pp_stage - 1], EF[p - 1][m] + ComFwd)
+                    EF[p][m] = SF + fwd_time[p]
+                    if p == 1:
+                        EF1_max = np.maximum(EF1_max, EF[p][m])
+
+                # bwd of 1f1b
+                for p in range(num_pp_stage, 0, -1):
+                    m = num_1f1b
+                    if remaining[p - 1] < num_1f1b:
+                        # this means it have to work for cool down phase
+                        continue
+                    if p == num_pp_stage:
+                        SB = EF[p][m + num_pp_stage - p]
+                    else:
+                        SB = np.maximum(EF[p][m + num_pp_stage - p], EB[p + 1][m] + ComBwd)
 
-                m = warmup[p - 1] + num_1f1b
-                if p == 1:
-                    EF[0][m] = max(EF[1]) - ComFwd
+                    EB[p][m] = SB + bwd_time[p] + recomp_time[p]
 
-                SF[p][m] = max(EB[p][m + p - num_pp_stage - 1], EF[p - 1][m] + ComFwd)
-                EF[p][m] = SF[p][m] + Fwd * n_layers[p]
+                # cooldown
+                for p in range(num_pp_stage, 0, -1):
+                    m = num_1f1b
+                    if remaining[p - 1] >= num_1f1b:
+                        continue
+                    SB = np.maximum(EB[p][m - 1], EB[p + 1][m] + ComBwd)
+                    EB[p][m] = SB + bwd_time[p] + recomp_time[p]
 
-            # bwd of 1f1b
-            for p in range(num_pp_stage, 0, -1):
-                m = num_1f1b
-                if remaining[p - 1] < num_1f1b:
-                    # this means it have to work for cool down phase
-                    continue
-                if p == num_pp_stage:
-                    SB[p][m] = EF[p][m + num_pp_stage - p]
-                else:
-                    SB[p][m] = max(EF[p][m + num_pp_stage - p], EB[p + 1][m] + ComBwd)
+            itertimes.extend(EB[:num_pp_stage].max(axis=(0, 1)).tolist())
+        return itertimes
 
-                EB[p][m] = SB[p][m] + Bwd * n_layers[p] + RecompFwd * n_recompute_layers[p]
 
-            # cooldown
-            for p in range(num_pp_stage, 0, -1):
-                m = num_1f1b
-                if remaining[p - 1] >= num_1f1b:
-                    continue
-                SB[p][m] = max(EB[p][m - 1], EB[p + 1][m] + ComBwd)
-                EB[p][m] = SB[p][m] + Bwd * n_layers[p] + RecompFwd * n_recompute_layers[p]
-
-        itertime = max([max(EB[p]) for p in range(num_pp_stage)])
+    def dp(self, examples):
+        itertime = self.simulate_1f1b([examples])[0]
         self.policy.append((itertime, examples))
         return
 
 
     def find_top_optimal_schedule(self):
         self.main_search()
-        for examples in self.ans:
-            self.dp(examples)
+        itertimes = self.simulate_1f1b(self.ans)
+        self.policy.extend(zip(itertimes, self.ans))
 
         if len(self.policy) > 0:
             min_itertime = self.policy[0][0]
@@ -0,0 +1,177 @@
+# Copyright (c) 2025, Huawei Technologies Co., Ltd.  All rights reserved.
+"""
+Pool of pinned host buffers shared by the activation swaps of swap attention and adaptive memory.
+
+Pinned allocations are slow host calls, the swaps of every step ask for buffers of the same sizes, so the
+released buffers are kept in free lists by size class and handed out again. The sizes are rounded up to a
+size class with ``SIZE_CLASSES_PER_DOUBLING`` classes between two powers of two, which wastes less than a
+quarter of a buffer and lets tensors of close shapes share buffers. A buffer is released with the event of
+the last copy using it, it is only reused once the event is completed.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+MIN_BLOCK_BYTES = 64 * 1024
+SIZE_CLASSES_PER_DOUBLING = 4
+
+
+def get_size_class(nbytes: int, min_block_bytes: int = MIN_BLOCK_BYTES) -> int:
+    """Smallest size class which holds ``nbytes``."""
+    if nbytes <= min_block_bytes:
+        return min_block_bytes
+    step = max(1, 1 << ((nbytes - 1).bit_length() - 1 - (SIZE_CLASSES_PER_DOUBLING.bit_length() - 1)))
+    return (nbytes + step - 1) // step * step
+
+
+@dataclass
+class PinnedBufferPoolStats:
+    """Counters of one step, the byte counts are the state of the pool at the end of the step."""
+    num_acquires: int = 0
+    num_reuses: int = 0
+    num_allocations: int = 0
+    allocated_bytes: int = 0
+    num_releases: int = 0
+    num_evictions: int = 0
+    cached_bytes: int = 0
+    held_bytes: int = 0
+    peak_held_bytes: int = 0
+
+    @property
+    def reuse_ratio(self):
+        return self.num_reuses / self.num_acquires if self.num_acquires else 0.
+
+
+class PinnedBufferPool:
+    """
+    Size class pool of pinned host buffers.
+
+    Args:
+        max_cached_bytes: cap of the free buffers kept for reuse, a released buffer which does not fit is freed.
+            ``None`` keeps every released buffer.
+        pin_memory: allocates pinned buffers, the CPU tests use pageable ones.
+        min_block_bytes: size of the smallest class.
+    """
+
+    def __init__(self, max_cached_bytes: Optional[int] = None, pin_memory: bool = True,
+                 min_block_bytes: int = MIN_BLOCK_BYTES):
+        self.max_cached_bytes = max_cached_bytes
+        self.pin_memory = pin_memory
+        self.min_block_bytes = min_block_bytes
+        self._free_blocks: Dict[int, List[Tuple[torch.Tensor, object]]] = {}
+        # data_ptr -> bytes of the blocks handed out, a block which is never released is freed with its tensor
+        self._used_blocks: Dict[int, int] = {}
+        self.cached_bytes = 0
+        self.used_bytes = 0
+        self.stats = PinnedBufferPoolStats()
+        self.last_step_stats = None
+
+    @property
+    def held_bytes(self):
+        """Bytes of the buffers handed out and of the free buffers."""
+        return self.cached_bytes + self.used_bytes
+
+    def set_max_cached_bytes(self, max_cached_bytes: Optional[int]):
+        self.max_cached_bytes = max_cached_bytes
+        if max_cached_bytes is not None:
+            self.trim(max_cached_bytes)
+
+    def acquire(self, shape, dtype: torch.dtype) -> torch.Tensor:
+        """Returns a host tensor of ``shape`` and ``dtype`` whose content is undefined."""
+        shape = torch.Size(shape)
+        nbytes = shape.numel() * torch.empty(0, dtype=dtype).element_size()
+        if nbytes == 0:
+            return torch.empty(shape, dtype=dtype, device='cpu')
+        self.stats.num_acquires += 1
+        size_class = get_size_class(nbytes, self.min_block_bytes)
+        block = self._pop_free_block(size_class)
+        if block is None:
+            block = torch.empty(size_class, dtype=torch.uint8, device='cpu', pin_memory=self.pin_memory)
+            self.stats.num_allocations += 1
+            self.stats.allocated_bytes += size_class
+        else:
+            self.stats.num_reuses += 1
+        # the block of a buffer which was dropped without being released may have been at this address
+        self.used_bytes += size_class - self._used_blocks.get(block.data_ptr(), 0)
+        self._used_blocks[block.data_ptr()] = size_class
+        self.stats.peak_held_bytes = max(self.stats.peak_held_bytes, self.held_bytes)
+        return block[:nbytes].view(dtype).view(shape)
+
+    def release(self, tensor: torch.Tensor, event=None):
+        """
+        Gives back the buffer of ``tensor``, which is reused after ``event``. Releasing a buffer again, or a
+        tensor which does not come from the pool, does nothing.
+        """
+        storage = tensor.untyped_storage()
+        size_class = self._used_blocks.pop(storage.data_ptr(), None)
+        if size_class is None:
+            return
+        self.used_bytes -= size_class
+        self.stats.num_releases += 1
+        if self.max_cached_bytes is not None and self.cached_bytes + size_class > self.max_cached_bytes:
+            self.stats.num_evictions += 1
+            return
+        block = torch.empty(0, dtype=torch.uint8, device='cpu').set_(storage)
+        self._free_blocks.setdefault(size_class, []).append((block, event))
+        self.cached_bytes += size_class
+
+    def trim(self, max_cached_bytes: int = 0) -> int:
+        """Frees the free buffers, the largest first, until at most ``max_cached_bytes`` are cached."""
+        freed_bytes = 0
+        for size_class in sorted(self._free_blocks, reverse=True):
+            blocks = self._free_blocks[size_class]
+            kept = []
+            for block, event in blocks:
+                if self.cached_bytes > max_cached_bytes and (event is None or event.query()):
+                    self.cached_bytes -= size_class
+                    freed_bytes += size_class
+                else:
+                    kept.append((block, event))
+            if kept:
+                self._free_blocks[size_class] = kept
+            else:
+                del self._free_blocks[size_class]
+        return freed_bytes
+
+    def end_step(self) -> PinnedBufferPoolStats:
+        """Closes the statistics of the step and returns them."""
+        self.stats.cached_bytes = self.cached_bytes
+        self.stats.held_bytes = self.held_bytes
+        self.last_step_stats = self.stats
+        self.stats = PinnedBufferPoolStats(peak_held_bytes=self.stats.held_bytes)
+        return self.last_step_stats
+
+    def _pop_free_block(self, size_class):
+        blocks = self._free_blocks.get(size_class)
+        if not blocks:
+            return None
+        for index, (block, event) in enumerate(blocks):
+            if event is None or event.query():
+                blocks.pop(index)
+                self.cached_bytes -= size_class
+                return block
+        return None
+
+
+def _get_storage_bytes(tensor):
+    return torch.empty(0, dtype=torch.uint8, device=tensor.device).set_(tensor.untyped_storage())
+
+
+def copy_storage_(dst: torch.Tensor, src: torch.Tensor, non_blocking: bool = False):
+    """
+    Copies the bytes of the storage of ``src`` to the storage of ``dst``, like ``dst.storage().copy_(src.storage())``
+    where one of the storages is a pooled buffer, which may be larger than the storage it swaps.
+    """
+    nbytes = min(dst.untyped_storage().nbytes(), src.untyped_storage().nbytes())
+    _get_storage_bytes(dst)[:nbytes].copy_(_get_storage_bytes(src)[:nbytes], non_blocking=non_blocking)
+
+
+_PINNED_BUFFER_POOL = None
+
+
+def get_pinned_buffer_pool() -> PinnedBufferPool:
+    global _PINNED_BUFFER_POOL
+    if _PINNED_BUFFER_POOL is None:
+        _PINNED_BUFFER_POOL = PinnedBufferPool()
+    return _PINNED_BUFFER_POOL
@@ -3,6 +3,7 @@ import re
 import torch
 import torch_npu
 from megatron.training import get_args
+from mindspeed.core.memory.pinned_buffer_pool import copy_storage_, get_pinned_buffer_pool
 
 
 def get_layer_id(name):
@@ -20,7 +21,10 @@ class SwapTensor:
         self.tensor = tensor
         self.size = tensor.size()
         self.storage_size = tensor.storage().size()
-        self.tensor_cpu = torch.empty(tensor.shape, dtype=tensor.dtype, pin_memory=True, device='cpu')
+        self.tensor_cpu = get_pinned_buffer_pool().acquire(tensor.shape, tensor.dtype)
+        # number of the swap tensors sharing tensor_cpu, shared by them
+        self.host_buffer_refs = [1]
+        self.host_buffer_released = False
 
         self.d2h_event = None
         self.h2d_event = torch.npu.Event()
@@ -49,7 +53,7 @@ class SwapTensor:
                 if self.is_slice_tensor:
                     self.tensor_cpu.copy_(self.tensor, non_blocking=True)
                 else:
-                    self.tensor_cpu.storage().copy_(self.tensor.storage(), non_blocking=True)
+                    copy_storage_(self.tensor_cpu, self.tensor, non_blocking=True)
                 self.stat = "d2h"
 
     # synchronize d2h and resize 0
@@ -76,7 +80,7 @@ class SwapTensor:
                 if self.is_slice_tensor:
                     self.tensor.copy_(self.tensor_cpu, non_blocking=True)
                 else:
-                    self.tensor.storage().copy_(self.tensor_cpu.storage(), non_blocking=True)
+                    copy_storage_(self.tensor, self.tensor_cpu, non_blocking=True)
                 self.h2d_event.record()
                 self.stat = "h2d"
 
@@ -89,6 +93,25 @@ class SwapTensor:
             torch.npu.default_stream().wait_stream(stream)
         self.stat = "device"
 
+    def share_host_buffer(self, swap_tensor):
+        """Uses the host buffer of ``swap_tensor``, which has the same storage, instead of its own."""
+        get_pinned_buffer_pool().release(self.tensor_cpu)
+        self.tensor_cpu = swap_tensor.tensor_cpu
+        self.host_buffer_refs = swap_tensor.host_buffer_refs
+        self.host_buffer_refs[0] += 1
+
+    def release_host_buffer(self, stream):
+        """Gives the host buffer back to the pool once the copies enqueued on ``stream`` are done.
+
+        A shared host buffer is only given back by the last of the swap tensors sharing it.
+        """
+        if self.host_buffer_released:
+            return
+        self.host_buffer_released = True
+        self.host_buffer_refs[0] -= 1
+        if self.host_buffer_refs[0] == 0:
+            get_pinned_buffer_pool().release(self.tensor_cpu, stream.record_event())
+
 
 class SwapPrefetch:
     swap_prefetch = None
@@ -119,6 +142,10 @@ class SwapPrefetch:
         self.slice_tensor_storage_ptr = {}
         self.slice_tensor_storage_ptr_list = []
         self.eval_end_flag = False
+        self.curr_iteration = None
+        max_cached_gb = getattr(all_args, 'swap_pinned_pool_max_cached_gb', None)
+        if max_cached_gb is not None:
+            get_pinned_buffer_pool().set_max_cached_bytes(int(max_cached_gb * 1024 ** 3))
 
     @staticmethod
     def no_swap_tensor(ori_tensor):
@@ -143,10 +170,18 @@ class SwapPrefetch:
             class: Information about swap and swaped host Tensor.
         """
         args = get_args()
+        if args.curr_iteration != self.curr_iteration:
+            if self.curr_iteration is not None:
+                get_pinned_buffer_pool().end_step()
+            self.curr_iteration = args.curr_iteration
         if args.eval_interval:
             if args.curr_iteration % args.eval_interval != 0:
                 self.eval_end_flag = False
             if args.curr_iteration and args.curr_iteration % args.eval_interval == 0 and not self.eval_end_flag:
+                for micro_batch_swap_tensors in self.prefetch_list:
+                    for swap_tensors in micro_batch_swap_tensors:
+                        for swap_tensor in swap_tensors:
+                            swap_tensor.release_host_buffer(self.prefetch_stream)
                 self.prefetch_data_ptr_list = []
                 self.prefetch_list = []
                 self.slice_tensor_storage_ptr_list = []
@@ -179,7 +214,7 @@ class SwapPrefetch:
         if ori_tensor.storage().data_ptr() in self.data_ptr:
             self.swap_tensors[self.data_ptr[ori_tensor.storage().data_ptr()]].stat = 'h2d'
             swap_tensor.stat = 'd2h'
-            swap_tensor.tensor_cpu = self.swap_tensors[self.data_ptr[ori_tensor.storage().data_ptr()]].tensor_cpu
+            swap_tensor.share_host_buffer(self.swap_tensors[self.data_ptr[ori_tensor.storage().data_ptr()]])
             self.data_ptr[ori_tensor.storage().data_ptr()] = len(self.swap_tensors)
         else:
             self.data_ptr[ori_tensor.storage().data_ptr()] = len(self.swap_tensors)
@@ -201,6 +236,7 @@ class SwapPrefetch:
         if isinstance(swap_tensor, torch.Tensor):
             return swap_tensor
         swap_tensor.wait_h2d_finished(self.prefetch_stream, swap_tensor.last_tensor)
+        swap_tensor.release_host_buffer(self.prefetch_stream)
         self.prefetch_list[self.cur_micro_num][swap_tensor.layer_index].remove(swap_tensor)
         # Remove prefetch completed list
         if len(self.prefetch_list[self.cur_micro_num][swap_tensor.layer_index]) == 0:
@@ -1,6 +1,7 @@
 # Copyright (c) 2022-2024, NVIDIA CORPORATION & AFFILIATES. All rights reserved.
 # Copyright (c) 2024, Huawei Technologies Co., Ltd.  All rights reserved.
 import math
+from collections import OrderedDict
 from typing import Optional
 import logging
 import torch
@@ -24,6 +25,10 @@ from mindspeed.core.parallel_state import (get_context_parallel_for_hybrid_ulyss
 from mindspeed.core.context_parallel.utils import get_remapped_seq_order
 from mindspeed.core.tensor_parallel_y_union_cp import TensorParallelYUnionCP
 
+ROTARY_EMB_CACHE_SIZE = 8
+# whether the position ids of a (shape, dtype, device) are the default arange, checked once per key
+_DEFAULT_POSITION_IDS_BY_SHAPE = {}
+
 
 def yarn_find_correction_dim(
         num_rotations, dim, base=10000, max_position_embeddings=2048
@@ -143,15 +148,43 @@ def rotary_forward(self, max_seq_len: int, offset: int = 0, packed_seq: bool = F
     if self.inv_freq.device.type == 'cpu':
         # move `inv_freq` to GPU once at the first micro-batch forward pass
         self.inv_freq = self.inv_freq.to(device=torch.cuda.current_device())
+    emb = get_rotary_emb(self, max_seq_len, offset)
+    emb = gather_rotary_emb(emb, get_position_ids())
+
+    if parallel_state.get_context_parallel_world_size() > 1 and not packed_seq:
+        # slice rotary_pos_emb along sequence dimension and select the parition of the current CP rank
+        emb = get_pos_emb_on_this_cp_rank(emb, 0)
+
+    return emb
+
+
+def get_rotary_emb(self, max_seq_len: int, offset: int = 0) -> Tensor:
+    """RoPE emb table [max_seq_len, 1, 1, dim] of a RotaryEmbedding, kept in an LRU cache on the module.
+
+    The table only depends on `inv_freq` and the arguments, so it is built once instead of on every micro-batch.
+    The returned table is shared by the calls and must not be modified in place.
+    """
+    cache = getattr(self, '_rotary_emb_cache', None)
+    if cache is None:
+        cache = OrderedDict()
+        self._rotary_emb_cache = cache
+    inv_freq = self.inv_freq
+    key = (max_seq_len, offset, self.seq_len_interpolation_factor, self.rotary_interleaved, inv_freq.dtype,
+           inv_freq.device, inv_freq.data_ptr(), inv_freq._version)
+    emb = cache.get(key)
+    if emb is not None:
+        cache.move_to_end(key)
+        return emb
+
     seq = (
-        torch.arange(max_seq_len, device=self.inv_freq.device, dtype=self.inv_freq.dtype)
+        torch.arange(max_seq_len, device=inv_freq.device, dtype=inv_freq.dtype)
         + offset
     )
 
     if self.seq_len_interpolation_factor is not None:
         seq *= 1 / self.seq_len_interpolation_factor
 
-    freqs = torch.outer(seq, self.inv_freq)
+    freqs = torch.outer(seq, inv_freq)
     # first part even vector components, second part odd vector components,
     #  2 * dim in dimension size
     if not self.rotary_interleaved:
@@ -163,15 +196,39 @@ def rotary_forward(self, max_seq_len: int, offset: int = 0, packed_seq: bool = F
     # emb [seq_length, .., dim]
     emb = emb[:, None, None, :]
 
-    position_ids = get_position_ids()
-    s, b = position_ids.shape
-    emb = emb[position_ids.view(-1)].squeeze(1).reshape(s, b, 1, -1)
+    cache[key] = emb
+    if len(cache) > ROTARY_EMB_CACHE_SIZE:
+        cache.popitem(last=False)
+    return emb
 
-    if parallel_state.get_context_parallel_world_size() > 1 and not packed_seq:
-        # slice rotary_pos_emb along sequence dimension and select the parition of the current CP rank
-        emb = get_pos_emb_on_this_cp_rank(emb, 0)
 
-    return emb
+def gather_rotary_emb(emb: Tensor, position_ids: Tensor) -> Tensor:
+    """Select the rows of the emb table for position_ids [s, b], returns [s, b, 1, dim].
+
+    When position_ids is the default arange of every sample, the rows are a prefix of the table and the gather
+    is replaced by a copy of the prefix. Without --reset-position-ids, this is checked once per shape. The result
+    is a new contiguous tensor which does not alias the cached table.
+    """
+    s, b = position_ids.shape
+    if s <= emb.shape[0] and _is_default_position_ids(position_ids):
+        return emb[:s].repeat(1, b, 1, 1)
+    return emb[position_ids.view(-1)].squeeze(1).reshape(s, b, 1, -1)
+
+
+def _is_default_position_ids(position_ids: Tensor) -> bool:
+    # Reset position ids depend on the documents of the micro-batch, they are always gathered. Otherwise the
+    # position ids only depend on their shape, so they are compared to the default arange, which synchronizes with
+    # the device, once per shape instead of on every micro-batch.
+    if getattr(get_args(), 'reset_position_ids', False):
+        return False
+    key = (tuple(position_ids.shape), position_ids.dtype, position_ids.device)
+    is_default = _DEFAULT_POSITION_IDS_BY_SHAPE.get(key)
+    if is_default is None:
+        s, b = position_ids.shape
+        default_position_ids = torch.arange(s, device=position_ids.device, dtype=position_ids.dtype)
+        is_default = torch.equal(position_ids, default_position_ids[:, None].expand(s, b))
+        _DEFAULT_POSITION_IDS_BY_SHAPE[key] = is_default
+    return is_default
 
 
 def apply_rotary_pos_emb_thd(
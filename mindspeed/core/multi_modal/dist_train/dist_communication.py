@@ -31,6 +31,13 @@ class TensorSyncTool:
         # fixed_header_len (10) = dtype (1) + req_grads (1) + len_shape (1) + shape (x) + pad(10 - 3 - x)
         # Thus, the maximum dimension of tensors that can be supported here is 7.
         self.fixed_header_len = 10
+        # list_header_len (2) = len(tensor_list) (1) + len(metadata) (1), `0` means the cached metadata is reused
+        self.list_header_len = 2
+        # Packed metadata of the tensor lists last sent to / received from each rank
+        self.send_metadata_cache: Dict[int, List[int]] = {}
+        self.recv_metadata_cache: Dict[int, List[Tuple[Optional[torch.dtype], Optional[List[int]], Optional[bool]]]] = {}
+        self.metadata_hits = 0
+        self.metadata_misses = 0
 
     def encode_tensor_header(self, tensor: torch.Tensor):
         """
@@ -67,6 +74,36 @@ class TensorSyncTool:
         shape = header_tensor.tolist()[3:3 + shape_len]
         return dtype, shape, requires_grad
 
+    def encode_tensor_list_metadata(self, tensor_list: Sequence[Optional[torch.Tensor]]) -> List[int]:
+        """
+        | int32 |   int32   |  int32      |  int32 |
+        | type  | req_grads |  len(shape) |  shape |  for each tensor, a `None` tensor only has its type (-1)
+        """
+        metadata = []
+        for tensor in tensor_list:
+            if tensor is None:
+                metadata.append(-1)
+                continue
+            if tensor.dtype not in self.type_to_int:
+                raise RuntimeError(f"The tensor dtype is not supported or recorded on this device: {tensor.dtype}")
+            metadata.extend([self.type_to_int[tensor.dtype], int(tensor.requires_grad), tensor.dim(), *tensor.shape])
+        return metadata
+
+    def decode_tensor_list_metadata(self, metadata: List[int], tensor_list_len: int):
+        headers = []
+        offset = 0
+        for _ in range(tensor_list_len):
+            dtype = self.int_to_type.get(metadata[offset], None)
+            if dtype is None:
+                headers.append((None, None, None))
+                offset += 1
+                continue
+            requires_grad = bool(metadata[offset + 1])
+            shape_len = metadata[offset + 2]
+            headers.append((dtype, metadata[offset + 3:offset + 3 + shape_len], requires_grad))
+            offset += 3 + shape_len
+        return headers
+
 
 def send_recv(tensor: Optional[torch.Tensor], is_recv: bool, ranks: Sequence) -> Optional[Sequence[torch.Tensor]]:
     """
@@ -127,28 +164,95 @@ def send_recv_tensor_list(
 
 
 def recv_tensor_list(src_ranks: Sequence[int]) -> Optional[Sequence[Sequence[torch.Tensor]]]:
-    tensor_list_len = []
-    recv_tensor = torch.tensor([0], device=torch.npu.current_device())
-    for rank in src_ranks:
-        torch.distributed.recv(recv_tensor, rank)
-        tensor_list_len.append(recv_tensor.item())
+    """Receives a tensor list from each of ``src_ranks``, the i-th item holds the i-th tensor of every rank.
 
+    First receive the list headers, then the packed metadata of the ranks whose metadata changed, and finally
+    all the payloads in one batch.
+    """
+    device = _get_device()
+    header_tensors = [torch.empty(TENSOR_SYNC_TOOL.list_header_len, dtype=torch.int32, device=device)
+                      for _ in src_ranks]
+    _batch_p2p([(torch.distributed.irecv, header_tensor, rank)
+                for header_tensor, rank in zip(header_tensors, src_ranks)])
+    headers = [header_tensor.tolist() for header_tensor in header_tensors]
+
+    tensor_list_len = [header[0] for header in headers]
     if not all(tensor_list_len[0] == len_ for len_ in tensor_list_len[1:]):
         raise ValueError(f'Tensor sequences of different lengths cannot be received from different cards.')
-    tensor_list_ret = [_recv_tensor(src_ranks) for _ in range(tensor_list_len[0])]
+
+    metadata_tensors = {}
+    for rank, (_, metadata_len) in zip(src_ranks, headers):
+        if metadata_len == 0:
+            TENSOR_SYNC_TOOL.metadata_hits += 1
+        else:
+            TENSOR_SYNC_TOOL.metadata_misses += 1
+            metadata_tensors[rank] = torch.empty(metadata_len, dtype=torch.int32, device=device)
+    _batch_p2p([(torch.distributed.irecv, metadata_tensor, rank) for rank, metadata_tensor in metadata_tensors.items()])
+    for rank, metadata_tensor in metadata_tensors.items():
+        TENSOR_SYNC_TOOL.recv_metadata_cache[rank] = TENSOR_SYNC_TOOL.decode_tensor_list_metadata(
+            metadata_tensor.tolist(), tensor_list_len[0])
+
+    recv_tensors = []
+    p2p_ops = []
+    for rank in src_ranks:
+        rank_tensors = []
+        for dtype, shape, _ in TENSOR_SYNC_TOOL.recv_metadata_cache[rank]:
+            tensor = None
+            if dtype is not None:
+                tensor = torch.empty(tuple(shape), dtype=dtype, device=device)
+                if tensor.numel() > 0:
+                    p2p_ops.append((torch.distributed.irecv, tensor, rank))
+            rank_tensors.append(tensor)
+        recv_tensors.append(rank_tensors)
+    _batch_p2p(p2p_ops)
+
+    tensor_list_ret = []
+    for i in range(tensor_list_len[0]):
+        tensors = []
+        for rank, rank_tensors in zip(src_ranks, recv_tensors):
+            _, _, requires_grad = TENSOR_SYNC_TOOL.recv_metadata_cache[rank][i]
+            if rank_tensors[i] is not None:
+                rank_tensors[i].requires_grad_(requires_grad)
+            tensors.append(rank_tensors[i])
+        tensor_list_ret.append(None if all(tensor is None for tensor in tensors) else tensors)
 
     return tensor_list_ret
 
 
 def send_tensor_list(tensor_list: Optional[Sequence[torch.Tensor]], dst_ranks: Sequence[int]) -> None:
+    """Sends the list header, the packed metadata if it changed since the last list and the payloads as one batch."""
     tensor_list_len = len(tensor_list)
     if tensor_list_len == 0:
         return
-    send_tensor = torch.tensor([tensor_list_len], device=torch.npu.current_device())
+    device = _get_device()
+    metadata = TENSOR_SYNC_TOOL.encode_tensor_list_metadata(tensor_list)
+    metadata_tensor = None
+    p2p_ops = []
     for rank in dst_ranks:
-        torch.distributed.send(send_tensor, rank)
-    for i in range(tensor_list_len):
-        _send_tensor(tensor_list[i], dst_ranks)
+        cached = TENSOR_SYNC_TOOL.send_metadata_cache.get(rank) == metadata
+        header = [tensor_list_len, 0 if cached else len(metadata)]
+        p2p_ops.append((torch.distributed.isend, torch.tensor(header, dtype=torch.int32, device=device), rank))
+        if not cached:
+            if metadata_tensor is None:
+                metadata_tensor = torch.tensor(metadata, dtype=torch.int32, device=device)
+            p2p_ops.append((torch.distributed.isend, metadata_tensor, rank))
+            TENSOR_SYNC_TOOL.send_metadata_cache[rank] = metadata
+        p2p_ops.extend((torch.distributed.isend, tensor, rank)
+                       for tensor in tensor_list if tensor is not None and tensor.numel() > 0)
+    _batch_p2p(p2p_ops)
+
+
+def _get_device():
+    return torch.npu.current_device()
+
+
+def _batch_p2p(p2p_ops: List[Tuple]) -> None:
+    if not p2p_ops:
+        return
+    reqs = torch.distributed.batch_isend_irecv([torch.distributed.P2POp(op, tensor, peer)
+                                                for op, tensor, peer in p2p_ops])
+    for req in reqs:
+        req.wait()
 
 
 def _send_header(tensor: torch.Tensor, dst: int) -> None:
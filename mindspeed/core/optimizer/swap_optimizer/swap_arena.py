@@ -0,0 +1,239 @@
+# Copyright (c) 2025, Huawei Technologies Co., Ltd.  All rights reserved.
+"""
+Pinned host arena of the swap optimizer and the bucketed swaps of its states.
+
+The states of every swapped parameter (the fp32 param, exp_avg, exp_avg_sq and max_exp_avg_sq) are packed
+one after the other in a single pinned host tensor, in the order of the DP shard which is also the order of
+the optimizer step. Consecutive parameters thus form contiguous ranges of the arena which are swapped to the
+device with one copy per bucket into a device buffer, the device tensors are views of the buffer while their
+bucket is resident. Two buffers are used in turn, the next bucket is prefetched while the current one is
+updated.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import torch
+
+SWAP_IN = 'swap_in'
+UPDATE = 'update'
+SWAP_OUT = 'swap_out'
+
+
+class ArenaSlot(NamedTuple):
+    """Range of the states of one parameter in an arena, the states of ``keys`` follow each other."""
+    arena: int
+    offset: int
+    numel: int
+    keys: Tuple[str, ...]
+
+    @property
+    def end(self):
+        return self.offset + self.numel * len(self.keys)
+
+    def get_offset(self, key):
+        return self.offset + self.keys.index(key) * self.numel
+
+
+class HostArenaLayout:
+    """Packs the slots of the parameters contiguously in the order they are added."""
+
+    def __init__(self, arena: int = 0):
+        self.arena = arena
+        self.slots: List[ArenaSlot] = []
+        self.numel = 0
+
+    def add(self, numel: int, keys: Sequence[str]) -> ArenaSlot:
+        slot = ArenaSlot(self.arena, self.numel, numel, tuple(keys))
+        self.slots.append(slot)
+        self.numel = slot.end
+        return slot
+
+
+def allocate_host_arena(layout: HostArenaLayout, dtype=torch.float32, pin_memory=True) -> torch.Tensor:
+    return torch.empty(layout.numel, dtype=dtype, device='cpu', pin_memory=pin_memory)
+
+
+def get_slot_views(arena: torch.Tensor, slot: ArenaSlot, shape) -> Dict[str, torch.Tensor]:
+    return {key: arena[slot.get_offset(key): slot.get_offset(key) + slot.numel].view(shape) for key in slot.keys}
+
+
+class SwapBucket(NamedTuple):
+    """Slots swapped with one copy, they are the arena range [start, end)."""
+    arena: int
+    start: int
+    end: int
+    slots: Tuple[ArenaSlot, ...]
+
+    @property
+    def numel(self):
+        return self.end - self.start
+
+
+def plan_buckets(slots: Sequence[ArenaSlot], bucket_numel: int) -> List[SwapBucket]:
+    """
+    Groups the slots, in the order of the optimizer step, into buckets of at most ``bucket_numel`` parameter
+    elements, or of one slot if it is larger. A bucket is a contiguous range of one arena, a slot which does not
+    follow the previous one in its arena starts a new bucket.
+    """
+    buckets = []
+    current, current_numel = [], 0
+    for slot in slots:
+        if current and (slot.arena != current[-1].arena or slot.offset != current[-1].end or
+                        current_numel + slot.numel > bucket_numel):
+            buckets.append(SwapBucket(current[0].arena, current[0].offset, current[-1].end, tuple(current)))
+            current, current_numel = [], 0
+        current.append(slot)
+        current_numel += slot.numel
+    if current:
+        buckets.append(SwapBucket(current[0].arena, current[0].offset, current[-1].end, tuple(current)))
+    return buckets
+
+
+def plan_swap_schedule(num_buckets: int, num_buffers: int = 2) -> List[Tuple[str, int, int]]:
+    """
+    Order of the (operation, bucket, buffer) of a step: the first buckets are swapped in, then every update
+    of a bucket is followed by its swap out and by the swap in of the bucket which reuses its buffer.
+    """
+    schedule = [(SWAP_IN, bucket, bucket % num_buffers) for bucket in range(min(num_buckets, num_buffers))]
+    for bucket in range(num_buckets):
+        buffer = bucket % num_buffers
+        schedule.append((UPDATE, bucket, buffer))
+        schedule.append((SWAP_OUT, bucket, buffer))
+        if bucket + num_buffers < num_buckets:
+            schedule.append((SWAP_IN, bucket + num_buffers, buffer))
+    return schedule
+
+
+class BucketedSwapper:
+    """
+    Runs the swap schedule of a step on the swap streams.
+
+    The swap in of a bucket waits for the swap out of the previous bucket of its buffer, its update waits for
+    its swap in and its swap out waits for its update. The device tensors of the slots are views of the buffer
+    while their bucket is resident and have an empty storage otherwise, like the tensors swapped one by one.
+
+    Args:
+        buckets: buckets in the order of the step.
+        host_arenas: pinned host tensor of every arena.
+        swap_to_device_stream, swap_to_host_stream: streams of the copies.
+        device: the device module with ``current_stream`` and ``stream``, ``torch.cuda`` by default.
+    """
+
+    def __init__(self, buckets: Sequence[SwapBucket], host_arenas: Dict[int, torch.Tensor], swap_to_device_stream,
+                 swap_to_host_stream, num_buffers: int = 2, device=None):
+        self.buckets = list(buckets)
+        self.host_arenas = host_arenas
+        self.slot_tensors = {}
+        self.swap_to_device_stream = swap_to_device_stream
+        self.swap_to_host_stream = swap_to_host_stream
+        self.num_buffers = num_buffers
+        self.device = device if device is not None else torch.cuda
+        self.schedule = plan_swap_schedule(len(self.buckets), num_buffers)
+        self.buffer_numel = max((bucket.numel for bucket in self.buckets), default=0)
+        self._buffers: List[Optional[torch.Tensor]] = []
+        self._next_op = 0
+        self._swap_in_events = {}
+        self._buffer_free_events = {}
+
+    def begin_step(self, slot_tensors: Dict[ArenaSlot, Dict[str, torch.Tensor]], buffer_device=None):
+        """
+        Allocates the buffers on ``buffer_device`` from the swap to device stream and swaps in the first buckets.
+        ``slot_tensors`` are the device tensors of the states of every slot, the tensors which are on the device,
+        e.g. loaded from a checkpoint, are first copied to the arena.
+        """
+        self.slot_tensors = slot_tensors
+        self._next_op = 0
+        self._swap_in_events = {}
+        self._buffer_free_events = {}
+        current_stream = self.device.current_stream()
+        # the arena may still be written by the swap out of the previous step
+        current_stream.wait_stream(self.swap_to_host_stream)
+        self._copy_resident_tensors_to_arena()
+        self.swap_to_device_stream.wait_stream(current_stream)
+        with self.device.stream(self.swap_to_device_stream):
+            self._buffers = [torch.empty(self.buffer_numel, dtype=torch.float32, device=buffer_device)
+                             for _ in range(min(self.num_buffers, len(self.buckets)))]
+        for buffer in self._buffers:
+            self._record_stream(buffer, current_stream)
+            self._record_stream(buffer, self.swap_to_host_stream)
+        self._run_until(UPDATE)
+
+    def acquire(self, bucket: int):
+        """Makes the current stream wait for the swap in of ``bucket``, whose update is the next operation."""
+        op, op_bucket, _ = self.schedule[self._next_op]
+        if (op, op_bucket) != (UPDATE, bucket):
+            raise RuntimeError(f"bucket {bucket} of the swap optimizer is updated out of order, "
+                               f"the next operation is {op} of bucket {op_bucket}")
+        self.device.current_stream().wait_event(self._swap_in_events.pop(bucket))
+        self._next_op += 1
+
+    def release(self, bucket: int):
+        """Swaps out ``bucket`` after its update on the current stream and prefetches the next bucket."""
+        op, op_bucket, _ = self.schedule[self._next_op]
+        if (op, op_bucket) != (SWAP_OUT, bucket):
+            raise RuntimeError(f"bucket {bucket} of the swap optimizer is released before its update")
+        self._run_until(UPDATE)
+
+    def end_step(self):
+        self._run_until(None)
+        self._buffers = []
+        self.slot_tensors = {}
+
+    def _run_until(self, stop_op):
+        while self._next_op < len(self.schedule):
+            op, bucket, buffer = self.schedule[self._next_op]
+            if op == stop_op:
+                return
+            if op == SWAP_IN:
+                self._swap_in(self.buckets[bucket], bucket, buffer)
+            elif op == SWAP_OUT:
+                self._swap_out(self.buckets[bucket], buffer)
+            else:
+                raise RuntimeError(f"bucket {bucket} of the swap optimizer is not updated")
+            self._next_op += 1
+
+    def _copy_resident_tensors_to_arena(self):
+        for bucket in self.buckets:
+            arena = self.host_arenas[bucket.arena]
+            for slot in bucket.slots:
+                for key, tensor in self.slot_tensors[slot].items():
+                    if tensor.untyped_storage().size() != 0:
+                        offset = slot.get_offset(key)
+                        arena[offset: offset + slot.numel].copy_(tensor.detach().view(-1), non_blocking=True)
+                        self._release_tensor(tensor)
+
+    def _swap_in(self, bucket: SwapBucket, bucket_index, buffer_index):
+        buffer = self._buffers[buffer_index]
+        with self.device.stream(self.swap_to_device_stream):
+            free_event = self._buffer_free_events.pop(buffer_index, None)
+            if free_event is not None:
+                self.swap_to_device_stream.wait_event(free_event)
+            buffer[:bucket.numel].copy_(self.host_arenas[bucket.arena][bucket.start:bucket.end], non_blocking=True)
+            self._swap_in_events[bucket_index] = self.swap_to_device_stream.record_event()
+        storage = buffer.untyped_storage()
+        with torch.no_grad():
+            for slot in bucket.slots:
+                for key, tensor in self.slot_tensors[slot].items():
+                    tensor.set_(storage, buffer.storage_offset() + slot.get_offset(key) - bucket.start,
+                                tensor.size(), tensor.stride())
+
+    def _swap_out(self, bucket: SwapBucket, buffer_index):
+        buffer = self._buffers[buffer_index]
+        update_event = self.device.current_stream().record_event()
+        with self.device.stream(self.swap_to_host_stream):
+            self.swap_to_host_stream.wait_event(update_event)
+            self.host_arenas[bucket.arena][bucket.start:bucket.end].copy_(buffer[:bucket.numel], non_blocking=True)
+            self._buffer_free_events[buffer_index] = self.swap_to_host_stream.record_event()
+        for slot in bucket.slots:
+            for tensor in self.slot_tensors[slot].values():
+                self._release_tensor(tensor)
+
+    @staticmethod
+    def _release_tensor(tensor):
+        with torch.no_grad():
+            tensor.set_(torch.empty(0, dtype=tensor.dtype, device=tensor.device).untyped_storage(), 0,
+                        tensor.size(), tensor.stride())
+
+    @staticmethod
+    def _record_stream(tensor, stream):
+        if tensor.device.type != 'cpu':
+            tensor.record_stream(stream)
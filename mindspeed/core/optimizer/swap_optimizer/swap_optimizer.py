@@ -6,6 +6,8 @@ from megatron.core.optimizer.distrib_optimizer import DistributedOptimizer as Me
 from megatron.core import tensor_parallel
 from megatron.training import get_args
 from mindspeed.ops.npu_apply_fused_adamw_v2 import npu_apply_fused_adamw_v2
+from mindspeed.core.optimizer.swap_optimizer.swap_arena import (BucketedSwapper, HostArenaLayout, allocate_host_arena,
+                                                                get_slot_views, plan_buckets)
 
 
 class SwapDistributedOptimizer(MegatronDistributedOptimizer):
@@ -22,6 +24,10 @@ class SwapDistributedOptimizer(MegatronDistributedOptimizer):
     param_to_device_states_map = {}
     main_param_to_model_param_map = {}
 
+    # pinned host arena of every _build_model_and_main_param_groups call and slot of every swapped param
+    host_arenas = {}
+    param_to_arena_slot_map = {}
+
     state_keys = ['exp_avg', 'exp_avg_sq', 'max_exp_avg_sq']
 
     def __init__(self, *args, **kwargs):
@@ -45,10 +51,23 @@ class SwapDistributedOptimizer(MegatronDistributedOptimizer):
         # print swap param num and size
         swap_num = sum([key.numel() for key in self.main_param_to_model_param_map.keys()])
         self.optimizer.swap_numel = swap_num // get_args().swap_optimizer_times
+        self.optimizer.bucket_swapper = self.build_bucket_swapper()
         total_num = sum([sum([p.numel() for p in group['params']]) for group in self.optimizer.param_groups])
         swap_memory = swap_num * 12 / 1024 / 1024
-        print('[Rank {}] swap optimizer: {} ({} MB)/{}\n'.format(torch.cuda.current_device(), swap_num, swap_memory,
-                                                                 total_num), end='')
+        print('[Rank {}] swap optimizer: {} ({} MB)/{} in {} buckets\n'.format(
+            torch.cuda.current_device(), swap_num, swap_memory, total_num,
+            len(self.optimizer.bucket_swapper.buckets)), end='')
+
+    def build_bucket_swapper(self):
+        """Buckets of about swap_numel elements of the swapped params, in the order of the step."""
+        swapped_params = [p for p in self.optimizer.param_to_group_map if p in self.param_to_arena_slot_map]
+        buckets = plan_buckets([self.param_to_arena_slot_map[p] for p in swapped_params],
+                               max(self.optimizer.swap_numel, 1))
+        slot_to_bucket = {slot: index for index, bucket in enumerate(buckets) for slot in bucket.slots}
+        self.optimizer.param_to_bucket_map = {p: slot_to_bucket[self.param_to_arena_slot_map[p]]
+                                              for p in swapped_params}
+        return BucketedSwapper(buckets, self.host_arenas, SwapDistributedOptimizer.swap_to_device_stream,
+                               SwapDistributedOptimizer.swap_to_host_stream)
 
     def opt_states_initialization(self):
         for group in self.shard_fp32_from_float16_groups:
@@ -67,14 +86,19 @@ class SwapDistributedOptimizer(MegatronDistributedOptimizer):
                         cpu_state[key] = None
                     else:
                         device_state[key] = torch.zeros_like(main_param, memory_format=torch.contiguous_format)
-                        cpu_state[key] = torch.empty_like(main_param, pin_memory=True, device='cpu')
+                        if key not in cpu_state:
+                            cpu_state[key] = torch.empty_like(main_param, pin_memory=True, device='cpu')
                         cpu_state[key].copy_(device_state[key], non_blocking=True)
                         device_state[key].storage().resize_(0)
 
     @classmethod
-    def create_tensor_maps(cls, main_param, model_param):
-        # optimizer parameter
-        cpu_state = {'param': torch.empty_like(main_param, pin_memory=True, device='cpu')}
+    def create_tensor_maps(cls, main_param, model_param, slot=None):
+        # optimizer parameter and states, views of the host arena if the param has a slot
+        if slot is None:
+            cpu_state = {'param': torch.empty_like(main_param, pin_memory=True, device='cpu')}
+        else:
+            cpu_state = get_slot_views(cls.host_arenas[slot.arena], slot, main_param.shape)
+            cls.param_to_arena_slot_map[main_param] = slot
         cls.param_to_cpu_states_map[main_param] = cpu_state
         cls.main_param_to_model_param_map[main_param] = model_param
         cls.swap_to_host_events_map[main_param] = None
@@ -182,6 +206,20 @@ class SwapDistributedOptimizer(MegatronDistributedOptimizer):
         shard_fp32_groups = []
         shard_fp32_from_float16_groups = []
 
+        # Pack the states of the float16 param shards in one pinned host arena, in the order of the step.
+        layout = HostArenaLayout(len(cls.host_arenas))
+        arena_slots = {}
+        for group_range in opt_group_ranges:
+            keys = ['param', 'exp_avg', 'exp_avg_sq']
+            if group_range["orig_group"].get('amsgrad', False):
+                keys.append('max_exp_avg_sq')
+            for model_param in group_range["params"]:
+                if model_param.type() in ['torch.cuda.HalfTensor', 'torch.cuda.BFloat16Tensor']:
+                    gbuf_index, dtype, bucket_index = param_gbuf_map[model_param]
+                    param_range = gbuf_ranges[gbuf_index][dtype][bucket_index]["param_map"][model_param]["param"]
+                    arena_slots[model_param] = layout.add(param_range.size, keys)
+        cls.host_arenas[layout.arena] = allocate_host_arena(layout)
+
         # Allocate (or slice) each group's param shard.
         for group_range in opt_group_ranges:
 
@@ -228,7 +266,8 @@ class SwapDistributedOptimizer(MegatronDistributedOptimizer):
                     shard_float16_params_this_group.append(shard_model_param)
                     shard_fp32_from_float16_params_this_group.append(shard_main_param)
 
-                    SwapDistributedOptimizer.create_tensor_maps(shard_main_param, shard_model_param)
+                    SwapDistributedOptimizer.create_tensor_maps(shard_main_param, shard_model_param,
+                                                                arena_slots[model_param])
                     SwapDistributedOptimizer.swap_tensors_to_host(shard_main_param)
 
                 # fp32 params.
@@ -581,9 +620,25 @@ def swap_adamw_step(self, closure=None):
         else:
             group['step'] = torch.tensor(1, dtype=torch.int64, device=torch.cuda.current_device())
 
-    swap_count = 0
+    # the states of the swapped params are swapped in buckets, the next bucket is prefetched during the update
     params_list = list(self.param_to_group_map.keys())
-    for i, param in enumerate(params_list):
+    swapper = self.bucket_swapper
+    slot_tensors = {}
+    for param in self.param_to_bucket_map:
+        slot = SwapDistributedOptimizer.param_to_arena_slot_map[param]
+        state = self.state[param]
+        slot_tensors[slot] = {key: param if key == 'param' else state[key] for key in slot.keys}
+    swapper.begin_step(slot_tensors, buffer_device=torch.cuda.current_device())
+
+    current_bucket = None
+    for param in params_list:
+        bucket = self.param_to_bucket_map.get(param, None)
+        if bucket is not None and bucket != current_bucket:
+            if current_bucket is not None:
+                swapper.release(current_bucket)
+            swapper.acquire(bucket)
+            current_bucket = bucket
+
         if param.grad is None:
             continue
         if param.grad.is_sparse:
@@ -601,25 +656,15 @@ def swap_adamw_step(self, closure=None):
         if 'max_exp_avg_sq' not in state:
             state['max_exp_avg_sq'] = torch.zeros_like(param, memory_format=torch.preserve_format) if amsgrad else None
 
-        # Swap adamw
-        if swap_count == 0:
-            torch.cuda.current_stream().wait_stream(SwapDistributedOptimizer.swap_to_host_stream)
-            with torch.cuda.stream(SwapDistributedOptimizer.swap_to_device_stream):
-                torch.cuda.current_stream().wait_stream(SwapDistributedOptimizer.swap_to_host_stream)
-                while i < len(params_list) and (swap_count + params_list[i].numel() <= self.swap_numel or swap_count <= 0):
-                    SwapDistributedOptimizer.swap_tensors_to_device(params_list[i])
-                    swap_count += params_list[i].numel()
-                    i += 1
-
-        SwapDistributedOptimizer.wait_swap_to_device_event(param)
         npu_apply_fused_adamw_v2(param, param.grad, state['exp_avg'], state['exp_avg_sq'], state['max_exp_avg_sq'],
                                  group['step'], group['lr'], beta1, beta2, group['weight_decay'],
                                  group['eps'], amsgrad, group['maximize'])
 
-        SwapDistributedOptimizer.copy_tensor_to_model_param(param)
-        with torch.cuda.stream(SwapDistributedOptimizer.swap_to_host_stream):
-            SwapDistributedOptimizer.wait_copy_to_model_event(param)
-            swap_count -= param.numel()
-            SwapDistributedOptimizer.swap_tensors_to_host(param)
+        if bucket is not None:
+            SwapDistributedOptimizer.main_param_to_model_param_map[param].data.copy_(param)
+
+    if current_bucket is not None:
+        swapper.release(current_bucket)
+    swapper.end_step()
 
     return loss
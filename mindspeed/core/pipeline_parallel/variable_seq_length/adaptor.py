@@ -5,12 +5,13 @@ Copyright (c) 2025, NVIDIA CORPORATION. All rights reserved.
 Copyright (c) 2025, Huawei Technologies Co., Ltd. All rights reserved.
 """
 
-from typing import Iterable, Optional, Tuple
+from typing import Iterable, List, Optional, Sequence, Tuple
 
 import torch
 
 from megatron.core import ModelParallelConfig
 from megatron.core.parallel_state import (
+    get_pipeline_model_parallel_first_rank,
     get_pipeline_model_parallel_group,
     get_pipeline_model_parallel_next_rank,
     get_pipeline_model_parallel_prev_rank,
@@ -19,6 +20,7 @@ from megatron.core.pipeline_parallel.p2p_communication import (
     _batched_p2p_ops, _p2p_ops)
 
 from .communicate import Shape, communicate_impl, communicate_shapes_impl
+from .shape_schedule import announce_shape_schedule
 
 
 def mindspeed_communicate(
@@ -125,3 +127,31 @@ def mindspeed_commuticate_shapes(
         p2p_ops=_p2p_ops,
         tensor_dim=tensor_dim,
     )
+
+
+def mindspeed_announce_shape_schedule(
+    shapes: Optional[Sequence[Shape]],
+    buckets: Optional[Sequence[int]] = None,
+    seq_dim: int = 0,
+) -> List[List[int]]:
+    """Announce the shapes of the micro batches of the iteration from the
+    first pipeline stage, so that no shape is communicated before the
+    transfers of the iteration. Must be called on all pipeline ranks
+    before every call of the forward backward function.
+
+    Args:
+        shapes: shape of the activation of every micro batch, only used
+                on the first pipeline stage.
+        buckets: sorted padded sequence lengths, see
+                 ``announce_shape_schedule``.
+        seq_dim: the sequence dimension of the shapes.
+    Returns:
+        The announced shapes.
+    """
+    return announce_shape_schedule(
+        shapes,
+        group=get_pipeline_model_parallel_group(),
+        src=get_pipeline_model_parallel_first_rank(),
+        buckets=buckets,
+        seq_dim=seq_dim,
+    )
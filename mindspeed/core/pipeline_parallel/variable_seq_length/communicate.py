@@ -13,6 +13,7 @@ from typing import Callable, Iterable, List, Optional, Tuple, Union
 import torch
 
 from .common import Config
+from .shape_schedule import take_scheduled_shapes
 
 # Types
 Shape = Union[List[int], torch.Size]
@@ -192,9 +193,18 @@ def communicate_impl(
     tensor_recv_prev_func = None
     tensor_recv_next_func = None
 
+    scheduled_shapes = None
+    if config.variable_seq_lengths:
+        # The shapes may have been announced for the iteration.
+        scheduled_shapes = take_scheduled_shapes(
+            tensor_send_next, tensor_send_prev, recv_prev, recv_next, config
+        )
+
     if not config.variable_seq_lengths:
         recv_prev_shape = tensor_shape
         recv_next_shape = tensor_shape
+    elif scheduled_shapes is not None:
+        recv_prev_shape, recv_next_shape = scheduled_shapes
     else:
         tensor_dim = len(tensor_shape) if tensor_shape is not None else 3
         recv_prev_shape, recv_next_shape = communicate_shapes_impl(
@@ -0,0 +1,159 @@
+"""Pre-announced shape schedule for pipeline communication
+with variable length of sequences.
+
+Instead of communicating the tensor shape before every transfer,
+the shapes of all micro batches of an iteration are announced once,
+and each rank takes the shape of its next transfer from the schedule.
+
+Copyright (c) 2025, Huawei Technologies Co., Ltd. All rights reserved.
+"""
+
+import bisect
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+from .common import Config
+
+Shape = List[int]
+
+# Directions of the transfers of a stage, each one goes through the
+# micro batches in order.
+_SEND_NEXT = "send_next"
+_RECV_PREV = "recv_prev"
+_SEND_PREV = "send_prev"
+_RECV_NEXT = "recv_next"
+
+_SHAPE_SCHEDULE: Optional["ShapeSchedule"] = None
+_SAVED_SHAPE_MESSAGES = 0
+
+
+def bucket_seq_length(seq_length: int, buckets: Sequence[int]) -> int:
+    """Returns the smallest bucket that can hold ``seq_length``."""
+    index = bisect.bisect_left(buckets, seq_length)
+    if index == len(buckets):
+        raise ValueError(
+            f"sequence length {seq_length} is larger than the largest "
+            f"bucket {buckets[-1]}"
+        )
+    return buckets[index]
+
+
+class ShapeSchedule:
+    """Shapes of the micro batches of an iteration.
+
+    The forward activations and the backward gradients of micro batch
+    ``i`` have the same shape, and without virtual pipeline every stage
+    sends and receives the micro batches in order, so a cursor per
+    direction gives the shape of the next transfer.
+    """
+
+    def __init__(self, shapes: Sequence[Shape]):
+        self.shapes = [list(shape) for shape in shapes]
+        self._cursors: Dict[str, int] = {
+            direction: 0
+            for direction in (_SEND_NEXT, _RECV_PREV, _SEND_PREV, _RECV_NEXT)
+        }
+
+    def has_next(self, direction: str) -> bool:
+        return self._cursors[direction] < len(self.shapes)
+
+    def take(self, direction: str) -> Shape:
+        shape = self.shapes[self._cursors[direction]]
+        self._cursors[direction] += 1
+        return shape
+
+
+def announce_shape_schedule(
+    shapes: Optional[Sequence[Shape]],
+    group: torch.distributed.ProcessGroup,
+    src: int,
+    buckets: Optional[Sequence[int]] = None,
+    seq_dim: int = 0,
+) -> List[Shape]:
+    """Announces the shapes of the micro batches of the iteration from
+    rank ``src`` to all ranks of the pipeline ``group`` in one broadcast.
+
+    Args:
+        shapes: shape of the activation of every micro batch, only used
+                on rank ``src``.
+        group: the pipeline model parallel group.
+        src: the global rank that knows the shapes, usually the first
+             pipeline stage that reads the data.
+        buckets: sorted padded sequence lengths. If set, the sequence
+                 dimension is padded to its bucket, and the data must
+                 be padded the same way with ``bucket_seq_length``.
+        seq_dim: the sequence dimension of the shapes.
+    Returns:
+        The announced shapes.
+    """
+    global _SHAPE_SCHEDULE
+    if torch.distributed.get_rank() == src:
+        shapes = [list(shape) for shape in shapes]
+        if buckets:
+            buckets = sorted(buckets)
+            for shape in shapes:
+                shape[seq_dim] = bucket_seq_length(shape[seq_dim], buckets)
+    objects = [shapes]
+    torch.distributed.broadcast_object_list(objects, src=src, group=group)
+    _SHAPE_SCHEDULE = ShapeSchedule(objects[0])
+    return _SHAPE_SCHEDULE.shapes
+
+
+def get_shape_schedule() -> Optional[ShapeSchedule]:
+    return _SHAPE_SCHEDULE
+
+
+def clear_shape_schedule():
+    global _SHAPE_SCHEDULE, _SAVED_SHAPE_MESSAGES
+    _SHAPE_SCHEDULE = None
+    _SAVED_SHAPE_MESSAGES = 0
+
+
+def get_saved_shape_messages() -> int:
+    """Number of shape sends and receives the schedule has saved."""
+    return _SAVED_SHAPE_MESSAGES
+
+
+def take_scheduled_shapes(
+    tensor_send_next: Optional[torch.Tensor],
+    tensor_send_prev: Optional[torch.Tensor],
+    recv_prev: bool,
+    recv_next: bool,
+    config: Config,
+) -> Optional[Tuple[Shape, Shape]]:
+    """Returns (recv_prev_shape, recv_next_shape) from the announced
+    schedule, or None if the shapes have to be communicated.
+    """
+    global _SAVED_SHAPE_MESSAGES
+    schedule = _SHAPE_SCHEDULE
+    if schedule is None:
+        return None
+    # With virtual pipeline the micro batches are not transferred in
+    # order, so the shapes are communicated as before.
+    if getattr(config, "virtual_pipeline_model_parallel_size", None) is not None:
+        return None
+
+    directions = [
+        (_SEND_NEXT, tensor_send_next is not None),
+        (_RECV_PREV, recv_prev),
+        (_SEND_PREV, tensor_send_prev is not None),
+        (_RECV_NEXT, recv_next),
+    ]
+    directions = [direction for direction, needed in directions if needed]
+    if not all(schedule.has_next(direction) for direction in directions):
+        return None
+
+    shapes = {direction: schedule.take(direction) for direction in directions}
+    for direction, tensor in (
+        (_SEND_NEXT, tensor_send_next),
+        (_SEND_PREV, tensor_send_prev),
+    ):
+        if tensor is not None and list(tensor.size()) != shapes[direction]:
+            raise RuntimeError(
+                f"tensor of shape {list(tensor.size())} does not match the "
+                f"announced shape {shapes[direction]}, pad the data to the "
+                f"announced sequence length"
+            )
+    _SAVED_SHAPE_MESSAGES += len(directions)
+    return shapes.get(_RECV_PREV, [0, 0, 0]), shapes.get(_RECV_NEXT, [0, 0, 0])
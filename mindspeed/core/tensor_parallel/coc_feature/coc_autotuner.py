@@ -0,0 +1,201 @@
+# Copyright (c) 2025, Huawei Technologies Co., Ltd.  All rights reserved.
+"""Online autotuner of the CoC split count (parallel_num).
+
+The first time a GEMM shape is seen, every candidate split count is timed,
+the timings are reduced over the tensor parallel group so that all ranks
+pick the same winner, and the winner is kept in a json cache keyed by the
+shape, communication type, dtype, tensor parallel size and hardware. Later
+jobs load the cache at startup and do not time the known shapes again.
+
+Every rank loads the cache on its own, so before using or timing a shape the
+ranks of the tensor parallel group reduce whether they miss it: they all time
+it if any of them misses it. The cache file is shared by the tensor parallel
+groups of the job, it is merged and replaced under a file lock.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence
+
+import torch
+
+CANDIDATE_PARALLEL_NUMS = (1, 2, 4, 8)
+CACHE_VERSION = 1
+
+
+def get_hardware_name():
+    try:
+        return torch.npu.get_device_name()
+    except Exception:
+        return "unknown"
+
+
+def make_cache_key(m, k, n, comm_type, dtype, tp_size, hardware):
+    comm_name = getattr(comm_type, "name", comm_type)
+    return f"m={m},k={k},n={n},comm={comm_name},dtype={dtype},tp={tp_size},hw={hardware}"
+
+
+def is_valid_parallel_num(m, parallel_num, comm_type, tp_size):
+    """The rows of every split have to be divisible by the tensor parallel size, except for all-reduce."""
+    comm_name = getattr(comm_type, "name", comm_type)
+    rows_divisor = parallel_num if comm_name == "ALL_REDUCE" else parallel_num * tp_size
+    return m >= rows_divisor and m % rows_divisor == 0
+
+
+class CoCAutotuner:
+    """
+    Chooses the split count of a CoC matmul by timing the candidates.
+
+    Args:
+        tp_size: tensor parallel size, part of the cache key.
+        candidates: split counts to time.
+        cache_path: json file of the winners, loaded at init and updated when a new shape is tuned.
+        timing_fn: ``timing_fn(m, k, n, comm_type, dtype, parallel_num)`` returns the time of one
+                   run in milliseconds. It runs collectives on the NPU by default, so all ranks of
+                   the tensor parallel group have to call the tuner with the same shapes in order.
+        reduce_fn: ``reduce_fn(values)`` reduces a list of timings or cache misses over the tensor parallel
+                   group, by default the maximum with an all-reduce, so all ranks agree on the winner.
+        hardware: hardware string of the cache key, the NPU name by default.
+        save_cache: whether this rank writes the cache file, usually tensor parallel rank 0.
+    """
+
+    def __init__(
+        self,
+        tp_size: int,
+        candidates: Sequence[int] = CANDIDATE_PARALLEL_NUMS,
+        cache_path: Optional[str] = None,
+        timing_fn: Optional[Callable] = None,
+        reduce_fn: Optional[Callable[[List[float]], List[float]]] = None,
+        hardware: Optional[str] = None,
+        save_cache: bool = True,
+    ):
+        self.tp_size = tp_size
+        self.candidates = tuple(candidates)
+        self.cache_path = cache_path
+        self.timing_fn = timing_fn if timing_fn is not None else time_coc_parallel
+        self.reduce_fn = reduce_fn if reduce_fn is not None else all_reduce_max_over_tp
+        self.hardware = hardware if hardware is not None else get_hardware_name()
+        self.save_cache = save_cache
+        self.entries: Dict[str, Dict] = {}
+        # keys that the ranks of the tensor parallel group agreed on
+        self._agreed_keys = set()
+        self.num_tuned = 0
+        if self.cache_path is not None and os.path.exists(self.cache_path):
+            self.entries.update(self._read_cache())
+
+    def get_parallel_num(self, m, k, n, comm_type, dtype):
+        key = make_cache_key(m, k, n, comm_type, dtype, self.tp_size, self.hardware)
+        if key not in self._agreed_keys:
+            self.entries[key] = self._agree_on_entry(key, m, k, n, comm_type, dtype)
+            self._agreed_keys.add(key)
+        return self.entries[key]["parallel_num"]
+
+    def _agree_on_entry(self, key, m, k, n, comm_type, dtype):
+        """
+        Returns the entry of a shape seen for the first time by this job. The ranks may have read different
+        caches, e.g. while another job wrote it, so a miss on any rank makes all the ranks time the shape and
+        a hit on all the ranks takes the maximum of the cached winners.
+        """
+        entry = self.entries.get(key)
+        miss, parallel_num = self.reduce_fn([float(entry is None), 0. if entry is None else entry["parallel_num"]])
+        if not miss:
+            return dict(entry, parallel_num=int(parallel_num))
+        entry = self._tune(m, k, n, comm_type, dtype)
+        self.num_tuned += 1
+        if self.cache_path is not None and self.save_cache:
+            self._write_cache({key: entry})
+        return entry
+
+    def _tune(self, m, k, n, comm_type, dtype):
+        candidates = [parallel_num for parallel_num in self.candidates
+                      if is_valid_parallel_num(m, parallel_num, comm_type, self.tp_size)]
+        if not candidates:
+            return {"parallel_num": 1, "timings_ms": {}}
+        timings = [float(self.timing_fn(m, k, n, comm_type, dtype, parallel_num)) for parallel_num in candidates]
+        timings = list(self.reduce_fn(timings))
+        # the first of the equal timings wins, i.e. the smallest split count
+        best = min(range(len(candidates)), key=lambda i: timings[i])
+        return {
+            "parallel_num": candidates[best],
+            "timings_ms": {str(parallel_num): timing for parallel_num, timing in zip(candidates, timings)},
+        }
+
+    def export_timings(self, path=None):
+        """Returns the tuned shapes with the timings of their candidates, and writes them to ``path`` as json."""
+        records = [dict(key=key, **entry) for key, entry in sorted(self.entries.items())]
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(records, f, indent=2)
+        return records
+
+    def _read_cache(self):
+        with open(self.cache_path, "r") as f:
+            cache = json.load(f)
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("entries", {})
+
+    def _write_cache(self, new_entries):
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+        # the tensor parallel groups of this job and the other jobs add their entries to the same file
+        with _file_lock(self.cache_path + ".lock"):
+            entries = self._read_cache() if os.path.exists(self.cache_path) else {}
+            entries.update(new_entries)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": CACHE_VERSION, "entries": entries}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o640)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def all_reduce_max_over_tp(timings):
+    from .min_comm_cfg import min_comm_config
+    timings = torch.tensor(timings, dtype=torch.float32, device=torch.npu.current_device())
+    torch.distributed.all_reduce(timings, op=torch.distributed.ReduceOp.MAX, group=min_comm_config.tp_group)
+    return timings.tolist()
+
+
+def time_coc_parallel(m, k, n, comm_type, dtype, parallel_num, warmup=2, iters=5):
+    """Times a COCParallel run on random inputs of the shape of the matmul."""
+    from .coc_utils import COCParallel, CommunicationType
+    from .min_comm_cfg import min_comm_config
+
+    device = torch.npu.current_device()
+    weight = torch.randn(k, n, dtype=dtype, device=device)
+    if comm_type == CommunicationType.ALL_GATHER:
+        input_ = torch.randn(m // min_comm_config.tp_world_size, k, dtype=dtype, device=device)
+    else:
+        input_ = torch.randn(m, k, dtype=dtype, device=device)
+    compute_first = comm_type != CommunicationType.ALL_GATHER
+
+    def compute_fcn(input_tensor, output_tensor=None):
+        if output_tensor is None:
+            return torch.matmul(input_tensor, weight)
+        return torch.matmul(input_tensor, weight, out=output_tensor)
+
+    def run():
+        return COCParallel(input_, comm_type, compute_fcn, compute_first=compute_first,
+                           weight_shape_list=[k, n], parallel_num=parallel_num).run()
+
+    for _ in range(warmup):
+        run()
+    start, end = torch.npu.Event(enable_timing=True), torch.npu.Event(enable_timing=True)
+    start.record()
+    for _ in range(iters):
+        run()
+    end.record()
+    end.synchronize()
+    return start.elapsed_time(end) / iters
@@ -36,7 +36,9 @@ class COCRowAllReduceFunction(RewriteRowAllReduceFunction):
 
         parallel_num = get_parallel_num(m=reduce(lambda x, y: x * y, input_.shape[:-1]),
                                         k=trans_weight.shape[0],
-                                        n=trans_weight.shape[1])
+                                        n=trans_weight.shape[1],
+                                        comm_type=CommunicationType.ALL_REDUCE,
+                                        dtype=input_.dtype)
         if parallel_num == 1:
             return RewriteRowAllReduceFunction.forward(ctx, input_, weight, bias)
 
@@ -52,7 +54,7 @@ class COCRowAllReduceFunction(RewriteRowAllReduceFunction):
             return output_tensor
 
         coc_all_gather = COCParallel(input_, CommunicationType.ALL_REDUCE, compute_fcn, compute_first=True,
-                                   weight_shape_list=list(trans_weight.shape))
+                                   weight_shape_list=list(trans_weight.shape), parallel_num=parallel_num)
         output_ = coc_all_gather.run()
         output_ = output_.reshape(output_orig_shape)
         if bias is not None:
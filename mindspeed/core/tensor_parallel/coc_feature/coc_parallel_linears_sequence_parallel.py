@@ -24,7 +24,9 @@ class COCColumnSeqParallelFunction(torch.autograd.Function):
 
         parallel_num = get_parallel_num(m=reduce(lambda x, y: x * y, input_.shape[:-1]) * min_comm_config.tp_world_size,
                                         k=trans_weight.shape[0],
-                                        n=trans_weight.shape[1])
+                                        n=trans_weight.shape[1],
+                                        comm_type=CommunicationType.ALL_GATHER,
+                                        dtype=input_.dtype)
         if parallel_num == 1:
             return RewriteColumnSeqParallelFunction.forward(ctx, input_, weight, bias)
 
@@ -138,7 +140,9 @@ class COCRowSeqParallelFunction(torch.autograd.Function):
 
         parallel_num = get_parallel_num(m=reduce(lambda x, y: x * y, input_.shape[:-1]),
                                         k=trans_weight.shape[0],
-                                        n=trans_weight.shape[1])
+                                        n=trans_weight.shape[1],
+                                        comm_type=CommunicationType.REDUCE_SCATTER,
+                                        dtype=input_.dtype)
         if parallel_num == 1:
             return RewriteRowSeqParallelFunction.forward(ctx, input_, weight, bias)
 
@@ -169,7 +173,9 @@ class COCRowSeqParallelFunction(torch.autograd.Function):
         parallel_num = get_parallel_num(
             m=reduce(lambda x, y: x * y, grad_output.shape[:-1]) * min_comm_config.tp_world_size,
             k=weight.shape[0],
-            n=weight.shape[1]
+            n=weight.shape[1],
+            comm_type=CommunicationType.ALL_GATHER,
+            dtype=grad_output.dtype
         )
         if parallel_num == 1:
             return RewriteRowSeqParallelFunction.backward(ctx, grad_output)
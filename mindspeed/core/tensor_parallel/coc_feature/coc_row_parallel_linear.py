@@ -157,6 +157,8 @@ class CoCRowParallelLinearImpl(torch.nn.Module):
             self.config.coc_parallel_num,
             self.config.coc_fused_kernel
         )
+        min_comm_config.register_autotune(getattr(self.config, 'coc_autotune', False),
+                                          getattr(self.config, 'coc_autotune_cache', None))
         min_comm_config.register_sequence_parallel_switch(self.sequence_parallel)
 
         min_comm_config.register_customized_coc(get_value_from_cfg('customized_coc'))
@@ -70,11 +70,13 @@ def is_grad_needed(needs_input_grad):
     return is_grad_weight_needed, is_grad_bias_needed
 
 
-def get_parallel_num(m, k, n, default_parallel_num=None):
+def get_parallel_num(m, k, n, default_parallel_num=None, comm_type=None, dtype=None):
     parallel_num = default_parallel_num if default_parallel_num is not None else min_comm_config.parallel_num
     shape_str = str([m, k, n])
     if len(min_comm_config.customized_coc_dict) > 0 and str(shape_str) in min_comm_config.customized_coc_dict.keys():
         parallel_num = min_comm_config.customized_coc_dict.get(shape_str)
+    elif min_comm_config.autotuner is not None and comm_type is not None and not min_comm_config.coc_fused_kernel:
+        parallel_num = min_comm_config.autotuner.get_parallel_num(m, k, n, comm_type, dtype)
     if not min_comm_config.coc_fused_kernel and m < parallel_num:
         return 1
     if parallel_num not in [-1, 1, 2, 4, 8]:
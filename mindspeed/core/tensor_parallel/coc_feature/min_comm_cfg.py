@@ -26,6 +26,7 @@ class MinCommConfig:
         self.coc_mode = None  # coc_mode degee (-1, 0, 1, 2)  -1:auto 0:close 1:debug(same like close) 2:open
         self.parallel_num = None  # Parallelism degree (-1, 1, 2, 4, 8)
         self.coc_fused_kernel = None
+        self.autotuner = None  # CoCAutotuner of the split counts when autotune is enabled
 
         # configurations registered from framework
         self.ColumnParallelLinear = None
@@ -78,7 +79,7 @@ class MinCommConfig:
                 "is coc turned on": True,
                 "use script or use fused kernel": "script",
                 "coc mode": self.coc_mode,
-                "parallel num": self.parallel_num,
+                "parallel num": "autotune" if self.autotuner is not None else self.parallel_num,
                 "module type": self.module_type.name,
                 "is sequence parallel enabled": self.sequence_parallel_enabled,
                 "if get aligned mm inputs": self.matmul_soc_friendly_enabled
@@ -117,6 +118,17 @@ class MinCommConfig:
         self.parallel_num = coc_parallel_num
         self.coc_fused_kernel = coc_fused_kernel
 
+    def register_autotune(self, coc_autotune, coc_autotune_cache=None):
+        """Enable/disable the autotune of the split counts, the winners are cached in coc_autotune_cache."""
+        if not coc_autotune:
+            self.autotuner = None
+            return
+        if self.autotuner is not None and self.autotuner.cache_path == coc_autotune_cache:
+            return
+        from .coc_autotuner import CoCAutotuner
+        self.autotuner = CoCAutotuner(self.tp_world_size, cache_path=coc_autotune_cache,
+                                      save_cache=self.tp_rank == 0)
+
     def register_mappings(self, _all_reduce, _reduce_scatter_along_first_dim, _gather_along_first_dim):
         """Register mapping helper functions."""
         self.all_reduce = _all_reduce
@@ -174,11 +186,12 @@ class MinCommConfig:
             raise RuntimeError("coc_mode must be either 0, 1, or 2. Current value not supported")
 
         if self.coc_mode == -1:
-            self.coc_mode = 0 if self.parallel_num == 1 else 2
+            self.coc_mode = 0 if self.parallel_num == 1 and self.autotuner is None else 2
 
         if tp_size == 1:
             self.coc_mode = 0
             self.parallel_num = 1
+            self.autotuner = None
 
         if self.sequence_parallel_enabled:
             self.module_type = sequence_parallel_types[self.coc_mode]
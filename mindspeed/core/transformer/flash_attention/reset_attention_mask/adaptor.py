@@ -23,6 +23,7 @@ from mindspeed.utils import get_position_ids, set_position_ids
 from mindspeed.core.context_parallel.get_batch_utils import get_actual_seq_len, set_actual_seq_len
 from mindspeed.core.context_parallel.rotary_pos_embedding_utils import get_pos_emb_on_this_cp_rank
 from mindspeed.core.fusions.fused_rope import apply_rotary_pos_emb_bshd, apply_rotary_pos_emb
+from mindspeed.core.models.common.embeddings.rotary_pos_embedding import get_rotary_emb, gather_rotary_emb
 
 
 def _p2p_ops_eod(
@@ -418,29 +419,8 @@ def rotary_forward(self, max_seq_len: int, offset: int = 0, packed_seq: bool = F
     if self.inv_freq.device.type == 'cpu':
         # move `inv_freq` to GPU once at the first micro-batch forward pass
         self.inv_freq = self.inv_freq.to(device=torch.cuda.current_device())
-    seq = (
-        torch.arange(max_seq_len, device=self.inv_freq.device, dtype=self.inv_freq.dtype)
-        + offset
-    )
-
-    if self.seq_len_interpolation_factor is not None:
-        seq *= 1 / self.seq_len_interpolation_factor
-
-    freqs = torch.outer(seq, self.inv_freq)
-    # first part even vector components, second part odd vector components,
-    #  2 * dim in dimension size
-    if not self.rotary_interleaved:
-        emb = torch.cat((freqs, freqs), dim=-1)
-    else:
-        emb = torch.stack((freqs.view(-1, 1), freqs.view(-1, 1)), dim=-1).view(
-            freqs.shape[0], -1
-        )
-    # emb [seq_length, .., dim]
-    emb = emb[:, None, None, :]
-
-    position_ids = get_position_ids()
-    s, b = position_ids.shape
-    emb = emb[position_ids.view(-1)].squeeze(1).reshape(s, b, 1, -1)
+    emb = get_rotary_emb(self, max_seq_len, offset)
+    emb = gather_rotary_emb(emb, get_position_ids())
 
     if parallel_state.get_context_parallel_world_size() > 1 and not packed_seq:
         # slice rotary_pos_emb along sequence dimension and select the parition of the current CP rank
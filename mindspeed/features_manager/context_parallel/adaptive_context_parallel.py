@@ -30,10 +30,21 @@ class AdaptiveContextParallelFeature(MindSpeedFeature):
                            help='not apply remapping but only rescheduling process in adaptive-cp feature')
         group.add_argument('--adaptive-cp-manually-set-mask-list', action='store_true',
                            help='manually set pre-cooked attention mask list')
+        group.add_argument('--adaptive-cp-cache-size', type=int, default=0,
+                           help='number of attention mask patterns whose adaptive cp remap and scheduling are cached '
+                                'with --adaptive-cp-dynamic-attn-mask, 0 (default) disables the cache')
+        group.add_argument('--adaptive-cp-async-remap', action='store_true',
+                           help='remap attention masks missing from the adaptive cp cache in a background thread, '
+                                'the step uses the plan without remapping until the remap is done')
 
 
     def validate_args(self, args):
         # adaptive context parallel
+        if args.adaptive_cp_cache_size < 0:
+            raise AssertionError("--adaptive-cp-cache-size must be non-negative")
+        if args.adaptive_cp_async_remap and not (args.adaptive_cp_dynamic_attn_mask and args.adaptive_cp_cache_size > 0):
+            raise AssertionError("--adaptive-cp-async-remap requires --adaptive-cp-dynamic-attn-mask and a positive "
+                                 "--adaptive-cp-cache-size")
         if args.context_parallel_size > 1 and args.context_parallel_algo == 'adaptive_cp_algo':
             if args.seq_length % args.context_parallel_size != 0:
                 raise AssertionError("sequence length must be divisible by context_parallel_size")
@@ -18,7 +18,7 @@ class MindSpeedFeaturesManager:
         for feature in cls.FEATURES_LIST:
             if feature.is_need_apply(mindspeed_args):
                 feature.pre_register_patches(MindSpeedPatchesManager, mindspeed_args)
-        MindSpeedPatchesManager.apply_patches()
+        MindSpeedPatchesManager.apply_patches(phase='pre_patches')
 
     @classmethod
     def apply_features_patches(cls, mindspeed_args):
@@ -26,7 +26,7 @@ class MindSpeedFeaturesManager:
         for feature in cls.FEATURES_LIST:
             if feature.is_need_apply(mindspeed_args):
                 feature.register_patches(MindSpeedPatchesManager, mindspeed_args)
-        MindSpeedPatchesManager.apply_patches()
+        MindSpeedPatchesManager.apply_patches(phase='patches')
 
     @classmethod
     def register_features_args(cls, parser):
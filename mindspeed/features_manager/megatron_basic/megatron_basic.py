@@ -61,6 +61,10 @@ class MegatronBasicFeature(MindSpeedFeature):
         from mindspeed.training import get_device_arch_version
         pm.register_patch('megatron.training.utils.get_device_arch_version', get_device_arch_version)
 
+        # finalize the legacy async checkpoint save with the blocking finalization of the megatron async saves
+        from mindspeed.async_checkpoint import maybe_finalize_async_save_wrapper
+        pm.register_patch('megatron.training.async_utils.maybe_finalize_async_save', maybe_finalize_async_save_wrapper)
+
         # fix count_zeros in ChainedOptimizer for core_r0.12.1.
         from mindspeed.core.megatron_basic.count_zero_fix import step
         pm.register_patch('megatron.core.optimizer.optimizer.ChainedOptimizer.step', step)
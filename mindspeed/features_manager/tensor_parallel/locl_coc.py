@@ -20,6 +20,12 @@ class CoCFeature(MindSpeedFeature):
                            help='coc parallel num')
         group.add_argument('--coc-fused-kernel', action='store_true',
                            help='use coc fused kernel')
+        group.add_argument('--coc-autotune', action='store_true',
+                           help='time the coc parallel nums 1/2/4/8 for every matmul shape at its first run '
+                                'and use the fastest one')
+        group.add_argument('--coc-autotune-cache', type=str, default=None,
+                           help='json file of the coc autotune results, loaded at startup and updated with '
+                                'the newly tuned shapes')
 
     def validate_args(self, args):
         self.incompatible_check(args, 'unaligned_linear')
@@ -1592,7 +1592,10 @@ def switch_mlp_init_wrapper(fn):
                 no_drop=global_args.moe_no_drop,
                 dynamic_padding=global_args.moe_dynamic_padding,
                 use_sinkhorn=global_args.moe_use_sinkhorn,
-                sequence_parallel=config.sequence_parallel
+                sequence_parallel=config.sequence_parallel,
+                sparse_dispatch=global_args.moe_sparse_dispatch,
+                capacity_bucket_size=global_args.moe_capacity_bucket_size,
+                capacity_shrink_patience=global_args.moe_capacity_shrink_patience
             )
         else:
             if layer_number % global_args.expert_interval == 0:
@@ -1610,7 +1613,10 @@ def switch_mlp_init_wrapper(fn):
                     no_drop=global_args.moe_no_drop,
                     dynamic_padding=global_args.moe_dynamic_padding,
                     use_sinkhorn=global_args.moe_use_sinkhorn,
-                    sequence_parallel=config.sequence_parallel
+                    sequence_parallel=config.sequence_parallel,
+                    sparse_dispatch=global_args.moe_sparse_dispatch,
+                    capacity_bucket_size=global_args.moe_capacity_bucket_size,
+                    capacity_shrink_patience=global_args.moe_capacity_shrink_patience
                 )
             else:
                 self.block = ParallelMLP(config)
@@ -0,0 +1,77 @@
+# coding=utf-8
+# Copyright (c) 2024 Huawei Technologies Co., Ltd. All rights reserved.
+
+import torch
+import torch.distributed as dist
+
+
+class CapacityNegotiator:
+    """Negotiates the no-drop capacity of one MoE layer across ranks without host synchronization.
+
+    The capacity stays a device tensor and the ranks agree on it with a single all-reduce of the max required
+    capacity. Without bucket_size, the capacity is the predicted capacity unless some rank needs more, in which
+    case it is the max over ranks. With bucket_size, the capacity is rounded up to a multiple of bucket_size, it
+    grows as soon as a rank needs more and only shrinks after the required bucket stayed lower for
+    shrink_patience consecutive steps, to the largest bucket required during those steps. The returned capacity is
+    capped to the number of tokens of the rank, which may be lower than the bucket.
+    """
+
+    def __init__(self, bucket_size=0, shrink_patience=16):
+        self.bucket_size = bucket_size
+        self.shrink_patience = shrink_patience
+        self.capacity = None
+        self.shrink_capacity = None
+        self.below_steps = None
+        self.num_changes = None
+        self.num_steps = 0
+
+    def negotiate(self, cur_capacity, predicted_capacity, num_tokens):
+        """Returns the capacity of this step as an int64 device tensor.
+
+        Args:
+            cur_capacity (Tensor): the capacity required by the tokens of this rank.
+            predicted_capacity (Tensor): the capacity predicted by the sliding window of MOELayer.
+            num_tokens (int): the number of tokens of this rank, the capacity is capped to it.
+        """
+        cur_capacity = cur_capacity.to(torch.int64)
+        max_capacity = cur_capacity.clone()
+        dist.all_reduce(max_capacity, op=dist.ReduceOp.MAX, group=dist.group.WORLD)
+
+        if self.bucket_size:
+            capacity = self._schedule(max_capacity)
+        else:
+            capacity = torch.maximum(max_capacity, predicted_capacity.to(max_capacity.device))
+
+        if self.num_changes is None:
+            self.num_changes = torch.zeros_like(capacity)
+        elif self.capacity is not None:
+            self.num_changes += (capacity != self.capacity).to(torch.int64)
+        # the schedule keeps the capacity agreed by all ranks, only the returned capacity is capped for this rank
+        self.capacity = capacity
+        self.num_steps += 1
+        return torch.clamp(capacity, max=num_tokens)
+
+    def _schedule(self, max_capacity):
+        bucket = torch.div(max_capacity + self.bucket_size - 1, self.bucket_size,
+                           rounding_mode='floor') * self.bucket_size
+        if self.capacity is None:
+            self.shrink_capacity = torch.zeros_like(bucket)
+            self.below_steps = torch.zeros_like(bucket)
+            return bucket
+
+        below = bucket < self.capacity
+        self.below_steps = torch.where(below, self.below_steps + 1, torch.zeros_like(self.below_steps))
+        self.shrink_capacity = torch.where(self.below_steps == 1, bucket,
+                                           torch.maximum(self.shrink_capacity, bucket))
+        shrink = self.below_steps >= max(self.shrink_patience, 1)
+        self.below_steps = torch.where(shrink, torch.zeros_like(self.below_steps), self.below_steps)
+        capacity = torch.where(bucket > self.capacity, bucket, self.capacity)
+        return torch.where(shrink, self.shrink_capacity, capacity)
+
+    def stats(self):
+        """Number of steps and capacity changes of this layer, synchronizes with the device."""
+        return {
+            'steps': self.num_steps,
+            'capacity_changes': 0 if self.num_changes is None else int(self.num_changes),
+            'capacity': None if self.capacity is None else int(self.capacity),
+        }
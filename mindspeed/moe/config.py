@@ -3,6 +3,8 @@
 
 import torch
 
+from .capacity import CapacityNegotiator
+
 
 class Config:
     def __init__(self,
@@ -21,6 +23,9 @@ class Config:
                  use_sinkhorn=False,
                  sequence_parallel=False,
                  reshape_index_select=None,
+                 sparse_dispatch=False,
+                 capacity_bucket_size=0,
+                 capacity_shrink_patience=16,
                  ):
         self.hidden_size = hidden_size
         self.num_experts = num_experts
@@ -36,7 +41,10 @@ class Config:
         self.dynamic_padding = dynamic_padding
         self.use_sinkhorn = use_sinkhorn
         self.dynamic_capacity = None
+        self.capacity_negotiator = CapacityNegotiator(capacity_bucket_size, capacity_shrink_patience) \
+            if dynamic_padding else None
         self.sequence_parallel = sequence_parallel
+        self.sparse_dispatch = sparse_dispatch
         self.reshape_index_select = None
         if reshape_index_select:
             self.reshape_index_select = torch.tensor(reshape_index_select, dtype=torch.int32,
@@ -24,6 +24,8 @@ exp_selection_uniform_map: Dict[torch.device, Callable] = {}
 
 
 GatingTokenRearrangeInfo = namedtuple('GatingTokenRearrangeInfo', ['token_rearranged_ec_idx', 'token_exp_weights', 'expert_select_token_idx'])
+GatingSparseDispatchInfo = namedtuple('GatingSparseDispatchInfo', ['expert_select_token_idx', 'token_ec_idx', 'token_exp_weights',
+                                                                   'expert_token_offsets', 'capacity'])
 
 
 class TopKGate(Module):
@@ -98,19 +100,8 @@ def top1gating(logits: Tensor, config: Config) -> Tuple[Tensor, ...]:
         # gating decisions
         exp_counts = torch.sum(token_sel_expert_mask, dim=0).detach()
         if config.dynamic_padding:
-            new_capacity = torch.max(exp_counts)
-            cur_capacity = new_capacity.item()
-            capacity = config.dynamic_capacity.to(logits.device)
-
-            flag = cur_capacity > capacity
-            dist.reduce(flag, dst=0, op=torch.distributed.ReduceOp.SUM, group=dist.group.WORLD)
-            dist.broadcast(flag, src=0, group=dist.group.WORLD)
-            if flag:
-                dist.all_reduce(new_capacity, op=dist.ReduceOp.MAX, group=dist.group.WORLD)
-                capacity = new_capacity
-
-            if cur_capacity > logits.shape[0]:
-                capacity = torch.ceil(torch.tensor(logits.shape[0])).to(torch.int64)
+            cur_capacity = torch.max(exp_counts)
+            capacity = config.capacity_negotiator.negotiate(cur_capacity, config.dynamic_capacity, logits.shape[0])
         else:
             new_capacity = torch.max(exp_counts).to(logits.device)
             dist.all_reduce(new_capacity, op=dist.ReduceOp.MAX, group=dist.group.WORLD)
@@ -162,6 +153,14 @@ def top1gating(logits: Tensor, config: Config) -> Tuple[Tensor, ...]:
                                                            token_exp_weights=token_exp_weights,
                                                            expert_select_token_idx=expert_select_token_idx)
         return l_aux, top1_gating_token_infos
+    elif config.sparse_dispatch:
+        token_exp_weights, token_exp_idx = torch.max(token_sel_expert_weights, dim=1)
+        dispatch_info = sparse_dispatch_info(token_exp_idx.unsqueeze(0), token_offset_for_expert.unsqueeze(0),
+                                             token_exp_weights.unsqueeze(0), capacity, num_experts)
+        if config.dynamic_padding:
+            return l_aux, dispatch_info, cur_capacity
+        else:
+            return l_aux, dispatch_info
     else:
         token_locations_sc = _one_hot_to_float(token_offset_for_expert, capacity)
         combine_weights = einsum("se,sc->sec", token_sel_expert_weights, token_locations_sc)
@@ -172,6 +171,31 @@ def top1gating(logits: Tensor, config: Config) -> Tuple[Tensor, ...]:
             return l_aux, combine_weights, dispatch_mask
 
 
+def sparse_dispatch_info(token_exp_idx, token_idx_in_expert, token_exp_weights, capacity, num_experts):
+    """Index form of combine_weights and dispatch_mask.
+
+    The inputs are [k, S], one entry per (token, selected expert) pair. Pairs with zero weight are dropped like
+    the zeros of dispatch_mask, the others are sorted by their slot in the [E * C] expert buffer, so the tokens
+    of expert e are expert_select_token_idx[expert_token_offsets[e]:expert_token_offsets[e + 1]].
+    """
+    capacity = int(capacity)
+    num_tokens = token_exp_idx.shape[1]
+    token_ec_idx = (token_exp_idx.long() * capacity + token_idx_in_expert.long()).reshape(-1)
+    token_exp_weights = token_exp_weights.reshape(-1)
+
+    kept_pair_idx = torch.nonzero(token_exp_weights != 0).squeeze(1)
+    token_ec_idx, order = torch.sort(token_ec_idx[kept_pair_idx])
+    kept_pair_idx = kept_pair_idx[order]
+    expert_token_counts = torch.bincount(torch.div(token_ec_idx, capacity, rounding_mode='floor'),
+                                         minlength=num_experts)
+    expert_token_offsets = F.pad(torch.cumsum(expert_token_counts, dim=0), (1, 0))
+    return GatingSparseDispatchInfo(expert_select_token_idx=kept_pair_idx % num_tokens,
+                                    token_ec_idx=token_ec_idx,
+                                    token_exp_weights=token_exp_weights[kept_pair_idx],
+                                    expert_token_offsets=expert_token_offsets,
+                                    capacity=capacity)
+
+
 def apply_aux_loss(config, gates, mask1):
     num_experts = int(gates.shape[1])
     me = torch.mean(gates, dim=0)
@@ -232,18 +256,8 @@ def top2gating(logits: Tensor, config: Config) -> Tuple[Tensor, Tensor, Tensor,
     token_sel_expert_weights, l_aux = apply_aux_loss(config, token_sel_expert_weights, first_expert_mask)
     if config.no_drop:
         if config.dynamic_padding:
-            new_capacity = torch.max(locations_in_second_expert) + 2
-            cur_capacity = new_capacity.item()
-            capacity = config.dynamic_capacity.to(logits.device)
-
-            flag = cur_capacity > capacity
-            dist.reduce(flag, dst=0, op=torch.distributed.ReduceOp.SUM, group=dist.group.WORLD)
-            dist.broadcast(flag, src=0, group=dist.group.WORLD)
-            if flag:
-                dist.all_reduce(new_capacity, op=dist.ReduceOp.MAX, group=dist.group.WORLD)
-                capacity = new_capacity
-            if cur_capacity > logits.shape[0]:
-                capacity = torch.ceil(torch.tensor(logits.shape[0])).to(torch.int64)
+            cur_capacity = torch.max(locations_in_second_expert) + 2
+            capacity = config.capacity_negotiator.negotiate(cur_capacity, config.dynamic_capacity, logits.shape[0])
         else:
             new_capacity = torch.max(locations_in_second_expert) + 2
             dist.all_reduce(new_capacity, op=dist.ReduceOp.MAX, group=dist.group.WORLD)
@@ -289,6 +303,15 @@ def top2gating(logits: Tensor, config: Config) -> Tuple[Tensor, Tensor, Tensor,
                                                            token_exp_weights=token_exp_weights,
                                                            expert_select_token_idx=expert_select_token_idx)
         return l_aux, top2_gating_token_infos
+    elif config.sparse_dispatch:
+        dispatch_info = sparse_dispatch_info(torch.stack([token_first_exp_idx, token_second_exp_idx]),
+                                             torch.stack([token_idx_in_first_expert, token_idx_in_second_expert]),
+                                             torch.stack([token_first_exp_weights, token_second_exp_weights]),
+                                             capacity, num_experts)
+        if config.dynamic_padding:
+            return l_aux, dispatch_info, cur_capacity
+        else:
+            return l_aux, dispatch_info
     else:
         # Calculate combine_weights and dispatch_mask
         gates1 = einsum("s,se->se", token_first_exp_weights, first_expert_mask_float)
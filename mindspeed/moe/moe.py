@@ -32,6 +32,11 @@ class MoE(torch.nn.Module):
         aux_loss_coef (int, optional): default=0.0, scaling coefficient for the aux loss.
         z_loss_coef (int, optional): default=0.0, scaling coefficient for the z loss.
         noisy_gate_policy (str, optional): default=None, noisy gate policy, valid options are 'Jitter', 'RSample' or 'None'.
+        sparse_dispatch (bool, optional): default=False, dispatch tokens through per-expert token indices instead of
+            dense [S, E, C] combine weights and dispatch mask.
+        capacity_bucket_size (int, optional): default=0, round the dynamic padding capacity up to multiples of it.
+        capacity_shrink_patience (int, optional): default=16, number of consecutive steps the bucketed capacity must
+            be oversized before it shrinks.
     """
 
     def __init__(self,
@@ -50,7 +55,10 @@ class MoE(torch.nn.Module):
                  no_drop=False,
                  dynamic_padding=False,
                  use_sinkhorn=False,
-                 sequence_parallel=False):
+                 sequence_parallel=False,
+                 sparse_dispatch=False,
+                 capacity_bucket_size=0,
+                 capacity_shrink_patience=16):
         super(MoE, self).__init__()
         args = get_args()
         pipe_experts = args.use_pipe_experts
@@ -87,7 +95,10 @@ class MoE(torch.nn.Module):
                         dynamic_padding=dynamic_padding,
                         use_sinkhorn=use_sinkhorn,
                         sequence_parallel=sequence_parallel,
-                        reshape_index_select=reshape_index_select
+                        reshape_index_select=reshape_index_select,
+                        sparse_dispatch=sparse_dispatch,
+                        capacity_bucket_size=capacity_bucket_size,
+                        capacity_shrink_patience=capacity_shrink_patience
                         )
         self.moe_layer = MOELayer(TopKGate(config),
                                   Experts(expert, num_local_experts),
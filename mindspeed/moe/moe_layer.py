@@ -12,7 +12,7 @@ from torch import Tensor
 from torch.nn import Module
 import torch.distributed as dist
 
-from .utils import _AllToAll, einsum
+from .utils import _AllToAll, einsum, sparse_dispatch, sparse_combine
 from .pipe_experts import PipeExpert
 
 if TYPE_CHECKING:
@@ -71,31 +71,46 @@ class MOELayer(Base):
     def set_ep_group(self, ep_group):
         self.ep_group = ep_group
 
+    def update_dynamic_capacity(self, cur_capacity_cur_rank, device):
+        if self.gate.config.capacity_negotiator.bucket_size:
+            # the bucketed capacity schedule does not use the predicted capacity.
+            return
+        self.capacity_history_window.append(cur_capacity_cur_rank.reshape(1).to(torch.float32))
+        self.cur_index_window += 1
+        if len(self.capacity_history_window) > self.capacity_window_size:
+            self.capacity_history_window.pop(0)
+        if self.cur_index_window == self.capacity_window_size - 1:
+            self.cur_index_window = 0
+            capacity_history_window_tensor = torch.cat(self.capacity_history_window[-5:]).to(device)
+            dist.all_reduce(capacity_history_window_tensor, op=torch.distributed.ReduceOp.MAX,
+                            group=dist.group.WORLD)
+            self.capacity_history_window = list(capacity_history_window_tensor.split(1))
+
+            capacity_next_window = capacity_history_window_tensor.mean() + 20
+            self.gate.config.dynamic_capacity = torch.ceil(capacity_next_window).to(torch.int64)
+
+    def capacity_stats(self):
+        """Steps and capacity changes of the dynamic padding capacity of this layer."""
+        if self.gate.config.capacity_negotiator is None:
+            return None
+        return self.gate.config.capacity_negotiator.stats()
+
     def forward(self, *input: Tensor, **kwargs: Any) -> Tensor:
         d_model = input[0].shape[-1]
         reshaped_input = input[0].reshape(-1, d_model)
         from megatron.training import get_args
         all_args = get_args()
         # gate
-        if not all_args.enable_token_rearrange_opt:
+        if self.gate.config.sparse_dispatch:
+            gate_output = self.gate(reshaped_input)
+            self.l_aux, dispatch_info = gate_output[:2]
+            if self.gate.config.dynamic_padding:
+                self.update_dynamic_capacity(gate_output[2], reshaped_input.device)
+            dispatched_input = sparse_dispatch(reshaped_input, dispatch_info, self.num_experts)
+        elif not all_args.enable_token_rearrange_opt:
             if self.gate.config.dynamic_padding:
                 self.l_aux, combine_weights, dispatch_mask, cur_capacity_cur_rank = self.gate(reshaped_input)
-                self.capacity_history_window.append(cur_capacity_cur_rank)
-                self.cur_index_window += 1
-                if len(self.capacity_history_window) > self.capacity_window_size:
-                    self.capacity_history_window.pop(0)
-                if self.cur_index_window == self.capacity_window_size - 1:
-                    self.cur_index_window = 0
-                    capacity_history_window_tensor = torch.Tensor(self.capacity_history_window[-5:]).to(combine_weights.device)
-                    dist.all_reduce(capacity_history_window_tensor, op=torch.distributed.ReduceOp.MAX,
-                                    group=dist.group.WORLD)
-                    self.capacity_history_window = capacity_history_window_tensor.cpu().numpy().tolist()
-
-                    if len(self.capacity_history_window) > 0:
-                        capacity_next_window = sum(self.capacity_history_window) / len(self.capacity_history_window) + 20
-                    else:
-                        capacity_next_window = 256
-                    self.gate.config.dynamic_capacity = torch.ceil(torch.tensor(capacity_next_window)).to(torch.int64)
+                self.update_dynamic_capacity(cur_capacity_cur_rank, combine_weights.device)
             else:
                 self.l_aux, combine_weights, dispatch_mask = self.gate(reshaped_input)
             dispatched_input = einsum("sec,sm->ecm", dispatch_mask.type_as(input[0]), reshaped_input)
@@ -131,7 +146,9 @@ class MOELayer(Base):
         # Re-shape back: gecm -> ecm
         expert_output = expert_output.reshape(self.ep_size * self.num_local_experts, -1, d_model)
 
-        if not all_args.enable_token_rearrange_opt:
+        if self.gate.config.sparse_dispatch:
+            combined_output = sparse_combine(expert_output, dispatch_info, reshaped_input.shape[0])
+        elif not all_args.enable_token_rearrange_opt:
             combined_output = einsum("sec,ecm->sm", combine_weights.type_as(input[0]), expert_output)
         else:
             E, C, M = expert_output.shape
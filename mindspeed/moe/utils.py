@@ -164,6 +164,30 @@ def einsum(rule, a, b):
         return torch.einsum(rule, a, b)
 
 
+def sparse_dispatch(reshaped_input, dispatch_info, num_experts):
+    """Index equivalent of einsum("sec,sm->ecm", dispatch_mask, reshaped_input)."""
+    d_model = reshaped_input.shape[-1]
+    dispatched_input = reshaped_input.new_zeros(num_experts * dispatch_info.capacity, d_model)
+    dispatched_input = dispatched_input.index_copy(
+        0, dispatch_info.token_ec_idx, reshaped_input.index_select(0, dispatch_info.expert_select_token_idx))
+    return dispatched_input.reshape(num_experts, dispatch_info.capacity, d_model)
+
+
+def sparse_combine(expert_output, dispatch_info, num_tokens):
+    """Index equivalent of einsum("sec,ecm->sm", combine_weights, expert_output).
+
+    Like the matmul, the weighted expert outputs of a token are accumulated in fp32, a token has at most two
+    of them so the result does not depend on the order of the accumulation.
+    """
+    d_model = expert_output.shape[-1]
+    token_exp_weights = dispatch_info.token_exp_weights.type_as(expert_output).float()
+    selected_output = expert_output.reshape(-1, d_model).index_select(0, dispatch_info.token_ec_idx).float()
+    combined_output = torch.zeros(num_tokens, d_model, dtype=torch.float32, device=expert_output.device)
+    combined_output = combined_output.index_add(0, dispatch_info.expert_select_token_idx,
+                                                selected_output * token_exp_weights.unsqueeze(1))
+    return combined_output.to(expert_output.dtype)
+
+
 class MoEAuxLossAutoScaler(torch.autograd.Function):
     """An AutoScaler that compute and scales the grad for auxiliary loss.
 
@@ -0,0 +1,200 @@
+"""Content-hashed cache of the JIT built ops, shared by the processes of a node.
+
+Every op is built in a directory named after a hash of its sources, headers,
+flags and the torch, torch_npu and CANN versions. One process builds the op
+under an exclusive file lock, the other processes wait for the lock and import
+the built library without compiling. The kernel releases the lock when the
+building process dies, so a killed build never leaves a stale lock behind.
+"""
+
+import fcntl
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+BUILD_CACHE_DIR_ENV = "MINDSPEED_OPS_BUILD_CACHE"
+BUILD_DONE_FILE = "BUILD_DONE"
+HEADER_SUFFIXES = (".h", ".hpp", ".hh", ".cuh")
+# file lock and library suffix of torch.utils.cpp_extension in the build directory
+TORCH_BATON_FILE = "lock"
+LIBRARY_SUFFIX = ".so"
+
+
+def get_default_cache_dir():
+    if os.getenv(BUILD_CACHE_DIR_ENV):
+        return os.environ[BUILD_CACHE_DIR_ENV]
+    from torch.utils.cpp_extension import get_default_build_root
+    return os.path.join(os.getenv("TORCH_EXTENSIONS_DIR", get_default_build_root()), "mindspeed_ops")
+
+
+def get_cann_version(cann_path):
+    """The toolkit version of the CANN package, 'unknown' if it cannot be read."""
+    if cann_path is None:
+        return "unknown"
+    try:
+        with open(os.path.join(cann_path, "version.cfg"), "r") as f:
+            versions = re.findall(r"toolkit_installed_version=\[([^:\]]+)", f.read())
+    except OSError:
+        return "unknown"
+    return versions[0] if versions else "unknown"
+
+
+def _iter_headers(directory):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.endswith(HEADER_SUFFIXES):
+                yield os.path.join(root, file_name)
+
+
+def compute_build_hash(name: str, sources: Iterable[str], header_dirs: Iterable[str] = (),
+                       extra_cflags: Iterable[str] = (), extra_ldflags: Iterable[str] = (),
+                       extra_include_paths: Iterable[str] = (), versions: Optional[Dict[str, str]] = None) -> str:
+    """
+    Hash of everything the build of an op depends on.
+
+    Args:
+        sources: source files, hashed by content.
+        header_dirs: directories whose headers are hashed by content, usually the include directories
+                     of the repo. The headers of the installed packages are covered by their versions.
+        extra_cflags, extra_ldflags, extra_include_paths: build flags, hashed as strings.
+        versions: versions of torch, torch_npu, CANN, python...
+    """
+    hasher = hashlib.sha256()
+
+    def update(*values):
+        for value in values:
+            hasher.update(str(value).encode())
+            hasher.update(b"\0")
+
+    def update_file(path):
+        update(os.path.basename(path))
+        with open(path, "rb") as f:
+            hasher.update(f.read())
+
+    update("name", name)
+    for source in sources:
+        update_file(source)
+    for directory in header_dirs:
+        if os.path.isdir(directory):
+            for header in _iter_headers(directory):
+                update(os.path.relpath(header, directory))
+                update_file(header)
+    update("cflags", *extra_cflags)
+    update("ldflags", *extra_ldflags)
+    update("include", *extra_include_paths)
+    for key, value in sorted((versions or {}).items()):
+        update(key, value)
+    return hasher.hexdigest()[:16]
+
+
+class FileLock:
+    """Exclusive flock on ``path``, waits at most ``timeout`` seconds if set."""
+
+    def __init__(self, path, timeout=None, poll_interval=0.1):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o640)
+        start = time.monotonic()
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if self.timeout is not None and time.monotonic() - start > self.timeout:
+                    os.close(fd)
+                    raise TimeoutError(f"timeout waiting for the build lock {self.path}")
+                time.sleep(self.poll_interval)
+        self._fd = fd
+
+    def release(self):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def import_extension(name, build_directory):
+    """Imports the library ``name`` built by torch.utils.cpp_extension in ``build_directory``."""
+    if name in sys.modules and getattr(sys.modules[name], "__file__", None) and \
+            os.path.dirname(os.path.abspath(sys.modules[name].__file__)) == os.path.abspath(build_directory):
+        return sys.modules[name]
+    library_path = os.path.join(build_directory, f"{name}{LIBRARY_SUFFIX}")
+    spec = importlib.util.spec_from_file_location(name, library_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class BuildCache:
+    """
+    Directory of the built ops, one sub directory per op and build hash.
+
+    Args:
+        cache_dir: root directory of the cache, ``MINDSPEED_OPS_BUILD_CACHE`` or
+                   ``$TORCH_EXTENSIONS_DIR/mindspeed_ops`` by default.
+        lock_timeout: max seconds to wait for another process building the same op.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, lock_timeout: Optional[float] = None):
+        self.cache_dir = cache_dir if cache_dir is not None else get_default_cache_dir()
+        self.lock_timeout = lock_timeout
+        self.num_builds = 0
+        self.num_imports = 0
+
+    def get_build_directory(self, name, build_hash):
+        return os.path.join(self.cache_dir, f"{name}_{build_hash}")
+
+    def is_built(self, name, build_hash):
+        return os.path.exists(os.path.join(self.get_build_directory(name, build_hash), BUILD_DONE_FILE))
+
+    def load(self, name: str, build_hash: str, build_fn: Callable[[str], object],
+             import_fn: Callable[[str, str], object] = import_extension):
+        """
+        Returns the op ``name``, built by ``build_fn(build_directory)`` if it is not in the cache,
+        else imported by ``import_fn(name, build_directory)``.
+        """
+        build_directory = self.get_build_directory(name, build_hash)
+        if self.is_built(name, build_hash):
+            self.num_imports += 1
+            return import_fn(name, build_directory)
+
+        os.makedirs(build_directory, exist_ok=True)
+        with FileLock(build_directory + ".lock", timeout=self.lock_timeout):
+            if self.is_built(name, build_hash):
+                # built by another process while this one waited
+                self.num_imports += 1
+                return import_fn(name, build_directory)
+            # left by a killed build, nobody else builds in this directory while the lock is held
+            baton = os.path.join(build_directory, TORCH_BATON_FILE)
+            if os.path.exists(baton):
+                os.remove(baton)
+            module = build_fn(build_directory)
+            with open(os.path.join(build_directory, BUILD_DONE_FILE), "w") as f:
+                f.write(build_hash)
+            self.num_builds += 1
+        return module
+
+
+_BUILD_CACHE = None
+
+
+def get_build_cache():
+    global _BUILD_CACHE
+    if _BUILD_CACHE is None:
+        _BUILD_CACHE = BuildCache()
+    return _BUILD_CACHE
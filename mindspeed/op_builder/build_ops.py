@@ -0,0 +1,75 @@
+"""Ahead-of-time build of the MindSpeed ops into the shared build cache, entry point ``mindspeed-build-ops``."""
+
+import argparse
+import inspect
+import os
+import sys
+import traceback
+
+from mindspeed.op_builder.build_cache import BUILD_CACHE_DIR_ENV
+
+
+def get_builder_name(builder_class):
+    return getattr(builder_class, "OP_NAME", None) or getattr(builder_class, "NAME", builder_class.__name__)
+
+
+def get_registered_builders():
+    """The builders exported by ``mindspeed.op_builder`` which can be built without arguments."""
+    import mindspeed.op_builder as op_builder
+    from mindspeed.op_builder.builder import MindSpeedOpBuilder
+
+    builders = {}
+    for value in vars(op_builder).values():
+        if not inspect.isclass(value) or not issubclass(value, MindSpeedOpBuilder) or inspect.isabstract(value):
+            continue
+        if any(param.default is param.empty for param in inspect.signature(value).parameters.values()):
+            continue
+        builders[get_builder_name(value)] = value
+    return builders
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the MindSpeed ops into the shared build cache.")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help=f"Directory of the build cache, shared by the ranks of the node. "
+                             f"The ranks read it from ${BUILD_CACHE_DIR_ENV}.")
+    parser.add_argument("--ops", nargs="+", default=None, help="Names of the ops to build, all ops by default.")
+    parser.add_argument("--list", action="store_true", help="List the names of the ops and exit.")
+    parser.add_argument("--quiet", action="store_true", help="Do not print the compiler outputs.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.cache_dir is not None:
+        os.environ[BUILD_CACHE_DIR_ENV] = os.path.abspath(args.cache_dir)
+
+    builders = get_registered_builders()
+    if args.list:
+        for name in sorted(builders):
+            print(name)
+        return 0
+
+    names = args.ops if args.ops is not None else sorted(builders)
+    unknown = [name for name in names if name not in builders]
+    if unknown:
+        print(f"Unknown ops: {', '.join(unknown)}, run with --list for the available ops.", file=sys.stderr)
+        return 2
+
+    failed = []
+    for name in names:
+        print(f"Building {name}...")
+        try:
+            builders[name]().load(verbose=not args.quiet)
+        except Exception:
+            traceback.print_exc()
+            failed.append(name)
+    print(f"Built {len(names) - len(failed)} of {len(names)} ops.")
+    if failed:
+        print(f"Failed ops: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
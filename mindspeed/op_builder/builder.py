@@ -1,11 +1,15 @@
 import re
 import os
+import platform
+import sys
 from abc import ABC, abstractmethod
 from typing import List, Union
+import torch
 from torch.utils.cpp_extension import load
 from torch.library import Library
 import torch_npu
 import mindspeed
+from mindspeed.op_builder.build_cache import compute_build_hash, get_build_cache, get_cann_version
 
 ASCEND_HOME_PATH = "ASCEND_HOME_PATH"
 AS_LIBRARY = Library("mindspeed", "DEF")
@@ -31,6 +35,27 @@ class MindSpeedOpBuilder(ABC):
         mindspeed_path = os.path.abspath(os.path.dirname(mindspeed.__file__))
         return [os.path.join(mindspeed_path, path) for path in paths]
 
+    def get_versions(self):
+        return {
+            'torch': torch.__version__,
+            'torch_npu': getattr(torch_npu, '__version__', 'unknown'),
+            'cann': get_cann_version(self._cann_path),
+            'python': '{}.{}'.format(*sys.version_info[:2]),
+            'machine': platform.machine(),
+        }
+
+    def get_build_hash(self):
+        """Hash of the sources, the headers of mindspeed, the flags and the versions of the build."""
+        mindspeed_path = os.path.abspath(os.path.dirname(mindspeed.__file__))
+        include_paths = self.get_absolute_paths(self.include_paths())
+        return compute_build_hash(self.name,
+                                  sources=self.get_absolute_paths(self.sources()),
+                                  header_dirs=[path for path in include_paths if path.startswith(mindspeed_path)],
+                                  extra_cflags=self.cxx_args(),
+                                  extra_ldflags=self.extra_ldflags(),
+                                  extra_include_paths=include_paths,
+                                  versions=self.get_versions())
+
     def register_op_proto(self, op_proto: Union[str, List[str]]):
         if isinstance(op_proto, str):
             op_proto = [op_proto]
@@ -66,12 +91,16 @@ class MindSpeedOpBuilder(ABC):
         if self.name in __class__._loaded_ops:
             return __class__._loaded_ops[self.name]
 
-        op_module = load(name=self.name,
-                         sources=self.get_absolute_paths(self.sources()),
-                         extra_include_paths=self.get_absolute_paths(self.include_paths()),
-                         extra_cflags=self.cxx_args(),
-                         extra_ldflags=self.extra_ldflags(),
-                         verbose=verbose)
+        def build(build_directory):
+            return load(name=self.name,
+                        sources=self.get_absolute_paths(self.sources()),
+                        extra_include_paths=self.get_absolute_paths(self.include_paths()),
+                        extra_cflags=self.cxx_args(),
+                        extra_ldflags=self.extra_ldflags(),
+                        build_directory=build_directory,
+                        verbose=verbose)
+
+        op_module = get_build_cache().load(self.name, self.get_build_hash(), build)
         __class__._loaded_ops[self.name] = op_module
 
         return op_module
@@ -1,7 +1,12 @@
 import importlib
 import sys
+import time
 import types
-from typing import List, Dict, Union
+from collections import defaultdict
+from logging import getLogger
+from typing import List, Dict, Iterable, Tuple, Union
+
+LOG = getLogger(__name__)
 
 
 def get_func_name(func):
@@ -68,7 +73,9 @@ class Patch:
                 else:
                     i += 1
 
-    def apply_patch(self):
+    def apply_patch(self, alias_index=None):
+        """Apply the patch. When `alias_index` is given, aliases of the original function are looked up in it
+        instead of scanning all of sys.modules."""
         if self.is_applied:
             return
 
@@ -81,12 +88,15 @@ class Patch:
         for wrapper in self.wrappers:
             final_patch_func = wrapper(final_patch_func)
 
+        if alias_index is not None and self.orig_func_name is not None:
+            alias_index.replace(self.orig_func_name, self.orig_func, final_patch_func)
         if self.orig_func_name is not None:
             setattr(self.orig_module, self.orig_func_name, final_patch_func)
-        for key, value in sys.modules.copy().items():
-            if self.orig_func_name is not None and hasattr(value, self.orig_func_name) \
-                    and id(getattr(value, self.orig_func_name)) == self.orig_func_id:
-                setattr(value, self.orig_func_name, final_patch_func)
+        if alias_index is None:
+            for key, value in sys.modules.copy().items():
+                if self.orig_func_name is not None and hasattr(value, self.orig_func_name) \
+                        and id(getattr(value, self.orig_func_name)) == self.orig_func_id:
+                    setattr(value, self.orig_func_name, final_patch_func)
         self.is_applied = True
 
     @staticmethod
@@ -121,8 +131,56 @@ class Patch:
         return sys.modules[module_path], getattr(sys.modules[module_path], function_name) if function_name is not None else None
 
 
+class ModuleAliasIndex:
+    """Reverse index `id(value) -> [(module name, attr)]` over the module-level attributes of sys.modules.
+
+    Only the attribute names passed in at construction are indexed, which is all that is needed to find the
+    aliases of the functions being patched. sys.modules is swept once when the index is built, and modules
+    imported afterwards (e.g. while resolving the path of a later patch) are indexed incrementally.
+    """
+
+    def __init__(self, attr_names: Iterable[str]):
+        self.attr_names = frozenset(attr_names)
+        self._index: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+        self._modules = {}
+        self.refresh()
+
+    def refresh(self):
+        """Index the modules loaded (or replaced) in sys.modules since the last sweep."""
+        for module_name, module in sys.modules.copy().items():
+            if self._modules.get(module_name) is not module:
+                self._modules[module_name] = module
+                self._index_module(module_name, module)
+
+    def _index_module(self, module_name, module):
+        module_dict = getattr(module, '__dict__', None)
+        if not isinstance(module_dict, dict):
+            return
+        for attr in module_dict.keys() & self.attr_names:
+            self._index[id(module_dict[attr])].append((module_name, attr))
+
+    def replace(self, attr, orig_value, new_value):
+        """Rebind every module attribute named `attr` that still refers to `orig_value` to `new_value`."""
+        self.refresh()
+        entries = self._index.pop(id(orig_value), [])
+        remaining = []
+        for module_name, name in entries:
+            module = sys.modules.get(module_name)
+            if module is None or getattr(module, name, None) is not orig_value:
+                # stale entry, the attribute was rebound or the module was unloaded.
+                continue
+            if name != attr:
+                remaining.append((module_name, name))
+                continue
+            setattr(module, name, new_value)
+            self._index[id(new_value)].append((module_name, name))
+        if remaining:
+            self._index[id(orig_value)].extend(remaining)
+
+
 class MindSpeedPatchesManager:
     patches_info: Dict[str, Patch] = {}
+    phase_timings: Dict[str, float] = {}
 
     @staticmethod
     def register_patch(orig_func_name, new_func=None, force_patch=False, create_dummy=False):
@@ -155,7 +213,21 @@ class MindSpeedPatchesManager:
             raise RuntimeError('Remove wrappers has not remove anything.')
 
     @staticmethod
-    def apply_patches():
-        """Apply all patches registered in MindSpeedPatchesManager."""
-        for patch in MindSpeedPatchesManager.patches_info.values():
-            patch.apply_patch()
+    def apply_patches(phase='default'):
+        """Apply all patches registered in MindSpeedPatchesManager.
+
+        Aliases of the patched functions are found through a `ModuleAliasIndex` built in a single sweep of
+        sys.modules, instead of scanning every module once per patch. The elapsed time is accumulated in
+        `phase_timings[phase]`.
+        """
+        start_time = time.perf_counter()
+        pending = [patch for patch in MindSpeedPatchesManager.patches_info.values() if not patch.is_applied]
+        if pending:
+            alias_index = ModuleAliasIndex(patch.orig_func_name for patch in pending
+                                           if patch.orig_func_name is not None)
+            for patch in pending:
+                patch.apply_patch(alias_index)
+        elapsed = time.perf_counter() - start_time
+        timings = MindSpeedPatchesManager.phase_timings
+        timings[phase] = timings.get(phase, 0.0) + elapsed
+        LOG.debug('Applied %d patches of phase %s in %.3fs.', len(pending), phase, elapsed)
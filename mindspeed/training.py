@@ -1,6 +1,7 @@
 # Copyright (c) 2023, NVIDIA CORPORATION. All rights reserved.
 # Copyright (c) 2024, Huawei Technologies Co., Ltd. All rights reserved.
 import time
+import weakref
 from functools import wraps
 import os
 from logging import getLogger
@@ -53,24 +54,98 @@ _TRAIN_START_TIME = time.time()
 LOG = getLogger(__name__)
 
 
-@torch.no_grad()
+class FusedEma:
+    """
+    EMA of the parameters of a model, updated with multi-tensor kernels.
+
+    The EMA and model parameters are grouped once by dtype and device, every update runs one
+    ``torch._foreach_mul_`` and one ``torch._foreach_add_`` per group instead of two kernels per parameter.
+    The groups hold the parameters and not the models, ``refresh`` has to be called if the parameters of
+    the models are replaced.
+    The decay is multiplied as a scalar tensor, which is computed in the precision of ``Tensor.mul_`` with a
+    python float, so the update is the same as the loop over the parameters.
+
+    Args:
+        decay: EMA decay of every update.
+        update_interval: the EMA is updated every ``update_interval`` steps with ``decay ** update_interval``,
+                         so it averages over the same number of steps.
+        warmup_steps: the decay ramps up linearly from 0 during the first ``warmup_steps`` steps.
+        skip_names: names of the parameters without EMA.
+    """
+
+    def __init__(self, ema_model: torch.nn.Module, model: torch.nn.Module, decay: float = 0.9999,
+                 update_interval: int = 1, warmup_steps: int = 0, skip_names=("pos_embed",)):
+        if update_interval < 1:
+            raise ValueError(f"update_interval of EMA should be at least 1, got {update_interval}")
+        self.decay = decay
+        self.update_interval = update_interval
+        self.warmup_steps = warmup_steps
+        self.skip_names = set(skip_names)
+        self.num_steps = 0
+        self.buckets = []
+        self._decay_tensors = {}
+        self.refresh(ema_model, model)
+
+    def refresh(self, ema_model: torch.nn.Module, model: torch.nn.Module):
+        ema_params = dict(ema_model.named_parameters())
+        buckets = {}
+        for name, param in model.named_parameters():
+            if name in self.skip_names or not param.requires_grad:
+                continue
+            ema_param = ema_params[name]
+            key = (ema_param.dtype, ema_param.device, param.dtype, param.device)
+            ema_bucket, model_bucket = buckets.setdefault(key, ([], []))
+            ema_bucket.append(ema_param)
+            model_bucket.append(param)
+        self.buckets = list(buckets.values())
+        self._decay_tensors = {}
+
+    def _get_decay_tensor(self, decay, dtype, device):
+        dtype = torch.float64 if dtype == torch.float64 else torch.float32
+        value, decay_tensor = self._decay_tensors.get((dtype, device), (None, None))
+        if value != decay:
+            decay_tensor = torch.tensor(decay, dtype=dtype, device=device)
+            self._decay_tensors[(dtype, device)] = (decay, decay_tensor)
+        return decay_tensor
+
+    def get_decay(self, step: int) -> float:
+        decay = self.decay
+        if step < self.warmup_steps:
+            decay *= step / self.warmup_steps
+        return decay ** self.update_interval
+
+    @torch.no_grad()
+    def step(self, iteration: int = None) -> bool:
+        """Updates the EMA at the training step ``iteration``, counted by the EMA if not given."""
+        if iteration is None:
+            iteration = self.num_steps
+        self.num_steps = iteration + 1
+        if iteration % self.update_interval != 0:
+            return False
+        decay = self.get_decay(iteration)
+        for ema_bucket, model_bucket in self.buckets:
+            torch._foreach_mul_(ema_bucket, self._get_decay_tensor(decay, ema_bucket[0].dtype, ema_bucket[0].device))
+            torch._foreach_add_(ema_bucket, model_bucket, alpha=1 - decay)
+        return True
+
+
+# EMA model -> (weak reference of the model, FusedEma), the engines do not keep the models alive
+_EMA_ENGINES = weakref.WeakKeyDictionary()
+
+
 def update_ema(
-    ema_model: torch.nn.Module, model: torch.nn.Module, optimizer=None, decay: float = 0.9999
+    ema_model: torch.nn.Module, model: torch.nn.Module, optimizer=None, decay: float = 0.9999,
+    iteration: int = None, update_interval: int = 1, warmup_steps: int = 0
 ) -> None:
     """
     Step the EMA model towards the current model.
     """
-    from collections import OrderedDict
-    ema_params = OrderedDict(ema_model.named_parameters())
-    model_params = OrderedDict(model.named_parameters())
-
-    for name, param in model_params.items():
-        if name == "pos_embed":
-            continue
-        if param.requires_grad == False:
-            continue
-        param_data = param.data
-        ema_params[name].mul_(decay).add_(param_data, alpha=1 - decay)
+    model_ref, engine = _EMA_ENGINES.get(ema_model, (None, None))
+    if engine is None or model_ref() is not model or \
+            (engine.decay, engine.update_interval, engine.warmup_steps) != (decay, update_interval, warmup_steps):
+        engine = FusedEma(ema_model, model, decay=decay, update_interval=update_interval, warmup_steps=warmup_steps)
+        _EMA_ENGINES[ema_model] = (weakref.ref(model), engine)
+    engine.step(iteration)
 
 
 def train_step(forward_step_func, data_iterator,
@@ -113,7 +188,8 @@ def train_step(forward_step_func, data_iterator,
     if args.use_ema:
         unwrapped_model = unwrap_model(model)
         for model_chunk in unwrapped_model:
-            update_ema(model_chunk.ema, model_chunk, optimizer=optimizer)
+            update_ema(model_chunk.ema, model_chunk, optimizer=optimizer, iteration=args.curr_iteration,
+                       update_interval=args.ema_update_interval, warmup_steps=args.ema_warmup_steps)
 
 
     # Vision momentum.
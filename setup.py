@@ -93,6 +93,7 @@ setuptools.setup(
     entry_points={
         "console_scripts": [
             "mindspeed = mindspeed.run.run:main",
+            "mindspeed-build-ops = mindspeed.op_builder.build_ops:main",
         ]
     },
     ext_modules=exts
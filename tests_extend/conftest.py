@@ -9,10 +9,25 @@ from multiprocessing.pool import RUN
 import pytest
 
 
+def pytest_addoption(parser):
+    parser.addoption("--run-benchmark", action="store_true", default=False,
+                     help="run the benchmarks, which report their timings without asserting on them")
+
+
 def pytest_configure(config):
     config.option.durations = 0
     config.option.durations_min = 1
     config.option.verbose = True
+    config.addinivalue_line("markers", "benchmark: reports timings, only run with --run-benchmark")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmark"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="benchmark, run with --run-benchmark")
+    for item in items:
+        if item.get_closest_marker("benchmark") is not None:
+            item.add_marker(skip_benchmark)
 
 
 # Override of pytest "runtest" for DistributedTest class
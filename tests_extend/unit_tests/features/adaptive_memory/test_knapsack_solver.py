@@ -0,0 +1,169 @@
+import sys
+import time
+import random
+from copy import deepcopy
+
+import pytest
+
+from mindspeed.core.memory.adaptive_recomputing.adaptive_recompute_solver import GraphSolver, LayerCombination
+from mindspeed.core.memory.adaptive_memory.adaptive_memory_solver import AdaptMemGraphSolver
+from mindspeed.core.memory.adaptive_memory.adaptive_memory_cache import AdaptiveLayerMemPolicy, AdaptiveModelMemPolicy
+
+
+class GoodsValue:
+    def __init__(self):
+        self.layer_names = []
+        self.memory = 0
+        self.cost = float('inf')
+
+
+def reference_recompute_knapsack(solver, device_memory):
+    """The per-cell knapsack of GraphSolver before vectorization, returns the layer names and cost."""
+    combinations = solver.layers_combination
+    combination_num = len(combinations) - 1
+    layers_num = solver.layers_num
+    device_memory = max(device_memory - solver.static_memory, 0) / solver.pp
+    ans = [[GoodsValue() for _ in range(layers_num + 1)] for _ in range(combination_num + 1)]
+    for i in range(1, combination_num + 1):
+        for j in range(layers_num + 1):
+            k = 0
+            while k <= combinations[i].num and k <= j:
+                pre_step_ans = ans[i - 1][j - k]
+                if k == 0:
+                    ans[i][j] = pre_step_ans
+                    k += 1
+                    continue
+                goods_value = ans[i][j]
+                memory = pre_step_ans.memory + k * combinations[i].memory
+                cost = pre_step_ans.cost + k * combinations[i].cost
+                if pre_step_ans.cost == float('inf'):
+                    cost = k * combinations[i].cost
+                if device_memory >= memory and cost <= goods_value.cost:
+                    goods_value.memory = memory
+                    goods_value.cost = cost
+                    goods_value.layer_names = pre_step_ans.layer_names + [combinations[i].name] * k
+                k += 1
+
+    full = solver.layer_full_recompute_combination
+    layer_nodes = [full.name] * layers_num
+    cost = layers_num * full.cost
+    for i in range(layers_num, 0, -1):
+        size = layers_num - len(ans[combination_num][i].layer_names)
+        if size != layers_num:
+            l_cost = ans[combination_num][i].cost + size * full.cost
+            if l_cost < cost:
+                cost = l_cost
+                layer_nodes = ans[combination_num][i].layer_names + [full.name] * size
+    return layer_nodes, cost
+
+
+def reference_adaptive_memory_knapsack(policy_combinations, combination_num, layers_bs, max_free_memory):
+    """The per-cell knapsack of AdaptMemGraphSolver before vectorization."""
+    layer_num = len(layers_bs)
+    ans = [[AdaptiveModelMemPolicy("normal", []) for _ in range(layer_num + 1)] for _ in range(combination_num + 1)]
+    for i in range(1, combination_num + 1):
+        for j in range(layer_num + 1):
+            for k in range(j + 1):
+                pre_step_ans = ans[i - 1][j - k]
+                if k == 0:
+                    ans[i][j] = deepcopy(pre_step_ans)
+                    continue
+                goods_value = ans[i][j]
+                memory = pre_step_ans.memory
+                for index in range(k):
+                    memory += layers_bs[len(pre_step_ans.polices) + index] * policy_combinations[i].memory
+                comb_time = pre_step_ans.time + k * policy_combinations[i].time
+                if pre_step_ans.time == sys.maxsize:
+                    comb_time = k * policy_combinations[i].time
+                if (max_free_memory >= memory and comb_time <= goods_value.time
+                        and len(pre_step_ans.polices) + k == j):
+                    goods_value.memory = memory
+                    goods_value.time = comb_time
+                    goods_value.polices = pre_step_ans.polices + [policy_combinations[i]] * k
+    return ans[combination_num][layer_num]
+
+
+def build_graph_solver(layers_num, combination_num, seed):
+    rnd = random.Random(seed)
+    solver = GraphSolver()
+    solver.layers_num = layers_num
+    solver.static_memory = rnd.uniform(0, 1024)
+    solver.pp = rnd.choice([1, 2, 4])
+    solver.layer_full_recompute_combination = LayerCombination({
+        "name": "full_recompute", "num": layers_num, "memory": rnd.uniform(8, 32), "cost": rnd.uniform(10, 20),
+        "broadcast_value": 0, "policy_name": "n_full"})
+    solver.layer_without_recompute_combination = LayerCombination({
+        "name": "without_recompute", "num": layers_num, "memory": rnd.uniform(256, 512), "cost": 0,
+        "broadcast_value": 2, "policy_name": "n_without"})
+    solver.layers_combination = [solver.layer_full_recompute_combination, solver.layer_without_recompute_combination]
+    for idx in range(combination_num):
+        solver.layer_recompute_one_combination = LayerCombination({
+            "name": f"selective_{idx}", "num": layers_num, "memory": rnd.uniform(32, 256),
+            "cost": rnd.uniform(0, 10), "broadcast_value": 1, "policy_name": "n_selective"})
+        solver.layers_combination.append(solver.layer_recompute_one_combination)
+    return solver, rnd.uniform(0, 256 * layers_num)
+
+
+def build_policy_combinations(combination_num, seed):
+    rnd = random.Random(seed)
+    policy_combinations = [None]
+    for idx in range(combination_num):
+        policy_combinations.append(AdaptiveLayerMemPolicy(recompute=[f"module_{idx}"], swap=[],
+                                                          memory=rnd.uniform(8, 256), time=rnd.uniform(0, 10)))
+    return policy_combinations
+
+
+class TestKnapsackSolver:
+
+    @pytest.mark.parametrize('seed', range(5))
+    @pytest.mark.parametrize('layers_num', [4, 16])
+    def test_graph_solver_knapsack_same_policy(self, layers_num, seed):
+        solver, device_memory = build_graph_solver(layers_num, 6, seed)
+        ref_solver = deepcopy(solver)
+        ref_solver.layers_combination.insert(0, None)
+
+        solver.knapsack_best(device_memory)
+        ref_layer_nodes, _ = reference_recompute_knapsack(ref_solver, device_memory)
+        ref_policy = {}
+        for nodes in ref_layer_nodes:
+            ref_policy[nodes] = ref_policy.get(nodes, 0) + 1
+
+        assert list(solver.recompute_policy.items()) == list(ref_policy.items())
+
+    @pytest.mark.parametrize('seed', range(5))
+    @pytest.mark.parametrize('layers_bs', [[1] * 8, [3] * 4 + [2] * 4, [4] * 6 + [1] * 6])
+    def test_adaptive_memory_knapsack_same_policy(self, layers_bs, seed):
+        policy_combinations = build_policy_combinations(6, seed)
+        max_free_memory = random.Random(seed).uniform(0, 256 * len(layers_bs))
+
+        best = AdaptMemGraphSolver.solve_knapsack(policy_combinations, 6, layers_bs, max_free_memory)
+        ref_best = reference_adaptive_memory_knapsack(policy_combinations, 6, layers_bs, max_free_memory)
+
+        assert [policy.recompute for policy in best.polices] == [policy.recompute for policy in ref_best.polices]
+        assert best.memory == ref_best.memory
+        assert best.time == ref_best.time
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('layers_num', [32, 64, 128])
+    def test_knapsack_benchmark(self, layers_num):
+        solver, device_memory = build_graph_solver(layers_num, 30, layers_num)
+        ref_solver = deepcopy(solver)
+        ref_solver.layers_combination.insert(0, None)
+        start = time.perf_counter()
+        reference_recompute_knapsack(ref_solver, device_memory)
+        ref_recompute_time = time.perf_counter() - start
+        start = time.perf_counter()
+        solver.knapsack_best(device_memory)
+        recompute_time = time.perf_counter() - start
+
+        policy_combinations = build_policy_combinations(30, layers_num)
+        layers_bs = [2] * layers_num
+        start = time.perf_counter()
+        reference_adaptive_memory_knapsack(policy_combinations, 30, layers_bs, 64 * layers_num)
+        ref_memory_time = time.perf_counter() - start
+        start = time.perf_counter()
+        AdaptMemGraphSolver.solve_knapsack(policy_combinations, 30, layers_bs, 64 * layers_num)
+        memory_time = time.perf_counter() - start
+
+        print(f'\n{layers_num} layers: adaptive recompute {ref_recompute_time:.3f}s -> {recompute_time:.3f}s, '
+              f'adaptive memory {ref_memory_time:.3f}s -> {memory_time:.3f}s')
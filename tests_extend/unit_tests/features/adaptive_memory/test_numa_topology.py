@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from mindspeed.core.memory.adaptive_memory.numa_topology import (NumaTopology, assign_cpus, discover_numa_topology,
+                                                                  load_numa_topology, parse_cpu_list, read_numa_cpus)
+
+# two sockets of 48 cores with two NUMA nodes each, four accelerators on the first and last nodes
+NODE_CPULISTS = {0: "0-23", 1: "24-47", 2: "48-71", 3: "72-95", 4: ""}
+ACCELERATORS = {"0000:c1:00.0": 0, "0000:01:00.0": 0, "0000:81:00.0": 3, "0000:41:00.0": 3}
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content + "\n")
+
+
+def make_sysfs(root, node_cpulists=None, accelerators=None):
+    node_cpulists = NODE_CPULISTS if node_cpulists is None else node_cpulists
+    accelerators = ACCELERATORS if accelerators is None else accelerators
+    for node, cpulist in node_cpulists.items():
+        write_file(os.path.join(root, "devices", "system", "node", f"node{node}", "cpulist"), cpulist)
+    write_file(os.path.join(root, "devices", "system", "node", "possible"), "0-4")
+    pci_dir = os.path.join(root, "bus", "pci", "devices")
+    devices = {bus: ("0x19e5", "0x120000", node) for bus, node in accelerators.items()}
+    # a Huawei network card and an accelerator of another vendor are not used
+    devices["0000:02:00.0"] = ("0x19e5", "0x020000", 0)
+    devices["0000:03:00.0"] = ("0x10de", "0x120000", 0)
+    for bus, (vendor, device_class, node) in devices.items():
+        write_file(os.path.join(pci_dir, bus, "vendor"), vendor)
+        write_file(os.path.join(pci_dir, bus, "class"), device_class)
+        write_file(os.path.join(pci_dir, bus, "numa_node"), str(node))
+    return str(root)
+
+
+class TestNumaTopology:
+
+    def test_parse_cpu_list(self):
+        assert parse_cpu_list("0-3,8-9,16\n") == [0, 1, 2, 3, 8, 9, 16]
+        assert parse_cpu_list("5") == [5]
+        assert parse_cpu_list("") == []
+        with pytest.raises(ValueError):
+            parse_cpu_list("0-3-5")
+
+    def test_discover(self, tmp_path):
+        sysfs_root = make_sysfs(tmp_path)
+        assert read_numa_cpus(sysfs_root) == {node: list(range(24 * node, 24 * (node + 1))) for node in range(4)}
+        topology = discover_numa_topology(sysfs_root)
+        assert topology.device_buses == ["0000:01:00.0", "0000:41:00.0", "0000:81:00.0", "0000:c1:00.0"]
+        assert topology.device_numa_nodes == [0, 3, 3, 0]
+        # the bus addresses reported by npu-smi
+        topology = discover_numa_topology(sysfs_root, device_buses=["C1:00.0", "0000:41:00.0", "00:00.0"])
+        assert topology.device_buses == ["0000:c1:00.0", "0000:41:00.0", "0000:00:00.0"]
+        assert topology.device_numa_nodes == [0, 3, -1]
+
+    def test_empty_sysfs(self, tmp_path):
+        topology = discover_numa_topology(str(tmp_path))
+        assert topology == NumaTopology([], [], {})
+
+    def test_assign_cpus(self, tmp_path):
+        topology = discover_numa_topology(make_sysfs(tmp_path))
+        device_cpus = assign_cpus(topology, [0, 1, 2, 3])
+        assert device_cpus == {0: list(range(0, 6)), 3: list(range(6, 12)),
+                               1: list(range(72, 78)), 2: list(range(78, 84))}
+        assert assign_cpus(topology, [0, 1, 2, 3], cpus_per_device=12)[3] == list(range(12, 24))
+        with pytest.raises(RuntimeError):
+            assign_cpus(topology, [0, 1, 2, 3], cpus_per_device=13)
+        # the devices of an unknown node go to the nodes with the most free cores
+        topology = topology._replace(device_numa_nodes=[-1, 3, -1, 0])
+        device_cpus = assign_cpus(topology, [0, 1, 2, 3])
+        assert device_cpus[0] == list(range(24, 36)) and device_cpus[2] == list(range(48, 60))
+        all_cpus = [cpu for cpus in device_cpus.values() for cpu in cpus]
+        assert len(all_cpus) == len(set(all_cpus))
+
+    def test_same_assignment_as_legacy(self, tmp_path):
+        """The legacy binder gave the devices of a node consecutive slices of ``ratio`` of its cores."""
+        topology = discover_numa_topology(make_sysfs(tmp_path, accelerators={
+            f"0000:{0x10 + i:02x}:00.0": i // 4 for i in range(8)}))
+        for ratio in [0.5, 1.]:
+            device_cpus = assign_cpus(topology, list(range(8)), ratio)
+            for device in range(8):
+                numa_id = device // 4
+                cpu_num_per_device = int(24 * ratio // 4)
+                idx = device % 4
+                assert device_cpus[device] == [24 * numa_id + i for i in range(
+                    idx * cpu_num_per_device, (idx + 1) * cpu_num_per_device)]
+
+    def test_cache_is_shared(self, tmp_path):
+        sysfs_root = make_sysfs(tmp_path / "sys")
+        cache_path = str(tmp_path / "topology.json")
+        discovered = []
+
+        def discover():
+            discovered.append(True)
+            return discover_numa_topology(sysfs_root)
+
+        topology = load_numa_topology(cache_path, discover_fn=discover)
+        assert load_numa_topology(cache_path, discover_fn=discover) == topology
+        assert load_numa_topology(cache_path, num_devices=4, discover_fn=discover) == topology
+        assert len(discovered) == 1
+        assert sorted(os.listdir(str(tmp_path))) == ["sys", "topology.json"]
+        # a cache with less devices than needed, or which is corrupted, is discovered again
+        load_numa_topology(cache_path, num_devices=5, discover_fn=discover)
+        with open(cache_path, "w") as f:
+            f.write("{")
+        assert load_numa_topology(cache_path, discover_fn=discover) == topology
+        assert len(discovered) == 3
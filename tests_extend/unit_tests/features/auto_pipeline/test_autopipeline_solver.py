@@ -0,0 +1,158 @@
+import time
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import mindspeed.core.memory.auto_pipeline.autopipeline_solver as autopipeline_solver
+from mindspeed.core.memory.auto_pipeline.autopipeline_solver import AutoPipelineSolver
+
+
+class ReferenceSolver(AutoPipelineSolver):
+    """AutoPipelineSolver with the exhaustive DFS and the per-example 1F1B simulation before optimization."""
+
+    def naive_search(self, module_type, answer_queue):
+        num_pp_stage = self.pipeline_model_parallel_size
+
+        def dfs_build_layers(prefix_n_layers, cur_layers_sum):
+            if len(prefix_n_layers) > num_pp_stage or cur_layers_sum > self.num_layers:
+                return
+            if 2 <= len(prefix_n_layers) < num_pp_stage and prefix_n_layers[-1] < prefix_n_layers[-2]:
+                return
+            if len(prefix_n_layers) == num_pp_stage and cur_layers_sum == self.num_layers:
+                status, recomp_modules, mem_set = self.get_recompute_modules(prefix_n_layers, num_pp_stage,
+                                                                             module_type)
+                if status:
+                    answer_queue.append((prefix_n_layers, recomp_modules, mem_set, module_type))
+                if len(answer_queue) == 0 and len(self.ans) == 0 and len(self.backup) == 0:
+                    self.backup.append((prefix_n_layers, recomp_modules, mem_set, module_type))
+                return
+            for cur_n_layer in range(self.max_layer, self.min_layer - 1, -1):
+                dfs_build_layers(prefix_n_layers + [cur_n_layer], cur_layers_sum + cur_n_layer)
+
+        dfs_build_layers([], 0)
+        return answer_queue
+
+    def main_search(self):
+        self.ans = self.naive_search(0, [])
+        self.ans += self.naive_search(1, [])
+        self.ans += self.naive_search(2, [])
+        return self.ans
+
+    def dp(self, examples):
+        Fwd, Bwd, ComFwd, ComBwd = self.forward_time, self.forward_time * 1.3, self.comm_time, self.comm_time
+        n_layers, n_recompute_layers = [0] + examples[0], [0] + examples[1]
+        RecompFwd = self.get_recompute_forward_time(examples[3])
+        num_pp_stage = self.pipeline_model_parallel_size
+        num_microbatch = self.global_batch_size
+        EF = [[0] * (num_microbatch + 1) for _ in range(num_pp_stage + 1)]
+        EB = [[0] * (num_microbatch + 1) for _ in range(num_pp_stage + 2)]
+        warmup = [num_pp_stage - p - 1 for p in range(num_pp_stage)]
+        remaining = [num_microbatch - warmup[p] for p in range(num_pp_stage)]
+        for p in range(1, num_pp_stage + 1):
+            for m in range(1, num_pp_stage - p + 1):
+                EF[p][m] = max(EF[p][m - 1], EF[p - 1][m] + ComFwd) + Fwd * n_layers[p]
+        for num_1f1b in range(1, num_microbatch + 1):
+            for p in range(1, num_pp_stage + 1):
+                if remaining[p - 1] < num_1f1b:
+                    continue
+                m = warmup[p - 1] + num_1f1b
+                if p == 1:
+                    EF[0][m] = max(EF[1]) - ComFwd
+                SF = max(EB[p][m + p - num_pp_stage - 1], EF[p - 1][m] + ComFwd)
+                EF[p][m] = SF + Fwd * n_layers[p]
+            for p in range(num_pp_stage, 0, -1):
+                m = num_1f1b
+                if remaining[p - 1] < num_1f1b:
+                    continue
+                if p == num_pp_stage:
+                    SB = EF[p][m + num_pp_stage - p]
+                else:
+                    SB = max(EF[p][m + num_pp_stage - p], EB[p + 1][m] + ComBwd)
+                EB[p][m] = SB + Bwd * n_layers[p] + RecompFwd * n_recompute_layers[p]
+            for p in range(num_pp_stage, 0, -1):
+                m = num_1f1b
+                if remaining[p - 1] >= num_1f1b:
+                    continue
+                SB = max(EB[p][m - 1], EB[p + 1][m] + ComBwd)
+                EB[p][m] = SB + Bwd * n_layers[p] + RecompFwd * n_recompute_layers[p]
+        self.policy.append((max([max(EB[p]) for p in range(num_pp_stage)]), examples))
+
+    def find_top_optimal_schedule(self):
+        self.main_search()
+        for examples in self.ans:
+            self.dp(examples)
+        if len(self.policy) > 0:
+            min_itertime, optimal_sch = self.policy[0]
+            for itertime, examples in self.policy:
+                if itertime < min_itertime:
+                    min_itertime, optimal_sch = itertime, examples
+            return [optimal_sch], [min_itertime]
+        return [self.backup[0]], [0]
+
+
+def build_context(rnd):
+    return {
+        "first_stage_embed": rnd.uniform(100, 2000), "last_stage_embed": rnd.uniform(100, 2000),
+        "per_trans_layer_param": rnd.uniform(50, 500), "comm_time": rnd.uniform(0.01, 1),
+        "layers": [{"name": "module", "time": rnd.uniform(1, 10), "memory": rnd.uniform(100, 1000), "layers": [
+            {"name": "embedding", "time": 1, "memory": rnd.uniform(10, 100)},
+            {"name": "0", "time": rnd.uniform(1, 10), "memory": rnd.uniform(100, 1000), "layers": [
+                {"name": "self_attention", "time": rnd.uniform(0.1, 3), "memory": rnd.uniform(10, 300)},
+                {"name": "mlp", "time": rnd.uniform(0.1, 3), "memory": rnd.uniform(10, 300)}]}]}]}
+
+
+def build_benchmark_context():
+    return {
+        "first_stage_embed": 500, "last_stage_embed": 500, "per_trans_layer_param": 100, "comm_time": 0.1,
+        "layers": [{"name": "module", "time": 5.0, "memory": 200, "layers": [
+            {"name": "embedding", "time": 1, "memory": 50},
+            {"name": "0", "time": 5.0, "memory": 200, "layers": [
+                {"name": "self_attention", "time": 2.0, "memory": 80},
+                {"name": "mlp", "time": 2.5, "memory": 120}]}]}]}
+
+
+def build_args(num_layers, pp, global_batch_size, save_memory_ratio):
+    return SimpleNamespace(num_layers=num_layers, padded_vocab_size=32000, hidden_size=4096, ffn_hidden_size=11008,
+                           micro_batch_size=1, global_batch_size=global_batch_size, seq_length=4096,
+                           num_attention_heads=32, pipeline_model_parallel_size=pp, tensor_model_parallel_size=1,
+                           save_memory_ratio=save_memory_ratio)
+
+
+class TestAutoPipelineSolver:
+
+    @pytest.mark.parametrize('seed', range(4))
+    @pytest.mark.parametrize('num_layers, pp', [(8, 2), (22, 4), (38, 4), (42, 8)])
+    @pytest.mark.parametrize('save_memory_ratio', [0.0, 0.2, 1.0])
+    def test_autopipeline_solver_same_policy(self, monkeypatch, num_layers, pp, save_memory_ratio, seed):
+        rnd = random.Random(seed)
+        context = build_context(rnd)
+        args = build_args(num_layers, pp, rnd.choice([16, 64]), save_memory_ratio)
+        monkeypatch.setattr(autopipeline_solver, 'get_args', lambda: args)
+        monkeypatch.setattr(autopipeline_solver, 'print_rank_0', lambda *_: None)
+
+        optimal_sch, minn = AutoPipelineSolver(context).find_top_optimal_schedule()
+        ref_optimal_sch, ref_minn = ReferenceSolver(context).find_top_optimal_schedule()
+
+        assert optimal_sch == ref_optimal_sch
+        assert minn == ref_minn
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('num_layers, pp', [(48, 4), (64, 8), (96, 8)])
+    def test_autopipeline_solver_benchmark(self, monkeypatch, num_layers, pp):
+        context = build_benchmark_context()
+        args = build_args(num_layers, pp, 128, 0.3)
+        monkeypatch.setattr(autopipeline_solver, 'get_args', lambda: args)
+        monkeypatch.setattr(autopipeline_solver, 'print_rank_0', lambda *_: None)
+
+        start = time.perf_counter()
+        ref_result = ReferenceSolver(context).find_top_optimal_schedule()
+        ref_time = time.perf_counter() - start
+        start = time.perf_counter()
+        solver = AutoPipelineSolver(context)
+        result = solver.find_top_optimal_schedule()
+        solve_time = time.perf_counter() - start
+
+        print(f'\n{num_layers} layers pp{pp}, {len(solver.policy)} candidates: '
+              f'naive search {ref_time:.3f}s -> pruned search {solve_time:.3f}s')
+        assert result == ref_result
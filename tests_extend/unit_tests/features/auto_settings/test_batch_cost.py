@@ -0,0 +1,146 @@
+import itertools
+import logging
+import math
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+import mindspeed.auto_settings.module.memory_cost as memory_cost_module
+import mindspeed.auto_settings.module.time_cost as time_cost_module
+from mindspeed.auto_settings.config.search_config import SearchConfig
+from mindspeed.auto_settings.module.memory_cost import MemoryCost
+from mindspeed.auto_settings.module.time_cost import TimeCost
+from mindspeed.auto_settings.utils.utils import get_num_warmup_micro_batches
+
+MEMORY_CAP = 60000.
+NUM_LAYERS = 32
+
+
+def fake_estimate(cfg):
+    """(recompute_mem, peak_stage_mem, optimizer_peak) of a config in MB."""
+    recompute_mem = 400. * cfg.mbs / (cfg.tp * cfg.cp)
+    peak_stage_mem = 40000. * cfg.mbs / (cfg.tp * cfg.cp) + 8000. * cfg.pp / cfg.dp
+    return recompute_mem, peak_stage_mem, 16000. / cfg.tp
+
+
+class FakeOperator:
+    def __init__(self):
+        self.calls = Counter()
+
+    def get_operator_info(self, cfg):
+        self.calls[TimeCost.get_operator_key(cfg)] += 1
+        return {"operator_time": 3. * cfg.mbs / cfg.tp + 0.7 * cfg.cp, "operator_fw_time": 1.1 * cfg.mbs / cfg.tp}
+
+
+class FakeCommunication:
+    def get_communication_time(self, cfg):
+        return {"use_mc2": cfg.tp > 4, "fw_communication_time": 0.2 * cfg.tp, "communication_time": 50. * cfg.cp,
+                "pp_time": 2. * cfg.pp, "dp_time": 30. / cfg.dp, "tp_time": 0.1, "cp_time": 0.1, "ep_time": 0.}
+
+
+def legacy_memory_cost(cfg, model_cfg):
+    """The per-config memory cost before the batched evaluation."""
+    layers_per_vpp = cfg.layers_per_vpp if cfg.layers_per_vpp else model_cfg.num_layers // cfg.pp
+    num_layers = model_cfg.num_layers // cfg.pp
+    memory_per_layer, peak_stage_mem, optimizer_peak = fake_estimate(cfg)
+    peak_mem = max(peak_stage_mem, optimizer_peak)
+    warmup_micro_batchs, _ = get_num_warmup_micro_batches(cfg, model_cfg)
+    max_release_mem = warmup_micro_batchs * layers_per_vpp * memory_per_layer - memory_per_layer
+    oom_cap = MEMORY_CAP - peak_stage_mem
+    if max_release_mem <= oom_cap:
+        return {"layer_calculate": 0, "peak_memory": peak_mem, "need_recompute": False,
+                "new_memory": max_release_mem + peak_stage_mem, "recompute_layer": 0}
+    layer_calculate = (oom_cap // (memory_per_layer * cfg.pp))
+    release_mem = layer_calculate * memory_per_layer * cfg.pp
+    if 0 < layer_calculate < num_layers:
+        release_mem -= memory_per_layer
+    return {"layer_calculate": layer_calculate, "peak_memory": peak_mem, "need_recompute": True,
+            "new_memory": release_mem + peak_stage_mem, "recompute_layer": num_layers - layer_calculate}
+
+
+def legacy_time_cost(cfg, memory_info, model_cfg):
+    """The per-config time cost before the batched evaluation."""
+    pp = cfg.pp
+    vp = cfg.num_layers // (pp * cfg.layers_per_vpp) if cfg.layers_per_vpp else 1
+    micro_batch_num = model_cfg.global_batch_size / (cfg.dp * cfg.mbs)
+    layer_num = math.ceil(micro_batch_num * (model_cfg.num_layers / pp))
+    bubble_ratio = (pp - 1) / (micro_batch_num * vp + pp - 1)
+    operator_info = FakeOperator().get_operator_info(cfg)
+    communication_info = FakeCommunication().get_communication_time(cfg)
+    fw_performance = operator_info["operator_fw_time"] + communication_info["fw_communication_time"]
+    total_time = operator_info["operator_time"] * layer_num + communication_info["communication_time"]
+    total_time = total_time / (1 - bubble_ratio)
+    total_time = total_time + communication_info["pp_time"] * cfg.mbs + communication_info["dp_time"]
+    _, total_num_micro_batches = get_num_warmup_micro_batches(cfg, model_cfg)
+    num_layers = model_cfg.num_layers // pp
+    if not memory_info["need_recompute"]:
+        return {"use_mc2": communication_info["use_mc2"],
+                "total_time": total_time - total_num_micro_batches * num_layers * fw_performance, "num_layers": 0}
+    layer_calculate = memory_info["layer_calculate"]
+    return {"use_mc2": communication_info["use_mc2"],
+            "total_time": total_time - total_num_micro_batches * layer_calculate * fw_performance,
+            "num_layers": num_layers - layer_calculate}
+
+
+def make_configs():
+    configs = []
+    for tp, pp, dp, cp, mbs, layers_per_vpp in itertools.product([1, 2, 4, 8], [1, 2, 4], [1, 2], [1, 2], [1, 2],
+                                                                 [None, 2]):
+        if layers_per_vpp and pp == 1:
+            continue
+        configs.append(SearchConfig(tensor_model_parallel_size=tp, pipeline_model_parallel_size=pp,
+                                    data_parallel_size=dp, context_parallel_size=cp, micro_batch_size=mbs,
+                                    num_layers_per_virtual_pipeline_stage=layers_per_vpp, num_layers=NUM_LAYERS,
+                                    seq_length=4096, expert_model_parallel_size=1))
+    return configs
+
+
+@pytest.fixture
+def model_cfg(monkeypatch):
+    model_cfg = SearchConfig(num_layers=NUM_LAYERS, global_batch_size=64, micro_batch_size=1)
+    monkeypatch.setattr(memory_cost_module, "get_model_config", lambda: model_cfg)
+    monkeypatch.setattr(memory_cost_module, "get_system_config", lambda: SimpleNamespace(memory_cap=MEMORY_CAP))
+    monkeypatch.setattr(memory_cost_module.MemoryModeling, "estimate", fake_estimate)
+    monkeypatch.setattr(time_cost_module, "get_model_config", lambda: model_cfg)
+    return model_cfg
+
+
+def make_time_cost():
+    time_cost = TimeCost.__new__(TimeCost)
+    time_cost.logger = logging.getLogger("TestBatchCost")
+    time_cost.operator = FakeOperator()
+    time_cost.communication = FakeCommunication()
+    return time_cost
+
+
+class TestBatchCost:
+
+    def test_memory_costs_same_as_per_config(self, model_cfg):
+        configs = make_configs()
+        memory_cost = MemoryCost()
+        memory_infos = memory_cost.get_memory_costs(configs)
+        assert memory_infos == [legacy_memory_cost(cfg, model_cfg) for cfg in configs]
+        need_recompute = [memory_info["need_recompute"] for memory_info in memory_infos]
+        assert any(need_recompute) and not all(need_recompute)
+        assert [memory_cost.get_memory_cost(cfg) for cfg in configs] == memory_infos
+        assert memory_cost.get_memory_costs([]) == []
+
+    def test_time_costs_same_as_per_config(self, model_cfg):
+        configs = make_configs()
+        memory_infos = [legacy_memory_cost(cfg, model_cfg) for cfg in configs]
+        time_cost = make_time_cost()
+        time_infos = time_cost.get_time_costs(configs, memory_infos)
+        assert time_infos == [legacy_time_cost(cfg, memory_info, model_cfg)
+                              for cfg, memory_info in zip(configs, memory_infos)]
+        assert time_cost.get_time_cost(configs[-1], memory_infos[-1]) == time_infos[-1]
+        assert time_cost.get_time_costs([], []) == []
+
+    def test_operator_time_estimated_once_per_operator_key(self, model_cfg):
+        configs = make_configs()
+        memory_infos = [legacy_memory_cost(cfg, model_cfg) for cfg in configs]
+        time_cost = make_time_cost()
+        time_cost.get_time_costs(configs, memory_infos)
+        # pp, dp and vpp do not change the operators
+        assert len(time_cost.operator.calls) == len({(cfg.tp, cfg.cp, cfg.mbs) for cfg in configs})
+        assert set(time_cost.operator.calls.values()) == {1}
@@ -0,0 +1,192 @@
+import functools
+import itertools
+import json
+import logging
+from copy import deepcopy
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import mindspeed.auto_settings.config.search_config as search_config
+import mindspeed.auto_settings.module.searcher as searcher_module
+from mindspeed.auto_settings.config.search_config import SearchConfig
+from mindspeed.auto_settings.module.memory_pruning import MemoryDominancePruner
+from mindspeed.auto_settings.module.searcher import BlackSearcher
+
+MAX_AVAILABLE_MEMORY = 10.
+
+
+class FakeMemoryCost:
+    """White box estimate in MB."""
+
+    def get_memory_cost(self, cfg):
+        return {"peak_memory": 16000. * cfg.micro_batch_size / (cfg.tp * cfg.cp) + 1000. * cfg.pp}
+
+    def get_memory_costs(self, configs):
+        return [self.get_memory_cost(cfg) for cfg in configs]
+
+
+class FakeMemoryBlack:
+    """Measured peak memory in GB, the white box model underestimates it by 30%."""
+
+    def get_peak_memory(self, cfg):
+        return 1.3e-3 * (16000. * cfg.micro_batch_size / (cfg.tp * cfg.cp) + 1000. * cfg.pp)
+
+
+class FakeTimeBlack:
+    def get_iteration_time(self, cfg):
+        return np.array([1000. * (cfg.tp + cfg.cp) / cfg.micro_batch_size])
+
+
+class FakeProfiler:
+    def __init__(self):
+        self.runs = []
+
+    def run(self, prof_dir, config, flag):
+        self.runs.append(prof_dir)
+
+
+def make_configs():
+    configs = []
+    for tp, cp, mbs in itertools.product([8, 4, 2, 1], [2, 1], [1, 2, 4]):
+        configs.append(SearchConfig(tensor_model_parallel_size=tp, pipeline_model_parallel_size=2,
+                                    context_parallel_size=cp, micro_batch_size=mbs, world_size=16,
+                                    num_layers=8, seq_length=4096))
+    return configs
+
+
+def make_searcher(tmp_path):
+    searcher = BlackSearcher.__new__(BlackSearcher)
+    searcher.logger = logging.getLogger("TestBlackSearcher")
+    searcher.profiler = FakeProfiler()
+    searcher.memory_cost = FakeMemoryCost()
+    searcher.memory_black = FakeMemoryBlack()
+    searcher.time_black = FakeTimeBlack()
+    searcher.pre_search = lambda: None
+    searcher.model_results = pd.DataFrame(columns=[
+        'pp', 'tp', 'dp', 'ring_attention', 'ulysses', 'mbs', 'vpp', 'ep', 'peak_memory', 'e2e_time'
+    ])
+    searcher.output_path = str(tmp_path / 'model_results.csv')
+    searcher.pruning_log_path = str(tmp_path / 'black_search_pruning.jsonl')
+    return searcher
+
+
+def legacy_search(searcher, configs, topk):
+    """The search removing the configs dominated by an OOM config one by one from a copy of the list."""
+    idx = 0
+    while idx < len(configs):
+        config = configs[idx]
+        micro_batch_size = config.micro_batch_size
+        cropped_config = config.crop()
+        cropped_config.micro_batch_size = 1
+        cropped_config.prepare_for_profiling_black()
+        searcher.profiler.run(searcher_module.get_prof_dir(cropped_config), config, None)
+        peak_memory = searcher.memory_black.get_peak_memory(config)
+        if peak_memory > MAX_AVAILABLE_MEMORY:
+            tmp_search_space = deepcopy(configs)
+            mem1 = searcher.memory_cost.get_memory_cost(cropped_config)["peak_memory"]
+            for i in range(idx + 1, len(tmp_search_space)):
+                mem2 = searcher.memory_cost.get_memory_cost(tmp_search_space[i])["peak_memory"]
+                if mem2 > mem1:
+                    configs.remove(tmp_search_space[i])
+            idx += 1
+            continue
+        cropped_config.micro_batch_size = micro_batch_size
+        cropped_config.prepare_for_profiling_black()
+        searcher.profiler.run(searcher_module.get_prof_dir(config), config, None)
+        step_time = np.mean(searcher.time_black.get_iteration_time(config)) / 1e3
+        searcher.add_model_result(config, searcher.memory_black.get_peak_memory(config), step_time)
+        idx += 1
+    return searcher.get_top_k(topk=topk)
+
+
+def summary(configs):
+    return [(cfg.tp, cfg.pp, cfg.dp, cfg.micro_batch_size) for cfg in configs]
+
+
+@pytest.fixture
+def black_search_env(tmp_path, monkeypatch):
+    system_config = SimpleNamespace(work_dir=str(tmp_path), node_rank=0, world_size=16,
+                                    max_available_memory=MAX_AVAILABLE_MEMORY)
+    monkeypatch.setattr(searcher_module, "get_system_config", lambda: system_config)
+    monkeypatch.setattr(search_config, "get_system_config", lambda: system_config)
+    monkeypatch.setattr(searcher_module, "get_black_prof_file", lambda cfg: searcher_module.get_prof_dir(cfg))
+
+
+def legacy_dominated(estimates, oom_thresholds):
+    alive = list(range(len(estimates)))
+    for index, threshold in oom_thresholds:
+        alive = [i for i in alive if i <= index or not estimates[i] > threshold]
+    return alive
+
+
+class TestBlackSearcher:
+
+    def test_prune_dominated_same_as_legacy(self):
+        rng = np.random.default_rng(0)
+        estimates = rng.integers(0, 50, 500).astype(float)
+        estimates[[3, 77]] = np.nan
+        oom_thresholds = [(10, 40.), (50, 30.), (400, 5.)]
+        pruner = MemoryDominancePruner(estimates, MAX_AVAILABLE_MEMORY)
+        for index, threshold in oom_thresholds:
+            pruned = pruner.prune_dominated(index, threshold)
+            assert pruned == sorted(pruned)
+            assert all(i > index and estimates[i] > threshold for i in pruned)
+        assert np.flatnonzero(pruner.alive).tolist() == legacy_dominated(estimates, oom_thresholds)
+
+    def test_calibrated_pruning(self, tmp_path):
+        estimates = [1000., 2000., 4000., 8000., 9500., 12000.]
+        log_path = str(tmp_path / 'pruning.jsonl')
+        pruner = MemoryDominancePruner(estimates, 10., log_path=log_path, margin=0.1, min_samples=2,
+                                       names=[f'cfg{i}' for i in range(len(estimates))])
+        # the model underestimates by 20%, the calibration starts with the second measurement
+        assert pruner.record_measurement(0, 1000., 1.2) == []
+        assert pruner.record_measurement(1, 2000., 2.4) == [4, 5]
+        # the median of the ratios is kept, the calibrated limit stays 11 / 1.2e-3 = 9166 MB
+        assert pruner.record_measurement(2, 4000., 4.) == []
+        assert pruner.is_alive(3) and pruner.num_pruned == 2
+        with open(log_path) as f:
+            records = [json.loads(line) for line in f]
+        assert [(record['event'], record['config'], record['pruned']) for record in records] == \
+            [('measurement', 'cfg0', []), ('measurement', 'cfg1', [4, 5]), ('measurement', 'cfg2', [])]
+        assert records[2]['scale'] == pytest.approx(1.2e-3)
+
+    def test_same_search_as_legacy_without_calibration(self, tmp_path, black_search_env, monkeypatch):
+        legacy_searcher = make_searcher(tmp_path)
+        expected = summary(legacy_search(legacy_searcher, make_configs(), 3))
+
+        monkeypatch.setattr(searcher_module, "MemoryDominancePruner",
+                            functools.partial(MemoryDominancePruner, min_samples=float('inf')))
+        searcher = make_searcher(tmp_path)
+        assert summary(searcher.search(make_configs(), 3)) == expected
+        assert searcher.profiler.runs == legacy_searcher.profiler.runs
+        assert searcher.model_results.equals(legacy_searcher.model_results)
+        with open(searcher.pruning_log_path) as f:
+            records = [json.loads(line) for line in f]
+        assert any(record['event'] == 'oom' and record['pruned'] for record in records)
+
+    def test_calibration_prunes_more(self, tmp_path, black_search_env):
+        legacy_searcher = make_searcher(tmp_path)
+        expected = summary(legacy_search(legacy_searcher, make_configs(), 3))
+        searcher = make_searcher(tmp_path)
+        assert summary(searcher.search(make_configs(), 3)) == expected
+        assert len(searcher.profiler.runs) < len(legacy_searcher.profiler.runs)
+
+    def test_calibration_uses_the_estimates_of_the_search_space(self, tmp_path, black_search_env, monkeypatch):
+        measurements = []
+
+        class RecordingPruner(MemoryDominancePruner):
+            def record_measurement(self, index, estimate, peak_memory):
+                measurements.append((index, estimate))
+                return super().record_measurement(index, estimate, peak_memory)
+
+        monkeypatch.setattr(searcher_module, "MemoryDominancePruner", RecordingPruner)
+        configs = make_configs()
+        estimates = [FakeMemoryCost().get_memory_cost(cfg)["peak_memory"] for cfg in configs]
+        peak_memories = [FakeMemoryBlack().get_peak_memory(cfg) for cfg in configs]
+        make_searcher(tmp_path).search(configs, 3)
+        # the OOM and the fitting configs are calibrated against the same estimates as the pruned ones
+        assert any(peak_memories[index] > MAX_AVAILABLE_MEMORY for index, _ in measurements)
+        assert measurements == [(index, estimates[index]) for index, _ in measurements]
@@ -0,0 +1,163 @@
+import random
+import time
+
+import numpy as np
+import pytest
+
+from mindspeed.auto_settings.module.operator.operator_database import DataBase, HISTORY_COLUMNS, OperatorHistory
+
+TYPES = ['MatMulV2', 'BatchMatMul', 'FlashAttentionScore', 'RmsNorm', 'Add', 'Mul', 'Cast', 'Transpose']
+CORES = ['AI_CORE', 'AI_VECTOR_CORE', 'MIX_AIC']
+
+
+def make_history(num_operators, num_shapes, seed=0):
+    rng = random.Random(seed)
+    data_list = []
+    for _ in range(num_operators):
+        shape = rng.randrange(num_shapes)
+        data_list.append(OperatorHistory(types=rng.choice(TYPES),
+                                         accelerator_core=rng.choice(CORES),
+                                         input_shape=f'{shape},{4096 // (1 + shape % 8)};4096',
+                                         output_shape=f'{shape},{rng.choice([1024, 2048, 4096])}',
+                                         duration=rng.uniform(1., 1000.),
+                                         device='910B',
+                                         jit=rng.randrange(2),
+                                         cann='8.0',
+                                         driver='24.1',
+                                         dtype='bf16').convert_to_dict())
+    return data_list
+
+
+def make_dir(path):
+    path.mkdir()
+    return str(path)
+
+
+def lookup_keys(data_list):
+    shape_keys = sorted({(data['types'], data['input_shape']) for data in data_list})
+    core_keys = sorted({(data['accelerator_core'], data['types']) for data in data_list})
+    return shape_keys + [('Unknown', '1,2')], core_keys + [('AI_CPU', 'Add')]
+
+
+def num_unique_operators(data_list):
+    return len({(data['types'], data['accelerator_core'], data['input_shape'], data['output_shape'], data['jit'])
+                for data in data_list})
+
+
+def as_dicts(operators):
+    return [operator.convert_to_dict() for operator in operators]
+
+
+class TestOperatorDatabase:
+
+    def test_index_same_as_db_queries(self, tmp_path):
+        data_list = make_history(3000, 50)
+        dao = DataBase(str(tmp_path)).operator_history_dao
+        dao.insert_history(data_list)
+        shape_keys, core_keys = lookup_keys(data_list)
+        expected_shape = [as_dicts(dao.get_by_types_and_input_shape(*key)) for key in shape_keys]
+        expected_core = [as_dicts(dao.get_by_types_and_accelerator_core(*key)) for key in core_keys]
+
+        index = dao.load_index()
+        assert index.num_rows == len(dao.export_columns()['types'])
+        assert [as_dicts(dao.get_by_types_and_input_shape(*key)) for key in shape_keys] == expected_shape
+        assert [as_dicts(dao.get_by_types_and_accelerator_core(*key)) for key in core_keys] == expected_core
+        # the index returns a new list on every lookup
+        operators = dao.get_by_types_and_input_shape(*shape_keys[0])
+        operators.clear()
+        assert as_dicts(dao.get_by_types_and_input_shape(*shape_keys[0])) == expected_shape[0]
+
+    def test_bulk_insert_same_as_row_insert(self, tmp_path):
+        # the same operators are profiled several times, the upsert averages their durations in order
+        data_list = make_history(2000, 20, seed=1)
+        row_dao = DataBase(make_dir(tmp_path / 'row')).operator_history_dao
+        for data in data_list:
+            row_dao.insert_history([data])
+        bulk_dao = DataBase(make_dir(tmp_path / 'bulk')).operator_history_dao
+        bulk_dao.insert_history(data_list[:500])
+        bulk_dao.insert_history(data_list[500:])
+        row_columns, bulk_columns = row_dao.export_columns(), bulk_dao.export_columns()
+        assert len(row_columns['types']) < len(data_list)
+        for name in HISTORY_COLUMNS:
+            assert np.array_equal(row_columns[name], bulk_columns[name])
+
+    def test_insert_reloads_index(self, tmp_path):
+        dao = DataBase(str(tmp_path)).operator_history_dao
+        data = make_history(1, 1)[0]
+        dao.insert_history([data])
+        dao.load_index()
+        assert [operator.duration for operator in dao.get_by_types_and_input_shape(data['types'],
+                                                                                   data['input_shape'])] == \
+            [data['duration']]
+        dao.insert_history([dict(data, duration=data['duration'] + 10.)])
+        assert [operator.duration for operator in dao.get_by_types_and_input_shape(data['types'],
+                                                                                   data['input_shape'])] == \
+            [data['duration'] + 5.]
+        dao.clear_index()
+        assert len(dao.get_by_types_and_accelerator_core(data['accelerator_core'], data['types'])) == 1
+
+    def test_export_columns(self, tmp_path):
+        data_list = make_history(500, 10, seed=2)
+        dao = DataBase(str(tmp_path)).operator_history_dao
+        dao.insert_history(data_list)
+        export_path = str(tmp_path / 'history.npz')
+        columns = dao.export_columns(export_path)
+        assert columns['duration'].dtype == np.float64
+        assert columns['jit'].dtype == np.int64
+        with np.load(export_path) as saved:
+            assert sorted(saved.files) == sorted(HISTORY_COLUMNS)
+            for name in HISTORY_COLUMNS:
+                assert np.array_equal(saved[name], columns[name])
+        assert len(columns['types']) == num_unique_operators(data_list)
+
+    def test_lookup_and_insert_on_large_history(self, tmp_path):
+        data_list = make_history(100000, 5000, seed=3)
+        dao = DataBase(str(tmp_path)).operator_history_dao
+        dao.insert_history(data_list)
+        num_row_inserts = 2000
+        row_dao = DataBase(make_dir(tmp_path / 'row')).operator_history_dao
+        for data in data_list[:num_row_inserts]:
+            row_dao.insert_history([data])
+        assert len(dao.export_columns()['types']) == num_unique_operators(data_list)
+        assert len(row_dao.export_columns()['types']) == num_unique_operators(data_list[:num_row_inserts])
+
+        shape_keys, _ = lookup_keys(data_list)
+        shape_keys = random.Random(0).sample(shape_keys, 2000)
+        expected = [as_dicts(dao.get_by_types_and_input_shape(*key)) for key in shape_keys]
+        index = dao.load_index()
+        assert index.num_rows == num_unique_operators(data_list)
+        assert [as_dicts(dao.get_by_types_and_input_shape(*key)) for key in shape_keys] == expected
+
+    @pytest.mark.benchmark
+    def test_benchmark_lookup_and_insert(self, tmp_path):
+        data_list = make_history(100000, 5000, seed=3)
+        dao = DataBase(str(tmp_path)).operator_history_dao
+        start = time.perf_counter()
+        dao.insert_history(data_list)
+        bulk_insert_time = time.perf_counter() - start
+
+        row_dao = DataBase(make_dir(tmp_path / 'row')).operator_history_dao
+        num_row_inserts = 2000
+        start = time.perf_counter()
+        for data in data_list[:num_row_inserts]:
+            row_dao.insert_history([data])
+        row_insert_time = time.perf_counter() - start
+
+        shape_keys, _ = lookup_keys(data_list)
+        shape_keys = random.Random(0).sample(shape_keys, 2000)
+        start = time.perf_counter()
+        for key in shape_keys:
+            dao.get_by_types_and_input_shape(*key)
+        query_time = time.perf_counter() - start
+        start = time.perf_counter()
+        dao.load_index()
+        load_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for key in shape_keys:
+            dao.get_by_types_and_input_shape(*key)
+        index_time = time.perf_counter() - start
+
+        print(f"\ninsert: {len(data_list) / bulk_insert_time:.0f} rows/s bulk, "
+              f"{num_row_inserts / row_insert_time:.0f} rows/s row by row; "
+              f"lookup: {len(shape_keys) / query_time:.0f}/s queries, {len(shape_keys) / index_time:.0f}/s index, "
+              f"index load {load_time:.2f} s")
@@ -0,0 +1,114 @@
+import os
+from argparse import Namespace
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+import mindspeed.auto_settings.config.model_config as model_config
+import mindspeed.auto_settings.config.system_config as system_config
+import mindspeed.auto_settings.profile.profiler as profiler_module
+from mindspeed.auto_settings.config.search_config import ExecutorFlag
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_config import ProfilingModelInfo
+from mindspeed.auto_settings.profile.profiler import Profiler
+from mindspeed.auto_settings.profile.runner import FakeRunner
+from mindspeed.auto_settings.search_space import SearchSpace
+from mindspeed.auto_settings.utils.file_utils import restricted_read, restricted_write
+from mindspeed.auto_settings.utils.singleton import Singleton
+
+
+def fake_profiling_job(argv, env):
+    """Writes what the torchrun job would write, the profiling result records the config it has read."""
+    save_path = argv[argv.index("--profile-save-path") + 1]
+    if env.get(Profiler.PARSE_MODEL_ENV) == Profiler.ENABLED_ENV_MARKER:
+        restricted_write(save_path, {"num_layers": int(argv[argv.index("--num-layers") + 1])})
+    elif env.get(Profiler.PROFILING_ENV) == Profiler.ENABLED_ENV_MARKER:
+        cfg = restricted_read(os.path.join(os.path.dirname(save_path), "at_0.pkl"))
+        profiling_res = ProfilingModelInfo()
+        profiling_res.matmul_total_time = [cfg.tp, cfg.cp, cfg.pp, cfg.seq_length]
+        os.makedirs(os.path.join(save_path, "pkl_path"), exist_ok=True)
+        restricted_write(os.path.join(save_path, "pkl_path", "node_0.pkl"), profiling_res)
+    return 0
+
+
+@pytest.fixture
+def auto_settings_env(tmp_path, monkeypatch):
+    properties = SimpleNamespace(total_memory=64 * 1024 ** 3)
+    monkeypatch.setattr(torch, "npu", SimpleNamespace(get_device_properties=lambda device: properties), raising=False)
+    monkeypatch.setattr(profiler_module, "dist", SimpleNamespace(monitored_barrier=lambda **kwargs: None,
+                                                                 broadcast_object_list=lambda objects: None,
+                                                                 barrier=lambda: None))
+    monkeypatch.setattr(system_config, "_SYSTEM_CONFIG", None)
+    monkeypatch.setattr(model_config, "_MODEL_CONFIG", None)
+    for cls in (Profiler, SearchSpace):
+        monkeypatch.delitem(Singleton._instances, cls, raising=False)
+
+    def init(work_dir, cann_version="8.0.0"):
+        system_config._SYSTEM_CONFIG = None
+        model_config._MODEL_CONFIG = None
+        Singleton._instances.pop(Profiler, None)
+        system_config.set_system_config(Namespace(
+            auto_settings_log_level="warning", nnodes=1, nproc_per_node=8, node_rank=0, master_addr="127.0.0.1",
+            master_port=6005, target_nnodes=1, auto_settings_work_dir=str(tmp_path / work_dir),
+            auto_settings_cache_dir=str(tmp_path / "cache")))
+        system_config.get_system_config().device_type = "Ascend910B"
+        system_config.get_system_config().cann_version = cann_version
+        model_config.set_model_config(Namespace(
+            hidden_size=1024, ffn_hidden_size=4096, num_attention_heads=16, num_layers=8, seq_length=8192,
+            vocab_size=32000, global_batch_size=16, micro_batch_size=1, tensor_model_parallel_size=1,
+            context_parallel_size=1, pipeline_model_parallel_size=1, bf16=True))
+        return Profiler()
+
+    return init
+
+
+def profile(profiler, configs, job_fn=fake_profiling_job):
+    profiler.runner = FakeRunner(job_fn)
+    results = profiler.profile(configs)
+    return [(cfg, res.matmul_total_time) for cfg, res in results]
+
+
+class TestProfileCache:
+
+    def test_reuse_across_runs(self, auto_settings_env):
+        profiler = auto_settings_env("work_0")
+        configs = SearchSpace().build_pre_search_spaces()
+        num_profile_jobs = sum(cfg.profile_type == ExecutorFlag.PROFILE for cfg, _ in configs)
+        results = profile(profiler, configs)
+        assert len(profiler.runner.launched) == len(configs)
+        assert len(results) == num_profile_jobs
+        assert [res for _, res in results] == [[cfg.tp, cfg.cp, cfg.pp, cfg.seq_length] for cfg, _ in results]
+        assert profiler.cache.stats() == {"hits": 0, "misses": len(configs)}
+
+        # a new work dir reuses the cache without launching any job
+        profiler = auto_settings_env("work_1")
+        configs = SearchSpace().build_pre_search_spaces()
+        assert profile(profiler, configs) == results
+        assert not profiler.runner.launched
+        assert profiler.cache.stats() == {"hits": len(configs), "misses": 0}
+        for cfg, file_name in configs:
+            if cfg.profile_type == ExecutorFlag.PARSE_MODEL:
+                work_dir = system_config.get_system_config().work_dir
+                assert restricted_read(os.path.join(work_dir, file_name)) == {"num_layers": cfg.num_layers}
+
+        # other software versions profile again
+        profiler = auto_settings_env("work_2", cann_version="8.1.0")
+        assert profile(profiler, SearchSpace().build_pre_search_spaces()) == results
+        assert len(profiler.runner.launched) == len(configs)
+
+    def test_failed_job(self, auto_settings_env):
+        profiler = auto_settings_env("work_0")
+        configs = SearchSpace().build_pre_search_spaces()
+        failed_file_name = next(file_name for cfg, file_name in configs if cfg.profile_type == ExecutorFlag.PROFILE)
+
+        def job_fn(argv, env):
+            save_path = argv[argv.index("--profile-save-path") + 1]
+            return 1 if os.path.basename(save_path) == failed_file_name else fake_profiling_job(argv, env)
+
+        with pytest.raises(RuntimeError, match=f"Profiling job {failed_file_name} failed with return code 1"):
+            profile(profiler, configs, job_fn)
+
+        # nothing of the failed run is cached, the next run profiles every config
+        profiler = auto_settings_env("work_1")
+        profile(profiler, SearchSpace().build_pre_search_spaces())
+        assert len(profiler.runner.launched) == len(configs)
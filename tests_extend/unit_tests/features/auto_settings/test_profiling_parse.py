@@ -0,0 +1,455 @@
+import csv
+import json
+import os
+import random
+import time
+
+import numpy as np
+import pytest
+
+import mindspeed.auto_settings.module.parse.profiling_parse.profiling_parse as profiling_parse
+from mindspeed.auto_settings.config.search_config import SearchConfig
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_communication_parse import \
+    AnalyseCommunicationMsg
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_config import ProfilingModelInfo
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_constant import (
+    NumberConstant,
+    OperatorDetails,
+    SpecialKeyName,
+    SpecialOperatorName,
+)
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_memory_parse import AnalyseMemoryMsg
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_meta_parse import (
+    ColumnarDetails,
+    FileAnalyseTool,
+    StructureAnalyseTool,
+)
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_operator_parse import AnalyseOperatorMsg
+from mindspeed.auto_settings.module.parse.profiling_parse.profiling_parse import ProfilingParser
+
+KERNEL_HEADER = ['Step Id', 'Model ID', 'Task ID', 'Stream ID', 'Name', 'Type', 'Accelerator Core',
+                 'Start Time(us)', 'Duration(us)', 'Wait Time(us)', 'Block Dim', 'Input Shapes', 'Output Shapes']
+DURATIONS = [5.0, 8.5, 12.25, 20.0, 35.5]
+
+
+class ProfileWriter:
+    """Writes the profiling files of a rank: a timeline of compute and HCCL ops with overlaps."""
+
+    def __init__(self, seed, groups):
+        self.random = random.Random(seed)
+        self.groups = groups
+        self.kernel_rows = []
+        self.memory_rows = []
+        self.communication = {'collective': {}, 'p2p': {}}
+        self.time = 1000.0
+        self.allocated = 2048.0
+        self.hcom_seq = 0
+
+    def add_kernel(self, name, type_, core):
+        duration = self.random.choice(DURATIONS)
+        start = self.time
+        if self.kernel_rows and self.random.random() < 0.4:
+            # starts during the previous op
+            start -= self.random.choice([1.0, 4.0])
+        self.time = start + duration
+        self.kernel_rows.append(['1', '0', str(len(self.kernel_rows)), '2', name, type_, core, f'{start:.3f}',
+                                 f'{duration:.3f}', f'{self.random.choice([0.0, 1.5]):.3f}', '20',
+                                 '"4096,1024;1024,2048"', '"4096,2048"'])
+
+    def add_memory(self, name):
+        self.allocated = max(0.0, self.allocated + self.random.choice([-64.0, 0.0, 32.0, 128.0]))
+        self.memory_rows.append([name, '1024.0', f'{self.time:.3f}', f'{self.time + 10:.3f}',
+                                 f'{self.allocated:.3f}', '4096.0'])
+
+    def add_hcom(self, group):
+        stream, ops = self.groups[group]
+        op = self.random.choice(ops)
+        name = f'hcom_{op}__{stream}_{self.hcom_seq}_1'
+        self.hcom_seq += 1
+        self.add_kernel(name, f'hcom_{op}_', 'HCCL')
+        elapse = self.random.choice([0.5, 1.0, 2.0])
+        transit = elapse * self.random.choice([0.3, 0.9, 1.0])
+        kind = 'p2p' if op in ('send', 'receive') else 'collective'
+        self.communication[kind][f'{name}@{self.hcom_seq}'] = {'Communication Time Info': {
+            'Start Timestamp(us)': self.time, 'Elapse Time(ms)': elapse, 'Transit Time(ms)': transit,
+            'Wait Time(ms)': elapse - transit, 'Idle Time(ms)': 0.0}}
+
+    def add_ops(self, num_ops):
+        for _ in range(num_ops):
+            choice = self.random.random()
+            if choice < 0.3:
+                self.add_hcom(self.random.choice(list(self.groups)))
+            elif choice < 0.55:
+                self.add_kernel('MatMul', 'MatMulCommon', 'AI_CORE')
+            elif choice < 0.6:
+                self.add_kernel('AllGatherMatmul', 'AllGatherMatmul', 'MIX_AIC')
+            else:
+                name = self.random.choice(['Add', 'Mul', 'SoftmaxGrad', 'Cast'])
+                self.add_kernel(name, name, 'AI_VECTOR_CORE')
+            self.add_memory(self.random.choice(['aten::add', 'aten::mm', 'aten::empty']))
+
+    def add_norm(self, backward):
+        self.add_kernel('RmsNorm', 'RmsNormGrad' if backward else 'RmsNorm', 'AI_VECTOR_CORE')
+        self.add_memory('npu_rms_norm_backward' if backward else 'npu_rms_norm')
+
+    def write_iteration(self, micro_num, norms_per_micro, ops_per_norm):
+        for group in self.groups:
+            # the first communication orders the groups
+            stream, ops = self.groups[group]
+            self.groups[group] = (stream, [op for op in ops if op != 'allReduce'])
+            self.add_hcom(group)
+            self.groups[group] = (stream, ops)
+            self.add_memory('aten::embedding' if group == next(iter(self.groups)) else 'aten::add')
+        for micro in range(micro_num):
+            for _ in range(norms_per_micro):
+                self.add_norm(backward=False)
+                self.add_ops(ops_per_norm)
+            self.add_ops(ops_per_norm)
+            for _ in range(norms_per_micro):
+                self.add_norm(backward=True)
+                self.add_ops(ops_per_norm)
+        self.add_ops(3 * ops_per_norm)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'kernel_details.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(KERNEL_HEADER)
+            writer.writerows(self.kernel_rows)
+        with open(os.path.join(path, 'operator_memory.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Name', 'Size(KB)', 'Allocation Time(us)', 'Release Time(us)',
+                             'Allocation Total Allocated(MB)', 'Allocation Total Reserved(MB)'])
+            writer.writerows(self.memory_rows)
+        with open(os.path.join(path, 'memory_record.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Component', 'Timestamp(us)', 'Total Allocated(MB)', 'Total Reserved(MB)', 'Device'])
+            writer.writerows([['PTA', '1', '100.0', '2048.5', 'NPU:0'], ['APP', '1', '100.0', '3500.25', 'NPU:0'],
+                              ['PTA', '2', '100.0', '1000.0', 'NPU:0']])
+        with open(os.path.join(path, 'op_statistic.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['OP Type', 'Core Type', 'Count'])
+            writer.writerows([['RmsNorm', 'AI_VECTOR_CORE', '6'], ['MatMulCommon', 'AI_CORE', '12']])
+        with open(os.path.join(path, 'communication.json'), 'w') as f:
+            json.dump({'step1': self.communication}, f)
+
+
+def make_search_cfg(tp, cp, pp, dp, num_layers, micro_num):
+    cfg = SearchConfig()
+    cfg.tensor_model_parallel_size = tp
+    cfg.context_parallel_size = cp
+    cfg.pipeline_model_parallel_size = pp
+    cfg.data_parallel_size = dp
+    cfg.expert_model_parallel_size = 1
+    cfg.num_layers = num_layers
+    cfg.micro_batch_size = 1
+    cfg.global_batch_size = micro_num * dp
+    return cfg
+
+
+def write_profile(root, search_cfg, ops_per_norm, seed=0):
+    """Profiling dirs of the 8 ranks of a node, the first rank of every stage has the profiling files."""
+    groups = {'tp': (10, ['allGather', 'reduceScatter', 'allReduce'])}
+    if search_cfg.cp > 1:
+        groups['cp'] = (20, ['send', 'receive'])
+    if search_cfg.pp > 1:
+        groups['pp'] = (30, ['send', 'receive'])
+    groups['dp'] = (40, ['allGather', 'reduceScatter'])
+    groups['dp_mlp'] = (50, ['allGather', 'reduceScatter'])
+    devices_each_stage = 8 // search_cfg.pp
+    micro_num = search_cfg.gbs // (search_cfg.mbs * search_cfg.dp)
+    for rank in range(8):
+        rank_dir = os.path.join(root, f'node_{rank}_ascend_pt')
+        os.makedirs(rank_dir, exist_ok=True)
+        with open(os.path.join(rank_dir, f'profiler_info_{rank}.json'), 'w') as f:
+            json.dump({}, f)
+        if rank % devices_each_stage == 0:
+            stage_id = rank // devices_each_stage
+            writer = ProfileWriter(seed + rank, dict(groups))
+            norms_per_micro = 3 if stage_id == search_cfg.pp - 1 else 2
+            writer.write_iteration(micro_num, norms_per_micro, ops_per_norm)
+            writer.save(os.path.join(rank_dir, 'ASCEND_PROFILER_OUTPUT'))
+
+
+# ---------------- the row parsers before the columnar parsing, the reference of the results ----------------
+
+def legacy_analyse_norm_op(self):
+    fw_norm_op_idx_list = []
+    bw_norm_op_idx_list = []
+    matmul_total_time = 0
+    mc2_total_time = 0
+    for idx, row in enumerate(self._memory_details):
+        if "Name" not in row or "Type" not in row:
+            continue
+        if row["Type"] == "MatMulCommon":
+            time_ = float(row["Duration(us)"]) / NumberConstant.CONVERSION_TIME
+            matmul_total_time += time_
+            mc2_total_time += time_
+        if row["Type"] == "AllGatherMatmul" or row["Type"] == "MatmulReduceScatter":
+            mc2_total_time += float(row["Duration(us)"]) / NumberConstant.CONVERSION_TIME
+        if row["Type"] == self.fw_norm_op:
+            fw_norm_op_idx_list.append(idx)
+        elif row["Type"] == self.bw_norm_op:
+            bw_norm_op_idx_list.append(idx)
+    return fw_norm_op_idx_list, bw_norm_op_idx_list, matmul_total_time, mc2_total_time
+
+
+class LegacyCommunicationMsg(AnalyseCommunicationMsg):
+
+    def __init__(self, search_cfg, communication_details, kernel_details):
+        super().__init__(search_cfg, communication_details, kernel_details)
+        self.kernel_details = list(kernel_details)
+        self.overlap_list = []
+
+    def get_hcom_and_hcom_overlap(self, index, info):
+        current_name = self.kernel_details[index][SpecialKeyName.NAME]
+        next_name = self.kernel_details[index + 1][SpecialKeyName.NAME]
+        if current_name in self.overlap_list or next_name in self.overlap_list:
+            return
+        hcom_time1 = float(info[SpecialKeyName.DURATION_US])
+        hcom_time2 = float(self.kernel_details[index + 1][SpecialKeyName.DURATION_US])
+        shorter_hcom = current_name if hcom_time1 <= hcom_time2 else next_name
+        self.overlap_list.append(shorter_hcom)
+
+    def legacy_compute_and_hcom_overlap(self, index, info):
+        overlap_record = {}
+        overlap_list = []
+        overlap_time = float(info[SpecialKeyName.DURATION_US])
+        op1 = self.kernel_details[index + 1]
+        op2 = self.kernel_details[index + 2] if index + 2 < len(self.kernel_details) else None
+        op1_name = op1[SpecialKeyName.NAME]
+        hcom1_duration = float(op1[SpecialKeyName.DURATION_US])
+        if op2 and op2[SpecialKeyName.ACCELERATOR_CORE] == 'HCCL':
+            op2_name = op2[SpecialKeyName.NAME]
+            hcom2_duration = float(op2[SpecialKeyName.DURATION_US])
+            if hcom2_duration <= hcom1_duration:
+                overlap_list.append(op2_name)
+                overlap_record[op1_name] = min(overlap_time, hcom1_duration)
+            else:
+                overlap_list.append(op1_name)
+                overlap_record[op1_name] = min(overlap_time, hcom2_duration)
+        else:
+            overlap_record[op1_name] = min(overlap_time, hcom1_duration)
+        return overlap_record, overlap_list
+
+    def is_overlap(self, index, row, row_is_hccl):
+        if index + 1 >= len(self.kernel_details):
+            return False
+        op1 = self.kernel_details[index + 1]
+        if op1[SpecialKeyName.ACCELERATOR_CORE] != 'HCCL' or \
+                (row[SpecialKeyName.ACCELERATOR_CORE] == 'HCCL') != row_is_hccl:
+            return False
+        return float(op1[SpecialKeyName.START_TIME_US]) < \
+            float(row[SpecialKeyName.START_TIME_US]) + float(row[SpecialKeyName.DURATION_US])
+
+    def _analyse_communication_overlap(self):
+        for index, row in enumerate(self.kernel_details):
+            if "Name" not in row or "Type" not in row:
+                continue
+            if self.is_overlap(index, row, row_is_hccl=False):
+                per_overlap_record, per_overlap_list = self.legacy_compute_and_hcom_overlap(index, row)
+                self.overlap_record = {**self.overlap_record, **per_overlap_record}
+                self.overlap_list.extend(per_overlap_list)
+            elif self.is_overlap(index, row, row_is_hccl=True):
+                self.get_hcom_and_hcom_overlap(index, row)
+        self.overlap_set = set(self.overlap_list)
+
+    def _cp_vector_operator_overlap(self, index, row):
+        if index >= len(self.kernel_details) - 1:
+            return False
+        is_hccl = row[SpecialKeyName.ACCELERATOR_CORE] == 'HCCL'
+        is_ai_vector_core = self.kernel_details[index + 1][SpecialKeyName.ACCELERATOR_CORE] == 'AI_VECTOR_CORE'
+        is_time_overlap = float(self.kernel_details[index + 1][SpecialKeyName.START_TIME_US]) < float(
+            row[SpecialKeyName.START_TIME_US]) + float(row[SpecialKeyName.DURATION_US])
+        is_overlap = is_hccl and is_ai_vector_core and is_time_overlap
+        return is_overlap and self.is_send_or_recv_op(row[SpecialKeyName.NAME])
+
+    def _analyse_cp_vector_time(self):
+        is_cp_vector = False
+        total_cp_vector = 0
+        for index, row in enumerate(self.kernel_details):
+            if "Name" not in row or "Type" not in row:
+                continue
+            is_ai_vector_core = row[SpecialKeyName.ACCELERATOR_CORE] == 'AI_VECTOR_CORE'
+            if is_cp_vector and is_ai_vector_core and 'Grad' not in row[SpecialKeyName.NAME]:
+                total_cp_vector += float(row[SpecialKeyName.DURATION_US]) / NumberConstant.CONVERSION_TIME
+            elif is_cp_vector and row[SpecialKeyName.ACCELERATOR_CORE] != 'AI_VECTOR_CORE':
+                is_cp_vector = False
+            if self._cp_vector_operator_overlap(index, row):
+                is_cp_vector = True
+        return total_cp_vector
+
+    def _analyse_cp_comm(self, name, info):
+        # the vector time was parsed again for every context parallel communication
+        self._cp_vector_time = None
+        super()._analyse_cp_comm(name, info)
+
+
+def legacy_memory_init(self, rank_file_path, search_cfg, memory_details, stage_id=0):
+    super(AnalyseMemoryMsg, self).__init__(search_cfg)
+    self._rank_file_path = rank_file_path
+    self._memory_details = list(memory_details)
+    self._update_norm_op()
+    self.stage_id = stage_id
+
+
+def legacy_analyse_embedding(self):
+    em_start_memory, em_peak_memory = 0, 0
+    if self.stage_id != 0:
+        return [em_start_memory], [em_peak_memory]
+    embedding_start_idx = 0
+    for idx, msg in enumerate(self._memory_details[1:], start=1):
+        op_name = msg[SpecialKeyName.NAME]
+        if self.norm_op in op_name:
+            break
+        if SpecialOperatorName.EMBEDDING in op_name:
+            embedding_start_idx = idx
+            em_start_memory, em_peak_memory = self.compare_memory(self._memory_details[idx - 1],
+                                                                  em_start_memory, em_peak_memory)
+        if idx > embedding_start_idx != 0:
+            em_start_memory, em_peak_memory = self.compare_memory(msg, em_start_memory, em_peak_memory)
+    return [em_start_memory], [em_peak_memory]
+
+
+def legacy_compare_memory_range(self, start_idx, end_idx, start_memory, peak_memory):
+    for msg in self._memory_details[start_idx:end_idx]:
+        start_memory, peak_memory = self.compare_memory(msg, start_memory, peak_memory)
+    return start_memory, peak_memory
+
+
+def legacy_analyse_norm_memory(self):
+    fw_memory_indices, bw_memory_indices = [], []
+    for index, row in enumerate(self._memory_details[1:], start=1):
+        if self.norm_op in self._memory_details[index - 1][SpecialKeyName.NAME]:
+            continue
+        if self.norm_op in row[SpecialKeyName.NAME] and SpecialOperatorName.BACKWARD not in row[SpecialKeyName.NAME]:
+            fw_memory_indices.append(index)
+        elif self.norm_op in row[SpecialKeyName.NAME] and SpecialOperatorName.BACKWARD in row[SpecialKeyName.NAME]:
+            bw_memory_indices.append(index)
+    return fw_memory_indices, bw_memory_indices
+
+
+def legacy_analyse_operators(self, start_idx, end_idx):
+    details_list = []
+    for i in range(start_idx, end_idx):
+        detail = self._operator_details[i]
+        details_list.append(OperatorDetails(
+            name=detail['Name'], type_=detail['Type'], input_shapes=detail['Input Shapes'],
+            output_shapes=detail['Output Shapes'], duration_us=detail['Duration(us)'],
+            wait_time_us=detail['Wait Time(us)'], accelerator_core=detail['Accelerator Core']))
+    return details_list
+
+
+def legacy_operator_init(self, operator_details):
+    self._operator_details = list(operator_details)
+
+
+@pytest.fixture
+def legacy_parser(monkeypatch):
+    """Patches the parsers back to the row parsing of the csv files, one rank after another."""
+
+    def patch():
+        monkeypatch.setattr(FileAnalyseTool, 'analyse_csv_columns', FileAnalyseTool.analyse_csv_info)
+        monkeypatch.setattr(StructureAnalyseTool, 'analyse_norm_op', legacy_analyse_norm_op)
+        monkeypatch.setattr(StructureAnalyseTool, '__init__', legacy_structure_init)
+        monkeypatch.setattr(profiling_parse, 'AnalyseCommunicationMsg', LegacyCommunicationMsg)
+        monkeypatch.setattr(AnalyseMemoryMsg, '__init__', legacy_memory_init)
+        monkeypatch.setattr(AnalyseMemoryMsg, 'analyse_embedding', legacy_analyse_embedding)
+        monkeypatch.setattr(AnalyseMemoryMsg, 'compare_memory_range', legacy_compare_memory_range)
+        monkeypatch.setattr(AnalyseMemoryMsg, '_analyse_norm_op', legacy_analyse_norm_memory)
+        monkeypatch.setattr(AnalyseOperatorMsg, '__init__', legacy_operator_init)
+        monkeypatch.setattr(AnalyseOperatorMsg, '_analyse_operators', legacy_analyse_operators)
+
+    return patch
+
+
+structure_init = StructureAnalyseTool.__init__
+
+
+def legacy_structure_init(self, rank_file_path, memory_details):
+    structure_init(self, rank_file_path, memory_details)
+    self._memory_details = list(memory_details)
+
+
+def to_plain(value):
+    """The attributes of the parsed objects as plain python values, to compare them."""
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if hasattr(value, '__dict__'):
+        return {'__class__': type(value).__name__, **to_plain(vars(value))}
+    return value
+
+
+def parse(root, search_cfg, num_workers=1):
+    return ProfilingParser(str(root), search_cfg=search_cfg, num_workers=num_workers).parser()
+
+
+class TestProfilingParse:
+
+    def test_columnar_details(self, tmp_path):
+        path = tmp_path / 'details.csv'
+        path.write_text('Name,Duration(us)\nMatMul,1.5\nAdd,\nCast\n')
+        details = FileAnalyseTool.analyse_csv_columns(str(tmp_path), 'details.csv')
+        assert list(details) == FileAnalyseTool.analyse_csv_info(str(tmp_path), 'details.csv')
+        assert details[-1] == {'Name': 'Cast', 'Duration(us)': None}
+        assert details[1:] == list(details)[1:]
+        durations = details.float_column('Duration(us)')
+        assert durations[0] == 1.5 and np.isnan(durations[1:]).all()
+        assert ColumnarDetails.from_rows(list(details)).column('Name') == ['MatMul', 'Add', 'Cast']
+
+    @pytest.mark.parametrize('seed', [0, 1, 2])
+    def test_same_overlap_as_row_parser(self, tmp_path, seed):
+        search_cfg = make_search_cfg(tp=2, cp=2, pp=1, dp=2, num_layers=1, micro_num=2)
+        write_profile(str(tmp_path), search_cfg, ops_per_norm=30, seed=seed)
+        rank_path = os.path.join(str(tmp_path), 'node_0_ascend_pt', 'ASCEND_PROFILER_OUTPUT')
+        kernel_details = FileAnalyseTool.analyse_csv_columns(rank_path, 'kernel_details.csv')
+        communication_details = FileAnalyseTool.analyse_json_info(rank_path, 'communication.json')
+
+        parsed = AnalyseCommunicationMsg(search_cfg, communication_details, kernel_details)
+        parsed._analyse_communication_overlap()
+        legacy = LegacyCommunicationMsg(search_cfg, communication_details, list(kernel_details))
+        legacy._analyse_communication_overlap()
+        assert parsed.overlap_record == legacy.overlap_record
+        assert list(parsed.overlap_record) == list(legacy.overlap_record)
+        assert parsed.overlap_set == legacy.overlap_set
+        assert len(parsed.overlap_set) > 0
+        assert parsed._analyse_cp_vector_time() == legacy._analyse_cp_vector_time() > 0
+
+    @pytest.mark.parametrize('pp, cp', [(1, 2), (2, 1)])
+    def test_same_model_info_as_row_parser(self, tmp_path, legacy_parser, pp, cp):
+        search_cfg = make_search_cfg(tp=2, cp=cp, pp=pp, dp=8 // (2 * cp * pp), num_layers=pp, micro_num=2)
+        write_profile(str(tmp_path), search_cfg, ops_per_norm=20)
+        # the stages are parsed in worker processes with pp 2
+        model = parse(tmp_path, search_cfg, num_workers=2)
+        legacy_parser()
+        legacy_model = parse(tmp_path, search_cfg)
+        assert isinstance(model, ProfilingModelInfo)
+        assert model.stage_id == pp - 1
+        assert len(model.tensor_parallel_comm) == pp
+        assert to_plain(model) == to_plain(legacy_model)
+
+    def test_same_model_info_on_large_profile(self, tmp_path, legacy_parser):
+        search_cfg = make_search_cfg(tp=2, cp=2, pp=1, dp=2, num_layers=1, micro_num=8)
+        write_profile(str(tmp_path), search_cfg, ops_per_norm=200)
+        model = parse(tmp_path, search_cfg)
+        legacy_parser()
+        legacy_model = parse(tmp_path, search_cfg)
+        assert to_plain(model) == to_plain(legacy_model)
+
+    @pytest.mark.benchmark
+    def test_benchmark_against_row_parser(self, tmp_path, legacy_parser):
+        search_cfg = make_search_cfg(tp=2, cp=2, pp=1, dp=2, num_layers=1, micro_num=8)
+        write_profile(str(tmp_path), search_cfg, ops_per_norm=200)
+        num_rows = len(FileAnalyseTool.analyse_csv_info(
+            os.path.join(str(tmp_path), 'node_0_ascend_pt', 'ASCEND_PROFILER_OUTPUT'), 'kernel_details.csv'))
+        start = time.perf_counter()
+        parse(tmp_path, search_cfg)
+        elapsed = time.perf_counter() - start
+        legacy_parser()
+        start = time.perf_counter()
+        parse(tmp_path, search_cfg)
+        legacy_elapsed = time.perf_counter() - start
+        print(f"\nprofiling parse of {num_rows} kernels: row parser {legacy_elapsed:.2f} s, "
+              f"columnar parser {elapsed:.2f} s")
@@ -0,0 +1,139 @@
+import itertools
+import logging
+import time
+from collections import deque
+from copy import deepcopy
+from types import SimpleNamespace
+
+import pytest
+
+import mindspeed.auto_settings.module.searcher as searcher_module
+from mindspeed.auto_settings.config.search_config import SearchConfig
+from mindspeed.auto_settings.module.searcher import WhiteSearcher
+
+MEMORY_CAP = 60000.
+
+
+class FakeMemoryCost:
+    def get_memory_cost(self, cfg):
+        peak_memory = 80000. / (cfg.tp * cfg.pp) + 1000. * cfg.micro_batch_size
+        return {"peak_memory": peak_memory, "new_memory": peak_memory * 0.9, "need_recompute": cfg.pp > 2,
+                "layer_calculate": 1, "recompute_layer": 0}
+
+    def get_memory_costs(self, configs):
+        return [self.get_memory_cost(cfg) for cfg in configs]
+
+
+class FakeTimeCost:
+    """Time of a config with many equal times, fails for cp 4 with ep 2 and is infinite for tp 8 with pp 8."""
+
+    def __init__(self, cost_time=0.):
+        self.cost_time = cost_time
+
+    def get_time_cost(self, cfg, memory_info):
+        if self.cost_time:
+            time.sleep(self.cost_time)
+        if cfg.cp == 4 and cfg.ep == 2:
+            raise ValueError("no model for this config")
+        total_time = float("inf") if cfg.tp == 8 and cfg.pp == 8 else \
+            float(cfg.tp + 2 * cfg.pp + cfg.cp + cfg.micro_batch_size)
+        return {"total_time": total_time, "num_layers": cfg.pp, "use_mc2": cfg.tp > 2}
+
+    def get_time_costs(self, configs, memory_infos):
+        return [self.get_time_cost(cfg, memory_info) for cfg, memory_info in zip(configs, memory_infos)]
+
+
+def make_configs():
+    configs = []
+    for tp, pp, cp, ep, mbs in itertools.product([1, 2, 4, 8], [1, 2, 4, 8], [1, 2, 4], [1, 2], [1, 2]):
+        configs.append(SearchConfig(tensor_model_parallel_size=tp, pipeline_model_parallel_size=pp,
+                                    context_parallel_size=cp, expert_model_parallel_size=ep, micro_batch_size=mbs,
+                                    data_parallel_size=1))
+    return configs
+
+
+def make_searcher(cost_time=0.):
+    searcher = WhiteSearcher.__new__(WhiteSearcher)
+    searcher.logger = logging.getLogger("TestWhiteSearcher")
+    searcher.memory_cost = FakeMemoryCost()
+    searcher.time_cost = FakeTimeCost(cost_time)
+    searcher.pre_search = lambda: None
+    return searcher
+
+
+def legacy_search(searcher, configs, topk):
+    """The serial search with a linearly scanned deque of the top-k configs."""
+    best_perf_cfg_map = deque([(float("inf"), None)] * topk, topk)
+    for cfg in configs:
+        memory_info = searcher.get_memory_cost(cfg)
+        if memory_info["peak_memory"] > MEMORY_CAP:
+            continue
+        try:
+            time_info = searcher.get_time_cost(cfg, memory_info)
+        except Exception:
+            continue
+        new_perf = time_info["total_time"]
+        for i, perf_cfg in enumerate(best_perf_cfg_map):
+            if new_perf < perf_cfg[0]:
+                cfg.performance = new_perf
+                cfg.memory = memory_info["new_memory"]
+                cfg.recompute_num_layers = time_info["num_layers"]
+                cfg.use_ascend_mc2 = time_info["use_mc2"] if cfg.tensor_model_parallel_size > 1 else False
+                best_perf_cfg_map.pop()
+                best_perf_cfg_map.insert(i, (new_perf, deepcopy(cfg)))
+                break
+    return [cfg for _, cfg in best_perf_cfg_map]
+
+
+def summary(configs):
+    return [None if cfg is None else (cfg.tp, cfg.pp, cfg.cp, cfg.ep, cfg.micro_batch_size, cfg.performance,
+                                      cfg.memory, cfg.recompute_num_layers, cfg.use_ascend_mc2)
+            for cfg in configs]
+
+
+@pytest.fixture
+def search_workers(monkeypatch):
+    system_config = SimpleNamespace(memory_cap=MEMORY_CAP, search_world_size=8, search_workers=1)
+    monkeypatch.setattr(searcher_module, "get_system_config", lambda: system_config)
+
+    def set_workers(num_workers):
+        system_config.search_workers = num_workers
+
+    return set_workers
+
+
+class TestWhiteSearcher:
+
+    @pytest.mark.parametrize("topk", [1, 3, 10, 400])
+    def test_same_top_k_as_serial_search(self, search_workers, topk):
+        expected = summary(legacy_search(make_searcher(), make_configs(), topk))
+        assert expected[0] is not None
+        for num_workers in [1, 2, 4]:
+            search_workers(num_workers)
+            assert summary(make_searcher().search(make_configs(), topk)) == expected
+
+    def test_does_not_change_configs(self, search_workers):
+        configs = make_configs()
+        search_workers(2)
+        best = make_searcher().search(configs, 3)
+        assert all(cfg.performance is None for cfg in configs)
+        assert all(cfg not in configs for cfg in best)
+
+    def test_evaluate_configs(self, search_workers):
+        configs = make_configs()
+        results = make_searcher().evaluate_configs(configs)
+        assert len(results) == len(configs)
+        for cfg, result in zip(configs, results):
+            memory_info = FakeMemoryCost().get_memory_cost(cfg)
+            if memory_info["peak_memory"] > MEMORY_CAP or (cfg.cp == 4 and cfg.ep == 2):
+                assert result is None
+            else:
+                assert result[0] == FakeTimeCost().get_time_cost(cfg, memory_info)["total_time"]
+                assert result[1:] == (memory_info["new_memory"], cfg.pp, cfg.tp > 2)
+
+    def test_parallel_search_same_as_serial(self, search_workers):
+        configs = make_configs()
+        search_workers(1)
+        expected = summary(make_searcher(cost_time=0.001).search(configs, 3))
+        search_workers(4)
+        assert summary(make_searcher(cost_time=0.001).search(configs, 3)) == expected
@@ -0,0 +1,185 @@
+import json
+import os
+
+import torch
+import torch.distributed as dist
+
+from mindspeed.core.tensor_parallel.coc_feature.coc_autotuner import CoCAutotuner
+from mindspeed.core.tensor_parallel.coc_feature.coc_utils import CommunicationType, get_parallel_num
+from mindspeed.core.tensor_parallel.coc_feature.min_comm_cfg import min_comm_config
+from tests_extend.unit_tests.gloo_common import run_gloo
+
+TP_SIZE = 8
+
+
+class FakeTiming:
+    """Timing of a matmul that overlaps best at ``best_parallel_num`` splits, records the timed configs."""
+
+    def __init__(self, best_parallel_num=4, slowdown=1.0):
+        self.best_parallel_num = best_parallel_num
+        self.slowdown = slowdown
+        self.calls = []
+
+    def __call__(self, m, k, n, comm_type, dtype, parallel_num):
+        self.calls.append((m, k, n, comm_type, dtype, parallel_num))
+        return self.slowdown * (10.0 + abs(parallel_num - self.best_parallel_num))
+
+
+def no_reduce(timings):
+    return timings
+
+
+def check_tp_agreement(rank, cache_path):
+    # rank 1 is slower at 8 splits, rank 0 at 2 splits, the maximum over the ranks is the fastest at 4 splits
+    timings = {0: {1: 12.0, 2: 30.0, 4: 11.0, 8: 10.0}, 1: {1: 12.0, 2: 9.0, 4: 11.0, 8: 40.0}}[rank]
+
+    def timing_fn(m, k, n, comm_type, dtype, parallel_num):
+        return timings[parallel_num]
+
+    def reduce_fn(values):
+        values = torch.tensor(values)
+        dist.all_reduce(values, op=dist.ReduceOp.MAX)
+        return values.tolist()
+
+    tuner = CoCAutotuner(2, cache_path=cache_path, timing_fn=timing_fn, reduce_fn=reduce_fn, hardware='fake',
+                         save_cache=rank == 0)
+    assert tuner.get_parallel_num(1024, 512, 256, CommunicationType.REDUCE_SCATTER, torch.bfloat16) == 4
+
+
+def max_over_ranks(values):
+    values = torch.tensor(values)
+    dist.all_reduce(values, op=dist.ReduceOp.MAX)
+    return values.tolist()
+
+
+def check_cache_miss_on_one_rank(rank, cache_dir):
+    # only rank 0 finds the shapes in its cache, e.g. it read the file after another job added them
+    cache_path = os.path.join(cache_dir, f'rank{rank}.json')
+    if rank == 0:
+        CoCAutotuner(2, cache_path=cache_path, timing_fn=FakeTiming(2), reduce_fn=no_reduce,
+                     hardware='fake').get_parallel_num(1024, 512, 256, CommunicationType.ALL_GATHER, torch.float16)
+    timing_fn = FakeTiming(8)
+    tuner = CoCAutotuner(2, cache_path=cache_path, timing_fn=timing_fn, reduce_fn=max_over_ranks, hardware='fake')
+    # both ranks time the shape, the collectives of the timings match
+    assert tuner.get_parallel_num(1024, 512, 256, CommunicationType.ALL_GATHER, torch.float16) == 8
+    assert len(timing_fn.calls) == 4 and tuner.num_tuned == 1
+    # the known shapes are agreed on once, later calls run no collective
+    tuner.reduce_fn = None
+    assert tuner.get_parallel_num(1024, 512, 256, CommunicationType.ALL_GATHER, torch.float16) == 8
+
+
+def check_cache_hit_on_all_ranks(rank, cache_dir):
+    cache_path = os.path.join(cache_dir, f'rank{rank}.json')
+    CoCAutotuner(2, cache_path=cache_path, timing_fn=FakeTiming(2 * (rank + 1)), reduce_fn=no_reduce,
+                 hardware='fake').get_parallel_num(1024, 512, 256, CommunicationType.ALL_GATHER, torch.float16)
+    timing_fn = FakeTiming(1)
+    tuner = CoCAutotuner(2, cache_path=cache_path, timing_fn=timing_fn, reduce_fn=max_over_ranks, hardware='fake')
+    # the ranks cached different winners, they take the same one without timing
+    assert tuner.get_parallel_num(1024, 512, 256, CommunicationType.ALL_GATHER, torch.float16) == 4
+    assert timing_fn.calls == []
+
+
+def tune_in_own_tp_group(rank, cache_path, num_shapes):
+    # every rank is the tensor parallel rank 0 of its own group and writes its shapes to the shared cache
+    tuner = CoCAutotuner(2, cache_path=cache_path, timing_fn=FakeTiming(4), reduce_fn=no_reduce, hardware='fake')
+    for m in range(num_shapes):
+        tuner.get_parallel_num(1024 * (m + 1), 512, 256 + rank, CommunicationType.ALL_GATHER, torch.float16)
+
+
+class TestCoCAutotuner:
+
+    def test_chooses_fastest_valid_parallel_num(self):
+        timing_fn = FakeTiming(best_parallel_num=4)
+        tuner = CoCAutotuner(TP_SIZE, timing_fn=timing_fn, reduce_fn=no_reduce, hardware='fake')
+        assert tuner.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.float16) == 4
+        assert [call[-1] for call in timing_fn.calls] == [1, 2, 4, 8]
+        # known shapes are not timed again
+        assert tuner.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.float16) == 4
+        assert len(timing_fn.calls) == 4
+        # m = 16 can only be split in 2 parts of tp size rows
+        assert tuner.get_parallel_num(16, 1024, 512, CommunicationType.REDUCE_SCATTER, torch.float16) == 2
+        assert [call[-1] for call in timing_fn.calls[4:]] == [1, 2]
+        # all-reduce does not split the rows over the ranks
+        assert tuner.get_parallel_num(16, 1024, 512, CommunicationType.ALL_REDUCE, torch.float16) == 4
+        # no valid split
+        assert tuner.get_parallel_num(4, 1024, 512, CommunicationType.ALL_GATHER, torch.float16) == 1
+        assert tuner.num_tuned == 4
+
+    def test_cache_is_loaded_by_later_jobs(self, tmp_path):
+        cache_path = str(tmp_path / 'coc_autotune.json')
+        first_job = CoCAutotuner(TP_SIZE, cache_path=cache_path, timing_fn=FakeTiming(8), reduce_fn=no_reduce,
+                                 hardware='fake')
+        assert first_job.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.bfloat16) == 8
+
+        timing_fn = FakeTiming(2)
+        second_job = CoCAutotuner(TP_SIZE, cache_path=cache_path, timing_fn=timing_fn, reduce_fn=no_reduce,
+                                  hardware='fake')
+        assert second_job.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.bfloat16) == 8
+        assert timing_fn.calls == []
+        # the dtype, the tp size and the hardware are part of the key
+        assert second_job.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.float16) == 2
+        other_tp = CoCAutotuner(4, cache_path=cache_path, timing_fn=timing_fn, reduce_fn=no_reduce, hardware='fake')
+        assert other_tp.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.bfloat16) == 2
+        other_hardware = CoCAutotuner(TP_SIZE, cache_path=cache_path, timing_fn=timing_fn, reduce_fn=no_reduce,
+                                      hardware='other')
+        assert other_hardware.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.bfloat16) == 2
+        assert len(timing_fn.calls) == 12
+
+        # all the jobs added their shapes to the cache
+        with open(cache_path) as f:
+            assert len(json.load(f)['entries']) == 4
+
+    def test_export_timings(self, tmp_path):
+        tuner = CoCAutotuner(TP_SIZE, timing_fn=FakeTiming(2), reduce_fn=no_reduce, hardware='fake')
+        tuner.get_parallel_num(4096, 1024, 512, CommunicationType.ALL_GATHER, torch.float16)
+        tuner.get_parallel_num(2048, 512, 1024, CommunicationType.REDUCE_SCATTER, torch.float16)
+        export_path = tmp_path / 'timings.json'
+        records = tuner.export_timings(str(export_path))
+        with open(export_path) as f:
+            assert json.load(f) == records
+        assert len(records) == 2
+        record = records[0]
+        assert record['key'] == 'm=2048,k=512,n=1024,comm=REDUCE_SCATTER,dtype=torch.float16,tp=8,hw=fake'
+        assert record['parallel_num'] == 2
+        assert record['timings_ms'] == {'1': 11.0, '2': 10.0, '4': 12.0, '8': 16.0}
+
+    def test_agreement_over_tp_ranks(self, tmp_path):
+        cache_path = str(tmp_path / 'coc_autotune.json')
+        run_gloo(check_tp_agreement, 2, cache_path)
+        with open(cache_path) as f:
+            entries = json.load(f)['entries']
+        assert [entry['parallel_num'] for entry in entries.values()] == [4]
+
+    def test_get_parallel_num_uses_autotuner(self):
+        timing_fn = FakeTiming(8)
+        saved = (min_comm_config.parallel_num, min_comm_config.coc_fused_kernel,
+                 min_comm_config.customized_coc_dict, min_comm_config.autotuner)
+        try:
+            min_comm_config.parallel_num = 2
+            min_comm_config.coc_fused_kernel = False
+            min_comm_config.customized_coc_dict = {str([1024, 64, 64]): 1}
+            min_comm_config.autotuner = CoCAutotuner(TP_SIZE, timing_fn=timing_fn, reduce_fn=no_reduce,
+                                                     hardware='fake')
+            assert get_parallel_num(4096, 64, 64, comm_type=CommunicationType.ALL_GATHER,
+                                    dtype=torch.float16) == 8
+            # the customized shapes have priority, the calls without comm type use the configured parallel num
+            assert get_parallel_num(1024, 64, 64, comm_type=CommunicationType.ALL_GATHER,
+                                    dtype=torch.float16) == 1
+            assert get_parallel_num(2048, 64, 64) == 2
+            assert len(timing_fn.calls) == 4
+        finally:
+            (min_comm_config.parallel_num, min_comm_config.coc_fused_kernel,
+             min_comm_config.customized_coc_dict, min_comm_config.autotuner) = saved
+
+    def test_tp_ranks_agree_on_cache_misses(self, tmp_path):
+        run_gloo(check_cache_miss_on_one_rank, 2, str(tmp_path))
+
+    def test_tp_ranks_agree_on_cache_hits(self, tmp_path):
+        run_gloo(check_cache_hit_on_all_ranks, 2, str(tmp_path))
+
+    def test_tp_groups_share_the_cache(self, tmp_path):
+        cache_path = str(tmp_path / 'coc_autotune.json')
+        num_ranks, num_shapes = 4, 10
+        run_gloo(tune_in_own_tp_group, num_ranks, cache_path, num_shapes)
+        with open(cache_path) as f:
+            assert len(json.load(f)['entries']) == num_ranks * num_shapes
@@ -0,0 +1,136 @@
+import copy
+import gc
+import time
+import weakref
+from collections import OrderedDict
+
+import pytest
+import torch
+
+from mindspeed.training import FusedEma, update_ema
+
+
+@torch.no_grad()
+def legacy_update_ema(ema_model, model, decay=0.9999):
+    """The update looping over the parameters with two kernels per parameter."""
+    ema_params = OrderedDict(ema_model.named_parameters())
+    model_params = OrderedDict(model.named_parameters())
+    for name, param in model_params.items():
+        if name == "pos_embed":
+            continue
+        if not param.requires_grad:
+            continue
+        ema_params[name].mul_(decay).add_(param.data, alpha=1 - decay)
+
+
+def make_model(num_params, numel=16, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    model = torch.nn.Module()
+    dtypes = [torch.float32, torch.bfloat16, torch.float16]
+    for i in range(num_params):
+        param = torch.nn.Parameter(torch.randn(numel, generator=generator).to(dtypes[i % len(dtypes)]))
+        model.register_parameter(f"p{i}", param)
+    model.register_parameter("pos_embed", torch.nn.Parameter(torch.randn(numel, generator=generator)))
+    return model
+
+
+@torch.no_grad()
+def perturb(model, seed):
+    generator = torch.Generator().manual_seed(seed)
+    for param in model.parameters():
+        param.add_(torch.randn(param.shape, generator=generator).to(param.dtype))
+
+
+def assert_params_equal(model1, model2):
+    for (name1, param1), (name2, param2) in zip(model1.named_parameters(), model2.named_parameters()):
+        assert name1 == name2
+        assert torch.equal(param1, param2), name1
+
+
+class TestUpdateEma:
+
+    def test_same_as_legacy_loop(self):
+        model = make_model(300)
+        model.p7.requires_grad_(False)
+        ema_model, legacy_ema_model = copy.deepcopy(model), copy.deepcopy(model)
+        perturb(ema_model, seed=1)
+        legacy_ema_model.load_state_dict(ema_model.state_dict())
+        for step in range(5):
+            perturb(model, seed=2 + step)
+            update_ema(ema_model, model, decay=0.99)
+            legacy_update_ema(legacy_ema_model, model, decay=0.99)
+            assert_params_equal(ema_model, legacy_ema_model)
+        assert not torch.equal(ema_model.pos_embed, model.pos_embed)
+        assert not torch.equal(ema_model.p7, model.p7)
+
+    def test_buckets_by_dtype(self):
+        model = make_model(30)
+        engine = FusedEma(copy.deepcopy(model), model)
+        assert sorted(len(model_bucket) for _, model_bucket in engine.buckets) == [10, 10, 10]
+        for ema_bucket, model_bucket in engine.buckets:
+            assert len({(p.dtype, p.device) for p in ema_bucket + model_bucket}) == 1
+
+    def test_update_interval_and_warmup(self):
+        model = torch.nn.Linear(4, 4)
+        ema_model = copy.deepcopy(model)
+        with torch.no_grad():
+            for param in ema_model.parameters():
+                param.zero_()
+        engine = FusedEma(ema_model, model, decay=0.9, update_interval=2, warmup_steps=4)
+        # the first update copies the model, then the decay ramps up every other step
+        assert engine.step() and torch.equal(ema_model.weight, model.weight)
+        assert not engine.step()
+        assert engine.get_decay(2) == pytest.approx((0.9 * 2 / 4) ** 2)
+        assert engine.get_decay(6) == pytest.approx(0.9 ** 2)
+        assert [engine.step(iteration) for iteration in range(2, 8)] == [True, False, True, False, True, False]
+        with pytest.raises(ValueError):
+            FusedEma(ema_model, model, update_interval=0)
+
+    def test_engine_rebuilt_for_new_decay(self):
+        model = make_model(4)
+        ema_model = copy.deepcopy(model)
+        update_ema(ema_model, model, decay=0.5)
+        # the engine cached for the old decay is not used
+        expected = copy.deepcopy(ema_model)
+        legacy_update_ema(expected, model, decay=0.2)
+        update_ema(ema_model, model, decay=0.2)
+        assert_params_equal(ema_model, expected)
+
+    def test_engine_does_not_keep_models_alive(self):
+        model = make_model(4)
+        ema_model = copy.deepcopy(model)
+        update_ema(ema_model, model)
+        ema_model_ref, model_ref = weakref.ref(ema_model), weakref.ref(model)
+        del ema_model, model
+        gc.collect()
+        assert ema_model_ref() is None and model_ref() is None
+
+    @pytest.mark.parametrize("num_params", [1000, 10000, 100000])
+    def test_same_as_legacy_loop_on_many_parameters(self, num_params):
+        model = make_model(num_params, numel=8)
+        ema_model, legacy_ema_model = copy.deepcopy(model), copy.deepcopy(model)
+        perturb(model, seed=1)
+        for _ in range(3):
+            update_ema(ema_model, model)
+            legacy_update_ema(legacy_ema_model, model)
+        assert_params_equal(ema_model, legacy_ema_model)
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize("num_params", [1000, 10000, 100000])
+    def test_benchmark_against_legacy_loop(self, num_params):
+        model = make_model(num_params, numel=8)
+        ema_model, legacy_ema_model = copy.deepcopy(model), copy.deepcopy(model)
+        perturb(model, seed=1)
+        num_steps = 3
+        update_ema(ema_model, model)  # groups the parameters once
+        legacy_update_ema(legacy_ema_model, model)
+        start = time.perf_counter()
+        for _ in range(num_steps):
+            legacy_update_ema(legacy_ema_model, model)
+        legacy_time = (time.perf_counter() - start) / num_steps
+        start = time.perf_counter()
+        for _ in range(num_steps):
+            update_ema(ema_model, model)
+        fused_time = (time.perf_counter() - start) / num_steps
+        print(f"\nema of {num_params} parameters: {legacy_time * 1e3:.2f} ms legacy loop, "
+              f"{fused_time * 1e3:.2f} ms fused, {legacy_time / fused_time:.1f}x")
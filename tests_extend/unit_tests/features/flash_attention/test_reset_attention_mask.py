@@ -0,0 +1,98 @@
+import time
+
+import pytest
+import torch
+
+from mindspeed.core.datasets.gpt_dataset import _get_ltor_masks_and_position_ids, collate_wrapper
+
+
+def loop_get_ltor_masks_and_position_ids(data, eod_token, reset_position_ids, reset_attention_mask,
+                                         eod_mask_loss, create_attention_mask):
+    """Reference implementation looping over the EOD indices."""
+    seq_length = data.numel()
+    if create_attention_mask:
+        attention_mask = torch.tril(torch.ones((seq_length, seq_length))).unsqueeze(0)
+    else:
+        attention_mask = None
+    loss_mask = torch.ones(seq_length, dtype=torch.float)
+    if eod_mask_loss:
+        loss_mask[data == eod_token] = 0.0
+    position_ids = torch.arange(seq_length, dtype=torch.long)
+    eod_index = position_ids[data == eod_token].clone()
+    if reset_attention_mask:
+        prev_index = 0
+        for j in range(eod_index.numel()):
+            i = eod_index[j]
+            if attention_mask is not None:
+                attention_mask[0, (i + 1):, : (i + 1)] = 0
+            if reset_position_ids:
+                position_ids[(i + 1):] -= i + 1 - prev_index
+                prev_index = i + 1
+    if attention_mask is not None:
+        attention_mask = attention_mask < 0.5
+    actual_seq_len = torch.cat([eod_index + 1, torch.tensor([seq_length])])
+    return attention_mask, loss_mask, (position_ids, actual_seq_len)
+
+
+def make_packed_sample(seq_length, num_docs, eod_token=0, end_with_eod=False):
+    generator = torch.Generator().manual_seed(seq_length + num_docs)
+    data = torch.randint(1, 100, (seq_length,), generator=generator)
+    eod_index = torch.randperm(seq_length - 1, generator=generator)[:num_docs - 1]
+    data[eod_index] = eod_token
+    if end_with_eod:
+        data[-1] = eod_token
+    return data
+
+
+class TestResetAttentionMask:
+
+    @pytest.mark.parametrize('create_attention_mask', [True, False])
+    @pytest.mark.parametrize('reset_position_ids', [True, False])
+    @pytest.mark.parametrize('end_with_eod', [True, False])
+    @pytest.mark.parametrize('num_docs', [1, 2, 7])
+    def test_get_ltor_masks_and_position_ids(self, create_attention_mask, reset_position_ids, end_with_eod, num_docs):
+        data = make_packed_sample(64, num_docs, end_with_eod=end_with_eod)
+        args = (data, 0, reset_position_ids, True, True, create_attention_mask)
+        attention_mask, loss_mask, (position_ids, actual_seq_len) = _get_ltor_masks_and_position_ids(*args)
+        ref_attention_mask, ref_loss_mask, (ref_position_ids, ref_actual_seq_len) = \
+            loop_get_ltor_masks_and_position_ids(*args)
+
+        if create_attention_mask:
+            assert torch.equal(attention_mask, ref_attention_mask)
+        else:
+            assert attention_mask is None
+        assert torch.equal(loss_mask, ref_loss_mask)
+        assert torch.equal(position_ids, ref_position_ids)
+        assert torch.equal(actual_seq_len, ref_actual_seq_len)
+
+    def test_collate_wrapper(self):
+        samples = []
+        for num_docs in (3, 5):
+            data = make_packed_sample(32, num_docs)
+            _, _, position_ids = _get_ltor_masks_and_position_ids(data, 0, True, True, False, False)
+            samples.append({'tokens': data, 'position_ids': position_ids})
+
+        batch = collate_wrapper(torch.utils.data.default_collate)(samples)
+
+        assert batch['position_ids'].shape == (2, 32)
+        assert torch.equal(batch['actual_seq_len'],
+                           torch.cat([samples[0]['position_ids'][1], samples[1]['position_ids'][1] + 32]))
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('seq_length', [4096, 32768, 131072])
+    @pytest.mark.parametrize('num_docs', [4, 64, 512])
+    def test_get_ltor_masks_and_position_ids_benchmark(self, seq_length, num_docs):
+        data = make_packed_sample(seq_length, num_docs)
+        args = (data, 0, True, True, True, False)
+
+        start = time.perf_counter()
+        _, _, (ref_position_ids, ref_actual_seq_len) = loop_get_ltor_masks_and_position_ids(*args)
+        loop_time = time.perf_counter() - start
+        start = time.perf_counter()
+        _, _, (position_ids, actual_seq_len) = _get_ltor_masks_and_position_ids(*args)
+        vectorized_time = time.perf_counter() - start
+
+        print(f'\nseq_length {seq_length} num_docs {num_docs}: '
+              f'loop {loop_time * 1e3:.2f}ms, vectorized {vectorized_time * 1e3:.2f}ms')
+        assert torch.equal(position_ids, ref_position_ids)
+        assert torch.equal(actual_seq_len, ref_actual_seq_len)
@@ -0,0 +1,137 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+import mindspeed.core.models.common.embeddings.rotary_pos_embedding as rotary_pos_embedding
+import mindspeed.core.transformer.flash_attention.reset_attention_mask.adaptor as reset_attention_mask_adaptor
+
+
+def legacy_rotary_forward(self, max_seq_len, offset, position_ids):
+    """rotary_forward before the emb table cache, without the context parallel slicing."""
+    seq = torch.arange(max_seq_len, device=self.inv_freq.device, dtype=self.inv_freq.dtype) + offset
+    if self.seq_len_interpolation_factor is not None:
+        seq *= 1 / self.seq_len_interpolation_factor
+    freqs = torch.outer(seq, self.inv_freq)
+    if not self.rotary_interleaved:
+        emb = torch.cat((freqs, freqs), dim=-1)
+    else:
+        emb = torch.stack((freqs.view(-1, 1), freqs.view(-1, 1)), dim=-1).view(freqs.shape[0], -1)
+    emb = emb[:, None, None, :]
+    s, b = position_ids.shape
+    return emb[position_ids.view(-1)].squeeze(1).reshape(s, b, 1, -1)
+
+
+def build_rotary_embedding(dim, dtype=torch.float32, seq_len_interpolation_factor=None, rotary_interleaved=False):
+    inv_freq = 1.0 / (10000 ** (torch.arange(0, dim, 2, dtype=torch.float32) / dim))
+    return SimpleNamespace(inv_freq=inv_freq.to(dtype), seq_len_interpolation_factor=seq_len_interpolation_factor,
+                           rotary_interleaved=rotary_interleaved)
+
+
+def build_position_ids(seq_len, batch_size, reset):
+    position_ids = torch.arange(seq_len)[:, None].repeat(1, batch_size)
+    if reset:
+        # packed documents restart their positions
+        position_ids[seq_len // 3:, 0] -= seq_len // 3
+        position_ids[seq_len // 2:, -1] -= seq_len // 2
+    return position_ids
+
+
+@pytest.fixture
+def position_ids_holder(monkeypatch):
+    holder = SimpleNamespace(position_ids=None, args=SimpleNamespace(reset_position_ids=False))
+    monkeypatch.setattr(rotary_pos_embedding, 'get_args', lambda: holder.args)
+    monkeypatch.setattr(rotary_pos_embedding, '_DEFAULT_POSITION_IDS_BY_SHAPE', {})
+    for module in (rotary_pos_embedding, reset_attention_mask_adaptor):
+        monkeypatch.setattr(module, 'get_position_ids', lambda: holder.position_ids)
+        monkeypatch.setattr(module.parallel_state, 'get_context_parallel_world_size', lambda: 1)
+    monkeypatch.setattr(torch.cuda, 'current_device', lambda: 'cpu')
+    return holder
+
+
+class TestRotaryEmbCache:
+
+    @pytest.mark.parametrize('rotary_forward', [rotary_pos_embedding.rotary_forward,
+                                                reset_attention_mask_adaptor.rotary_forward])
+    @pytest.mark.parametrize('reset', [False, True])
+    @pytest.mark.parametrize('seq_len_interpolation_factor, rotary_interleaved, dtype',
+                             [(None, False, torch.float32), (None, True, torch.float32),
+                              (4.0, False, torch.float32), (2.0, True, torch.bfloat16)])
+    def test_same_as_legacy(self, position_ids_holder, rotary_forward, reset, seq_len_interpolation_factor,
+                            rotary_interleaved, dtype):
+        rotary_embedding = build_rotary_embedding(64, dtype, seq_len_interpolation_factor, rotary_interleaved)
+        position_ids_holder.args.reset_position_ids = reset
+        for max_seq_len, offset, batch_size in [(128, 0, 2), (128, 0, 2), (96, 3, 1), (128, 0, 3), (96, 3, 2)]:
+            position_ids_holder.position_ids = build_position_ids(max_seq_len, batch_size, reset)
+            emb = rotary_forward(rotary_embedding, max_seq_len, offset)
+            expected = legacy_rotary_forward(rotary_embedding, max_seq_len, offset, position_ids_holder.position_ids)
+            assert emb.shape == expected.shape and emb.dtype == expected.dtype
+            assert torch.equal(emb, expected)
+
+    @pytest.mark.parametrize('batch_size', [1, 2])
+    def test_emb_does_not_alias_the_cache(self, position_ids_holder, batch_size):
+        rotary_embedding = build_rotary_embedding(16)
+        position_ids_holder.position_ids = build_position_ids(32, batch_size, reset=False)
+        emb = rotary_pos_embedding.rotary_forward(rotary_embedding, 32)
+        expected = emb.clone()
+        assert emb.is_contiguous() and emb.view(32 * batch_size, -1).shape == (32 * batch_size, 16)
+        emb.mul_(2)
+        assert torch.equal(rotary_pos_embedding.rotary_forward(rotary_embedding, 32), expected)
+
+    def test_default_position_ids_checked_once_per_shape(self, position_ids_holder, monkeypatch):
+        rotary_embedding = build_rotary_embedding(16)
+        num_checks = []
+        equal = torch.equal
+        monkeypatch.setattr(torch, 'equal', lambda *args: num_checks.append(1) or equal(*args))
+        for batch_size in (2, 2, 1, 2, 1):
+            position_ids_holder.position_ids = build_position_ids(32, batch_size, reset=False)
+            emb = rotary_pos_embedding.rotary_forward(rotary_embedding, 32)
+            assert equal(emb, legacy_rotary_forward(rotary_embedding, 32, 0, position_ids_holder.position_ids))
+        assert len(num_checks) == 2
+
+        # reset position ids are gathered without a check
+        position_ids_holder.args.reset_position_ids = True
+        position_ids_holder.position_ids = build_position_ids(32, 3, reset=True)
+        emb = rotary_pos_embedding.rotary_forward(rotary_embedding, 32)
+        assert equal(emb, legacy_rotary_forward(rotary_embedding, 32, 0, position_ids_holder.position_ids))
+        assert len(num_checks) == 2
+
+    def test_lru_eviction(self):
+        rotary_embedding = build_rotary_embedding(16)
+        tables = [rotary_pos_embedding.get_rotary_emb(rotary_embedding, 32, offset)
+                  for offset in range(rotary_pos_embedding.ROTARY_EMB_CACHE_SIZE)]
+        # a hit makes offset 0 the most recently used table, offset 1 is then the first one evicted
+        assert rotary_pos_embedding.get_rotary_emb(rotary_embedding, 32, 0) is tables[0]
+        rotary_pos_embedding.get_rotary_emb(rotary_embedding, 64)
+        assert len(rotary_embedding._rotary_emb_cache) == rotary_pos_embedding.ROTARY_EMB_CACHE_SIZE
+        assert rotary_pos_embedding.get_rotary_emb(rotary_embedding, 32, 0) is tables[0]
+        assert rotary_pos_embedding.get_rotary_emb(rotary_embedding, 32, 2) is tables[2]
+        rebuilt = rotary_pos_embedding.get_rotary_emb(rotary_embedding, 32, 1)
+        assert rebuilt is not tables[1] and torch.equal(rebuilt, tables[1])
+
+    def test_cache_follows_inv_freq_updates(self):
+        rotary_embedding = build_rotary_embedding(16)
+        first = rotary_pos_embedding.get_rotary_emb(rotary_embedding, 32)
+        rotary_embedding.inv_freq.mul_(2)
+        assert torch.equal(rotary_pos_embedding.get_rotary_emb(rotary_embedding, 32), first * 2)
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('reset', [False, True])
+    def test_rotary_forward_benchmark(self, position_ids_holder, reset):
+        max_seq_len, batch_size, num_calls = 4096, 2, 50
+        rotary_embedding = build_rotary_embedding(128)
+        position_ids_holder.args.reset_position_ids = reset
+        calls_per_second = {}
+        for name in ('legacy', 'cached'):
+            start = time.perf_counter()
+            for _ in range(num_calls):
+                # a new micro-batch sets new position ids
+                position_ids_holder.position_ids = build_position_ids(max_seq_len, batch_size, reset)
+                if name == 'legacy':
+                    legacy_rotary_forward(rotary_embedding, max_seq_len, 0, position_ids_holder.position_ids)
+                else:
+                    rotary_pos_embedding.rotary_forward(rotary_embedding, max_seq_len)
+            calls_per_second[name] = num_calls / (time.perf_counter() - start)
+        print(f"\nreset position ids={reset}: legacy {calls_per_second['legacy']:.0f} calls/s, "
+              f"cached {calls_per_second['cached']:.0f} calls/s")
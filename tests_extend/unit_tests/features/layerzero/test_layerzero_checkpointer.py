@@ -0,0 +1,117 @@
+import os
+from argparse import Namespace
+
+import pytest
+import torch
+
+from mindspeed.core.distributed.layerzero.state.fqn import ShardFlattenInfo
+from mindspeed.core.distributed.layerzero.state.scripts.layerzero_checkpointer import (
+    LayerzeroCheckpoint,
+    StreamingLayerzeroCheckpoint,
+)
+
+TP, PP, DP = 2, 2, 2
+NUM_LAYERS = 4
+# local name -> (local shape, dtype, tensor_model_parallel, partition_dim, managed by layerzero)
+FIRST_STAGE = {
+    'embedding.word_embeddings.weight': ((16, 8), torch.float32, True, 0, False),
+    'shared.bias': ((8,), torch.float32, False, -1, True),
+}
+LAST_STAGE = {
+    'final_layernorm.weight': ((8,), torch.bfloat16, False, -1, True),
+    'shared.bias': ((8,), torch.float32, False, -1, True),
+}
+LAYERS = {
+    'layers.{}.linear_qkv.weight': ((12, 8), torch.bfloat16, True, 0, True),
+    'layers.{}.linear_proj.weight': ((8, 4), torch.float32, True, 1, True),
+    'layers.{}.input_layernorm.weight': ((8,), torch.float32, False, -1, True),
+    'layers.{}.rotary.inv_freq': ((4,), torch.float32, False, -1, False),
+}
+
+
+def build_stage_params(pp_rank):
+    params = dict(FIRST_STAGE if pp_rank == 0 else LAST_STAGE)
+    for layer in range(NUM_LAYERS // PP):
+        params.update({name.format(layer): param for name, param in LAYERS.items()})
+    return params
+
+
+def save_layerzero_checkpoint(ckpt_dir):
+    generator = torch.Generator().manual_seed(0)
+    args = Namespace(num_layers=NUM_LAYERS, pipeline_model_parallel_size=PP, tensor_model_parallel_size=TP)
+    for pp_rank in range(PP):
+        params = build_stage_params(pp_rank)
+        full_params = {}
+        for name, (shape, dtype, tensor_model_parallel, _, zero) in params.items():
+            num_copies = TP if tensor_model_parallel or not zero else 1
+            full_params[name] = torch.randn(num_copies, *shape, generator=generator).to(dtype)
+        for dp_rank in range(DP):
+            for tp_rank in range(TP):
+                global_rank = (pp_rank * DP + dp_rank) * TP + tp_rank
+                model, shard_infos = {}, {}
+                for name, (shape, _, tensor_model_parallel, partition_dim, zero) in params.items():
+                    if not zero:
+                        model[name] = full_params[name][tp_rank].clone()
+                        continue
+                    # the flattened parameter is evenly sharded over the ranks of the stage
+                    shards = full_params[name].flatten().chunk(TP * DP)
+                    model[name] = shards[tp_rank * DP + dp_rank].clone()
+                    shard_infos[name] = ShardFlattenInfo(True, model[name].numel(), 0, model[name].numel() - 1,
+                                                         torch.Size(shape), tensor_model_parallel, partition_dim, 1)
+                state_dict = {
+                    'iteration': 100,
+                    'args': args,
+                    'model': model,
+                    'shard_state_dict': shard_infos,
+                    'parallel_state': {'tp_rank': tp_rank, 'pp_rank': pp_rank, 'dp_rank': dp_rank,
+                                       'tp_degree': TP, 'pp_degree': PP, 'dp_degree': DP,
+                                       'global_rank': global_rank},
+                }
+                rank_dir = os.path.join(ckpt_dir, f'rank_{global_rank}')
+                os.makedirs(rank_dir)
+                torch.save(state_dict, os.path.join(rank_dir, 'model_optim.pt'))
+
+
+def save_rank_checkpoints(lz_checkpoint, output_dir, target_tp, target_pp):
+    for tp_index in range(target_tp):
+        for pp_index in range(target_pp):
+            rank_dir = os.path.join(output_dir, f'mp_rank_{tp_index:02d}_{pp_index:03d}')
+            os.makedirs(rank_dir)
+            state_dict = {'model': lz_checkpoint.create_rank_checkpoint(tp_index, pp_index, target_tp, target_pp),
+                          'iteration': lz_checkpoint.get_iteration()}
+            torch.save(state_dict, os.path.join(rank_dir, 'model_optim_rng.pt'))
+
+
+def read_rank_checkpoints(output_dir):
+    files = {}
+    for rank_dir in sorted(os.listdir(output_dir)):
+        with open(os.path.join(output_dir, rank_dir, 'model_optim_rng.pt'), 'rb') as f:
+            files[rank_dir] = f.read()
+    return files
+
+
+class TestLayerzeroCheckpointer:
+
+    @pytest.mark.parametrize('target_tp, target_pp', [(1, 1), (2, 2), (4, 2)])
+    @pytest.mark.parametrize('max_memory_bytes, num_workers', [(0, 1), (1024, 1), (2 ** 30, 2)])
+    def test_streaming_same_bytes_as_in_memory(self, tmp_path, target_tp, target_pp, max_memory_bytes,
+                                               num_workers):
+        ckpt_dir = str(tmp_path / 'layerzero')
+        save_layerzero_checkpoint(ckpt_dir)
+
+        save_rank_checkpoints(LayerzeroCheckpoint(ckpt_dir), str(tmp_path / 'in_memory'), target_tp, target_pp)
+        spill_dir = str(tmp_path / 'spill')
+        streaming = StreamingLayerzeroCheckpoint(ckpt_dir, spill_dir, max_memory_bytes, num_workers)
+        save_rank_checkpoints(streaming, str(tmp_path / 'streaming'), target_tp, target_pp)
+
+        in_memory_files = read_rank_checkpoints(str(tmp_path / 'in_memory'))
+        assert len(in_memory_files) == target_tp * target_pp
+        assert read_rank_checkpoints(str(tmp_path / 'streaming')) == in_memory_files
+
+    @pytest.mark.parametrize('max_memory_bytes, num_spill_files', [(0, 7 + 8), (2 ** 30, 2)])
+    def test_spill_files_follow_memory_budget(self, tmp_path, max_memory_bytes, num_spill_files):
+        ckpt_dir = str(tmp_path / 'layerzero')
+        save_layerzero_checkpoint(ckpt_dir)
+        spill_dir = str(tmp_path / 'spill')
+        StreamingLayerzeroCheckpoint(ckpt_dir, spill_dir, max_memory_bytes)
+        assert len(os.listdir(spill_dir)) == num_spill_files
@@ -0,0 +1,220 @@
+import contextlib
+from types import SimpleNamespace
+
+from mindspeed.core.distributed.layerzero.runtime._shard import (
+    _post_backward_reshard,
+    _post_forward_reshard,
+    _pre_forward_backward_unshard,
+)
+from mindspeed.core.distributed.layerzero.zero3._exec_order_utils import _ExecOrderData
+from mindspeed.core.distributed.layerzero.zero3._limiter import _FreeEventQueue
+from mindspeed.core.distributed.layerzero.zero3.api import BackwardPrefetch
+from mindspeed.core.distributed.layerzero.zero3.flat_param import HandleTrainingState
+
+MB = 1024 * 1024
+
+
+class FakeDevice:
+    """
+    Device memory of the simulation. The CPU runs ahead of the device, so a freed unsharded
+    flat param is only reclaimed once a later free event has been synchronized.
+    """
+
+    def __init__(self):
+        self.live_bytes = 0
+        self.pending_frees = []
+        self.num_events = 0
+        self.num_syncs = 0
+        self.peak_bytes = 0
+
+    @property
+    def pending_bytes(self):
+        return sum(nbytes for _, nbytes in self.pending_frees)
+
+    def alloc(self, nbytes):
+        self.live_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.live_bytes + self.pending_bytes)
+
+    def free(self, nbytes):
+        self.live_bytes -= nbytes
+        self.pending_frees.append((self.num_events, nbytes))
+
+    def record(self):
+        self.num_events += 1
+        return self.num_events
+
+    def synchronize(self, event_id):
+        self.num_syncs += 1
+        self.pending_frees = [(seq, nbytes) for seq, nbytes in self.pending_frees if seq >= event_id]
+
+
+class FakeEvent:
+
+    def __init__(self, device):
+        self.device = device
+        self.event_id = None
+
+    def record(self):
+        self.event_id = self.device.record()
+
+    def synchronize(self):
+        self.device.synchronize(self.event_id)
+
+
+class FakeHandle:
+
+    def __init__(self, name, nbytes, device, unshard_log):
+        self.name = name
+        self._unsharded_bytes = nbytes
+        self.device = device
+        self.unshard_log = unshard_log
+        self.flat_param = SimpleNamespace(data=None)
+        self.unsharded = False
+        self.enter_backward = False
+        self._prefetched = False
+        self._training_state = HandleTrainingState.IDLE
+        self._needs_pre_backward_unshard = False
+        self._pre_forward_order_index = None
+        self._post_forward_index = None
+
+    def needs_unshard(self):
+        return not self.unsharded
+
+    def pre_unshard(self):
+        pass
+
+    def unshard(self):
+        self.unshard_log.append((self.name, self._training_state))
+        self.device.alloc(self._unsharded_bytes)
+        self.unsharded = True
+
+    def post_unshard(self):
+        pass
+
+    def reshard(self, free_unsharded_flat_param):
+        if free_unsharded_flat_param and self.unsharded:
+            self.device.free(self._unsharded_bytes)
+            self.unsharded = False
+
+    def _check_unsharded(self, tensor):
+        assert self.unsharded
+
+
+def build_trace(num_layers=8):
+    """Handles of a transformer: embedding, per layer two small norms and two large linears, output layer."""
+    trace = [("embedding", 256 * MB)]
+    for layer in range(num_layers):
+        trace += [(f"layers.{layer}.input_layernorm", 16 * 1024), (f"layers.{layer}.attention", 48 * MB),
+                  (f"layers.{layer}.pre_mlp_layernorm", 16 * 1024), (f"layers.{layer}.mlp", 96 * MB)]
+    trace += [("final_layernorm", 16 * 1024), ("output_layer", 256 * MB)]
+    return trace
+
+
+def build_state(trace, inflight_all_gather_bytes):
+    device = FakeDevice()
+    unshard_log = []
+    handles = [FakeHandle(name, nbytes, device, unshard_log) for name, nbytes in trace]
+    stream = SimpleNamespace(wait_stream=lambda other: None)
+    exec_order_data = _ExecOrderData(1, 1, inflight_all_gather_bytes)
+    exec_order_data.all_handles = list(handles)
+    state = SimpleNamespace(
+        limit_all_gathers=True,
+        forward_prefetch=True,
+        backward_prefetch=BackwardPrefetch.BACKWARD_PRE,
+        zero3_rank=0,
+        _sync_gradients=True,
+        _free_event_queue=_FreeEventQueue(max_inflight_bytes=inflight_all_gather_bytes),
+        _exec_order_data=exec_order_data,
+        _device_handle=SimpleNamespace(stream=lambda s: contextlib.nullcontext(), Event=lambda: FakeEvent(device)),
+        _unshard_stream=stream,
+        _pre_unshard_stream=stream,
+        _default_stream=stream,
+    )
+    return state, handles, device, unshard_log
+
+
+def run_iteration(state, handles):
+    """Runs the unshard/reshard hooks of the forward and the backward like the LayerZeRO3 runtime."""
+    eod = state._exec_order_data
+    for handle in handles:
+        eod.record_pre_forward(handle, True)
+        handle._training_state = HandleTrainingState.FORWARD
+        _pre_forward_backward_unshard(state, handle)
+        assert handle.unsharded
+        eod.record_post_forward(handle)
+        _post_forward_reshard(state, handle)
+        handle._training_state = HandleTrainingState.IDLE
+        handle._needs_pre_backward_unshard = True
+    for handle in reversed(handles):
+        handle._training_state = HandleTrainingState.BACKWARD_PRE
+        _pre_forward_backward_unshard(state, handle)
+        assert handle.unsharded
+        handle._training_state = HandleTrainingState.BACKWARD_POST
+        _post_backward_reshard(state, handle)
+        handle._training_state = HandleTrainingState.IDLE
+    eod.next_iter()
+    for handle in handles:
+        handle._needs_pre_backward_unshard = False
+        handle._post_forward_index = None
+        handle._prefetched = False
+
+
+class TestLayerzeroLimiter:
+
+    def test_count_limiter(self):
+        queue = _FreeEventQueue()
+        for event in range(3):
+            assert queue.dequeue_if_needed(100 * MB) is None
+            queue.enqueue(event, 100 * MB)
+        assert queue.dequeue_if_needed(100 * MB) == 0
+        assert queue.inflight_bytes == 300 * MB
+
+    def test_bytes_limiter(self):
+        queue = _FreeEventQueue(max_inflight_bytes=10 * MB)
+        for event, nbytes in enumerate([4 * MB, 1024, 1024, 4 * MB]):
+            assert queue.dequeue_if_needed(nbytes) is None
+            queue.enqueue(event, nbytes)
+        # the all-gathers of the freed flat params are in flight until their free events are waited for
+        assert queue.inflight_bytes == 8 * MB + 2048
+        assert queue.dequeue_if_needed(MB) is None
+        # the events are ordered on the stream, only the last one needs to be waited for
+        assert queue.dequeue_if_needed(5 * MB) == 2
+        assert queue.inflight_bytes == 10 * MB
+        assert queue.dequeue_if_needed(100 * MB) == 3
+        assert queue.inflight_bytes == 106 * MB
+
+    def test_same_prefetch_without_budget(self):
+        state, handles, _, unshard_log = build_state(build_trace(), None)
+        for _ in range(2):
+            run_iteration(state, handles)
+        names = [name for name, _ in build_trace()]
+        forward_log = [name for name, training_state in unshard_log[len(names):]
+                       if training_state == HandleTrainingState.FORWARD]
+        # one handle is prefetched ahead, the first handle is unsharded by its own pre-forward
+        assert forward_log == names
+        assert not any(handle.unsharded for handle in handles)
+
+    def test_bytes_budget_simulation(self):
+        trace = build_trace()
+        budget = 320 * MB
+        results = {}
+        for inflight_all_gather_bytes in (None, budget):
+            state, handles, device, unshard_log = build_state(trace, inflight_all_gather_bytes)
+            for _ in range(3):
+                run_iteration(state, handles)
+            results[inflight_all_gather_bytes] = (device.peak_bytes, device.num_syncs, len(unshard_log))
+            assert not any(handle.unsharded for handle in handles)
+            if inflight_all_gather_bytes is not None:
+                # the prefetch depth adapts to the sizes, the small norms are prefetched with the next linear
+                depths = [len(state._exec_order_data.get_handles_to_forward_prefetch(handle)) for handle in handles]
+                assert max(depths) > 1
+                # the unsharded flat params that are in use or not reclaimed yet stay within the budget
+                assert device.peak_bytes <= budget
+                assert device.pending_bytes == state._free_event_queue.inflight_bytes
+
+        (count_peak, count_syncs, count_unshards), (bytes_peak, bytes_syncs, bytes_unshards) = (
+            results[None], results[budget])
+        assert count_unshards == bytes_unshards
+        assert bytes_peak < count_peak
+        # the small handles do not use up the budget, so fewer all-gathers wait for a free
+        assert bytes_syncs < count_syncs
@@ -0,0 +1,90 @@
+import pytest
+import torch
+
+from mindspeed.moe.capacity import CapacityNegotiator
+from tests_extend.unit_tests.gloo_common import run_gloo
+
+
+def legacy_negotiate(cur_capacities, rank, predicted_capacity, num_tokens):
+    """The reduce + broadcast + conditional all-reduce negotiation of dynamic padding."""
+    capacity = predicted_capacity
+    if any(cur_capacity > predicted_capacity for cur_capacity in cur_capacities):
+        capacity = max(cur_capacities)
+    if cur_capacities[rank] > num_tokens:
+        capacity = num_tokens
+    return capacity
+
+
+def no_host_sync(*args, **kwargs):
+    raise AssertionError('capacity negotiation must not synchronize with the host')
+
+
+def check_same_as_legacy(rank, steps):
+    negotiator = CapacityNegotiator()
+    torch.Tensor.item = no_host_sync
+    for cur_capacities, predicted_capacity in steps:
+        capacity = negotiator.negotiate(torch.tensor(cur_capacities[rank]), torch.tensor(predicted_capacity), 64)
+        # the legacy capacity of a rank below the token count could exceed it, e.g. 70 for 3 tokens
+        assert capacity.tolist() == min(legacy_negotiate(cur_capacities, rank, predicted_capacity, 64), 64)
+
+
+def check_bucket_schedule(rank, steps, expected_capacities, expected_changes):
+    negotiator = CapacityNegotiator(bucket_size=8, shrink_patience=3)
+    capacities = []
+    for cur_capacities in steps:
+        capacity = negotiator.negotiate(torch.tensor(cur_capacities[rank]), torch.tensor(0), 1024)
+        capacities.append(capacity.tolist())
+    assert capacities == expected_capacities
+    assert negotiator.stats() == {'steps': len(steps), 'capacity_changes': expected_changes,
+                                  'capacity': expected_capacities[-1]}
+
+
+def check_capped_capacity_keeps_schedule(rank, steps, expected_capacities):
+    negotiator = CapacityNegotiator(bucket_size=8, shrink_patience=3)
+    num_tokens = 10 if rank == 0 else 1024
+    for cur_capacities, expected_capacity in zip(steps, expected_capacities):
+        capacity = negotiator.negotiate(torch.tensor(cur_capacities[rank]), torch.tensor(0), num_tokens)
+        assert capacity.tolist() == min(num_tokens, expected_capacity)
+        # the schedule of every rank keeps the agreed capacity
+        assert negotiator.capacity.tolist() == expected_capacity
+
+
+def check_capacity_capped_below_bucket(rank, num_tokens):
+    negotiator = CapacityNegotiator(bucket_size=16, shrink_patience=2)
+    for cur_capacity in (3, num_tokens, 1):
+        capacity = negotiator.negotiate(torch.tensor(cur_capacity), torch.tensor(0), num_tokens)
+        assert capacity.tolist() == num_tokens and negotiator.capacity.tolist() == 16
+        scores = torch.rand(num_tokens, 4)
+        assert torch.topk(scores, k=capacity, dim=0)[1].shape == (num_tokens, 4)
+
+
+def check_bucket_schedule_stable(rank, bucket_size):
+    negotiator = CapacityNegotiator(bucket_size=bucket_size, shrink_patience=2)
+    for _ in range(5):
+        negotiator.negotiate(torch.tensor(8 - rank), torch.tensor(8), 1024)
+    assert negotiator.stats() == {'steps': 5, 'capacity_changes': 0, 'capacity': 8}
+
+
+class TestCapacityNegotiator:
+
+    def test_same_as_legacy_negotiation(self):
+        steps = [([10, 12], 16), ([10, 20], 16), ([30, 5], 16), ([16, 16], 16), ([70, 3], 16), ([3, 4], 2)]
+        run_gloo(check_same_as_legacy, 2, steps)
+
+    def test_bucket_schedule_with_hysteresis(self):
+        steps = [[10, 3], [12, 14], [17, 2], [9, 9], [3, 12], [4, 4], [4, 4], [20, 4], [4, 4], [4, 4], [4, 4]]
+        # grows at once to the bucket of the max over ranks, shrinks after 3 steps below to the largest bucket
+        # required during those steps.
+        expected_capacities = [16, 16, 24, 24, 24, 16, 16, 24, 24, 24, 8]
+        run_gloo(check_bucket_schedule, 2, steps, expected_capacities, 4)
+
+    def test_capped_capacity_keeps_schedule(self):
+        steps = [[12, 3], [4, 4], [4, 4], [4, 4]]
+        run_gloo(check_capped_capacity_keeps_schedule, 2, steps, [16, 16, 16, 8])
+
+    def test_capacity_capped_below_bucket(self):
+        run_gloo(check_capacity_capped_below_bucket, 2, 5)
+
+    @pytest.mark.parametrize('bucket_size', [0, 8])
+    def test_counters_without_changes(self, bucket_size):
+        run_gloo(check_bucket_schedule_stable, 2, bucket_size)
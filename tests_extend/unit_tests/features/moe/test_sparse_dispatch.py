@@ -0,0 +1,113 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+import mindspeed.moe.gate as moe_gate
+from mindspeed.moe.config import Config
+from mindspeed.moe.gate import top1gating, top2gating
+from mindspeed.moe.utils import einsum, sparse_dispatch, sparse_combine
+
+
+@pytest.fixture
+def gate_args(monkeypatch):
+    args = SimpleNamespace(ampipe_degree=1, use_rts=False, enable_token_rearrange_opt=False)
+    monkeypatch.setattr(moe_gate, 'get_args', lambda: args)
+    return args
+
+
+def run_moe(logits, hidden_states, expert_weight, topk, capacity_factor, sparse):
+    num_tokens, num_experts = logits.shape
+    config = Config(hidden_states.shape[-1], num_experts=num_experts, topk=topk, capacity_factor=capacity_factor,
+                    sparse_dispatch=sparse)
+    torch.manual_seed(1234)
+    gating = top1gating if topk == 1 else top2gating
+    if sparse:
+        l_aux, dispatch_info = gating(logits, config)
+        dispatched_input = sparse_dispatch(hidden_states, dispatch_info, num_experts)
+        output = sparse_combine(torch.bmm(dispatched_input, expert_weight), dispatch_info, num_tokens)
+    else:
+        l_aux, combine_weights, dispatch_mask = gating(logits, config)
+        dispatched_input = einsum("sec,sm->ecm", dispatch_mask.type_as(hidden_states), hidden_states)
+        output = einsum("sec,ecm->sm", combine_weights.type_as(hidden_states),
+                        torch.bmm(dispatched_input, expert_weight))
+    return l_aux, dispatched_input, output
+
+
+def build_inputs(num_tokens, num_experts, hidden_size, dtype, seed):
+    generator = torch.Generator().manual_seed(seed)
+    logits = torch.randn(num_tokens, num_experts, generator=generator).requires_grad_()
+    hidden_states = torch.randn(num_tokens, hidden_size, generator=generator).to(dtype).requires_grad_()
+    expert_weight = (torch.randn(num_experts, hidden_size, hidden_size, generator=generator) / 4).to(dtype)
+    return logits, hidden_states, expert_weight
+
+
+class TestSparseDispatch:
+
+    @pytest.mark.parametrize('use_rts', [False, True])
+    @pytest.mark.parametrize('dtype', [torch.float32, torch.bfloat16])
+    @pytest.mark.parametrize('capacity_factor', [0.5, 1.0, 2.0])
+    @pytest.mark.parametrize('num_experts', [4, 16, 64])
+    @pytest.mark.parametrize('topk', [1, 2])
+    def test_sparse_dispatch_same_as_dense(self, gate_args, topk, num_experts, capacity_factor, dtype, use_rts):
+        gate_args.use_rts = use_rts
+        logits, hidden_states, expert_weight = build_inputs(256, num_experts, 32, dtype, num_experts)
+
+        dense_l_aux, dense_dispatched, dense_output = run_moe(logits, hidden_states, expert_weight, topk,
+                                                              capacity_factor, sparse=False)
+        dense_grads = torch.autograd.grad(dense_output.float().sum(), [logits, hidden_states])
+        sparse_l_aux, sparse_dispatched, sparse_output = run_moe(logits, hidden_states, expert_weight, topk,
+                                                                 capacity_factor, sparse=True)
+        sparse_grads = torch.autograd.grad(sparse_output.float().sum(), [logits, hidden_states])
+
+        assert torch.equal(sparse_l_aux, dense_l_aux)
+        assert torch.equal(sparse_dispatched, dense_dispatched)
+        if topk == 2 and dtype == torch.float32:
+            # the dense fp32 matmul may fuse the two products of a token, which rounds once less.
+            torch.testing.assert_close(sparse_output, dense_output)
+        else:
+            assert torch.equal(sparse_output, dense_output)
+        for sparse_grad, dense_grad in zip(sparse_grads, dense_grads):
+            torch.testing.assert_close(sparse_grad, dense_grad)
+
+    def test_sparse_dispatch_info_offsets(self, gate_args):
+        logits = torch.randn(128, 8)
+        config = Config(16, num_experts=8, topk=2, capacity_factor=1.0, sparse_dispatch=True)
+        _, dispatch_info = top2gating(logits, config)
+
+        offsets = dispatch_info.expert_token_offsets.tolist()
+        assert offsets[0] == 0 and offsets[-1] == dispatch_info.token_ec_idx.numel()
+        for expert in range(8):
+            expert_ec_idx = dispatch_info.token_ec_idx[offsets[expert]:offsets[expert + 1]]
+            assert torch.all(torch.div(expert_ec_idx, dispatch_info.capacity, rounding_mode='floor') == expert)
+        assert torch.unique(dispatch_info.token_ec_idx).numel() == dispatch_info.token_ec_idx.numel()
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize('capacity_factor', [1.0, 2.0])
+    @pytest.mark.parametrize('num_experts', [8, 64, 256])
+    def test_sparse_dispatch_benchmark(self, gate_args, num_experts, capacity_factor):
+        num_tokens, hidden_size = 4096, 64
+        logits, hidden_states, expert_weight = build_inputs(num_tokens, num_experts, hidden_size, torch.float32, 0)
+        results = {}
+        for sparse in (False, True):
+            config = Config(hidden_size, num_experts=num_experts, topk=2, capacity_factor=capacity_factor,
+                            sparse_dispatch=sparse)
+            start = time.perf_counter()
+            gating_output = top2gating(logits, config)
+            if sparse:
+                dispatch_info = gating_output[1]
+                dispatched_input = sparse_dispatch(hidden_states, dispatch_info, num_experts)
+                sparse_combine(dispatched_input, dispatch_info, num_tokens)
+                routing_bytes = sum(tensor.numel() * tensor.element_size() for tensor in dispatch_info[:4])
+            else:
+                _, combine_weights, dispatch_mask = gating_output
+                dispatched_input = einsum("sec,sm->ecm", dispatch_mask.type_as(hidden_states), hidden_states)
+                einsum("sec,ecm->sm", combine_weights, dispatched_input)
+                routing_bytes = combine_weights.numel() * combine_weights.element_size() + dispatch_mask.numel()
+            results[sparse] = (time.perf_counter() - start, routing_bytes)
+
+        (dense_time, dense_bytes), (sparse_time, sparse_bytes) = results[False], results[True]
+        print(f'\nE={num_experts} capacity_factor={capacity_factor}: dense {dense_time * 1000:.1f}ms '
+              f'{dense_bytes / 2 ** 20:.1f}MB, sparse {sparse_time * 1000:.1f}ms {sparse_bytes / 2 ** 20:.3f}MB')
+        assert sparse_bytes < dense_bytes
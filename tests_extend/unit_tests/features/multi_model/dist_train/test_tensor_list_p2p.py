@@ -0,0 +1,79 @@
+import pytest
+import torch
+import torch.distributed
+
+import mindspeed.core.multi_modal.dist_train.dist_communication as comm
+from tests_extend.unit_tests.gloo_common import run_gloo
+
+# (shape, dtype, requires_grad) of the tensors of a micro-batch, the shapes repeat and change at the last one
+MICRO_BATCHES = [
+    [((4, 2, 8), torch.float32, True), ((3,), torch.int64, False), ((2, 2), torch.float16, False)],
+    [((4, 2, 8), torch.float32, True), ((3,), torch.int64, False), ((2, 2), torch.float16, False)],
+    [((4, 2, 8), torch.float32, True), ((3,), torch.int64, False), ((2, 2), torch.float16, False)],
+    [((6, 2, 8), torch.float32, True), ((0,), torch.int64, False), ((2, 2), torch.float64, True)],
+]
+
+
+def make_tensor_list(src_rank, step):
+    generator = torch.Generator().manual_seed(src_rank * 100 + step)
+    tensor_list = []
+    for shape, dtype, requires_grad in MICRO_BATCHES[step]:
+        tensor = (torch.rand(shape, generator=generator) * 100).to(dtype)
+        tensor_list.append(tensor.requires_grad_(requires_grad))
+    return tensor_list
+
+
+def no_blocking_p2p(*args, **kwargs):
+    raise AssertionError('the tensor list transfer must not use blocking send/recv')
+
+
+def check_tensor_list_transfer(rank, src, dst):
+    comm._get_device = lambda: torch.device('cpu')
+    torch.distributed.send = torch.distributed.recv = no_blocking_p2p
+    batch_isend_irecv = torch.distributed.batch_isend_irecv
+    num_p2p_ops = []
+
+    def counting_batch_isend_irecv(p2p_op_list):
+        num_p2p_ops.append(len(p2p_op_list))
+        return batch_isend_irecv(p2p_op_list)
+
+    torch.distributed.batch_isend_irecv = counting_batch_isend_irecv
+    for step in range(len(MICRO_BATCHES)):
+        num_p2p_ops.clear()
+        if rank in src:
+            comm.send_tensor_list(make_tensor_list(rank, step), dst)
+            # one batch, the metadata is only sent with the first and the changed micro-batch
+            num_metadata = 1 if step in (0, len(MICRO_BATCHES) - 1) else 0
+            num_payloads = sum(1 for shape, _, _ in MICRO_BATCHES[step] if 0 not in shape)
+            assert num_p2p_ops == [len(dst) * (1 + num_metadata + num_payloads)]
+        elif rank in dst:
+            tensor_list = comm.recv_tensor_list(src)
+            expected = [make_tensor_list(src_rank, step) for src_rank in src]
+            assert len(tensor_list) == len(MICRO_BATCHES[step])
+            for i, tensors in enumerate(tensor_list):
+                assert len(tensors) == len(src)
+                for tensor, expected_tensors in zip(tensors, expected):
+                    assert tensor.dtype == expected_tensors[i].dtype
+                    assert tensor.requires_grad == expected_tensors[i].requires_grad
+                    assert torch.equal(tensor.detach(), expected_tensors[i].detach())
+            # headers, then the metadata if it changed, then the payloads
+            assert len(num_p2p_ops) == (3 if step in (0, len(MICRO_BATCHES) - 1) else 2)
+    if rank in dst:
+        assert comm.TENSOR_SYNC_TOOL.metadata_misses == 2 * len(src)
+        assert comm.TENSOR_SYNC_TOOL.metadata_hits == (len(MICRO_BATCHES) - 2) * len(src)
+
+
+class TestTensorListP2P:
+
+    def test_metadata_encode_decode(self):
+        tool = comm.TensorSyncTool()
+        tensor_list = [torch.empty(2, 3, requires_grad=True), None, torch.empty(0, dtype=torch.int32),
+                       torch.empty(1, 2, 3, 4, 5, 6, 7, 8, dtype=torch.float16)]
+        metadata = tool.encode_tensor_list_metadata(tensor_list)
+        assert tool.decode_tensor_list_metadata(metadata, len(tensor_list)) == [
+            (torch.float32, [2, 3], True), (None, None, None), (torch.int32, [0], False),
+            (torch.float16, [1, 2, 3, 4, 5, 6, 7, 8], False)]
+
+    @pytest.mark.parametrize('src, dst', [([0], [1, 2, 3]), ([0, 1], [2, 3]), ([0, 1, 2], [3])])
+    def test_tensor_list_transfer(self, src, dst):
+        run_gloo(check_tensor_list_transfer, 4, src, dst)
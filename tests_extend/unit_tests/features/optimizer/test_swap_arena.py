@@ -0,0 +1,210 @@
+from contextlib import contextmanager
+
+import pytest
+import torch
+
+from mindspeed.core.optimizer.swap_optimizer.swap_arena import (SWAP_IN, SWAP_OUT, UPDATE, BucketedSwapper,
+                                                                HostArenaLayout, allocate_host_arena, get_slot_views,
+                                                                plan_buckets, plan_swap_schedule)
+
+ADAM_KEYS = ('param', 'exp_avg', 'exp_avg_sq')
+
+
+class FakeEvent:
+    def __init__(self, stream, index):
+        self.name = f'{stream.name}{index}'
+
+
+class FakeStream:
+    """Logs the events, the copies on CPU are synchronous."""
+
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+        self.num_events = 0
+
+    def record_event(self):
+        event = FakeEvent(self, self.num_events)
+        self.num_events += 1
+        self.log.append(('record', event.name))
+        return event
+
+    def wait_event(self, event):
+        self.log.append(('wait', self.name, event.name))
+
+    def wait_stream(self, stream):
+        self.log.append(('wait_stream', self.name, stream.name))
+
+
+class FakeDevice:
+    def __init__(self):
+        self.log = []
+        self.compute_stream = FakeStream('compute', self.log)
+        self._streams = [self.compute_stream]
+
+    def current_stream(self):
+        return self._streams[-1]
+
+    @contextmanager
+    def stream(self, stream):
+        self._streams.append(stream)
+        try:
+            yield
+        finally:
+            self._streams.pop()
+
+
+def make_swapper(numels, bucket_numel, seed=0, amsgrad_every=0):
+    generator = torch.Generator().manual_seed(seed)
+    layout = HostArenaLayout()
+    slots = [layout.add(numel, ADAM_KEYS + (('max_exp_avg_sq',) if amsgrad_every and i % amsgrad_every == 0 else ()))
+             for i, numel in enumerate(numels)]
+    arena = allocate_host_arena(layout, pin_memory=False)
+    arena.copy_(torch.rand(layout.numel, generator=generator))
+    # the device tensors are swapped out, they have their shape and an empty storage
+    slot_tensors = {}
+    for slot in slots:
+        tensors = {key: torch.empty(slot.numel) for key in slot.keys}
+        for tensor in tensors.values():
+            tensor.untyped_storage().resize_(0)
+        slot_tensors[slot] = tensors
+    device = FakeDevice()
+    swapper = BucketedSwapper(plan_buckets(slots, bucket_numel), {0: arena}, FakeStream('h2d', device.log),
+                              FakeStream('d2h', device.log), device=device)
+    return swapper, slots, slot_tensors, arena, device
+
+
+def fake_adam_update(tensors):
+    tensors['exp_avg'].mul_(0.9).add_(tensors['param'], alpha=0.1)
+    tensors['exp_avg_sq'].mul_(0.99).addcmul_(tensors['param'], tensors['param'], value=0.01)
+    if 'max_exp_avg_sq' in tensors:
+        torch.maximum(tensors['max_exp_avg_sq'], tensors['exp_avg_sq'], out=tensors['max_exp_avg_sq'])
+    tensors['param'].sub_(tensors['exp_avg'] / (tensors['exp_avg_sq'].sqrt() + 1e-8), alpha=1e-3)
+
+
+def run_step(swapper, slots, slot_tensors, on_acquire=None):
+    swapper.begin_step(slot_tensors)
+    slot_to_bucket = {slot: index for index, bucket in enumerate(swapper.buckets) for slot in bucket.slots}
+    current_bucket = None
+    for slot in slots:
+        bucket = slot_to_bucket[slot]
+        if bucket != current_bucket:
+            if current_bucket is not None:
+                swapper.release(current_bucket)
+            swapper.acquire(bucket)
+            current_bucket = bucket
+            if on_acquire is not None:
+                on_acquire(bucket)
+        fake_adam_update(slot_tensors[slot])
+    swapper.release(current_bucket)
+    swapper.end_step()
+
+
+def is_resident(tensor):
+    return tensor.untyped_storage().size() != 0
+
+
+class TestSwapArena:
+
+    def test_layout_packs_slots_in_order(self):
+        layout = HostArenaLayout(arena=3)
+        slots = [layout.add(10, ADAM_KEYS), layout.add(4, ADAM_KEYS + ('max_exp_avg_sq',)), layout.add(6, ADAM_KEYS)]
+        assert [(slot.offset, slot.end) for slot in slots] == [(0, 30), (30, 46), (46, 64)]
+        assert layout.numel == 64 and all(slot.arena == 3 for slot in slots)
+        assert slots[1].get_offset('exp_avg_sq') == 38
+        arena = torch.arange(layout.numel, dtype=torch.float32)
+        views = get_slot_views(arena, slots[1], (2, 2))
+        assert views['max_exp_avg_sq'].shape == (2, 2)
+        assert views['max_exp_avg_sq'].flatten().tolist() == [42, 43, 44, 45]
+        views['exp_avg'].fill_(-1)
+        assert arena[34:38].tolist() == [-1] * 4
+
+    def test_plan_buckets(self):
+        layout = HostArenaLayout()
+        slots = [layout.add(numel, ADAM_KEYS) for numel in [4, 4, 10, 1, 2, 3, 8]]
+        buckets = plan_buckets(slots, bucket_numel=8)
+        assert [[slots.index(slot) for slot in bucket.slots] for bucket in buckets] == [[0, 1], [2], [3, 4, 5], [6]]
+        assert [(bucket.start, bucket.end) for bucket in buckets] == [(0, 24), (24, 54), (54, 72), (72, 96)]
+        # a slot which is not next in the arena, or in another arena, starts a new bucket
+        other = HostArenaLayout(arena=1).add(1, ADAM_KEYS)
+        buckets = plan_buckets([slots[0], slots[2], slots[3], other], bucket_numel=100)
+        assert [len(bucket.slots) for bucket in buckets] == [1, 2, 1]
+        assert plan_buckets([], 8) == []
+
+    def test_plan_swap_schedule(self):
+        assert plan_swap_schedule(3) == [
+            (SWAP_IN, 0, 0), (SWAP_IN, 1, 1),
+            (UPDATE, 0, 0), (SWAP_OUT, 0, 0), (SWAP_IN, 2, 0),
+            (UPDATE, 1, 1), (SWAP_OUT, 1, 1),
+            (UPDATE, 2, 0), (SWAP_OUT, 2, 0),
+        ]
+        assert plan_swap_schedule(1) == [(SWAP_IN, 0, 0), (UPDATE, 0, 0), (SWAP_OUT, 0, 0)]
+        for num_buckets in range(7):
+            schedule = plan_swap_schedule(num_buckets)
+            # every bucket is swapped in, updated and swapped out once, at most two buckets are resident
+            for bucket in range(num_buckets):
+                ops = [op for op, op_bucket, _ in schedule if op_bucket == bucket]
+                assert ops == [SWAP_IN, UPDATE, SWAP_OUT]
+            resident = 0
+            for op, _, _ in schedule:
+                resident += {SWAP_IN: 1, SWAP_OUT: -1, UPDATE: 0}[op]
+                assert resident <= 2
+
+    def test_stream_dependencies(self):
+        swapper, slots, slot_tensors, _, device = make_swapper([4, 4, 4], bucket_numel=4)
+        run_step(swapper, slots, slot_tensors)
+        assert device.log == [
+            ('wait_stream', 'compute', 'd2h'), ('wait_stream', 'h2d', 'compute'),
+            ('record', 'h2d0'), ('record', 'h2d1'),
+            # bucket 0 is updated after its swap in, swapped out after its update, then its buffer is reused
+            ('wait', 'compute', 'h2d0'),
+            ('record', 'compute0'), ('wait', 'd2h', 'compute0'), ('record', 'd2h0'),
+            ('wait', 'h2d', 'd2h0'), ('record', 'h2d2'),
+            ('wait', 'compute', 'h2d1'),
+            ('record', 'compute1'), ('wait', 'd2h', 'compute1'), ('record', 'd2h1'),
+            ('wait', 'compute', 'h2d2'),
+            ('record', 'compute2'), ('wait', 'd2h', 'compute2'), ('record', 'd2h2'),
+        ]
+
+    @pytest.mark.parametrize("bucket_numel", [1, 7, 20, 1000])
+    def test_same_update_as_per_param_swaps(self, bucket_numel):
+        numels = [5, 3, 8, 1, 13, 2, 7, 4]
+        swapper, slots, slot_tensors, arena, _ = make_swapper(numels, bucket_numel, amsgrad_every=3)
+        expected = arena.clone()
+        for slot in slots:
+            fake_adam_update(get_slot_views(expected, slot, (slot.numel,)))
+
+        max_resident = []
+
+        def count_resident(bucket):
+            resident_buckets = {index for index, other in enumerate(swapper.buckets)
+                                if any(is_resident(tensor) for slot in other.slots
+                                       for tensor in slot_tensors[slot].values())}
+            assert bucket in resident_buckets
+            max_resident.append(len(resident_buckets))
+
+        run_step(swapper, slots, slot_tensors, on_acquire=count_resident)
+        assert torch.equal(arena, expected)
+        assert max(max_resident) <= 2
+        assert not any(is_resident(tensor) for tensors in slot_tensors.values() for tensor in tensors.values())
+        assert all(tensor.shape == (slot.numel,) for slot in slots for tensor in slot_tensors[slot].values())
+
+    def test_resident_tensors_are_copied_to_arena(self):
+        swapper, slots, slot_tensors, arena, _ = make_swapper([3, 3], bucket_numel=3)
+        loaded = torch.full((3,), 7.)
+        slot_tensors[slots[1]]['exp_avg'].set_(loaded.clone())
+        expected = arena.clone()
+        get_slot_views(expected, slots[1], (3,))['exp_avg'].copy_(loaded)
+        for slot in slots:
+            fake_adam_update(get_slot_views(expected, slot, (slot.numel,)))
+        run_step(swapper, slots, slot_tensors)
+        assert torch.equal(arena, expected)
+
+    def test_out_of_order_update_is_rejected(self):
+        swapper, slots, slot_tensors, _, _ = make_swapper([2, 2, 2], bucket_numel=2)
+        swapper.begin_step(slot_tensors)
+        with pytest.raises(RuntimeError):
+            swapper.acquire(1)
+        swapper.acquire(0)
+        with pytest.raises(RuntimeError):
+            swapper.release(1)
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+import pytest
+import torch
+import torch.distributed as dist
+
+import mindspeed.core.pipeline_parallel.variable_seq_length.shape_schedule as shape_schedule
+from mindspeed.core.pipeline_parallel.variable_seq_length.communicate import communicate_impl
+from mindspeed.core.pipeline_parallel.variable_seq_length.shape_schedule import (
+    announce_shape_schedule,
+    bucket_seq_length,
+)
+from tests_extend.unit_tests.gloo_common import run_gloo
+
+SEQ_LENGTHS = [5, 7, 5, 12, 7, 5]
+MICRO_BATCH_SIZE, HIDDEN_SIZE = 2, 4
+
+
+def batched_p2p_ops(*, tensor_send_prev, tensor_recv_prev, tensor_send_next, tensor_recv_next, group,
+                    prev_pipeline_rank, next_pipeline_rank):
+    ops = []
+    if tensor_send_prev is not None:
+        ops.append(dist.P2POp(dist.isend, tensor_send_prev, prev_pipeline_rank, group))
+    if tensor_recv_prev is not None:
+        ops.append(dist.P2POp(dist.irecv, tensor_recv_prev, prev_pipeline_rank, group))
+    if tensor_send_next is not None:
+        ops.append(dist.P2POp(dist.isend, tensor_send_next, next_pipeline_rank, group))
+    if tensor_recv_next is not None:
+        ops.append(dist.P2POp(dist.irecv, tensor_recv_next, next_pipeline_rank, group))
+    return dist.batch_isend_irecv(ops) if ops else []
+
+
+def run_pipeline(rank, world_size, buckets):
+    """Runs all forwards then all backwards of the micro batches, returns the received tensors and the number of
+    p2p calls."""
+    config = SimpleNamespace(variable_seq_lengths=True, pipeline_dtype=torch.float32, batch_p2p_comm=True,
+                             batch_p2p_sync=False, use_ring_exchange_p2p=False)
+    num_p2p_calls = [0]
+
+    def communicate(tensor_send_next, tensor_send_prev, recv_prev, recv_next):
+        def counting_batched_p2p_ops(**kwargs):
+            num_p2p_calls[0] += 1
+            return batched_p2p_ops(**kwargs)
+
+        recv_prev_tensor, recv_next_tensor, _ = communicate_impl(
+            tensor_send_next, tensor_send_prev, recv_prev, recv_next, [1, 1, 1], config,
+            get_pipeline_model_parallel_group=lambda: None,
+            get_pipeline_model_parallel_next_rank=lambda: rank + 1,
+            get_pipeline_model_parallel_prev_rank=lambda: rank - 1,
+            batched_p2p_ops=counting_batched_p2p_ops, p2p_ops=None)
+        return recv_prev_tensor, recv_next_tensor
+
+    received = []
+    is_first, is_last = rank == 0, rank == world_size - 1
+    for micro_batch, seq_length in enumerate(SEQ_LENGTHS):
+        if is_first:
+            padded_length = bucket_seq_length(seq_length, buckets) if buckets else seq_length
+            activation = torch.full((padded_length, MICRO_BATCH_SIZE, HIDDEN_SIZE), float(micro_batch))
+        else:
+            activation, _ = communicate(None, None, True, False)
+            received.append(activation.detach().clone())
+            activation = activation.detach() + 1
+        if not is_last:
+            communicate(activation, None, False, False)
+    for micro_batch in range(len(SEQ_LENGTHS)):
+        if is_last:
+            grad = torch.full(received[micro_batch].shape, 100. + micro_batch)
+        else:
+            _, grad = communicate(None, None, False, True)
+            received.append(grad.detach().clone())
+            grad = grad.detach() * 2
+        if not is_first:
+            communicate(None, grad, False, False)
+    return received, num_p2p_calls[0]
+
+
+def check_schedule_same_as_shape_exchange(rank, world_size, buckets):
+    torch.cuda.current_device = lambda: 'cpu'
+    expected, num_exchange_calls = run_pipeline(rank, world_size, buckets)
+    assert shape_schedule.get_saved_shape_messages() == 0
+
+    shapes = None
+    if rank == 0:
+        shapes = [[seq_length, MICRO_BATCH_SIZE, HIDDEN_SIZE] for seq_length in SEQ_LENGTHS]
+    announced = announce_shape_schedule(shapes, group=None, src=0, buckets=buckets)
+    expected_seq_lengths = [bucket_seq_length(seq_length, buckets) if buckets else seq_length
+                            for seq_length in SEQ_LENGTHS]
+    assert [shape[0] for shape in announced] == expected_seq_lengths
+
+    received, num_schedule_calls = run_pipeline(rank, world_size, buckets)
+    assert len(received) == len(expected)
+    for tensor, expected_tensor in zip(received, expected):
+        assert torch.equal(tensor, expected_tensor)
+    # one shape send or receive per direction and micro batch
+    num_directions = (rank > 0) * 2 + (rank < world_size - 1) * 2
+    assert shape_schedule.get_saved_shape_messages() == num_directions * len(SEQ_LENGTHS)
+    # every transfer needed a shape exchange before, none with the schedule
+    assert num_exchange_calls == 2 * num_schedule_calls
+
+    # the schedule is used up, the shapes are exchanged again
+    _, num_calls = run_pipeline(rank, world_size, buckets)
+    assert num_calls == num_exchange_calls
+
+
+def check_mismatched_shape(rank):
+    torch.cuda.current_device = lambda: 'cpu'
+    announce_shape_schedule([[4, 1, 2]] if rank == 0 else None, group=None, src=0)
+    config = SimpleNamespace(variable_seq_lengths=True, virtual_pipeline_model_parallel_size=None)
+    with pytest.raises(RuntimeError, match='does not match the announced shape'):
+        shape_schedule.take_scheduled_shapes(torch.empty(5, 1, 2), None, False, False, config)
+
+
+class TestShapeSchedule:
+
+    def test_bucket_seq_length(self):
+        assert [bucket_seq_length(seq_length, [4, 8, 16]) for seq_length in (1, 4, 5, 16)] == [4, 4, 8, 16]
+        with pytest.raises(ValueError):
+            bucket_seq_length(17, [4, 8, 16])
+
+    @pytest.mark.parametrize('buckets', [None, [8, 16]])
+    def test_schedule_same_as_shape_exchange(self, buckets):
+        run_gloo(check_schedule_same_as_shape_exchange, 3, 3, buckets)
+
+    def test_mismatched_shape(self):
+        run_gloo(check_mismatched_shape, 2)
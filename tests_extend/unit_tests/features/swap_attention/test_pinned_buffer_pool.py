@@ -0,0 +1,185 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+import mindspeed.core.memory.swap_attention.prefetch as prefetch
+from mindspeed.core.memory.pinned_buffer_pool import PinnedBufferPool, copy_storage_, get_size_class
+
+MB = 1024 * 1024
+
+
+class FakeEvent:
+    def __init__(self, done=False):
+        self.done = done
+
+    def query(self):
+        return self.done
+
+
+def swap_step(activations, acquire, release):
+    """Swaps the activations out and back in, like the forward and backward of one step."""
+    host_tensors = []
+    for activation in activations:
+        host_tensor = acquire(activation.shape, activation.dtype)
+        copy_storage_(host_tensor, activation)
+        host_tensors.append(host_tensor)
+    for activation, host_tensor in zip(reversed(activations), reversed(host_tensors)):
+        copy_storage_(activation, host_tensor)
+        release(host_tensor)
+
+
+class FakeStream:
+    def record_event(self):
+        return FakeEvent(done=True)
+
+
+class TestPinnedBufferPool:
+
+    def test_size_classes(self):
+        assert get_size_class(1, min_block_bytes=1024) == 1024
+        assert get_size_class(1024, min_block_bytes=1024) == 1024
+        assert [get_size_class(n * MB // 8, min_block_bytes=1024) for n in range(9, 17)] == \
+               [10 * MB // 8] * 2 + [12 * MB // 8] * 2 + [14 * MB // 8] * 2 + [2 * MB] * 2
+        previous = 0
+        for nbytes in range(1025, 5 * MB, 4099):
+            size_class = get_size_class(nbytes, min_block_bytes=1024)
+            assert nbytes <= size_class < nbytes * 1.25
+            assert size_class >= previous
+            previous = size_class
+
+    def test_released_buffer_is_reused(self):
+        pool = PinnedBufferPool(pin_memory=False, min_block_bytes=1024)
+        tensor = pool.acquire((4, 256), torch.bfloat16)
+        assert tensor.shape == (4, 256) and tensor.dtype == torch.bfloat16
+        data_ptr = tensor.data_ptr()
+        pool.release(tensor)
+        # a close shape of another dtype falls in the same size class
+        tensor = pool.acquire((500,), torch.float32)
+        assert tensor.data_ptr() == data_ptr
+        other = pool.acquire((4, 256), torch.bfloat16)
+        assert other.data_ptr() != data_ptr
+        stats = pool.end_step()
+        assert (stats.num_acquires, stats.num_reuses, stats.num_allocations) == (3, 1, 2)
+        assert stats.reuse_ratio == pytest.approx(1 / 3)
+        assert (stats.held_bytes, stats.peak_held_bytes, stats.cached_bytes) == (4096, 4096, 0)
+        assert pool.stats.num_acquires == 0 and pool.last_step_stats is stats
+
+    def test_release_is_idempotent(self):
+        pool = PinnedBufferPool(pin_memory=False, min_block_bytes=1024)
+        tensor = pool.acquire((16,), torch.float32)
+        pool.release(tensor)
+        pool.release(tensor)
+        pool.release(torch.empty(256))
+        assert pool.cached_bytes == 1024 and pool.stats.num_releases == 1
+        assert pool.acquire((16,), torch.float32).data_ptr() == tensor.data_ptr()
+        assert pool.acquire((16,), torch.float32).data_ptr() != tensor.data_ptr()
+
+    def test_buffer_is_reused_after_its_event(self):
+        pool = PinnedBufferPool(pin_memory=False, min_block_bytes=1024)
+        tensor = pool.acquire((16,), torch.float32)
+        event = FakeEvent()
+        pool.release(tensor, event)
+        assert pool.acquire((16,), torch.float32).data_ptr() != tensor.data_ptr()
+        assert pool.trim() == 0
+        event.done = True
+        assert pool.acquire((16,), torch.float32).data_ptr() == tensor.data_ptr()
+
+    def test_max_cached_bytes(self):
+        pool = PinnedBufferPool(max_cached_bytes=3072, pin_memory=False, min_block_bytes=1024)
+        tensors = [pool.acquire((256 * (i + 1),), torch.float32) for i in range(3)]
+        for tensor in tensors:
+            pool.release(tensor)
+        # the buffer of 3072 bytes does not fit next to the two others
+        assert pool.cached_bytes == 3072 and pool.stats.num_evictions == 1
+        pool.set_max_cached_bytes(1024)
+        assert pool.cached_bytes == 1024
+        assert pool.acquire((256,), torch.float32).data_ptr() == tensors[0].data_ptr()
+
+    def test_trim(self):
+        pool = PinnedBufferPool(pin_memory=False, min_block_bytes=1024)
+        tensors = [pool.acquire((256 * (i + 1),), torch.float32) for i in range(3)]
+        for tensor in tensors:
+            pool.release(tensor)
+        assert pool.trim(3072) == 3072
+        assert pool.cached_bytes == 3072
+        assert pool.acquire((256,), torch.float32).data_ptr() == tensors[0].data_ptr()
+        assert pool.trim() == 2048 and pool.cached_bytes == 0 and pool.held_bytes == 1024
+
+    def test_copy_storage(self):
+        pool = PinnedBufferPool(pin_memory=False, min_block_bytes=1024)
+        activation = torch.randn(8, 5).t()
+        expected = activation.clone()
+        host_tensor = pool.acquire(activation.shape, activation.dtype)
+        copy_storage_(host_tensor, activation)
+        activation.untyped_storage().resize_(0)
+        activation.untyped_storage().resize_(40 * 4)
+        copy_storage_(activation, host_tensor)
+        assert torch.equal(activation, expected)
+
+    def test_steps_reuse_the_buffers(self):
+        activations = [torch.randn(n * MB // 4) for n in [40, 40, 48, 36, 40, 48]]
+        expected = [activation.clone() for activation in activations]
+        pool = PinnedBufferPool(pin_memory=False)
+        swap_step(activations, pool.acquire, pool.release)
+        warmup_stats = pool.end_step()
+        for _ in range(5):
+            swap_step(activations, pool.acquire, pool.release)
+        stats = pool.end_step()
+        assert all(torch.equal(activation, value) for activation, value in zip(activations, expected))
+        # only the first step allocates
+        assert warmup_stats.num_allocations == len(activations)
+        assert stats.num_allocations == 0 and stats.reuse_ratio == 1.
+
+    def test_aliased_storages_release_the_shared_buffer_once(self, monkeypatch):
+        pool = PinnedBufferPool(pin_memory=False, min_block_bytes=1024)
+        monkeypatch.setattr(prefetch, 'get_pinned_buffer_pool', lambda: pool)
+        monkeypatch.setattr(torch, 'npu', SimpleNamespace(Event=lambda: None), raising=False)
+        stream = FakeStream()
+        activation = torch.randn(256)
+        first = prefetch.SwapTensor(activation, 'layers.0')
+        # a second saved tensor of the same storage shares the host buffer of the first one
+        second = prefetch.SwapTensor(activation.view(16, 16), 'layers.0')
+        second.share_host_buffer(first)
+        assert second.tensor_cpu is first.tensor_cpu and pool.used_bytes == 1024
+
+        first.release_host_buffer(stream)
+        first.release_host_buffer(stream)
+        # the buffer is still used by the second swap tensor, the next ones get other buffers
+        assert pool.used_bytes == 1024
+        others = [prefetch.SwapTensor(torch.randn(256), 'layers.1') for _ in range(2)]
+        assert all(other.tensor_cpu.data_ptr() != second.tensor_cpu.data_ptr() for other in others)
+        second.release_host_buffer(stream)
+        for other in others:
+            other.release_host_buffer(stream)
+        assert pool.used_bytes == 0 and pool.cached_bytes == 3 * 1024
+
+    @pytest.mark.benchmark
+    def test_benchmark_against_fresh_allocations(self):
+        activations = [torch.randn(n * MB // 4) for n in [40, 40, 48, 36, 40, 48]]
+        num_steps = 5
+        fresh_allocations = []
+
+        def fresh_acquire(shape, dtype):
+            fresh_allocations.append(shape)
+            return torch.empty(shape, dtype=dtype)
+
+        def run(acquire, release):
+            start = time.perf_counter()
+            for _ in range(num_steps):
+                swap_step(activations, acquire, release)
+            return (time.perf_counter() - start) / num_steps
+
+        pool = PinnedBufferPool(pin_memory=False)
+        swap_step(activations, fresh_acquire, lambda tensor: None)
+        swap_step(activations, pool.acquire, pool.release)
+        fresh_allocations.clear()
+        pool.end_step()
+        fresh_time = run(fresh_acquire, lambda tensor: None)
+        pool_time = run(pool.acquire, pool.release)
+        stats = pool.end_step()
+        print(f"\nswap of {len(activations)} activations per step: "
+              f"{len(fresh_allocations) / num_steps:.0f} allocations {fresh_time * 1e3:.2f} ms with fresh buffers, "
+              f"{stats.num_allocations / num_steps:.0f} allocations {pool_time * 1e3:.2f} ms with the pool, "
+              f"{fresh_time / pool_time:.1f}x")
@@ -0,0 +1,24 @@
+import os
+import tempfile
+from datetime import timedelta
+
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+GLOO_TIMEOUT = timedelta(seconds=120)
+
+
+def _gloo_worker(rank, world_size, store_path, fn, args):
+    dist.init_process_group('gloo', init_method=f'file://{store_path}', rank=rank, world_size=world_size,
+                            timeout=GLOO_TIMEOUT)
+    fn(rank, *args)
+    dist.barrier()
+    # destroying the gloo group may hang or abort when the peers exit at the same time on a small cpu host,
+    # the process exits right away instead.
+    os._exit(0)
+
+
+def run_gloo(fn, world_size, *args):
+    """Run fn(rank, *args) on world_size cpu processes joined in a gloo process group."""
+    with tempfile.TemporaryDirectory() as store_dir:
+        mp.spawn(_gloo_worker, args=(world_size, os.path.join(store_dir, 'store'), fn, args), nprocs=world_size)
@@ -0,0 +1,167 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+import mindspeed.core.context_parallel.utils as cp_utils
+from mindspeed.core.context_parallel.utils import AdaptiveCpOps, coarsen_attn_mask_npu
+
+
+class FakeAdaptiveCpOps:
+    """Python stand-in of the adaptive cp cpu operators, search_kmeans sorts the rows by their number of tasks."""
+
+    def __init__(self):
+        self.kmeans_threads = []
+        self.num_mask_list_calls = 0
+
+    def coarsen_mask(self, attn_mask, split_num, output):
+        output.copy_(coarsen_attn_mask_npu(attn_mask, attn_mask.shape[0] // split_num))
+
+    def search_kmeans(self, attn_mask, reduced_mask, tmp_attn_mask, tmp_grid_mask, optimal_grid_mask,
+                      optimal_attn_mask, optimal_num_cluster, cp_size, num_iters):
+        self.kmeans_threads.append(threading.current_thread().name)
+        seq = torch.argsort(attn_mask.sum(dim=1), stable=True)
+        remapped_mask = attn_mask[seq][:, seq]
+        self.coarsen_mask(remapped_mask, cp_size, optimal_grid_mask)
+        optimal_attn_mask.copy_(remapped_mask)
+        return seq.tolist()
+
+    def get_mask_list_with_remap(self, attn_mask, output, q_token_list, kv_token_list):
+        self.num_mask_list_calls += 1
+        output.copy_(attn_mask[q_token_list][:, kv_token_list])
+
+    def get_mask_list_without_remap(self, attn_mask, output, grid_inds, cp_size):
+        self.num_mask_list_calls += 1
+        grid_size = attn_mask.shape[0] // cp_size
+        q_device_id, kv_device_id = grid_inds
+        output.copy_(attn_mask[grid_size * q_device_id:grid_size * (q_device_id + 1),
+                               grid_size * kv_device_id:grid_size * (kv_device_id + 1)])
+
+
+def build_packed_mask(seq_len, doc_starts):
+    """Causal mask of packed documents, True is masked."""
+    doc_ids = torch.zeros(seq_len, dtype=torch.long)
+    for start in doc_starts:
+        doc_ids[start:] += 1
+    causal = torch.ones(seq_len, seq_len, dtype=torch.bool).tril()
+    return ~(causal & (doc_ids[:, None] == doc_ids[None, :]))
+
+
+def build_masks(seq_len):
+    mask_a = build_packed_mask(seq_len, [seq_len // 2])
+    mask_b = build_packed_mask(seq_len, [seq_len // 4, seq_len // 2 + 8])
+    # unmasks a future token inside a diagonal block, coarsening by 2 maps it to the same mask as mask_a
+    mask_a_fine = mask_a.clone()
+    mask_a_fine[2, 3] = False
+    return mask_a, mask_b, mask_a_fine
+
+
+@pytest.fixture
+def adaptive_cp_args(monkeypatch):
+    args = SimpleNamespace(attention_mask_on_cpu=True, adaptive_cp_without_coarse=False,
+                           adaptive_cp_dynamic_attn_mask=True, adaptive_cp_only_reschedule=False,
+                           adaptive_cp_cache_size=16, adaptive_cp_async_remap=False)
+    monkeypatch.setattr(cp_utils, 'get_args', lambda: args)
+    fake_ops = FakeAdaptiveCpOps()
+    monkeypatch.setattr(cp_utils, 'AdaptiveCpOpBuilder', lambda: SimpleNamespace(load=lambda: fake_ops))
+    monkeypatch.setattr(torch.Tensor, 'npu', lambda self, non_blocking=False: self, raising=False)
+    cp_utils.clear_global_info()
+    yield args, fake_ops
+    cp_utils.clear_global_info()
+
+
+def run_steps(masks, cp_size):
+    """Plans of every step, with the mask lists of all cp ranks."""
+    plans = []
+    for attn_mask in masks:
+        adaptive_cp_ops = AdaptiveCpOps()
+        opt_seq, scheduling = adaptive_cp_ops.get_adaptive_cp_info(attn_mask, cp_size)
+        mask_lists = [adaptive_cp_ops.get_mask_list(attn_mask, scheduling, opt_seq, cp_rank, cp_size)
+                      for cp_rank in range(cp_size)]
+        plans.append((list(opt_seq), [list(round_scheduling) for round_scheduling in scheduling], mask_lists))
+    return plans
+
+
+def flatten_mask_lists(mask_lists):
+    return [mask for mask_list in mask_lists for mask in mask_list]
+
+
+def assert_same_plans(plans, expected_plans):
+    assert len(plans) == len(expected_plans)
+    for (opt_seq, scheduling, mask_lists), (expected_seq, expected_scheduling, expected_mask_lists) in zip(
+            plans, expected_plans):
+        assert opt_seq == expected_seq
+        assert scheduling == expected_scheduling
+        masks, expected_masks = flatten_mask_lists(mask_lists), flatten_mask_lists(expected_mask_lists)
+        assert len(masks) == len(expected_masks)
+        for mask, expected_mask in zip(masks, expected_masks):
+            assert (mask is None and expected_mask is None) or torch.equal(mask, expected_mask)
+
+
+class TestAdaptiveCpRemapCache:
+
+    @pytest.mark.parametrize('without_coarse, seq_len, expected_misses', [(False, 2048, 2), (True, 256, 3)])
+    def test_same_plans_as_without_cache(self, adaptive_cp_args, without_coarse, seq_len, expected_misses):
+        args, fake_ops = adaptive_cp_args
+        args.adaptive_cp_without_coarse = without_coarse
+        mask_a, mask_b, mask_a_fine = build_masks(seq_len)
+        masks = [mask_a, mask_b, mask_a, mask_b, mask_a_fine, mask_a]
+
+        args.adaptive_cp_cache_size = 0
+        expected_plans = run_steps(masks, 4)
+        assert len(fake_ops.kmeans_threads) == len(masks)
+
+        args.adaptive_cp_cache_size = 16
+        fake_ops.kmeans_threads.clear()
+        fake_ops.num_mask_list_calls = 0
+        plans = run_steps(masks, 4)
+        assert_same_plans(plans, expected_plans)
+        stats = cp_utils.get_adaptive_cp_remap_cache().stats()
+        assert stats == {'hits': len(masks) - expected_misses, 'misses': expected_misses, 'size': expected_misses}
+        assert len(fake_ops.kmeans_threads) == expected_misses
+        num_masks = [sum(mask is not None for mask in flatten_mask_lists(plan[2])) for plan in plans]
+        if without_coarse:
+            # the key covers the whole mask, the hits reuse the mask lists of their plan
+            assert plans[2][2][1] is plans[0][2][1]
+            assert fake_ops.num_mask_list_calls == sum(num_masks[:2]) + num_masks[4]
+        else:
+            # the fine mask shares the coarse mask of mask_a, its mask lists are still computed from the fine mask
+            assert fake_ops.num_mask_list_calls == sum(num_masks)
+            assert any(not torch.equal(mask, fine_mask) for mask, fine_mask in zip(
+                flatten_mask_lists(plans[0][2]), flatten_mask_lists(plans[4][2])) if mask is not None)
+
+    def test_lru_eviction(self, adaptive_cp_args):
+        args, fake_ops = adaptive_cp_args
+        args.adaptive_cp_cache_size = 1
+        mask_a, mask_b, _ = build_masks(2048)
+        run_steps([mask_a, mask_b, mask_a, mask_a], 4)
+        assert cp_utils.get_adaptive_cp_remap_cache().stats() == {'hits': 1, 'misses': 3, 'size': 1}
+        assert len(fake_ops.kmeans_threads) == 3
+
+    def test_only_reschedule(self, adaptive_cp_args):
+        args, fake_ops = adaptive_cp_args
+        args.adaptive_cp_only_reschedule = True
+        mask_a, mask_b, _ = build_masks(2048)
+        args.adaptive_cp_cache_size = 0
+        expected_plans = run_steps([mask_a, mask_b, mask_a], 4)
+        args.adaptive_cp_cache_size = 16
+        assert_same_plans(run_steps([mask_a, mask_b, mask_a], 4), expected_plans)
+        assert cp_utils.get_adaptive_cp_remap_cache().stats() == {'hits': 1, 'misses': 2, 'size': 2}
+        assert not fake_ops.kmeans_threads
+
+    def test_async_remap(self, adaptive_cp_args):
+        args, fake_ops = adaptive_cp_args
+        mask_a, mask_b, _ = build_masks(2048)
+        remapped_plans = run_steps([mask_a, mask_b], 4)
+        cp_utils.clear_global_info()
+        fake_ops.kmeans_threads.clear()
+
+        args.adaptive_cp_async_remap = True
+        plans = run_steps([mask_a, mask_b, mask_a, mask_b], 4)
+        # misses keep the token order while the remap runs in the background
+        args.adaptive_cp_async_remap, args.adaptive_cp_only_reschedule, args.adaptive_cp_cache_size = False, True, 0
+        assert_same_plans(plans[:2], run_steps([mask_a, mask_b], 4))
+        assert_same_plans(plans[2:], remapped_plans)
+        assert all(name.startswith('adaptive_cp_remap') for name in fake_ops.kmeans_threads)
+        assert len(fake_ops.kmeans_threads) == 2
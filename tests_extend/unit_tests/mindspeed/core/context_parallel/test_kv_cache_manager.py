@@ -0,0 +1,101 @@
+import pytest
+import torch
+
+from mindspeed.core.context_parallel.ring_context_parallel.ring_context_parallel import KVCacheManager
+
+
+class LegacyKVCacheManager:
+    """KVCacheManager before the preallocated cache, clones every block and stacks the lists."""
+
+    def __init__(self, cache_policy):
+        self.cache_policy = cache_policy
+        self.k_cache_list = []
+        self.v_cache_list = []
+        self.allocated_bytes = 0
+
+    def _clone(self, x):
+        self.allocated_bytes += x.nbytes
+        return x.clone()
+
+    def update_cache(self, cur_kv):
+        if self.cache_policy == "full":
+            self.k_cache_list.append(self._clone(cur_kv[0]))
+            self.v_cache_list.append(self._clone(cur_kv[1]))
+        elif self.cache_policy == "half":
+            self.k_cache_list.append(self._clone(cur_kv[0]))
+
+    def get_cache(self, cur_kv):
+        self.k_cache_list = self.k_cache_list if self.k_cache_list else [self._clone(cur_kv[0])]
+        self.v_cache_list = self.v_cache_list if self.v_cache_list else [self._clone(cur_kv[1])]
+        k_stack = torch.stack(self.k_cache_list)
+        v_stack = torch.stack(self.v_cache_list)
+        self.allocated_bytes += k_stack.nbytes + v_stack.nbytes
+        return k_stack, v_stack
+
+    def get_cache_causal_regular(self, cur_kv, q):
+        self.k_cache_list = self.k_cache_list if self.k_cache_list else [self._clone(cur_kv[0])]
+        self.v_cache_list = self.v_cache_list if self.v_cache_list else [self._clone(cur_kv[1])]
+        q = q.view(-1, *q.shape[2:])
+        self.k_cache_list = [x.view(-1, *x.shape[2:]) for x in self.k_cache_list]
+        self.v_cache_list = [x.view(-1, *x.shape[2:]) for x in self.v_cache_list]
+        k_stack = torch.stack(self.k_cache_list)
+        v_stack = torch.stack(self.v_cache_list)
+        self.allocated_bytes += k_stack.nbytes + v_stack.nbytes
+        return k_stack, v_stack, q
+
+
+def run_ring_forward(manager, cp_size, kv_shape, causal_regular, seed=0):
+    """Feeds the blocks of every ring step like AttentionWithCp.forward, the two ring buffers are overwritten."""
+    generator = torch.Generator().manual_seed(seed)
+    ring_buffers = [torch.empty(2, *kv_shape), torch.empty(2, *kv_shape)]
+    cur_kv = ring_buffers[0]
+    for step in range(cp_size):
+        cur_kv = ring_buffers[step % 2]
+        cur_kv.copy_(torch.randn(2, *kv_shape, generator=generator))
+        if step + 2 != cp_size:
+            manager.update_cache(cur_kv)
+    q = torch.randn(*kv_shape, generator=generator)
+    if causal_regular:
+        return manager.get_cache_causal_regular(cur_kv, q)
+    return (*manager.get_cache(cur_kv), q)
+
+
+def storage_bytes(*tensors):
+    storages = {x.untyped_storage().data_ptr(): x.untyped_storage().nbytes() for x in tensors}
+    return sum(storages.values())
+
+
+class TestKVCacheManager:
+
+    @pytest.mark.parametrize('cache_policy', ['full', 'half', None])
+    @pytest.mark.parametrize('cp_size', [2, 4, 8])
+    @pytest.mark.parametrize('causal_regular, kv_shape', [(True, (2, 16, 2, 32)), (False, (64, 4, 8))])
+    def test_same_as_list_cache(self, cache_policy, cp_size, causal_regular, kv_shape):
+        legacy = LegacyKVCacheManager(cache_policy)
+        expected = run_ring_forward(legacy, cp_size, kv_shape, causal_regular)
+        manager = KVCacheManager(cache_policy, cp_size)
+        k_stack, v_stack, q = run_ring_forward(manager, cp_size, kv_shape, causal_regular)
+        for x, expected_x in zip((k_stack, v_stack, q), expected):
+            assert x.shape == expected_x.shape
+            assert torch.equal(x, expected_x)
+        # what backward reads: the blocks of each index and the causal [2, s, b, h] views
+        for stack, expected_stack in ((k_stack, expected[0]), (v_stack, expected[1])):
+            for block, expected_block in zip(stack, expected_stack):
+                assert torch.equal(block.view(2, block.shape[0] // 2, *block.shape[1:]),
+                                   expected_block.view(2, expected_block.shape[0] // 2, *expected_block.shape[1:]))
+
+    @pytest.mark.parametrize('cache_policy', ['full', 'half'])
+    def test_zero_copy_views(self, cache_policy):
+        cp_size, kv_shape = 8, (2, 128, 2, 64)
+        legacy = LegacyKVCacheManager(cache_policy)
+        run_ring_forward(legacy, cp_size, kv_shape, True)
+        manager = KVCacheManager(cache_policy, cp_size)
+        k_stack, v_stack, _ = run_ring_forward(manager, cp_size, kv_shape, True)
+
+        # k and v share the single preallocated storage
+        assert k_stack.untyped_storage().data_ptr() == v_stack.untyped_storage().data_ptr()
+        allocated_bytes = storage_bytes(k_stack, v_stack)
+        assert allocated_bytes == k_stack.nbytes + v_stack.nbytes
+        print(f"\ncache policy {cache_policy}, cp size {cp_size}: list cache allocated {legacy.allocated_bytes} "
+              f"bytes, preallocated cache {allocated_bytes} bytes")
+        assert allocated_bytes * 2 == legacy.allocated_bytes
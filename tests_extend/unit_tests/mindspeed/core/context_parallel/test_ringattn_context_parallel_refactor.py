@@ -28,7 +28,7 @@ class TestRefactoredRingAttnCP:
 
     def test_kv_cache_manager_full_policy(self):
         # Test full cache policy
-        manager = KVCacheManager("full")
+        manager = KVCacheManager("full", 2)
         cur_kv = (torch.randn(2, 10, 20), torch.randn(2, 10, 20))
 
         # Test update and get cache
@@ -39,8 +39,9 @@ class TestRefactoredRingAttnCP:
 
     def test_kv_cache_manager_half_policy(self):
         # Test half cache policy
-        manager_half = KVCacheManager("half")
+        manager_half = KVCacheManager("half", 2)
         cur_kv = (torch.randn(2, 10, 20), torch.randn(2, 10, 20))
 
         manager_half.update_cache(cur_kv)
-        assert manager_half.v_cache_list is None or len(manager_half.v_cache_list) == 0
\ No newline at end of file
+        # v is not cached, its only slot keeps the v of the last block
+        assert manager_half.v_cache.shape[0] == 1
\ No newline at end of file
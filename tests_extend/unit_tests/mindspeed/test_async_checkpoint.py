@@ -0,0 +1,177 @@
+import argparse
+import os
+import random
+import time
+from collections import OrderedDict, namedtuple
+
+import pytest
+import torch
+
+import mindspeed.async_checkpoint as async_checkpoint
+from mindspeed.async_checkpoint import (AsyncCheckpointWriter, is_checkpoint_done,
+                                      maybe_finalize_async_save_wrapper)
+
+ParamGroup = namedtuple("ParamGroup", ["lr", "params"])
+
+
+def make_state_dict(num_layers=4, hidden=64, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    model = OrderedDict()
+    for i in range(num_layers):
+        model[f"layers.{i}.weight"] = torch.randn(hidden, hidden, generator=generator).to(torch.bfloat16)
+        model[f"layers.{i}.bias"] = torch.randn(hidden, generator=generator)
+    # tied weights, a view of another storage and a transposed tensor
+    model["output.weight"] = model["layers.0.weight"]
+    flat = torch.randn(3 * hidden, generator=generator)
+    model["qkv.q"], model["qkv.k"] = flat[:hidden], flat[hidden:2 * hidden]
+    model["transposed"] = torch.randn(hidden, 8, generator=generator).t()
+    model["param"] = torch.nn.Parameter(torch.randn(hidden, generator=generator))
+    optimizer = {
+        "state": {i: {"exp_avg": torch.randn(hidden, generator=generator), "step": torch.tensor(7.)}
+                  for i in range(num_layers)},
+        "param_groups": [ParamGroup(1e-4, [0, 1]), ParamGroup(1e-5, (2, 3))],
+    }
+    return {
+        "args": argparse.Namespace(hidden_size=hidden, lr=1e-4),
+        "checkpoint_version": 3.0,
+        "iteration": 10,
+        "model": model,
+        "optimizer": optimizer,
+        "rng_state": [{"random_rng_state": random.getstate(), "torch_rng_state": torch.get_rng_state()}],
+    }
+
+
+def assert_same(loaded, expected):
+    assert type(loaded) is type(expected)
+    if isinstance(expected, torch.Tensor):
+        assert loaded.dtype == expected.dtype and loaded.stride() == expected.stride()
+        assert loaded.storage_offset() == expected.storage_offset()
+        assert torch.equal(loaded, expected) and loaded.requires_grad == expected.requires_grad
+    elif isinstance(expected, dict):
+        assert list(loaded) == list(expected)
+        for key in expected:
+            assert_same(loaded[key], expected[key])
+    elif isinstance(expected, (list, tuple)):
+        assert len(loaded) == len(expected)
+        for loaded_value, value in zip(loaded, expected):
+            assert_same(loaded_value, value)
+    elif isinstance(expected, argparse.Namespace):
+        assert vars(loaded) == vars(expected)
+    else:
+        assert loaded == expected
+
+
+@torch.no_grad()
+def train_step(state_dict):
+    for tensor in state_dict["model"].values():
+        tensor.add_(1)
+    state_dict["iteration"] += 1
+
+
+def write_sync(state_dict, path):
+    torch.save(state_dict, str(path))
+    return str(path)
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class TestAsyncCheckpoint:
+
+    def test_same_checkpoint_as_sync_save(self, tmp_path):
+        state_dict = make_state_dict()
+        writer = AsyncCheckpointWriter()
+        async_name, async_ema_name = str(tmp_path / "async.pt"), str(tmp_path / "async.pt.ema")
+        ema_state_dict = {"model": {"ema.weight": torch.randn(8)}}
+        writer.save([(state_dict, async_name), (ema_state_dict, async_ema_name)])
+        # the snapshot is taken before the save returns
+        expected = torch.load(write_sync(state_dict, tmp_path / "expected.pt"))
+        train_step(state_dict)
+        writer.finalize()
+        assert is_checkpoint_done(async_name) and is_checkpoint_done(async_ema_name)
+        assert sorted(os.listdir(str(tmp_path))) == ["async.pt", "async.pt.done", "async.pt.ema", "async.pt.ema.done",
+                                                     "expected.pt"]
+        loaded = torch.load(async_name)
+        assert_same(loaded, expected)
+        assert loaded["model"]["output.weight"].data_ptr() == loaded["model"]["layers.0.weight"].data_ptr()
+        assert loaded["model"]["qkv.k"].untyped_storage().data_ptr() == \
+            loaded["model"]["qkv.q"].untyped_storage().data_ptr()
+        assert_same(torch.load(async_ema_name), ema_state_dict)
+
+        # the host buffers are reused by the next save, which is identical to a sync save of the same file name
+        host_buffers = list(writer._host_buffers)
+        writer.save([(state_dict, str(tmp_path / "expected.pt"))])
+        writer.wait()
+        assert all(a is b for a, b in zip(writer._host_buffers, host_buffers))
+        sync_name = str(tmp_path / "sync" / "expected.pt")
+        os.makedirs(os.path.dirname(sync_name))
+        torch.save(state_dict, sync_name)
+        assert read_bytes(str(tmp_path / "expected.pt")) == read_bytes(sync_name)
+
+    def test_one_save_in_flight(self, tmp_path):
+        state_dict = make_state_dict()
+        writer = AsyncCheckpointWriter()
+        finalized = []
+        for iteration in range(3):
+            writer.save([(state_dict, str(tmp_path / f"iter_{iteration}.pt"))])
+            writer.add_finalize_fn(lambda iteration=iteration: finalized.append(iteration))
+            assert writer.in_flight
+            train_step(state_dict)
+        writer.finalize()
+        assert not writer.in_flight and finalized == [0, 1, 2]
+        for iteration in range(3):
+            assert torch.load(str(tmp_path / f"iter_{iteration}.pt"))["iteration"] == 10 + iteration
+
+    def test_failed_save(self, tmp_path):
+        # the checkpoint directory is a file
+        (tmp_path / "iter_0000010").write_text("")
+        checkpoint_name = str(tmp_path / "iter_0000010" / "model.pt")
+        writer = AsyncCheckpointWriter()
+        writer.save([({"x": torch.ones(2)}, checkpoint_name)])
+        writer.add_finalize_fn(lambda: pytest.fail("a failed save is not finalized"))
+        with pytest.raises(RuntimeError):
+            writer.finalize()
+        assert not writer.in_flight and not is_checkpoint_done(checkpoint_name)
+        writer.finalize()
+
+    def test_finalized_with_blocking_megatron_finalization(self, tmp_path, monkeypatch):
+        writer = AsyncCheckpointWriter()
+        monkeypatch.setattr(async_checkpoint, "_ASYNC_CHECKPOINT_WRITER", writer)
+        megatron_calls, finalized = [], []
+        maybe_finalize_async_save = maybe_finalize_async_save_wrapper(
+            lambda blocking=False, terminate=False: megatron_calls.append((blocking, terminate)))
+        writer.save([({"x": torch.ones(2)}, str(tmp_path / "model.pt"))])
+        writer.add_finalize_fn(lambda: finalized.append(True))
+        maybe_finalize_async_save(blocking=False)
+        assert not finalized
+        # e.g. before sys.exit on the exit interval
+        maybe_finalize_async_save(blocking=True, terminate=True)
+        assert finalized == [True] and not writer.in_flight and is_checkpoint_done(str(tmp_path / "model.pt"))
+        maybe_finalize_async_save(True)
+        assert megatron_calls == [(False, False), (True, True), (True, False)]
+
+    @pytest.mark.benchmark
+    def test_benchmark_blocked_time(self, tmp_path):
+        state_dict = make_state_dict(num_layers=16, hidden=1024)
+        writer = AsyncCheckpointWriter()
+        writer.save([(state_dict, str(tmp_path / "warmup.pt"))])  # allocates the host buffers
+        writer.wait()
+        num_saves = 3
+        sync_time, async_time = 0., 0.
+        for i in range(num_saves):
+            start = time.perf_counter()
+            torch.save(state_dict, str(tmp_path / f"sync_{i}.pt"))
+            sync_time += time.perf_counter() - start
+            writer.wait()
+            start = time.perf_counter()
+            writer.save([(state_dict, str(tmp_path / f"async_{i}.pt"))])
+            async_time += time.perf_counter() - start
+        writer.finalize()
+        print(f"\ncheckpoint of {os.path.getsize(str(tmp_path / 'sync_0.pt')) / 2 ** 20:.0f} MB: training thread "
+              f"blocked {sync_time / num_saves * 1e3:.1f} ms by torch.save, "
+              f"{async_time / num_saves * 1e3:.1f} ms by the async save")
+        for i in range(num_saves):
+            assert torch.equal(torch.load(str(tmp_path / f"async_{i}.pt"))["model"]["layers.0.weight"],
+                               state_dict["model"]["layers.0.weight"])
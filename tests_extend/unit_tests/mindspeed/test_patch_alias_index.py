@@ -0,0 +1,165 @@
+import sys
+import types
+
+import pytest
+from mindspeed.patch_utils import MindSpeedPatchesManager as aspm, Patch
+
+
+def make_module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def replacement(*args, **kwargs):
+    return 'replaced'
+
+
+def replacement_wrapper(fn):
+    def wrapper(*args, **kwargs):
+        return fn(*args, **kwargs) + ' wrapped'
+
+    return wrapper
+
+
+@pytest.fixture
+def clean_env():
+    patches_info = dict(aspm.patches_info)
+    aspm.patches_info.clear()
+    created = []
+    yield created
+    for name in created:
+        sys.modules.pop(name, None)
+    aspm.patches_info.clear()
+    aspm.patches_info.update(patches_info)
+
+
+def build_modules(created, prefix, num_modules, num_funcs, aliases_per_func):
+    funcs = {}
+    for i in range(num_funcs):
+        def func(*args, **kwargs):
+            return 'orig'
+        funcs[f'func_{i}'] = func
+    make_module(f'{prefix}_src', **funcs)
+    created.append(f'{prefix}_src')
+    for m in range(num_modules):
+        attrs = {f'other_{j}': j for j in range(20)}
+        for i in range(num_funcs):
+            if (i + m) % max(1, num_modules // aliases_per_func) == 0:
+                attrs[f'func_{i}'] = funcs[f'func_{i}']
+        make_module(f'{prefix}_user_{m}', **attrs)
+        created.append(f'{prefix}_user_{m}')
+    return funcs
+
+
+def snapshot(prefix, num_modules, num_funcs):
+    result = []
+    for m in range(-1, num_modules):
+        module = sys.modules[f'{prefix}_src' if m < 0 else f'{prefix}_user_{m}']
+        for i in range(num_funcs):
+            func = getattr(module, f'func_{i}', None)
+            result.append(None if func is None else func())
+    return result
+
+
+class TestPatchAliasIndex:
+
+    def test_replace_aliases(self, clean_env):
+        def orig():
+            return 'orig'
+
+        make_module('alias_index_src', target=orig)
+        make_module('alias_index_user', target=orig, other=orig)
+        clean_env.extend(['alias_index_src', 'alias_index_user'])
+
+        aspm.register_patch('alias_index_src.target', replacement)
+        aspm.apply_patches()
+
+        assert sys.modules['alias_index_src'].target() == 'replaced'
+        assert sys.modules['alias_index_user'].target() == 'replaced'
+        # only aliases with the same attribute name are patched, as before.
+        assert sys.modules['alias_index_user'].other() == 'orig'
+
+    def test_module_loaded_while_patching(self, clean_env):
+        def orig():
+            return 'orig'
+
+        make_module('alias_index_lazy_src', target=orig, loader=orig)
+        clean_env.extend(['alias_index_lazy_src', 'alias_index_lazy_user'])
+
+        def loader_wrapper(fn):
+            make_module('alias_index_lazy_user', target=orig)
+            return fn
+
+        aspm.register_patch('alias_index_lazy_src.loader', loader_wrapper)
+        aspm.register_patch('alias_index_lazy_src.target', replacement)
+        aspm.apply_patches()
+
+        assert sys.modules['alias_index_lazy_user'].target() == 'replaced'
+
+    def test_module_replaced_while_patching(self, clean_env):
+        def orig():
+            return 'orig'
+
+        make_module('alias_index_swap_src', target=orig, loader=orig)
+        make_module('alias_index_swap_user')
+        clean_env.extend(['alias_index_swap_src', 'alias_index_swap_user'])
+
+        def loader_wrapper(fn):
+            # same number of modules, but the module is a new one with an alias
+            make_module('alias_index_swap_user', target=orig)
+            return fn
+
+        aspm.register_patch('alias_index_swap_src.loader', loader_wrapper)
+        aspm.register_patch('alias_index_swap_src.target', replacement)
+        aspm.apply_patches()
+
+        assert sys.modules['alias_index_swap_user'].target() == 'replaced'
+
+    def test_chained_patches_on_alias(self, clean_env):
+        def orig():
+            return 'orig'
+
+        make_module('alias_index_chain_a', target=orig)
+        make_module('alias_index_chain_b', target=orig)
+        make_module('alias_index_chain_c', target=orig)
+        clean_env.extend(['alias_index_chain_a', 'alias_index_chain_b', 'alias_index_chain_c'])
+
+        aspm.register_patch('alias_index_chain_a.target', replacement)
+        aspm.register_patch('alias_index_chain_b.target', replacement_wrapper)
+        aspm.apply_patches()
+
+        for name in ('alias_index_chain_a', 'alias_index_chain_b', 'alias_index_chain_c'):
+            assert sys.modules[name].target() == 'replaced wrapped'
+
+    def test_same_result_as_module_scan(self, clean_env):
+        num_modules, num_funcs = 50, 20
+        build_modules(clean_env, 'alias_index_scan', num_modules, num_funcs, 5)
+        build_modules(clean_env, 'alias_index_idx', num_modules, num_funcs, 5)
+        for i in range(num_funcs):
+            Patch(f'alias_index_scan_src.func_{i}', replacement_wrapper, False).apply_patch()
+            aspm.register_patch(f'alias_index_idx_src.func_{i}', replacement_wrapper)
+        aspm.apply_patches()
+
+        assert snapshot('alias_index_scan', num_modules, num_funcs) == \
+            snapshot('alias_index_idx', num_modules, num_funcs)
+
+    def test_apply_patches_across_phases(self, clean_env):
+        num_modules, num_funcs = 1000, 200
+        build_modules(clean_env, 'alias_index_phase_scan', num_modules, num_funcs, 5)
+        build_modules(clean_env, 'alias_index_phase_idx', num_modules, num_funcs, 5)
+
+        for i in range(num_funcs):
+            Patch(f'alias_index_phase_scan_src.func_{i}', replacement_wrapper, False).apply_patch()
+
+        half = num_funcs // 2
+        for i in range(half):
+            aspm.register_patch(f'alias_index_phase_idx_src.func_{i}', replacement_wrapper)
+        aspm.apply_patches(phase='pre_patches')
+        for i in range(half, num_funcs):
+            aspm.register_patch(f'alias_index_phase_idx_src.func_{i}', replacement_wrapper)
+        aspm.apply_patches(phase='patches')
+
+        assert snapshot('alias_index_phase_scan', num_modules, num_funcs) == \
+            snapshot('alias_index_phase_idx', num_modules, num_funcs)
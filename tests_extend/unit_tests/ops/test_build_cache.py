@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+
+from mindspeed.op_builder.build_cache import (BUILD_DONE_FILE, TORCH_BATON_FILE, BuildCache, FileLock,
+                                              compute_build_hash, get_cann_version)
+
+
+class DummyBuilder:
+    """Builds a 'library' holding its build hash, records every build in a shared log."""
+
+    def __init__(self, cache_dir, log_path, build_time=0.):
+        self.cache_dir = cache_dir
+        self.log_path = log_path
+        self.build_time = build_time
+
+    def build(self, build_directory):
+        assert not os.path.exists(os.path.join(build_directory, TORCH_BATON_FILE))
+        with open(self.log_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(self.build_time)
+        with open(os.path.join(build_directory, "dummy.so"), "w") as f:
+            f.write(os.path.basename(build_directory))
+        return self.import_library("dummy", build_directory)
+
+    @staticmethod
+    def import_library(name, build_directory):
+        with open(os.path.join(build_directory, f"{name}.so")) as f:
+            return f.read()
+
+    def load(self, build_hash="0123"):
+        return BuildCache(self.cache_dir, lock_timeout=60).load("dummy", build_hash, self.build,
+                                                                self.import_library)
+
+
+def read_builds(log_path):
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path) as f:
+        return f.read().split()
+
+
+def load_in_process(builder, queue):
+    queue.put(builder.load())
+
+
+def hold_lock(path, event):
+    with FileLock(path):
+        event.set()
+        time.sleep(60)
+
+
+def write_files(directory, files):
+    for name, content in files.items():
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+    return [os.path.join(directory, name) for name in files]
+
+
+class TestBuildCache:
+
+    def test_build_hash(self, tmp_path):
+        sources = write_files(str(tmp_path), {"src/op.cpp": "int op();", "src/kernel.cpp": "int kernel();"})
+        include_dir = str(tmp_path / "inc")
+        write_files(include_dir, {"op.h": "#pragma once", "sub/kernel.hpp": "#pragma once", "notes.txt": "a"})
+        kwargs = dict(sources=sources, header_dirs=[include_dir], extra_cflags=["-O2"], extra_ldflags=["-lascendcl"],
+                      extra_include_paths=[include_dir], versions={"torch": "2.1.0", "cann": "8.0.RC3"})
+        build_hash = compute_build_hash("op", **kwargs)
+        assert build_hash == compute_build_hash("op", **dict(kwargs, versions={"cann": "8.0.RC3", "torch": "2.1.0"}))
+
+        changed = [
+            compute_build_hash("other_op", **kwargs),
+            compute_build_hash("op", **dict(kwargs, extra_cflags=["-O3"])),
+            compute_build_hash("op", **dict(kwargs, extra_ldflags=[])),
+            compute_build_hash("op", **dict(kwargs, versions={"torch": "2.1.0", "cann": "8.0.0"})),
+            compute_build_hash("op", **dict(kwargs, sources=sources[::-1])),
+        ]
+        write_files(str(tmp_path), {"src/op.cpp": "int op(int);"})
+        changed.append(compute_build_hash("op", **kwargs))
+        write_files(str(tmp_path), {"src/op.cpp": "int op();", "inc/sub/kernel.hpp": "#define KERNEL"})
+        changed.append(compute_build_hash("op", **kwargs))
+        assert len(set(changed + [build_hash])) == len(changed) + 1
+
+        # only the headers are part of the hash
+        write_files(str(tmp_path), {"inc/sub/kernel.hpp": "#pragma once", "inc/notes.txt": "b"})
+        assert compute_build_hash("op", **kwargs) == build_hash
+
+    def test_cann_version(self, tmp_path):
+        assert get_cann_version(None) == "unknown"
+        assert get_cann_version(str(tmp_path)) == "unknown"
+        write_files(str(tmp_path), {"version.cfg": "# version\ntoolkit_installed_version=[8.0.RC3:8.0.RC3.alpha]\n"})
+        assert get_cann_version(str(tmp_path)) == "8.0.RC3"
+
+    def test_build_once_and_load_from_cache(self, tmp_path):
+        log_path = str(tmp_path / "builds.log")
+        builder = DummyBuilder(str(tmp_path / "cache"), log_path)
+        cache = BuildCache(builder.cache_dir)
+        assert cache.load("dummy", "0123", builder.build, builder.import_library) == "dummy_0123"
+        assert cache.load("dummy", "0123", builder.build, builder.import_library) == "dummy_0123"
+        assert (cache.num_builds, cache.num_imports) == (1, 1)
+        assert cache.is_built("dummy", "0123")
+        # a new hash is built in its own directory, the old build stays usable
+        assert cache.load("dummy", "4567", builder.build, builder.import_library) == "dummy_4567"
+        assert len(read_builds(log_path)) == 2
+        assert sorted(os.listdir(builder.cache_dir)) == ["dummy_0123", "dummy_0123.lock", "dummy_4567",
+                                                         "dummy_4567.lock"]
+
+    def test_failed_build_is_not_cached(self, tmp_path):
+        cache = BuildCache(str(tmp_path))
+
+        def failed_build(build_directory):
+            raise RuntimeError("compile error")
+
+        with pytest.raises(RuntimeError):
+            cache.load("dummy", "0123", failed_build)
+        assert not cache.is_built("dummy", "0123")
+        builder = DummyBuilder(str(tmp_path), str(tmp_path / "builds.log"))
+        assert builder.load() == "dummy_0123"
+
+    def test_one_build_per_node(self, tmp_path):
+        log_path = str(tmp_path / "builds.log")
+        builder = DummyBuilder(str(tmp_path / "cache"), log_path, build_time=1.)
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        processes = [context.Process(target=load_in_process, args=(builder, queue)) for _ in range(8)]
+        for process in processes:
+            process.start()
+        results = [queue.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+        assert results == ["dummy_0123"] * len(processes)
+        assert len(read_builds(log_path)) == 1
+
+    def test_stale_torch_lock_is_removed(self, tmp_path):
+        builder = DummyBuilder(str(tmp_path), str(tmp_path / "builds.log"))
+        build_directory = BuildCache(builder.cache_dir).get_build_directory("dummy", "0123")
+        os.makedirs(build_directory)
+        open(os.path.join(build_directory, TORCH_BATON_FILE), "w").close()
+        assert builder.load() == "dummy_0123"
+        assert sorted(os.listdir(build_directory)) == [BUILD_DONE_FILE, "dummy.so"]
+
+    def test_lock_released_when_holder_is_killed(self, tmp_path):
+        lock_path = str(tmp_path / "dummy.lock")
+        context = multiprocessing.get_context("fork")
+        event = context.Event()
+        holder = context.Process(target=hold_lock, args=(lock_path, event))
+        holder.start()
+        assert event.wait(30)
+        with pytest.raises(TimeoutError):
+            FileLock(lock_path, timeout=0.2).acquire()
+        os.kill(holder.pid, signal.SIGKILL)
+        holder.join()
+        with FileLock(lock_path, timeout=10):
+            pass